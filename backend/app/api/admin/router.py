@@ -0,0 +1,43 @@
+import os
+from typing import Any
+
+from fastapi import APIRouter, Depends
+
+from app import models
+from app.api import deps
+from app.services.junction_client import junction
+from app.services.offer_polling import offer_poller
+from app.services.return_prefetch import return_prefetcher
+from app.services.search_jobs import search_jobs
+from app.utils.cache import cache_stats
+
+router = APIRouter()
+
+
+@router.get("/caches")
+def read_cache_stats(
+    current_user: models.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Entries, bytes and hit/miss/eviction counts of every cache in this worker process.
+    """
+    # Caches are per process; with several workers each reports its own
+    return {"pid": os.getpid(), "caches": cache_stats()}
+
+
+@router.get("/junction")
+def read_junction_stats(
+    current_user: models.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Rate limiter queue and tokens, shared offer polls and what cancelling them saved, search jobs
+    and return offer prefetching, plus circuit breaker state, bulkhead occupancy and call counts
+    per Junction endpoint group, in this worker process.
+    """
+    return {
+        "pid": os.getpid(),
+        **junction.stats(),
+        "offer_polling": offer_poller.to_dict(),
+        "search_jobs": search_jobs.to_dict(),
+        "return_prefetch": return_prefetcher.to_dict(),
+    }
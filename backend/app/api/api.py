@@ -6,6 +6,7 @@ from app.api.trips.router import router as trips_router
 from app.api.places.router import router as places_router
 from app.api.trains.router import router as trains_router
 from app.api.bookings.router import router as bookings_router
+from app.api.admin.router import router as admin_router
 
 api_router = APIRouter()
 api_router.include_router(auth_router, prefix="/auth", tags=["auth"])
@@ -14,3 +15,4 @@ api_router.include_router(trips_router, prefix="/trips", tags=["trips"])
 api_router.include_router(places_router, prefix="/places", tags=["places"])
 api_router.include_router(trains_router, prefix="/trains", tags=["trains"])
 api_router.include_router(bookings_router, prefix="/bookings", tags=["bookings"])
+api_router.include_router(admin_router, prefix="/admin", tags=["admin"])
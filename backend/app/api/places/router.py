@@ -3,10 +3,19 @@ import httpx
 from typing import List, Optional
 import os
 
+from app.core.config import settings
+from app.services.junction_client import PLACES, JunctionUnavailableError, junction
+from app.utils.cache import BoundedCache
+
 router = APIRouter()
 
-JUNCTION_API_BASE = "https://content-api.sandbox.junction.dev"
-API_KEY = "jk_live_01j8r3grxbeve8ta0h1t5qbrvx"
+# Stations and airports rarely change; autocomplete repeats the same queries
+places_cache = BoundedCache(
+    "places",
+    max_bytes=settings.PLACES_CACHE_MAX_BYTES,
+    ttl=settings.PLACES_CACHE_TTL_SECONDS,
+    stale_ttl=settings.PLACES_CACHE_STALE_SECONDS,
+)
 
 @router.get("/search")
 async def search_places(
@@ -19,8 +28,6 @@ async def search_places(
     This endpoint acts as a proxy to avoid CORS issues.
     """
     try:
-        # Build the URL
-        url = f"{JUNCTION_API_BASE}/places"
         params = {
             "filter[name][like]": query.strip()
         }
@@ -31,27 +38,22 @@ async def search_places(
         if limit:
             params["limit"] = limit
 
-        # Make the request to Junction API
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url,
-                params=params,
-                headers={
-                    "Accept": "application/json",
-                    "x-api-key": API_KEY,
-                },
-                timeout=10.0
-            )
-
-        if not response.is_success:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail=f"Junction API error: {response.text}"
-            )
-
-        data = response.json()
-        return data
+        async def load():
+            # Make the request to Junction API
+            response = await junction.request(PLACES, "GET", "/places", params=params, timeout=10.0)
+
+            if not response.is_success:
+                raise HTTPException(
+                    status_code=response.status_code,
+                    detail=f"Junction API error: {response.text}"
+                )
+
+            return response.json()
+
+        return await places_cache.aget_or_load(("search", query.strip(), place_type, limit), load)
 
+    except JunctionUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
     except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="Request to Junction API timed out")
     except httpx.RequestError as e:
@@ -82,29 +84,24 @@ async def search_airports(
 async def get_place_by_id(place_id: str):
     """Get a specific place by its ID."""
     try:
-        url = f"{JUNCTION_API_BASE}/places/{place_id}"
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url,
-                headers={
-                    "Accept": "application/json",
-                    "x-api-key": API_KEY,
-                },
-                timeout=10.0
-            )
-
-        if response.status_code == 404:
-            raise HTTPException(status_code=404, detail="Place not found")
-            
-        if not response.is_success:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail=f"Junction API error: {response.text}"
-            )
+        async def load():
+            response = await junction.request(PLACES, "GET", f"/places/{place_id}", timeout=10.0)
+
+            if response.status_code == 404:
+                raise HTTPException(status_code=404, detail="Place not found")
+
+            if not response.is_success:
+                raise HTTPException(
+                    status_code=response.status_code,
+                    detail=f"Junction API error: {response.text}"
+                )
+
+            return response.json()
 
-        return response.json()
+        return await places_cache.aget_or_load(("place", place_id), load)
 
+    except JunctionUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
     except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="Request to Junction API timed out")
     except httpx.RequestError as e:
@@ -1,141 +1,290 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
 import httpx
 import asyncio
 from typing import Dict, Any, Optional
 import logging
 
+from app.core.config import settings
+from app.services.junction_client import SEARCHES, JunctionUnavailableError, junction
+from app.services.offer_polling import ClientDisconnected, offer_poller, until_disconnected
+from app.services.policy_engine import annotate_train_offers
+from app.services.return_prefetch import return_prefetcher
+from app.services.search_jobs import search_jobs
+from app.utils.deadline import DEADLINE_HEADER, Deadline, DeadlineExceeded
+from app.utils.rate_limiter import LOW
+
 router = APIRouter()
 
-JUNCTION_API_BASE = "https://content-api.sandbox.junction.dev"
-API_KEY = "jk_live_01j8r3grxbeve8ta0h1t5qbrvx"
+JUNCTION_API_BASE = settings.JUNCTION_API_BASE
+API_KEY = settings.JUNCTION_API_KEY
 
 logger = logging.getLogger(__name__)
 
-async def poll_for_train_offers(train_search_id: str, train_offer_id: Optional[str] = None, max_attempts: int = 30, delay: float = 1.0) -> Optional[Dict[str, Any]]:
-    """Poll the train offers endpoint until results are available or timeout."""
+# Polling for return offers, whether the user asked for them or they are prefetched
+RETURN_MAX_ATTEMPTS = 25
+RETURN_POLL_DELAY = 2.0
+
+
+def _request_deadline(header: Optional[str], timeout: Optional[float],
+                      default: Optional[float] = None, maximum: Optional[float] = None) -> Deadline:
+    """
+    The search's end-to-end deadline, from the timeout parameter or X-Request-Timeout
+    header; default and maximum are those of a synchronous search unless given.
+    """
+    try:
+        return Deadline.from_request(
+            header,
+            timeout,
+            settings.TRAIN_SEARCH_TIMEOUT_SECONDS if default is None else default,
+            settings.TRAIN_SEARCH_MAX_TIMEOUT_SECONDS if maximum is None else maximum,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _sleep(delay: float, deadline: Optional[Deadline]) -> None:
+    """Wait between polls, waking no later than the deadline"""
+    await asyncio.sleep(deadline.timeout(delay) if deadline is not None else delay)
+
+
+def _pending_offers(train_search_id: str, train_offer_id: Optional[str] = None) -> Dict[str, Any]:
+    """Response for a search that had no offers yet when its deadline passed"""
+    resume_url = f"{settings.API_V1_STR}/trains/search/{train_search_id}/offers"
+    if train_offer_id:
+        resume_url += f"?trainOfferId={train_offer_id}"
+    return {
+        "items": [],
+        "status": "pending",
+        "train_search_id": train_search_id,
+        "resumeUrl": resume_url,
+        "message": "Search is still running, resume it to get the offers",
+    }
+
+
+async def poll_for_train_offers(train_search_id: str, train_offer_id: Optional[str] = None, max_attempts: int = 30, delay: float = 1.0,
+                                deadline: Optional[Deadline] = None,
+                                progress: Optional[Dict[str, int]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Poll the train offers endpoint until results are available, max_attempts
+    are used or the deadline passes; returns None when there are no results.
+    Stops with JunctionUnavailableError as soon as the searches circuit opens.
+    Counts upstream calls in progress["attempts"] when given.
+    """
     logger.info(f"=== STARTING POLL_FOR_TRAIN_OFFERS ===")
     logger.info(f"train_search_id: {train_search_id}")
     logger.info(f"train_offer_id: {train_offer_id}")
     logger.info(f"max_attempts: {max_attempts}")
     logger.info(f"delay: {delay}")
     
-    offers_url = f"{JUNCTION_API_BASE}/train-searches/{train_search_id}/offers"
-    if train_offer_id:
-        offers_url += f"?trainOfferId={train_offer_id}"
+    offers_path = f"/train-searches/{train_search_id}/offers"
+    params = {"trainOfferId": train_offer_id} if train_offer_id else None
         
-    logger.info(f"Final URL: {offers_url}")
+    logger.info(f"Final URL: {JUNCTION_API_BASE}{offers_path} params={params}")
     
-    try:
-        logger.info("Creating httpx.AsyncClient...")
-        async with httpx.AsyncClient() as client:
-            logger.info("httpx.AsyncClient created successfully")
-            for attempt in range(max_attempts):
-                try:
-                    logger.info(f"🚂 === POLLING ATTEMPT {attempt + 1}/{max_attempts} ===")
-                    logger.info(f"🚂 URL: {offers_url}")
-                    logger.info(f"🚂 Headers: Accept: application/json, x-api-key: {API_KEY[:10]}...")
-                    logger.info(f"🚂 Full request details:")
-                    logger.info(f"🚂   Method: GET")
-                    logger.info(f"🚂   URL: {offers_url}")
-                    logger.info(f"🚂   Headers: {{'Accept': 'application/json', 'x-api-key': '{API_KEY[:10]}...'}}")
-                    logger.info(f"🚂   Timeout: 30.0s")
-                    logger.info("🚂 About to make GET request...")
-                    
-                    response = await client.get(
-                        offers_url,
-                        headers={
-                            "Accept": "application/json",
-                            "x-api-key": API_KEY,
-                        },
-                        timeout=30.0
-                    )
-                    
-                    logger.info(f"🚂 GET request completed!")
-                    logger.info(f"🚂 Response status: {response.status_code}")
-                    logger.info(f"🚂 Response headers: {dict(response.headers)}")
-                    logger.info(f"🚂 Response content length: {len(response.content) if response.content else 0}")
-                    logger.info(f"🚂 Response text length: {len(response.text) if response.text else 0}")
+    for attempt in range(max_attempts):
+        if deadline is not None and deadline.expired:
+            logger.warning(f"Polling stopped at the request deadline after {attempt} attempts")
+            return None
+        try:
+            logger.info(f"🚂 === POLLING ATTEMPT {attempt + 1}/{max_attempts} ===")
+            logger.info(f"🚂 Path: {offers_path}")
+            logger.info(f"🚂   Timeout: 30.0s")
+            logger.info("🚂 About to make GET request...")
+            
+            # Polls yield to creating searches and bookings when the rate limit is tight
+            if progress is not None:
+                progress["attempts"] += 1
+            response = await junction.request(
+                SEARCHES, "GET", offers_path, params=params, timeout=30.0, priority=LOW, deadline=deadline
+            )
+            
+            logger.info(f"🚂 GET request completed!")
+            logger.info(f"🚂 Response status: {response.status_code}")
+            logger.info(f"🚂 Response headers: {dict(response.headers)}")
+            logger.info(f"🚂 Response content length: {len(response.content) if response.content else 0}")
+            logger.info(f"🚂 Response text length: {len(response.text) if response.text else 0}")
+            
+            if response.is_success:
+                logger.info("🚂 Response is successful, checking content...")
+                response_text = response.text.strip()
+                logger.info(f"🚂 Response text length: {len(response_text)}")
+                logger.info(f"🚂 Response text preview (first 300 chars): {response_text[:300]}")
+                
+                if not response_text:
+                    logger.info("🚂 Empty response body - API not ready yet, waiting...")
+                    logger.info(f"🚂 About to sleep for {delay}s...")
+                    await _sleep(delay, deadline)
+                    logger.info("🚂 Sleep completed")
+                    continue
                     
-                    if response.is_success:
-                        logger.info("🚂 Response is successful, checking content...")
-                        response_text = response.text.strip()
-                        logger.info(f"🚂 Response text length: {len(response_text)}")
-                        logger.info(f"🚂 Response text preview (first 300 chars): {response_text[:300]}")
-                        
-                        if not response_text:
-                            logger.info("🚂 Empty response body - API not ready yet, waiting...")
-                            logger.info(f"🚂 About to sleep for {delay}s...")
-                            await asyncio.sleep(delay)
-                            logger.info("🚂 Sleep completed")
-                            continue
-                            
-                        try:
-                            logger.info("🚂 Parsing JSON...")
-                            data = response.json()
-                            logger.info(f"🚂 JSON parsed successfully!")
-                            logger.info(f"🚂 Response data keys: {list(data.keys()) if data else 'None'}")
-                            logger.info(f"🚂 Response data preview: {str(data)[:500]}...")
-                            if data.get("items"):
-                                logger.info(f"🚂 Found {len(data['items'])} train offers - RETURNING SUCCESS")
-                                logger.info(f"🚂 SUCCESS! Returning data with {len(data['items'])} items")
-                                return data
-                            else:
-                                logger.info(f"🚂 No offers yet (items: {data.get('items', 'missing')}), waiting {delay}s...")
-                                logger.info(f"🚂 About to sleep for {delay}s...")
-                                await asyncio.sleep(delay)
-                                logger.info("🚂 Sleep completed")
-                        except Exception as json_error:
-                            logger.error(f"🚂 JSON parsing error: {str(json_error)}")
-                            logger.error(f"🚂 Response text that failed to parse: '{response_text}'")
-                            logger.info(f"🚂 About to sleep for {delay}s after JSON error...")
-                            await asyncio.sleep(delay)
-                            logger.info("🚂 Sleep completed after JSON error")
+                try:
+                    logger.info("🚂 Parsing JSON...")
+                    data = response.json()
+                    logger.info(f"🚂 JSON parsed successfully!")
+                    logger.info(f"🚂 Response data keys: {list(data.keys()) if data else 'None'}")
+                    logger.info(f"🚂 Response data preview: {str(data)[:500]}...")
+                    if data.get("items"):
+                        logger.info(f"🚂 Found {len(data['items'])} train offers - RETURNING SUCCESS")
+                        logger.info(f"🚂 SUCCESS! Returning data with {len(data['items'])} items")
+                        return data
                     else:
-                        error_text = response.text[:500] if response.text else "No response text"
-                        logger.warning(f"Polling failed with status {response.status_code}: {error_text}")
-                        logger.info("About to sleep after error...")
-                        await asyncio.sleep(delay)
-                        logger.info("Sleep completed after error")
-                        
-                except Exception as e:
-                    logger.error(f"Exception during polling attempt {attempt + 1}: {str(e)}")
-                    logger.error(f"Exception type: {type(e)}")
-                    import traceback
-                    logger.error(f"Traceback: {traceback.format_exc()}")
-                    logger.info("About to sleep after exception...")
-                    await asyncio.sleep(delay)
-                    logger.info("Sleep completed after exception")
-    except Exception as e:
-        logger.error(f"Error creating httpx client: {str(e)}")
-        logger.error(f"Exception type: {type(e)}")
-        import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
-        return None
+                        logger.info(f"🚂 No offers yet (items: {data.get('items', 'missing')}), waiting {delay}s...")
+                        logger.info(f"🚂 About to sleep for {delay}s...")
+                        await _sleep(delay, deadline)
+                        logger.info("🚂 Sleep completed")
+                except Exception as json_error:
+                    logger.error(f"🚂 JSON parsing error: {str(json_error)}")
+                    logger.error(f"🚂 Response text that failed to parse: '{response_text}'")
+                    logger.info(f"🚂 About to sleep for {delay}s after JSON error...")
+                    await _sleep(delay, deadline)
+                    logger.info("🚂 Sleep completed after JSON error")
+            else:
+                error_text = response.text[:500] if response.text else "No response text"
+                logger.warning(f"Polling failed with status {response.status_code}: {error_text}")
+                logger.info("About to sleep after error...")
+                await _sleep(delay, deadline)
+                logger.info("Sleep completed after error")
+                
+        except JunctionUnavailableError:
+            raise
+        except DeadlineExceeded:
+            logger.warning(f"Polling stopped at the request deadline after {attempt + 1} attempts")
+            return None
+        except Exception as e:
+            logger.error(f"Exception during polling attempt {attempt + 1}: {str(e)}")
+            logger.error(f"Exception type: {type(e)}")
+            import traceback
+            logger.error(f"Traceback: {traceback.format_exc()}")
+            logger.info("About to sleep after exception...")
+            await _sleep(delay, deadline)
+            logger.info("Sleep completed after exception")
     
     logger.warning(f"Polling timed out after {max_attempts} attempts")
     return None
 
 
+def _offers_poll(train_search_id: str, train_offer_id: Optional[str], max_attempts: int, delay: float):
+    """The poll OfferPoller runs for a search's offers"""
+    def poll(shared_deadline: Deadline, progress: Dict[str, int]):
+        return poll_for_train_offers(
+            train_search_id, train_offer_id, max_attempts, delay, deadline=shared_deadline, progress=progress
+        )
+    return poll
+
+
+async def _collect_offers(request: Optional[Request], train_search_id: str, train_offer_id: Optional[str], deadline: Deadline,
+                          policy_context: Dict[str, Any], max_attempts: int = 30, delay: float = 1.0,
+                          prefetch_returns: bool = False) -> Dict[str, Any]:
+    """
+    Poll for a search's offers and annotate them with policy results when
+    policy_context has orgId and userId, all within the deadline. Returns a
+    pending response with a resume URL if no offers came in time.
+
+    Requests for the same offers share one poll, which is cancelled once
+    every client waiting on it has disconnected (raising ClientDisconnected).
+    Background jobs pass no request and wait for the poll regardless.
+
+    Return offers come from the prefetch cache when they are there. With
+    prefetch_returns, the return offers of the top outbound offers found are
+    prefetched in the background.
+    """
+    annotate = policy_context.get("orgId") and policy_context.get("userId")
+    # Stop polling early enough for the policy engine to annotate what was found
+    poll_deadline = deadline.reserve(settings.TRAIN_SEARCH_ANNOTATION_RESERVE_SECONDS) if annotate else deadline
+
+    key = (train_search_id, train_offer_id)
+    offers = return_prefetcher.lookup(key) if train_offer_id else None
+    if offers is None:
+        shared_poll = offer_poller.wait(key, _offers_poll(train_search_id, train_offer_id, max_attempts, delay),
+                                        poll_deadline, max_attempts, delay)
+        offers = await (until_disconnected(request, shared_poll) if request is not None else shared_poll)
+        if offers is None:
+            return _pending_offers(train_search_id, train_offer_id)
+        if train_offer_id:
+            return_prefetcher.store(key, offers)
+
+    # Waiters share the poll's result, so each annotates its own copy
+    offers = {**offers, "items": [dict(item) for item in offers.get("items") or []]}
+    # Add the train_search_id to the response for return trip handling
+    offers["train_search_id"] = train_search_id
+    offers["status"] = "complete"
+
+    if annotate:
+        offers = await annotate_train_offers(
+            offers,
+            policy_context["orgId"],
+            policy_context["userId"],
+            origin=policy_context.get("originName"),
+            destination=policy_context.get("destinationName"),
+            timeout=deadline.timeout(settings.POLICY_ENGINE_TIMEOUT)
+        )
+
+    if prefetch_returns:
+        return_prefetcher.schedule(
+            train_search_id,
+            offers["items"],
+            lambda offer_id: _offers_poll(train_search_id, offer_id, RETURN_MAX_ATTEMPTS, RETURN_POLL_DELAY),
+            RETURN_MAX_ATTEMPTS,
+            RETURN_POLL_DELAY,
+        )
+    return offers
+
+
 @router.post("/search")
-async def search_trains(search_request: Dict[str, Any]):
+async def search_trains(
+    request: Request,
+    search_request: Dict[str, Any],
+    timeout: Optional[float] = Query(None, description="Seconds the client will wait for results"),
+    x_request_timeout: Optional[str] = Header(None, alias=DEADLINE_HEADER),
+    run_async: bool = Query(False, alias="async", description="Answer at once with a job id to fetch results from"),
+):
     """
     Search for train tickets.
+    The search answers within timeout seconds (or the X-Request-Timeout header,
+    default TRAIN_SEARCH_TIMEOUT_SECONDS). If offers aren't ready by then it
+    returns {"status": "pending", "train_search_id", "resumeUrl"}; GET the
+    resume URL to carry on polling the same search.
+    With ?async=true it answers 202 with {"job_id", "statusUrl"} at once and
+    searches in the background within SEARCH_JOB_TIMEOUT_SECONDS (or a shorter
+    timeout); GET the status URL for the job and its result.
     Expected request body format:
     {
         "origin": "place_id",
         "destination": "place_id", 
         "departureDate": "2025-06-24",
         "passengers": [{"type": "adult"}],
-        "returnDate": "2025-06-25" (optional for round trip)
+        "returnDate": "2025-06-25" (optional for round trip),
+        "orgId": "org_uuid", "userId": "user_uuid" (optional, annotate offers with policy results),
+        "originName": "London", "destinationName": "Paris" (optional, used for route policies)
     }
     """
-    try:
-        # Validate required fields
-        required_fields = ["origin", "destination", "departureDate", "passengers"]
-        for field in required_fields:
-            if field not in search_request:
-                raise HTTPException(status_code=400, detail=f"Missing required field: {field}")
+    if run_async:
+        # Nobody holds a connection open for a job, so it gets its own, longer budget
+        deadline = _request_deadline(
+            x_request_timeout, timeout, settings.SEARCH_JOB_TIMEOUT_SECONDS, settings.SEARCH_JOB_TIMEOUT_SECONDS
+        )
+    else:
+        deadline = _request_deadline(x_request_timeout, timeout)
+
+    # Validate required fields
+    required_fields = ["origin", "destination", "departureDate", "passengers"]
+    for field in required_fields:
+        if field not in search_request:
+            raise HTTPException(status_code=400, detail=f"Missing required field: {field}")
+
+    if run_async:
+        job = await search_jobs.start(lambda: _run_search(None, search_request, deadline))
+        return JSONResponse(status_code=202, content={
+            **job,
+            "statusUrl": f"{settings.API_V1_STR}/trains/search/{job['job_id']}",
+        })
+    return await _run_search(request, search_request, deadline)
 
+
+async def _run_search(request: Optional[Request], search_request: Dict[str, Any], deadline: Deadline) -> Dict[str, Any]:
+    """Create a Junction train search and collect its offers, for a request or a background job"""
+    try:
         # Transform the request to Junction API format
         departure_date = search_request["departureDate"]
         # Convert date string to ISO format with time
@@ -166,73 +315,65 @@ async def search_trains(search_request: Dict[str, Any]):
         else:
             junction_request["returnDepartureAfter"] = None
 
-        create_url = f"{JUNCTION_API_BASE}/train-searches"
-        headers = {
-            "x-api-key": API_KEY,
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-        }
-        
         logger.info(f"Creating train search with transformed body: {junction_request}")
 
-        async with httpx.AsyncClient() as client:
-            # Create the train search
-            response = await client.post(
-                create_url,
-                json=junction_request,
-                headers=headers,
-                timeout=15.0
+        # Create the train search
+        response = await junction.request(
+            SEARCHES, "POST", "/train-searches", json=junction_request, timeout=15.0, deadline=deadline
+        )
+
+        logger.info(f"🚂 Train search creation response status: {response.status_code}")
+        logger.info(f"🚂 Train search creation response headers: {dict(response.headers)}")
+        
+        if not response.is_success:
+            error_text = response.text
+            logger.error(f"🚂 Train search creation failed: {error_text}")
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"Junction API error: {error_text}"
             )
 
-            logger.info(f"🚂 Train search creation response status: {response.status_code}")
-            logger.info(f"🚂 Train search creation response headers: {dict(response.headers)}")
-            
-            if not response.is_success:
-                error_text = response.text
-                logger.error(f"🚂 Train search creation failed: {error_text}")
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Junction API error: {error_text}"
-                )
-
-            # Extract train_search_id from Location header
-            location = response.headers.get("Location", "")
-            logger.info(f"🚂 Location header from train search creation: {location}")
-            
-            train_search_id = None
-            if location:
-                parts = location.strip("/").split("/")
-                # Handle both formats: .../train-searches/{id}/offers and .../train-searches/{id}
-                if len(parts) >= 2 and parts[-1] == "offers" and parts[-3] == "train-searches":
-                    potential_match = parts[-2]
-                    if potential_match.startswith("train_search_"):
-                        train_search_id = potential_match
-                elif len(parts) >= 1 and parts[-2] == "train-searches":
-                    potential_match = parts[-1]
-                    if potential_match.startswith("train_search_"):
-                        train_search_id = potential_match
-
-            if not train_search_id:
-                logger.error(f"Could not extract train_search_id from Location: {location}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Could not extract train_search_id from Location header: {location}"
-                )
-
-            logger.info(f"Extracted train_search_id: {train_search_id}")
-
-            # Poll for offers (outbound only initially)
-            offers = await poll_for_train_offers(train_search_id)
-            
-            if offers is None:
-                # Return empty results if polling timed out
-                return {"items": [], "message": "Search timed out, please try again"}
-            
-            # Add the train_search_id to the response for return trip handling
-            offers["train_search_id"] = train_search_id
-            
-            return offers
+        # Extract train_search_id from Location header
+        location = response.headers.get("Location", "")
+        logger.info(f"🚂 Location header from train search creation: {location}")
+        
+        train_search_id = None
+        if location:
+            parts = location.strip("/").split("/")
+            # Handle both formats: .../train-searches/{id}/offers and .../train-searches/{id}
+            if len(parts) >= 2 and parts[-1] == "offers" and parts[-3] == "train-searches":
+                potential_match = parts[-2]
+                if potential_match.startswith("train_search_"):
+                    train_search_id = potential_match
+            elif len(parts) >= 1 and parts[-2] == "train-searches":
+                potential_match = parts[-1]
+                if potential_match.startswith("train_search_"):
+                    train_search_id = potential_match
+
+        if not train_search_id:
+            logger.error(f"Could not extract train_search_id from Location: {location}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Could not extract train_search_id from Location header: {location}"
+            )
+
+        logger.info(f"Extracted train_search_id: {train_search_id}")
+
+        # Poll for offers (outbound only initially)
+        return await _collect_offers(
+            request, train_search_id, None, deadline, search_request,
+            prefetch_returns=bool(search_request.get("returnDate"))
+        )
 
+    except JunctionUnavailableError as e:
+        logger.warning(f"Train search rejected: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
+    except DeadlineExceeded as e:
+        logger.warning(f"Train search not created: {str(e)}")
+        raise HTTPException(status_code=504, detail="Request deadline passed before the search was created")
+    except ClientDisconnected:
+        # Nobody reads this; nginx's status for a client that closed the request
+        raise HTTPException(status_code=499, detail="Client closed request")
     except httpx.TimeoutException:
         logger.error("Timeout during train search")
         raise HTTPException(status_code=504, detail="Request timed out")
@@ -246,12 +387,66 @@ async def search_trains(search_request: Dict[str, Any]):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@router.get("/search/{job_id}")
+async def get_search_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, description="Seconds to wait for a running job to finish"),
+):
+    """
+    An async search job: {"job_id", "status": "running" | "succeeded" | "failed", ...}
+    with "result" (as from a synchronous search) or "error" once it has finished.
+    With ?wait= it long-polls, answering when the job finishes or wait passes
+    (at most SEARCH_JOB_MAX_WAIT_SECONDS).
+    """
+    job = await search_jobs.get(job_id, min(wait, settings.SEARCH_JOB_MAX_WAIT_SECONDS))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Search job not found or expired")
+    return job
+
+
+@router.get("/search/{train_search_id}/offers")
+async def resume_train_search(
+    request: Request,
+    train_search_id: str,
+    trainOfferId: Optional[str] = Query(None, description="Selected outbound offer, for return offers"),
+    orgId: Optional[str] = Query(None),
+    userId: Optional[str] = Query(None),
+    originName: Optional[str] = Query(None),
+    destinationName: Optional[str] = Query(None),
+    timeout: Optional[float] = Query(None, description="Seconds the client will wait for results"),
+    x_request_timeout: Optional[str] = Header(None, alias=DEADLINE_HEADER),
+):
+    """
+    Carry on polling a search that returned "status": "pending", within a new deadline.
+    Policy parameters are as for search.
+    """
+    deadline = _request_deadline(x_request_timeout, timeout)
+    policy_context = {"orgId": orgId, "userId": userId, "originName": originName, "destinationName": destinationName}
+    try:
+        return await _collect_offers(request, train_search_id, trainOfferId, deadline, policy_context)
+    except JunctionUnavailableError as e:
+        logger.warning(f"Resumed train search rejected: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client closed request")
+
+
 @router.post("/return-offers/{train_search_id}")
-async def get_return_offers(train_search_id: str, request_body: Dict[str, Any]):
+async def get_return_offers(
+    request: Request,
+    train_search_id: str,
+    request_body: Dict[str, Any],
+    timeout: Optional[float] = Query(None, description="Seconds the client will wait for results"),
+    x_request_timeout: Optional[str] = Header(None, alias=DEADLINE_HEADER),
+):
     """
     Get return trip offers for a selected outbound train offer.
     Expected request body: {"trainOfferId": "train_offer_01..."}
+    Optional "orgId", "userId", "originName" and "destinationName" annotate
+    the offers with policy results, as for search. Deadline and pending
+    responses are as for search.
     """
+    deadline = _request_deadline(x_request_timeout, timeout)
     try:
         logger.info(f"=== RETURN OFFERS ENDPOINT CALLED ===")
         logger.info(f"train_search_id: {train_search_id}")
@@ -266,17 +461,21 @@ async def get_return_offers(train_search_id: str, request_body: Dict[str, Any]):
 
         # Poll for return offers with the selected outbound offer
         logger.info(f"Starting polling for return offers...")
-        offers = await poll_for_train_offers(train_search_id, train_offer_id, max_attempts=25, delay=2.0)
+        offers = await _collect_offers(
+            request, train_search_id, train_offer_id, deadline, request_body,
+            max_attempts=RETURN_MAX_ATTEMPTS, delay=RETURN_POLL_DELAY
+        )
         
-        logger.info(f"Polling completed. offers is None: {offers is None}")
-        
-        if offers is None:
-            logger.warning("Return offers polling timed out")
-            return {"items": [], "message": "Return search timed out, please try again"}
+        logger.info(f"Polling completed with status {offers['status']}")
         
         logger.info(f"Returning {len(offers.get('items', []))} return offers")
         return offers
 
+    except JunctionUnavailableError as e:
+        logger.warning(f"Return offers rejected: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client closed request")
     except HTTPException as e:
         logger.error(f"HTTPException in return offers: {e}")
         raise
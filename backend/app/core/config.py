@@ -58,6 +58,65 @@ class Settings(BaseSettings):
         "CELERY_RESULT_BACKEND", "redis://localhost:6379/0"
     )
 
+    # Junction API Configuration (point at tools/fake_junction.py for load testing)
+    JUNCTION_API_BASE: str = os.getenv("JUNCTION_API_BASE", "https://content-api.sandbox.junction.dev")
+    # Required; main.py refuses to start without it
+    JUNCTION_API_KEY: str = os.getenv("JUNCTION_API_KEY", "")
+    # Concurrent upstream calls per endpoint group (see app/services/junction_client.py);
+    # bookings have their own slots so searches can't crowd them out
+    JUNCTION_SEARCH_CONCURRENCY: int = int(os.getenv("JUNCTION_SEARCH_CONCURRENCY", "32"))
+    JUNCTION_PLACES_CONCURRENCY: int = int(os.getenv("JUNCTION_PLACES_CONCURRENCY", "16"))
+    JUNCTION_BOOKING_CONCURRENCY: int = int(os.getenv("JUNCTION_BOOKING_CONCURRENCY", "16"))
+    JUNCTION_BULKHEAD_WAIT_SECONDS: float = float(os.getenv("JUNCTION_BULKHEAD_WAIT_SECONDS", "1.0"))
+    # Fail fast after this many consecutive upstream failures in a group, probing again after the reset time
+    JUNCTION_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("JUNCTION_BREAKER_FAILURE_THRESHOLD", "5"))
+    JUNCTION_BREAKER_RESET_SECONDS: float = float(os.getenv("JUNCTION_BREAKER_RESET_SECONDS", "30"))
+    # Outbound requests per second per worker, overall and per endpoint group (0 = no limit);
+    # keep the sum across workers and replicas under the API key's quota
+    JUNCTION_RATE_LIMIT_PER_SECOND: float = float(os.getenv("JUNCTION_RATE_LIMIT_PER_SECOND", "20"))
+    JUNCTION_RATE_LIMIT_BURST: float = float(os.getenv("JUNCTION_RATE_LIMIT_BURST", "40"))
+    JUNCTION_SEARCH_RATE_LIMIT_PER_SECOND: float = float(os.getenv("JUNCTION_SEARCH_RATE_LIMIT_PER_SECOND", "15"))
+    JUNCTION_PLACES_RATE_LIMIT_PER_SECOND: float = float(os.getenv("JUNCTION_PLACES_RATE_LIMIT_PER_SECOND", "5"))
+    JUNCTION_BOOKING_RATE_LIMIT_PER_SECOND: float = float(os.getenv("JUNCTION_BOOKING_RATE_LIMIT_PER_SECOND", "0"))
+    # How long a call queues for a token before failing with a 503
+    JUNCTION_RATE_LIMIT_WAIT_SECONDS: float = float(os.getenv("JUNCTION_RATE_LIMIT_WAIT_SECONDS", "10"))
+
+    # Policy Engine Configuration
+    POLICY_ENGINE_URL: str = os.getenv("POLICY_ENGINE_URL", "http://localhost:5001")
+    POLICY_ENGINE_TIMEOUT: float = float(os.getenv("POLICY_ENGINE_TIMEOUT", "5.0"))
+
+    # End-to-end budget for a train search, unless the client sends X-Request-Timeout or ?timeout=
+    TRAIN_SEARCH_TIMEOUT_SECONDS: float = float(os.getenv("TRAIN_SEARCH_TIMEOUT_SECONDS", "30"))
+    TRAIN_SEARCH_MAX_TIMEOUT_SECONDS: float = float(os.getenv("TRAIN_SEARCH_MAX_TIMEOUT_SECONDS", "60"))
+    # Part of the budget kept back from polling for the policy engine annotating the offers
+    TRAIN_SEARCH_ANNOTATION_RESERVE_SECONDS: float = float(os.getenv("TRAIN_SEARCH_ANNOTATION_RESERVE_SECONDS", "1.0"))
+    # Async search jobs (POST /trains/search?async=true): "memory" (one process) or "redis".
+    # gunicorn.conf.py defaults it to redis with more than one worker and refuses memory there
+    SEARCH_JOB_BACKEND: str = os.getenv("SEARCH_JOB_BACKEND", "memory")
+    SEARCH_JOB_REDIS_URL: str = os.getenv(
+        "SEARCH_JOB_REDIS_URL",
+        f"redis://{os.getenv('REDIS_HOST', 'localhost')}:{os.getenv('REDIS_PORT', '6379')}/0"
+    )
+    SEARCH_JOB_TTL_SECONDS: float = float(os.getenv("SEARCH_JOB_TTL_SECONDS", "900"))
+    SEARCH_JOB_MAX_WAIT_SECONDS: float = float(os.getenv("SEARCH_JOB_MAX_WAIT_SECONDS", "30"))
+    # Budget of a job's search, which no client holds a connection open for; also caps ?timeout=
+    SEARCH_JOB_TIMEOUT_SECONDS: float = float(os.getenv("SEARCH_JOB_TIMEOUT_SECONDS", "120"))
+    # Return offers prefetched for the top outbound offers of a round-trip search (0 = off)
+    RETURN_PREFETCH_COUNT: int = int(os.getenv("RETURN_PREFETCH_COUNT", "0"))
+    RETURN_PREFETCH_CONCURRENCY: int = int(os.getenv("RETURN_PREFETCH_CONCURRENCY", "8"))
+    RETURN_PREFETCH_TIMEOUT_SECONDS: float = float(os.getenv("RETURN_PREFETCH_TIMEOUT_SECONDS", "50"))
+    RETURN_PREFETCH_CACHE_TTL_SECONDS: float = float(os.getenv("RETURN_PREFETCH_CACHE_TTL_SECONDS", "600"))
+    RETURN_PREFETCH_CACHE_MAX_BYTES: int = int(os.getenv("RETURN_PREFETCH_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    # Seconds a stopping worker lets search jobs and return prefetches finish before cancelling them.
+    # Runs after in-flight requests end, so keep it plus the longest search under GRACEFUL_TIMEOUT
+    SHUTDOWN_DRAIN_SECONDS: float = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "50"))
+
+    # In-process caches (see app/utils/cache.py); stats at /api/admin/caches
+    PLACES_CACHE_MAX_BYTES: int = int(os.getenv("PLACES_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    PLACES_CACHE_TTL_SECONDS: float = float(os.getenv("PLACES_CACHE_TTL_SECONDS", "3600"))
+    # Older places are still served for this long while they are refetched
+    PLACES_CACHE_STALE_SECONDS: float = float(os.getenv("PLACES_CACHE_STALE_SECONDS", "86400"))
+
     # Project Configuration
     PROJECT_NAME: str = "Junction Two"
 
@@ -0,0 +1,248 @@
+"""Client for the Junction API with a bulkhead and circuit breaker per endpoint group
+
+Endpoint groups:
+    searches    POST /train-searches and polls of their offers
+    places      place search and lookup
+    bookings    create, get and confirm bookings
+
+Each group has its own bulkhead, so a slow train-searches endpoint can hold
+at most the search slots, and booking and confirmation calls always have
+theirs. A call that finds its group's slots taken waits up to
+JUNCTION_BULKHEAD_WAIT_SECONDS and then fails with JunctionUnavailableError.
+
+Each group also has its own circuit breaker. Timeouts, connection errors,
+429s and 5xx responses count as failures; after
+JUNCTION_BREAKER_FAILURE_THRESHOLD in a row the group's calls fail at once
+with JunctionUnavailableError until a probe succeeds, which is tried every
+JUNCTION_BREAKER_RESET_SECONDS. Routers turn the error into a 503 with
+Retry-After.
+
+Calls are also rate limited to stay under the API key's quota: each needs
+a token from the global bucket (JUNCTION_RATE_LIMIT_PER_SECOND) and from its
+group's bucket, where one is configured. Calls without a token queue by
+priority - creating searches and bookings before place lookups, and offer
+polls last - for up to JUNCTION_RATE_LIMIT_WAIT_SECONDS before failing with
+JunctionUnavailableError. A 429 pauses the global bucket for its Retry-After,
+so queued calls wait out the throttle instead of retrying into it.
+
+A call made with a request Deadline never waits or runs past it: the
+queueing and bulkhead waits and the httpx timeout are all capped by the
+time left, and a call whose deadline has passed raises DeadlineExceeded.
+
+All calls share one connection pool per event loop. Limiter, bulkhead and
+breaker state and per-group request counts are reported by stats(), served
+at GET /api/admin/junction.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.utils.bulkhead import Bulkhead, BulkheadFullError
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.deadline import Deadline, DeadlineExceeded
+from app.utils.rate_limiter import HIGH, NORMAL, RateLimiter, RateLimitExceeded, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+SEARCHES = "searches"
+PLACES = "places"
+BOOKINGS = "bookings"
+
+# Queueing priority when a call doesn't give one; offer polls in the trains router pass LOW
+DEFAULT_PRIORITY = {SEARCHES: HIGH, PLACES: NORMAL, BOOKINGS: HIGH}
+
+# Pause used for a 429 without a usable Retry-After
+DEFAULT_THROTTLE_SECONDS = 1.0
+
+
+def _is_failure(response: httpx.Response) -> bool:
+    """Responses that say upstream is unhealthy, as opposed to a bad request"""
+    return response.status_code == 429 or response.status_code >= 500
+
+
+def _retry_after(response: httpx.Response) -> float:
+    """Seconds from a Retry-After header; HTTP dates are not worth parsing here"""
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", "")))
+    except ValueError:
+        return DEFAULT_THROTTLE_SECONDS
+
+
+class JunctionUnavailableError(Exception):
+    """Raised when a call is not made because its group's breaker is open, bulkhead is full or rate limit is used up"""
+
+    def __init__(self, group: str, reason: str, retry_after: float):
+        super().__init__(f"Junction {group} unavailable: {reason}")
+        self.group = group
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Headers for the 503 a router answers with"""
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+class JunctionClient:
+    def __init__(self, base_url: str, api_key: str, concurrency: Dict[str, int],
+                 bulkhead_wait: float = 1.0, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 rate_limit: float = 0.0, rate_burst: float = 0.0, group_rate_limits: Optional[Dict[str, float]] = None,
+                 rate_limit_wait: float = 10.0, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.bulkheads = {
+            group: Bulkhead(f"junction-{group}", limit, max_wait=bulkhead_wait)
+            for group, limit in concurrency.items()
+        }
+        self.breakers = {
+            group: CircuitBreaker(f"junction-{group}", failure_threshold=failure_threshold, reset_timeout=reset_timeout)
+            for group in concurrency
+        }
+        self.metrics = {
+            group: {"requests": 0, "failures": 0, "errors_4xx": 0, "total_seconds": 0.0}
+            for group in concurrency
+        }
+        # A rate of 0 means no bucket
+        self.limiter = RateLimiter(
+            "junction",
+            TokenBucket(rate_limit, rate_burst) if rate_limit > 0 else None,
+            {group: TokenBucket(rate) for group, rate in (group_rate_limits or {}).items() if rate > 0},
+        )
+        self.rate_limit_wait = rate_limit_wait
+        # None for the network; tests pass an httpx.MockTransport
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_settings(cls) -> "JunctionClient":
+        return cls(
+            settings.JUNCTION_API_BASE,
+            settings.JUNCTION_API_KEY,
+            concurrency={
+                SEARCHES: settings.JUNCTION_SEARCH_CONCURRENCY,
+                PLACES: settings.JUNCTION_PLACES_CONCURRENCY,
+                BOOKINGS: settings.JUNCTION_BOOKING_CONCURRENCY,
+            },
+            bulkhead_wait=settings.JUNCTION_BULKHEAD_WAIT_SECONDS,
+            failure_threshold=settings.JUNCTION_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.JUNCTION_BREAKER_RESET_SECONDS,
+            rate_limit=settings.JUNCTION_RATE_LIMIT_PER_SECOND,
+            rate_burst=settings.JUNCTION_RATE_LIMIT_BURST,
+            group_rate_limits={
+                SEARCHES: settings.JUNCTION_SEARCH_RATE_LIMIT_PER_SECOND,
+                PLACES: settings.JUNCTION_PLACES_RATE_LIMIT_PER_SECOND,
+                BOOKINGS: settings.JUNCTION_BOOKING_RATE_LIMIT_PER_SECOND,
+            },
+            rate_limit_wait=settings.JUNCTION_RATE_LIMIT_WAIT_SECONDS,
+        )
+
+    def _http(self) -> httpx.AsyncClient:
+        # httpx clients are tied to the loop they were first used on
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            limit = sum(bulkhead.max_concurrent for bulkhead in self.bulkheads.values())
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Accept": "application/json", "x-api-key": self.api_key},
+                # Never fewer connections than slots, so groups don't queue behind each other in the pool
+                limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit),
+                transport=self.transport,
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def request(self, group: str, method: str, path: str, timeout: float,
+                      priority: Optional[int] = None, deadline: Optional[Deadline] = None,
+                      **kwargs: Any) -> httpx.Response:
+        """
+        Make a call in an endpoint group, with the rate limiter and the group's breaker and bulkhead.
+
+        Raises JunctionUnavailableError without calling upstream when the group
+        is failing fast or full, or no rate-limit token came free in time, and
+        DeadlineExceeded when the deadline passes first; httpx errors propagate
+        as they do without the client.
+        """
+        rate_limit_wait = self.rate_limit_wait
+        bulkhead_wait = self.bulkheads[group].max_wait
+        if deadline is not None:
+            if deadline.expired:
+                raise DeadlineExceeded(f"Deadline passed before Junction {group} call")
+            rate_limit_wait = deadline.timeout(rate_limit_wait)
+            bulkhead_wait = deadline.timeout(bulkhead_wait)
+
+        breaker = self.breakers[group]
+        if not breaker.allow():
+            raise JunctionUnavailableError(group, "circuit open", breaker.retry_after())
+
+        # Queue for a token before taking a slot, so waiting calls don't hold slots
+        if priority is None:
+            priority = DEFAULT_PRIORITY.get(group, NORMAL)
+        try:
+            await self.limiter.acquire(group, priority, timeout=rate_limit_wait)
+        except RateLimitExceeded as e:
+            if deadline is not None and deadline.expired:
+                raise DeadlineExceeded(f"Deadline passed queueing for Junction {group} call")
+            raise JunctionUnavailableError(group, str(e), e.retry_after)
+
+        if deadline is not None:
+            timeout = deadline.timeout(timeout)
+
+        metrics = self.metrics[group]
+        try:
+            async with self.bulkheads[group].slot(bulkhead_wait):
+                start = time.perf_counter()
+                metrics["requests"] += 1
+                try:
+                    response = await self._http().request(method, path, timeout=timeout, **kwargs)
+                except httpx.TransportError:
+                    metrics["failures"] += 1
+                    breaker.record_failure()
+                    raise
+                finally:
+                    metrics["total_seconds"] += time.perf_counter() - start
+        except BulkheadFullError as e:
+            if deadline is not None and deadline.expired:
+                raise DeadlineExceeded(f"Deadline passed waiting for a Junction {group} slot")
+            raise JunctionUnavailableError(group, str(e), self.bulkheads[group].max_wait)
+
+        if response.status_code == 429:
+            retry_after = _retry_after(response)
+            logger.warning(f"Junction throttled a {group} call, pausing requests for {retry_after}s")
+            self.limiter.pause(retry_after)
+
+        if _is_failure(response):
+            metrics["failures"] += 1
+            breaker.record_failure()
+        else:
+            if response.status_code >= 400:
+                metrics["errors_4xx"] += 1
+            breaker.record_success()
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        groups = {}
+        for group, metrics in self.metrics.items():
+            groups[group] = {
+                "breaker": self.breakers[group].to_dict(),
+                "bulkhead": self.bulkheads[group].to_dict(),
+                "requests": metrics["requests"],
+                "failures": metrics["failures"],
+                "errors_4xx": metrics["errors_4xx"],
+                "avg_ms": round(metrics["total_seconds"] * 1000 / metrics["requests"], 2) if metrics["requests"] else None,
+            }
+        return {"groups": groups, "rate_limiter": self.limiter.to_dict()}
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+junction = JunctionClient.from_settings()
@@ -0,0 +1,145 @@
+"""Shared, cancellable polling of train search offers
+
+Several requests can wait for the offers of the same search at once: a
+client retrying, a resumed search, a return-offers call for the same
+outbound offer. OfferPoller runs one poll per (train_search_id,
+train_offer_id) and hands its result to every waiter; the poll keeps going
+until the latest waiter's deadline.
+
+A waiter leaves when its client disconnects (see until_disconnected) or its
+deadline passes. The poll is cancelled when the last waiter leaves, so no
+upstream quota or event-loop time is spent on offers nobody will read.
+
+stats() reports polls started, joined and cancelled, upstream attempts made,
+and an estimate of the attempts cancelling saved; it is served at
+GET /api/admin/junction.
+"""
+
+import asyncio
+import logging
+import math
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from fastapi import Request
+
+from app.utils.deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+PollKey = Tuple[str, Optional[str]]
+OffersPoll = Callable[[Deadline, Dict[str, int]], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class ClientDisconnected(Exception):
+    """Raised when work for a request was cancelled because its client went away"""
+
+
+class _SharedPoll:
+    def __init__(self, task: asyncio.Task, deadline: Deadline, progress: Dict[str, int], max_attempts: int, delay: float):
+        self.task = task
+        self.deadline = deadline
+        self.progress = progress
+        self.max_attempts = max_attempts
+        self.delay = delay
+        self.waiters = 0
+
+
+class OfferPoller:
+    def __init__(self):
+        self.polls: Dict[PollKey, _SharedPoll] = {}
+        self.stats = {
+            "started": 0,
+            "joined": 0,
+            "completed": 0,
+            "cancelled": 0,
+            "disconnects": 0,
+            "attempts": 0,
+            "attempts_saved": 0,
+        }
+
+    async def wait(self, key: PollKey, poll: OffersPoll, deadline: Deadline,
+                   max_attempts: int, delay: float) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the offers of the poll for key, starting it with poll(deadline, progress)
+        if none is running. Returns None if the deadline passes first.
+        """
+        shared = self.polls.get(key)
+        if shared is None:
+            # The poll gets its own deadline, pushed back as later waiters join
+            poll_deadline = Deadline(deadline.remaining(), deadline.clock)
+            progress = {"attempts": 0}
+            task = asyncio.create_task(poll(poll_deadline, progress))
+            shared = _SharedPoll(task, poll_deadline, progress, max_attempts, delay)
+            self.polls[key] = shared
+            task.add_done_callback(lambda _, key=key, shared=shared: self._finished(key, shared))
+            self.stats["started"] += 1
+        else:
+            shared.deadline.expires_at = max(shared.deadline.expires_at, deadline.expires_at)
+            self.stats["joined"] += 1
+
+        shared.waiters += 1
+        try:
+            # Shielded so one waiter leaving doesn't cancel the poll for the others
+            return await asyncio.wait_for(asyncio.shield(shared.task), timeout=deadline.remaining())
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            shared.waiters -= 1
+            if shared.waiters == 0 and not shared.task.done():
+                self._cancel(key, shared)
+
+    def _cancel(self, key: PollKey, shared: _SharedPoll) -> None:
+        remaining = shared.max_attempts - shared.progress["attempts"]
+        if shared.delay > 0:
+            remaining = min(remaining, math.ceil(shared.deadline.remaining() / shared.delay))
+        self.stats["cancelled"] += 1
+        self.stats["attempts_saved"] += max(0, remaining)
+        logger.info(f"Cancelled offer poll for {key} after its last waiter left, saving up to {remaining} attempts")
+        shared.task.cancel()
+
+    def _finished(self, key: PollKey, shared: _SharedPoll) -> None:
+        if self.polls.get(key) is shared:
+            del self.polls[key]
+        self.stats["attempts"] += shared.progress["attempts"]
+        if not shared.task.cancelled():
+            self.stats["completed"] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "active": len(self.polls),
+            "waiters": sum(shared.waiters for shared in self.polls.values()),
+            **self.stats,
+        }
+
+
+offer_poller = OfferPoller()
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def until_disconnected(request: Request, work: Awaitable[T]) -> T:
+    """
+    Await work for a request, cancelling it as soon as the client disconnects.
+    Raises ClientDisconnected in that case.
+    """
+    work_task = asyncio.ensure_future(work)
+    watcher = asyncio.create_task(_wait_for_disconnect(request))
+    try:
+        await asyncio.wait({work_task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if work_task.done():
+            return work_task.result()
+        offer_poller.stats["disconnects"] += 1
+        logger.info(f"Client disconnected from {request.url.path}, cancelling its work")
+        raise ClientDisconnected(request.url.path)
+    finally:
+        watcher.cancel()
+        if not work_task.done():
+            work_task.cancel()
+            await asyncio.gather(work_task, return_exceptions=True)
@@ -0,0 +1,136 @@
+"""Client for the policy engine, used to annotate search results with policy results"""
+
+from typing import Dict, Any, List, Optional
+import logging
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+EVALUATE_BATCH_PATH = "/api/v1/policy-evaluation/evaluate-batch"
+
+# None for the network; tests set an httpx.MockTransport
+transport: Optional[httpx.AsyncBaseTransport] = None
+
+
+def _first_segment(offer: Dict[str, Any]) -> Dict[str, Any]:
+    trips = offer.get("trips") or [{}]
+    segments = trips[0].get("segments") or [{}]
+    return segments[0]
+
+
+def _train_class(offer: Dict[str, Any]) -> str:
+    """Same fallbacks as the frontend's PolicyComplianceBadge"""
+    first_segment = _first_segment(offer)
+    if first_segment.get("fareClass"):
+        return first_segment["fareClass"].upper()
+    if first_segment.get("bookingClass"):
+        return first_segment["bookingClass"].upper()
+    return "STANDARD"
+
+
+def _train_operator(offer: Dict[str, Any]) -> str:
+    first_segment = _first_segment(offer)
+    if (first_segment.get("vehicle") or {}).get("name"):
+        return first_segment["vehicle"]["name"]
+    if first_segment.get("operator"):
+        return first_segment["operator"]
+    return (offer.get("metadata") or {}).get("providerId") or "Unknown"
+
+
+def train_offer_to_travel_data(offer: Dict[str, Any], origin: Optional[str] = None,
+                               destination: Optional[str] = None) -> Dict[str, Any]:
+    """Map a Junction train offer to the policy engine's travel_data format"""
+    price = offer.get("price") or {}
+    first_segment = _first_segment(offer)
+    return {
+        "train": {
+            "price": float(price.get("amount") or 0),
+            "currency": price.get("currency") or "EUR",
+            "class": _train_class(offer),
+            "operator": _train_operator(offer),
+            "departure_date": first_segment.get("departureAt"),
+        },
+        "origin": origin,
+        "destination": destination,
+    }
+
+
+async def evaluate_train_offers(offers: List[Dict[str, Any]], org_id: str, user_id: str,
+                                origin: Optional[str] = None,
+                                destination: Optional[str] = None,
+                                timeout: Optional[float] = None) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    Evaluate train offers in one policy engine call.
+    Returns {offer_id: {"result", "messages", "approvers"}}, or None if the
+    policy engine could not be reached in timeout seconds (default POLICY_ENGINE_TIMEOUT).
+    """
+    payload = {
+        "org_id": org_id,
+        "user_id": user_id,
+        # Search results only need the final result, not every rule
+        "full_detail": False,
+        "offers": [
+            {"id": offer.get("id"), "travel_data": train_offer_to_travel_data(offer, origin, destination)}
+            for offer in offers
+        ],
+    }
+
+    try:
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.post(
+                f"{settings.POLICY_ENGINE_URL}{EVALUATE_BATCH_PATH}",
+                json=payload,
+                timeout=timeout if timeout is not None else settings.POLICY_ENGINE_TIMEOUT
+            )
+        if not response.is_success:
+            logger.warning(f"Policy engine batch evaluation failed with status {response.status_code}: {response.text[:500]}")
+            return None
+        return {result["id"]: result for result in response.json().get("results", [])}
+    except (httpx.RequestError, ValueError) as e:
+        logger.warning(f"Policy engine batch evaluation failed: {str(e)}")
+        return None
+
+
+async def annotate_train_offers(offers: Dict[str, Any], org_id: str, user_id: str,
+                                origin: Optional[str] = None,
+                                destination: Optional[str] = None,
+                                timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Add a "policy" entry to each offer and drop HIDDEN offers.
+    If the policy engine is unavailable, or doesn't answer within timeout,
+    the offers are returned unannotated with "policyAnnotated": False, so the
+    client can evaluate them itself.
+    """
+    items = offers.get("items") or []
+    if items and timeout is not None and timeout <= 0:
+        results = None
+    else:
+        results = await evaluate_train_offers(items, org_id, user_id, origin, destination, timeout) if items else {}
+
+    if results is None:
+        offers["policyAnnotated"] = False
+        return offers
+
+    visible = []
+    for item in items:
+        policy = results.get(item.get("id"))
+        if policy is None:
+            visible.append(item)
+            continue
+        if policy["result"] == "HIDDEN":
+            continue
+        item["policy"] = {
+            "result": policy["result"],
+            "messages": policy.get("messages", []),
+            "approvers": policy.get("approvers", []),
+        }
+        visible.append(item)
+
+    logger.info(f"Policy annotation: {len(items)} offers, {len(items) - len(visible)} hidden")
+    offers["items"] = visible
+    offers["policyAnnotated"] = True
+    offers["hiddenCount"] = len(items) - len(visible)
+    return offers
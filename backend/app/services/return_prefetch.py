@@ -0,0 +1,174 @@
+"""Speculative prefetch of return offers
+
+Return offers are only polled for once the user picks an outbound offer,
+which makes the return step the slowest in booking a round trip. When
+RETURN_PREFETCH_COUNT is set, a completed outbound search starts polling for
+the return offers of its top outbound offers in the background: in-policy
+offers first, cheapest first, never ones whose booking is blocked.
+
+Prefetches share OfferPoller's polls, so a user picking an offer that is
+still being prefetched joins the running poll. Each outbound offer is
+prefetched at most once at a time, however many requests for the search
+finish. Finished return offers are cached by (train_search_id,
+train_offer_id) for RETURN_PREFETCH_CACHE_TTL_SECONDS, or until the first of
+them expires if that is sooner, and the return step answers from the cache.
+With prefetching off the cache is not used at all.
+
+At most RETURN_PREFETCH_CONCURRENCY prefetches run at once per worker;
+prefetches past the budget are skipped, not queued, and their polls run
+at the rate limiter's low priority like every offer poll.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.services.offer_polling import OffersPoll, offer_poller
+from app.utils.bulkhead import Bulkhead, BulkheadFullError
+from app.utils.cache import BoundedCache
+from app.utils.deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+# Policy results worth prefetching first, and ones never worth it
+IN_POLICY = {"IN_POLICY", "NOT_SPECIFIED"}
+BLOCKED = {"BOOKING_BLOCKED"}
+
+ReturnKey = Tuple[str, str]
+
+
+def _price(offer: Dict[str, Any]) -> float:
+    try:
+        return float((offer.get("price") or {}).get("amount"))
+    except (TypeError, ValueError):
+        return float("inf")
+
+
+def _validity(offers: Dict[str, Any]) -> Optional[float]:
+    """Seconds until the first of the offers expires, or None if none says when"""
+    now = datetime.now(timezone.utc)
+    remaining = None
+    for offer in offers.get("items") or []:
+        try:
+            expires_at = datetime.fromisoformat(str(offer["expiresAt"]).replace("Z", "+00:00"))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        seconds = (expires_at - now).total_seconds()
+        remaining = seconds if remaining is None else min(remaining, seconds)
+    return remaining
+
+
+def rank_outbound_offers(items: List[Dict[str, Any]], count: int) -> List[str]:
+    """Ids of the count outbound offers most likely to be picked: in policy, then cheapest"""
+    candidates = []
+    for offer in items:
+        result = (offer.get("policy") or {}).get("result")
+        if not offer.get("id") or result in BLOCKED:
+            continue
+        # Unannotated offers count as in policy
+        in_policy = result is None or result in IN_POLICY
+        candidates.append((not in_policy, _price(offer), offer["id"]))
+    return [offer_id for _, _, offer_id in sorted(candidates)[:count]]
+
+
+class ReturnOfferPrefetcher:
+    def __init__(self, count: int, concurrency: int, timeout: float, cache_ttl: float, cache_max_bytes: int):
+        self.count = count
+        self.timeout = timeout
+        self.bulkhead = Bulkhead("return-prefetch", max(1, concurrency))
+        self.cache = BoundedCache("return_offers", max_bytes=cache_max_bytes, ttl=cache_ttl)
+        self.tasks: Set[asyncio.Task] = set()
+        # Keys being prefetched, so each is only prefetched once at a time
+        self.in_flight: Set[ReturnKey] = set()
+        self.stats = {"scheduled": 0, "skipped": 0, "prefetched": 0, "empty": 0, "expired": 0, "failed": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.count > 0
+
+    def lookup(self, key: ReturnKey) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        return self.cache.get(key)
+
+    def store(self, key: ReturnKey, offers: Dict[str, Any]) -> None:
+        """Cache return offers until the cache TTL passes or the first of them expires"""
+        if not self.enabled:
+            return
+        ttl = self.cache.ttl
+        validity = _validity(offers)
+        if validity is not None:
+            if validity <= 0:
+                self.stats["expired"] += 1
+                return
+            ttl = validity if ttl is None else min(ttl, validity)
+        self.cache.set(key, offers, ttl=ttl)
+
+    def schedule(self, train_search_id: str, items: List[Dict[str, Any]],
+                 poll_for: Callable[[str], OffersPoll], max_attempts: int, delay: float) -> List[str]:
+        """Start prefetching return offers for the top outbound offers; returns their ids"""
+        if not self.enabled:
+            return []
+        offer_ids = [
+            offer_id for offer_id in rank_outbound_offers(items, self.count)
+            # get, not `in`: an entry past its TTL is still held but must be fetched again
+            if self.cache.get((train_search_id, offer_id)) is None and (train_search_id, offer_id) not in self.in_flight
+        ]
+        for offer_id in offer_ids:
+            key = (train_search_id, offer_id)
+            self.in_flight.add(key)
+            task = asyncio.create_task(self._prefetch(key, poll_for(offer_id), max_attempts, delay))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        self.stats["scheduled"] += len(offer_ids)
+        return offer_ids
+
+    async def _prefetch(self, key: ReturnKey, poll: OffersPoll, max_attempts: int, delay: float) -> None:
+        try:
+            async with self.bulkhead.slot():
+                offers = await offer_poller.wait(key, poll, Deadline(self.timeout), max_attempts, delay)
+        except BulkheadFullError:
+            self.stats["skipped"] += 1
+            return
+        except Exception as e:
+            logger.warning(f"Return offer prefetch for {key} failed: {str(e)}")
+            self.stats["failed"] += 1
+            return
+        finally:
+            self.in_flight.discard(key)
+
+        if offers is None:
+            self.stats["empty"] += 1
+            return
+        self.store(key, offers)
+        self.stats["prefetched"] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "running": len(self.tasks),
+            "bulkhead": self.bulkhead.to_dict(),
+            "cache": self.cache.to_dict(),
+            **self.stats,
+        }
+
+    async def aclose(self, timeout: float = 0.0) -> None:
+        """Let running prefetches finish for up to timeout seconds, then cancel the rest"""
+        if self.tasks:
+            await asyncio.wait(set(self.tasks), timeout=timeout)
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+return_prefetcher = ReturnOfferPrefetcher(
+    count=settings.RETURN_PREFETCH_COUNT,
+    concurrency=settings.RETURN_PREFETCH_CONCURRENCY,
+    timeout=settings.RETURN_PREFETCH_TIMEOUT_SECONDS,
+    cache_ttl=settings.RETURN_PREFETCH_CACHE_TTL_SECONDS,
+    cache_max_bytes=settings.RETURN_PREFETCH_CACHE_MAX_BYTES,
+)
@@ -0,0 +1,202 @@
+"""Asynchronous train search jobs
+
+POST /trains/search?async=true answers at once with a job id and runs the
+create-and-poll flow as a background task in the worker that accepted it.
+Clients fetch GET /trains/search/{job_id}, optionally long-polling with
+?wait= until the job finishes.
+
+Jobs are kept in a JobStore for SEARCH_JOB_TTL_SECONDS after their last
+update. The memory store only serves the worker that ran the job, so use it
+for a single process; the Redis store lets any worker or replica answer, and
+gunicorn.conf.py picks it whenever it runs more than one worker.
+
+A job searches within SEARCH_JOB_TIMEOUT_SECONDS rather than the synchronous
+search's budget, since no client holds a connection open for it.
+
+A job is {"job_id", "status", "created_at", "updated_at"} plus "result" (the
+search response) once it succeeded, or "error" ({"status_code", "detail"})
+if it failed.
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# How often the Redis store re-reads a job while a client long-polls it
+REDIS_WAIT_INTERVAL = 0.25
+
+
+class JobStore(ABC):
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+
+    @abstractmethod
+    async def put(self, job: Dict[str, Any]) -> None:
+        """Store the job, replacing any earlier version, for ttl seconds"""
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The job, or None if it is unknown or expired"""
+
+    @abstractmethod
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """The job once it is no longer running, or as it is when timeout passes"""
+
+    async def aclose(self) -> None:
+        pass
+
+
+class MemoryJobStore(JobStore):
+    """Jobs in this process, expiring ttl seconds after their last update"""
+
+    def __init__(self, ttl: float):
+        super().__init__(ttl)
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.expires: Dict[str, float] = {}
+        self.events: Dict[str, asyncio.Event] = {}
+
+    async def put(self, job: Dict[str, Any]) -> None:
+        self._purge()
+        job_id = job["job_id"]
+        self.jobs[job_id] = job
+        self.expires[job_id] = time.monotonic() + self.ttl
+        if job["status"] != RUNNING and job_id in self.events:
+            self.events.pop(job_id).set()
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        self._purge()
+        return self.jobs.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        job = await self.get(job_id)
+        if job is None or job["status"] != RUNNING:
+            return job
+        event = self.events.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return await self.get(job_id)
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        for job_id in [job_id for job_id, expires_at in self.expires.items() if expires_at <= now]:
+            del self.jobs[job_id], self.expires[job_id]
+            self.events.pop(job_id, None)
+
+
+class RedisJobStore(JobStore):
+    """Jobs as JSON strings under search-job:{job_id}, expiring through Redis TTLs"""
+
+    def __init__(self, redis_url: str, ttl: float):
+        super().__init__(ttl)
+        import redis
+
+        self.client = redis.Redis.from_url(redis_url)
+
+    def _key(self, job_id: str) -> str:
+        return f"search-job:{job_id}"
+
+    async def put(self, job: Dict[str, Any]) -> None:
+        # The redis client blocks, so keep it off the event loop
+        await asyncio.to_thread(self.client.set, self._key(job["job_id"]), json.dumps(job), ex=int(self.ttl))
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = await asyncio.to_thread(self.client.get, self._key(job_id))
+        return json.loads(raw) if raw else None
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        deadline = time.monotonic() + timeout
+        job = await self.get(job_id)
+        while job is not None and job["status"] == RUNNING and time.monotonic() < deadline:
+            await asyncio.sleep(min(REDIS_WAIT_INTERVAL, max(0.0, deadline - time.monotonic())))
+            job = await self.get(job_id)
+        return job
+
+    async def aclose(self) -> None:
+        await asyncio.to_thread(self.client.close)
+
+
+def create_job_store() -> JobStore:
+    """The store selected by SEARCH_JOB_BACKEND: 'memory' or 'redis'"""
+    if settings.SEARCH_JOB_BACKEND.lower() == "redis":
+        return RedisJobStore(settings.SEARCH_JOB_REDIS_URL, settings.SEARCH_JOB_TTL_SECONDS)
+    return MemoryJobStore(settings.SEARCH_JOB_TTL_SECONDS)
+
+
+class SearchJobs:
+    def __init__(self, store: JobStore):
+        self.store = store
+        # Strong references, since the loop only keeps weak ones to tasks
+        self.tasks: Set[asyncio.Task] = set()
+        self.stats = {"started": 0, SUCCEEDED: 0, FAILED: 0}
+
+    async def start(self, work: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Store a running job and run work for it in the background"""
+        now = time.time()
+        job = {"job_id": f"search_job_{uuid.uuid4().hex}", "status": RUNNING, "created_at": now, "updated_at": now}
+        await self.store.put(job)
+        task = asyncio.create_task(self._run(dict(job), work))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        self.stats["started"] += 1
+        return job
+
+    async def get(self, job_id: str, wait: float = 0.0) -> Optional[Dict[str, Any]]:
+        """The job, waiting up to wait seconds for a running one to finish"""
+        if wait > 0:
+            return await self.store.wait(job_id, wait)
+        return await self.store.get(job_id)
+
+    async def _run(self, job: Dict[str, Any], work: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+        try:
+            job["result"] = await work()
+            job["status"] = SUCCEEDED
+        except asyncio.CancelledError:
+            job["status"] = FAILED
+            job["error"] = {"status_code": 503, "detail": "Search was cancelled by a server shutdown"}
+            await self._save(job)
+            raise
+        except Exception as e:
+            # Routers raise HTTPException; anything else is an internal error
+            status_code = getattr(e, "status_code", 500)
+            if status_code == 500:
+                logger.error(f"Search job {job['job_id']} failed: {str(e)}")
+            job["status"] = FAILED
+            job["error"] = {"status_code": status_code, "detail": getattr(e, "detail", str(e))}
+        await self._save(job)
+
+    async def _save(self, job: Dict[str, Any]) -> None:
+        job["updated_at"] = time.time()
+        self.stats[job["status"]] += 1
+        try:
+            await self.store.put(job)
+        except Exception as e:
+            logger.error(f"Failed to store search job {job['job_id']}: {str(e)}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"backend": type(self.store).__name__, "running": len(self.tasks), **self.stats}
+
+    async def aclose(self, timeout: float = 0.0) -> None:
+        """Let running jobs finish for up to timeout seconds, then cancel the rest"""
+        if self.tasks:
+            await asyncio.wait(set(self.tasks), timeout=timeout)
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.store.aclose()
+
+
+search_jobs = SearchJobs(create_job_store())
@@ -0,0 +1,98 @@
+"""Concurrency bulkhead for calls to a dependency
+
+A bulkhead caps how many calls to one dependency run at once. A call that
+finds every slot taken waits up to max_wait seconds for one and is then
+rejected with BulkheadFullError. Separate bulkheads keep one slow dependency
+from using up the capacity the others need.
+"""
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+
+class BulkheadFullError(Exception):
+    """Raised when no slot became free within the bulkhead's max_wait"""
+
+    def __init__(self, name: str):
+        super().__init__(f"{name} bulkhead full")
+        self.name = name
+
+
+class Bulkhead:
+    def __init__(self, name: str, max_concurrent: int, max_wait: float = 0.0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self.in_flight = 0
+        # Futures of calls waiting for a slot, oldest first. A slot is handed
+        # to a waiter by resolving its future, so in_flight never drops while
+        # someone is queued and a waiter that gives up can tell whether it was
+        # handed one it must pass on
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.stats = {"accepted": 0, "rejected": 0}
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for waiter in self.waiters if not waiter.done())
+
+    @asynccontextmanager
+    async def slot(self, max_wait: Optional[float] = None) -> AsyncIterator[None]:
+        """
+        Hold one slot for the duration of the block, waiting at most max_wait
+        (default the bulkhead's) for it; a max_wait of 0 fails at once when full.
+        """
+        if max_wait is None:
+            max_wait = self.max_wait
+        if self.in_flight < self.max_concurrent and not self.waiting:
+            self.in_flight += 1
+        elif max_wait <= 0:
+            self.stats["rejected"] += 1
+            raise BulkheadFullError(self.name)
+        else:
+            await self._wait(max_wait)
+
+        self.stats["accepted"] += 1
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _wait(self, max_wait: float) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=max_wait)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot just as the wait ran out
+                return
+            self.stats["rejected"] += 1
+            raise BulkheadFullError(self.name)
+        except BaseException:
+            # Cancelled after being handed a slot: pass it on rather than leak it
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+        finally:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+
+    def _release(self) -> None:
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                # The slot goes straight to the next waiter, so in_flight stays put
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            **self.stats,
+        }
@@ -0,0 +1,226 @@
+"""Memory-bounded in-process caches with per-namespace stats
+
+BoundedCache holds entries up to a byte budget, evicting the least recently
+used entry. Entries can expire after a TTL; for stale_ttl seconds after that,
+aget_or_load still returns them while a task reloads them
+(stale-while-revalidate), so callers never wait on a refresh of a value they
+already have.
+
+Entry sizes are estimated once, when the entry is set, by walking the value's
+containers and attributes with sys.getsizeof; callers that know better pass
+size= instead. Every cache registers under its namespace, and cache_stats()
+reports hits, misses, evictions and bytes for all of them.
+
+Caches are only used from the event loop, so they take no locks. The policy
+engine has its own thread-safe variant with LFU eviction
+(policy-engine/app/utils/cache.py).
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from collections import OrderedDict
+import asyncio
+import logging
+import sys
+import time
+import types
+import weakref
+
+logger = logging.getLogger(__name__)
+
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Walking into these would count code and shared state, not the cached value
+_UNSIZED = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+            types.MethodType, types.CodeType, weakref.ref)
+_SCALARS = (str, bytes, bytearray, int, float, complex, bool, type(None))
+
+# Live caches by namespace
+_registry: "weakref.WeakValueDictionary[str, BoundedCache]" = weakref.WeakValueDictionary()
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate bytes held by a value and everything it references, counting shared objects once"""
+    seen = set()
+    stack = [value]
+    size = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _UNSIZED):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, _SCALARS):
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        else:
+            attributes = getattr(obj, "__dict__", None)
+            if attributes is not None:
+                stack.append(attributes)
+            for cls in type(obj).__mro__:
+                slots = cls.__dict__.get("__slots__", ())
+                for slot in (slots,) if isinstance(slots, str) else slots:
+                    if slot not in ("__dict__", "__weakref__"):
+                        stack.append(getattr(obj, slot, None))
+    return size
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats of every live cache in the process, by namespace"""
+    return {namespace: cache.to_dict() for namespace, cache in sorted(_registry.items())}
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires_at", "stale_until")
+
+    def __init__(self, value: Any, size: int, expires_at: Optional[float], stale_until: Optional[float]):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+
+class BoundedCache:
+    """Size-aware LRU cache with per-entry TTL"""
+
+    def __init__(self, namespace: str, max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl: Optional[float] = None, stale_ttl: float = 0.0,
+                 sizer: Callable[[Any], int] = estimate_size,
+                 clock: Callable[[], float] = time.monotonic):
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.sizer = sizer
+        self.clock = clock
+        # Least recently used first
+        self.entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self.bytes = 0
+        self.refreshing = set()
+        # Strong references, so running refresh tasks are not garbage collected
+        self.tasks = set()
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "sets": 0, "evictions": 0,
+                      "expirations": 0, "rejected": 0, "refreshes": 0, "refresh_errors": 0}
+        _registry[namespace] = self
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """The key's value while it is fresh, else default"""
+        state, value = self._lookup(key, allow_stale=False)
+        return value if state == FRESH else default
+
+    async def aget_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                           ttl: Optional[float] = None, size: Optional[int] = None) -> Any:
+        """
+        The key's value, loading it on a miss.
+
+        A value past its TTL but within stale_ttl is returned as is and
+        reloaded in a task. Loader errors on a miss propagate and nothing is
+        cached.
+        """
+        state, value = self._lookup(key, allow_stale=True)
+        if state == FRESH:
+            return value
+        if state == STALE:
+            self._refresh_in_task(key, loader, ttl, size)
+            return value
+        value = await loader()
+        self.set(key, value, ttl=ttl, size=size)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, size: Optional[int] = None) -> bool:
+        """
+        Cache a value, evicting others to stay within budget.
+
+        ttl defaults to the cache's; returns False (caching nothing) when the
+        value alone is larger than the budget.
+        """
+        size = self.sizer(value) if size is None else size
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = self.clock() + ttl if ttl is not None else None
+        stale_until = expires_at + self.stale_ttl if expires_at is not None else None
+
+        if key in self.entries:
+            self._unlink(key)
+        if size > self.max_bytes:
+            self.stats["rejected"] += 1
+            return False
+        while self.entries and self.bytes + size > self.max_bytes:
+            self._unlink(next(iter(self.entries)))
+            self.stats["evictions"] += 1
+
+        self.entries[key] = _Entry(value, size, expires_at, stale_until)
+        self.bytes += size
+        self.stats["sets"] += 1
+        return True
+
+    def to_dict(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"]
+        return {
+            "namespace": self.namespace,
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hit_ratio": round((self.stats["hits"] + self.stats["stale_hits"]) / lookups, 4) if lookups else None,
+            **self.stats
+        }
+
+    def _lookup(self, key: Hashable, allow_stale: bool) -> Tuple[str, Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return MISS, None
+        now = self.clock()
+        if entry.expires_at is None or now < entry.expires_at:
+            state = FRESH
+        elif now < entry.stale_until:
+            state = STALE
+        else:
+            self._unlink(key)
+            self.stats["expirations"] += 1
+            state = MISS
+
+        if state == FRESH or (state == STALE and allow_stale):
+            self.stats["hits" if state == FRESH else "stale_hits"] += 1
+            self.entries.move_to_end(key)
+        else:
+            self.stats["misses"] += 1
+        return state, entry.value if state != MISS else None
+
+    def _unlink(self, key: Hashable) -> _Entry:
+        entry = self.entries.pop(key)
+        self.bytes -= entry.size
+        return entry
+
+    def _refresh_in_task(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                         ttl: Optional[float], size: Optional[int]) -> None:
+        if key in self.refreshing:
+            return
+        self.refreshing.add(key)
+
+        async def refresh():
+            try:
+                self.set(key, await loader(), ttl=ttl, size=size)
+                self.stats["refreshes"] += 1
+            except Exception as e:
+                # Keep serving the stale value until it runs out
+                self.stats["refresh_errors"] += 1
+                logger.warning(f"Cache {self.namespace} failed to refresh {key}: {e}")
+            finally:
+                self.refreshing.discard(key)
+
+        task = asyncio.get_running_loop().create_task(refresh())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
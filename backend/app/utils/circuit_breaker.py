@@ -0,0 +1,97 @@
+"""Consecutive-failure circuit breaker
+
+After failure_threshold consecutive failures the breaker opens and allow()
+returns False, so callers fail at once instead of each waiting out its own
+timeout. After reset_timeout seconds one call is let through as a probe:
+success closes the breaker, failure opens it for another reset_timeout.
+
+Same semantics as the policy engine's database breaker
+(policy-engine/app/utils/circuit_breaker.py), without the SQLAlchemy hooks.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker, safe to share between tasks and threads"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_started: Optional[float] = None
+        self.lock = threading.Lock()
+        self.stats = {"opened": 0, "rejected": 0, "failures": 0}
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; in half-open state only one probe at a time does"""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN:
+            with self.lock:
+                now = self.clock()
+                # A probe that never reported back must not hold the breaker half-open forever
+                if self.probe_started is None or now - self.probe_started >= self.reset_timeout:
+                    self.probe_started = now
+                    return True
+        self.stats["rejected"] += 1
+        return False
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets a probe through"""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - self.clock())
+
+    def record_success(self) -> None:
+        if self.opened_at is None and self.failures == 0:
+            return
+        with self.lock:
+            if self.opened_at is not None:
+                logger.info(f"{self.name} circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self.probe_started = None
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            self.stats["failures"] += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"{self.name} circuit opened after {self.failures} consecutive failures")
+                    self.stats["opened"] += 1
+                # A failed probe restarts the wait
+                self.opened_at = self.clock()
+                self.probe_started = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "retry_after": round(self.retry_after(), 3),
+            **self.stats,
+        }
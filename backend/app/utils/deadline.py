@@ -0,0 +1,61 @@
+"""End-to-end request deadlines
+
+A Deadline is the moment by which a request must be answered. Code working
+on the request caps each upstream timeout and each wait with timeout(), so
+the request finishes when its budget runs out instead of overrunning it.
+
+Clients set the budget in seconds with the X-Request-Timeout header or a
+timeout query parameter; the parameter wins when both are given.
+"""
+
+import math
+import time
+from typing import Callable, Optional
+
+DEADLINE_HEADER = "X-Request-Timeout"
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a call is not made because the request's deadline has passed"""
+
+
+class Deadline:
+    def __init__(self, seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.seconds = seconds
+        self.clock = clock
+        self.expires_at = clock() + seconds
+
+    @classmethod
+    def from_request(cls, header: Optional[str], param: Optional[float], default: float, maximum: float) -> "Deadline":
+        """
+        Deadline from a request's timeout parameter or header, capped at maximum.
+        Raises ValueError for a value that is not a positive number of seconds.
+        """
+        value = param if param is not None else header
+        if value is None:
+            return cls(min(default, maximum))
+        try:
+            seconds = float(value)
+        except ValueError:
+            raise ValueError(f"Invalid timeout: {value}")
+        if not math.isfinite(seconds) or seconds <= 0:
+            raise ValueError(f"Timeout must be a positive number of seconds, got {value}")
+        return cls(min(seconds, maximum))
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self.clock())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: float) -> float:
+        """A timeout of at most cap that ends no later than the deadline"""
+        return min(cap, self.remaining())
+
+    def reserve(self, seconds: float) -> "Deadline":
+        """A deadline seconds earlier, leaving time for work after the first part"""
+        earlier = Deadline(0, self.clock)
+        earlier.seconds = self.seconds
+        earlier.expires_at = self.expires_at - seconds
+        return earlier
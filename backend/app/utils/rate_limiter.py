@@ -0,0 +1,175 @@
+"""Token-bucket rate limiting with priority queueing
+
+RateLimiter combines an optional global TokenBucket with one bucket per
+class of calls; a call needs a token from both. Callers that find no token
+wait in a queue ordered by priority (HIGH first, then arrival), and give up
+with RateLimitExceeded once their timeout passes rather than failing at once.
+A caller whose own class is exhausted does not hold up the others.
+
+pause() empties the buckets for a while, for when upstream answers 429 with
+a Retry-After: queued and new callers wait it out instead of retrying into
+the throttle.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+HIGH = 0
+NORMAL = 1
+LOW = 2
+
+PRIORITY_NAMES = {HIGH: "high", NORMAL: "normal", LOW: "low"}
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a caller's queueing timeout passed before a token was free"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} rate limit exceeded")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = burst if burst else max(1.0, rate)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self) -> bool:
+        self._refill()
+        return self.tokens >= 1
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def wait_time(self) -> float:
+        """Seconds until a token is free"""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for the next seconds"""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+    def to_dict(self) -> Dict[str, Any]:
+        self._refill()
+        return {"rate": self.rate, "burst": self.capacity, "tokens": round(self.tokens, 2)}
+
+
+class RateLimiter:
+    def __init__(self, name: str, global_bucket: Optional[TokenBucket] = None,
+                 buckets: Optional[Dict[str, TokenBucket]] = None):
+        self.name = name
+        self.global_bucket = global_bucket
+        self.buckets = buckets or {}
+        # Heap of [priority, arrival, class, future]
+        self.waiters: List[list] = []
+        self.arrivals = itertools.count()
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.stats = {"granted": 0, "queued": 0, "rejected": 0, "paused": 0, "wait_seconds": 0.0}
+        self.queued_by_priority = {label: 0 for label in PRIORITY_NAMES.values()}
+
+    async def acquire(self, cls: str, priority: int = NORMAL, timeout: Optional[float] = None) -> None:
+        """Take a token for a call of the class, queueing for up to timeout seconds"""
+        if not self._queue_length() and self._take(cls):
+            self.stats["granted"] += 1
+            return
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self.waiters, [priority, next(self.arrivals), cls, future])
+        self.stats["queued"] += 1
+        self.queued_by_priority[PRIORITY_NAMES[priority]] += 1
+        start = time.monotonic()
+        expiry = loop.call_later(timeout, self._expire, future, cls) if timeout is not None else None
+        self._dispatch()
+        try:
+            await future
+            self.stats["granted"] += 1
+        finally:
+            self.stats["wait_seconds"] += time.monotonic() - start
+            if expiry is not None:
+                expiry.cancel()
+
+    def pause(self, seconds: float, cls: Optional[str] = None) -> None:
+        """Stop granting tokens (globally, or for one class) for the next seconds"""
+        bucket = self.buckets.get(cls) if cls is not None else self.global_bucket
+        if bucket is None:
+            bucket = self.global_bucket
+        if bucket is None:
+            return
+        bucket.pause(seconds)
+        self.stats["paused"] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "global": self.global_bucket.to_dict() if self.global_bucket else None,
+            "classes": {cls: bucket.to_dict() for cls, bucket in self.buckets.items()},
+            "waiting": self._queue_length(),
+            "queued_by_priority": dict(self.queued_by_priority),
+            **{key: round(value, 3) if isinstance(value, float) else value for key, value in self.stats.items()},
+        }
+
+    def _queue_length(self) -> int:
+        return sum(1 for waiter in self.waiters if not waiter[3].done())
+
+    def _available(self, cls: str) -> bool:
+        bucket = self.buckets.get(cls)
+        return (self.global_bucket is None or self.global_bucket.available()) and (bucket is None or bucket.available())
+
+    def _take(self, cls: str) -> bool:
+        if not self._available(cls):
+            return False
+        if self.global_bucket is not None:
+            self.global_bucket.take()
+        if cls in self.buckets:
+            self.buckets[cls].take()
+        return True
+
+    def _wait_time(self, cls: str) -> float:
+        bucket = self.buckets.get(cls)
+        return max(
+            self.global_bucket.wait_time() if self.global_bucket is not None else 0.0,
+            bucket.wait_time() if bucket is not None else 0.0,
+        )
+
+    def _expire(self, future: asyncio.Future, cls: str) -> None:
+        if not future.done():
+            self.stats["rejected"] += 1
+            future.set_exception(RateLimitExceeded(f"{self.name} {cls}", self._wait_time(cls)))
+
+    def _dispatch(self) -> None:
+        """Grant free tokens to waiters in priority order, then sleep until the next one frees up"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        remaining = []
+        for waiter in sorted(self.waiters):
+            future = waiter[3]
+            if future.done():
+                # Expired or cancelled
+                continue
+            if self._take(waiter[2]):
+                future.set_result(None)
+            else:
+                remaining.append(waiter)
+        heapq.heapify(remaining)
+        self.waiters = remaining
+
+        if remaining:
+            delay = min(self._wait_time(waiter[2]) for waiter in remaining)
+            self.timer = asyncio.get_running_loop().call_later(max(delay, 0.001), self._dispatch)
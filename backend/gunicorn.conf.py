@@ -0,0 +1,76 @@
+"""
+Production server profile: gunicorn managing uvicorn workers.
+
+    gunicorn main:app
+
+gunicorn reads this file from the working directory. uvicorn's workers use
+uvloop and httptools when they are installed (uvicorn[standard]) and fall back
+to asyncio and h11 otherwise; the loop in use is logged as each worker boots.
+
+Environment:
+    PORT               bind port (default 8000)
+    WEB_CONCURRENCY    worker processes (default: one per core)
+    GRACEFUL_TIMEOUT   seconds a stopping worker has to finish in-flight
+                       requests, including train offer polls, and then drain
+                       background search jobs and return prefetches (default 120)
+    SHUTDOWN_DRAIN_SECONDS  part of that left to background work (default 50)
+    SEARCH_JOB_BACKEND store for async search jobs; defaults to redis with more
+                       than one worker, where memory is refused
+    KEEPALIVE          keep-alive seconds for idle client connections (default 5)
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# The backend is async and mostly waits on Junction, so one event loop per
+# core is enough; more processes only add memory and connection pools
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# A job polled for on another worker than the one running it is only found
+# in a shared store
+if workers > 1:
+    os.environ.setdefault("SEARCH_JOB_BACKEND", "redis")
+
+# On SIGTERM a worker stops accepting connections and lets in-flight requests
+# finish; searches are capped by TRAIN_SEARCH_MAX_TIMEOUT_SECONDS (60). Then
+# the shutdown hook gives async search jobs and return prefetches up to
+# SHUTDOWN_DRAIN_SECONDS (50) to finish and cancels whatever is left, so the
+# default leaves both phases room before the worker is killed
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "120"))
+# Async workers heartbeat from the event loop, so this only catches a blocked loop
+timeout = 60
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+
+# Recycle workers now and then to bound slow leaks; jitter avoids all restarting together
+max_requests = int(os.getenv("MAX_REQUESTS", "10000"))
+max_requests_jitter = 1000
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+
+def post_worker_init(worker):
+    try:
+        import uvloop  # noqa: F401
+        loop = "uvloop"
+    except ImportError:
+        loop = "asyncio"
+    try:
+        import httptools  # noqa: F401
+        http = "httptools"
+    except ImportError:
+        http = "h11"
+    worker.log.info(f"Worker {worker.pid} using {loop} with {http}")
+
+
+def on_starting(server):
+    backend = os.getenv("SEARCH_JOB_BACKEND", "memory").lower()
+    if server.cfg.workers > 1 and backend == "memory":
+        raise RuntimeError(
+            "SEARCH_JOB_BACKEND=memory only works with one worker; "
+            "use SEARCH_JOB_BACKEND=redis or WEB_CONCURRENCY=1"
+        )
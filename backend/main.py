@@ -4,6 +4,10 @@ from starlette.middleware.sessions import SessionMiddleware
 
 from app.api.api import api_router
 from app.core.config import settings
+from app.services.junction_client import junction
+from app.services.return_prefetch import return_prefetcher
+from app.services.search_jobs import search_jobs
+from app.utils.deadline import Deadline
 
 app = FastAPI(
     title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json"
@@ -37,3 +41,19 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 @app.get("/")
 def root():
     return {"message": "Welcome to Junction Two API"}
+
+
+@app.on_event("startup")
+def require_junction_api_key():
+    # Fail at boot rather than on the first search
+    if not settings.JUNCTION_API_KEY:
+        raise RuntimeError("JUNCTION_API_KEY is not set")
+
+
+@app.on_event("shutdown")
+async def close_junction_client():
+    # Jobs and prefetches first, so they finish with the client before it closes
+    drain = Deadline(settings.SHUTDOWN_DRAIN_SECONDS)
+    await search_jobs.aclose(drain.remaining())
+    await return_prefetcher.aclose(drain.remaining())
+    await junction.aclose()
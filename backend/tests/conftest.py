@@ -0,0 +1,31 @@
+"""Shared setup for in-process backend tests (no Junction, policy engine or database)"""
+
+import os
+import sys
+
+import httpx
+
+sys.path.append(os.getcwd())
+
+# Settings are read at import; main refuses to start without a key
+os.environ.setdefault("JUNCTION_API_KEY", "test")
+
+from app.services.junction_client import BOOKINGS, PLACES, SEARCHES, JunctionClient  # noqa: E402
+
+
+class FakeClock:
+    """A clock for code that takes one, moved by setting now"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def junction_client(handler, slots=1, **kwargs):
+    """A JunctionClient answering from handler, with slots concurrent calls per group"""
+    return JunctionClient(
+        "http://junction.test", "test", concurrency={SEARCHES: slots, PLACES: slots, BOOKINGS: slots},
+        transport=httpx.MockTransport(handler), **kwargs
+    )
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Test the memory-bounded cache used for places and prefetched return offers"""
+
+import asyncio
+
+import pytest
+
+from app.utils.cache import BoundedCache, cache_stats, estimate_size
+from conftest import FakeClock
+
+
+def test_lru_evicts_to_byte_budget():
+    """Least recently used entries go first; values over budget are not cached"""
+    cache = BoundedCache("test_lru", max_bytes=100, sizer=lambda value: value)
+    cache.set("a", 40)
+    cache.set("b", 40)
+    assert cache.get("a") == 40
+    cache.set("c", 40)
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.bytes == 80 and cache.stats["evictions"] == 1
+
+    assert not cache.set("huge", 101)
+    assert "huge" not in cache and cache.stats["rejected"] == 1
+
+    # Replacing an entry is not an eviction
+    cache.set("a", 10)
+    assert cache.bytes == 50 and cache.stats["evictions"] == 1
+
+
+def test_ttl_expires_entries():
+    """Entries expire after the cache's TTL or their own"""
+    clock = FakeClock()
+    cache = BoundedCache("test_ttl", ttl=10, clock=clock)
+    cache.set("default", 1)
+    cache.set("short", 2, ttl=5)
+
+    clock.now = 6
+    assert cache.get("default") == 1
+    assert cache.get("short") is None
+
+    clock.now = 11
+    assert cache.get("default") is None
+    assert len(cache) == 0 and cache.bytes == 0
+    assert cache.stats["expirations"] == 2
+
+
+def test_stale_while_revalidate():
+    """Stale values are served at once and reloaded in a task; expired ones are reloaded inline"""
+
+    async def scenario():
+        clock = FakeClock()
+        cache = BoundedCache("test_swr", ttl=10, stale_ttl=20, clock=clock)
+        loads = []
+
+        async def loader():
+            loads.append(clock.now)
+            return len(loads)
+
+        assert await cache.aget_or_load("place", loader) == 1
+        clock.now = 5
+        assert await cache.aget_or_load("place", loader) == 1
+
+        clock.now = 15
+        assert cache.get("place") is None
+        assert await cache.aget_or_load("place", loader) == 1
+        # A second stale read doesn't start another refresh
+        assert await cache.aget_or_load("place", loader) == 1
+        await asyncio.gather(*cache.tasks)
+        assert cache.stats["refreshes"] == 1
+        assert await cache.aget_or_load("place", loader) == 2
+
+        # Past the stale window the caller waits for the load
+        clock.now = 100
+        assert await cache.aget_or_load("place", loader) == 3
+        assert cache.stats["stale_hits"] == 2 and cache.stats["expirations"] == 1
+
+        async def failing():
+            raise RuntimeError("Junction unavailable")
+
+        clock.now = 115
+        assert await cache.aget_or_load("place", failing) == 3
+        await asyncio.gather(*cache.tasks)
+        assert cache.stats["refresh_errors"] == 1
+        assert cache.entries["place"].value == 3
+        with pytest.raises(RuntimeError):
+            await cache.aget_or_load("other", failing)
+        assert "other" not in cache
+
+    asyncio.run(scenario())
+
+
+def test_estimated_sizes_and_stats():
+    """Sizes count shared objects once; every cache reports under its namespace"""
+    shared = {"name": "x" * 1000}
+    assert estimate_size([shared, shared]) < 2 * estimate_size(shared)
+
+    cache = BoundedCache("test_stats", max_bytes=10 * estimate_size(shared))
+    cache.set("a", shared)
+    cache.get("a")
+    cache.get("b")
+    stats = cache_stats()["test_stats"]
+    assert stats["entries"] == 1 and stats["bytes"] == estimate_size(shared)
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["hit_ratio"] == 0.5
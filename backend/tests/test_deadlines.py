@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Test end-to-end request deadlines and how train searches honour them"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.api.trains import router as trains_router
+from app.services.junction_client import SEARCHES
+from app.utils.deadline import Deadline, DeadlineExceeded
+from conftest import FakeClock, junction_client
+
+
+async def _post_search(params=None, headers=None):
+    from main import app
+
+    body = {"origin": "a", "destination": "b", "departureDate": "2026-11-02", "passengers": [{"type": "adult"}]}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post("/api/trains/search", json=body, params=params, headers=headers)
+
+
+def test_deadline_from_request():
+    """The parameter beats the header, both are capped at the maximum, and bad values are rejected"""
+    assert Deadline.from_request(None, None, default=30, maximum=60).seconds == 30
+    assert Deadline.from_request(None, None, default=90, maximum=60).seconds == 60
+    assert Deadline.from_request("5", None, default=30, maximum=60).seconds == 5
+    assert Deadline.from_request("5", 2.5, default=30, maximum=60).seconds == 2.5
+    assert Deadline.from_request("600", None, default=30, maximum=60).seconds == 60
+    for bad in ("soon", "0", "-1", "nan", "inf"):
+        with pytest.raises(ValueError):
+            Deadline.from_request(bad, None, default=30, maximum=60)
+
+
+def test_remaining_budget():
+    """Timeouts are capped by what's left of the budget, and reserve() keeps some back"""
+    clock = FakeClock()
+    deadline = Deadline(10, clock)
+    clock.now = 4
+    assert deadline.remaining() == 6
+    assert deadline.timeout(30) == 6 and deadline.timeout(2) == 2
+
+    annotation = deadline.reserve(1.5)
+    assert annotation.remaining() == 4.5 and deadline.remaining() == 6
+
+    clock.now = 9
+    assert annotation.expired and annotation.timeout(30) == 0
+    assert not deadline.expired
+    clock.now = 11
+    assert deadline.expired and deadline.remaining() == 0
+
+
+def test_junction_calls_get_the_remaining_budget():
+    """Each upstream timeout is capped at the deadline; past it no call is made"""
+    timeouts = []
+
+    def handler(request):
+        timeouts.append(request.extensions["timeout"]["read"])
+        return httpx.Response(200, json={})
+
+    async def scenario():
+        client = junction_client(handler, slots=2, rate_limit=100)
+        await client.request(SEARCHES, "GET", "/train-searches/x/offers", timeout=30.0, deadline=Deadline(2))
+        await client.request(SEARCHES, "GET", "/train-searches/x/offers", timeout=1.0, deadline=Deadline(2))
+        with pytest.raises(DeadlineExceeded):
+            await client.request(SEARCHES, "GET", "/train-searches/x/offers", timeout=30.0, deadline=Deadline(0))
+        await client.aclose()
+
+    asyncio.run(scenario())
+    assert len(timeouts) == 2
+    assert 1.9 < timeouts[0] <= 2 and timeouts[1] == 1.0
+
+
+def test_search_answers_504_when_the_budget_runs_out(monkeypatch):
+    """A search that can't be created within its deadline fails with a 504, not a late answer"""
+
+    async def scenario():
+        client = junction_client(lambda request: httpx.Response(201), slots=2, rate_limit=100)
+        # Throttled upstream: no token frees up before the deadline
+        client.limiter.pause(30)
+        monkeypatch.setattr(trains_router, "junction", client)
+        start = time.monotonic()
+        response = await _post_search(params={"timeout": 0.2})
+        return response, time.monotonic() - start
+
+    response, elapsed = asyncio.run(scenario())
+    assert response.status_code == 504
+    assert elapsed < 2
+
+    response = asyncio.run(_post_search(headers={"X-Request-Timeout": "soon"}))
+    assert response.status_code == 400
+
+
+def test_search_answers_pending_when_offers_are_late(monkeypatch):
+    """Polling stops at the deadline and hands back a resume URL for the same search"""
+
+    def handler(request):
+        if request.method == "POST":
+            return httpx.Response(201, headers={"Location": "/train-searches/train_search_late/offers"})
+        return httpx.Response(200, json={"items": []})
+
+    async def scenario():
+        monkeypatch.setattr(trains_router, "junction", junction_client(handler, slots=2, rate_limit=100))
+        start = time.monotonic()
+        response = await _post_search(headers={"X-Request-Timeout": "0.5"})
+        return response, time.monotonic() - start
+
+    response, elapsed = asyncio.run(scenario())
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "pending" and body["train_search_id"] == "train_search_late"
+    assert body["resumeUrl"] == "/api/trains/search/train_search_late/offers"
+    # The poll's 1s sleep was cut short by the 0.5s budget
+    assert elapsed < 1
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Test shared offer polls and their cancellation when clients go away"""
+
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from app.services.offer_polling import ClientDisconnected, OfferPoller, offer_poller, until_disconnected
+from app.utils.deadline import Deadline
+
+
+def _request(disconnected: asyncio.Event) -> Request:
+    """A request whose client disconnects when the event is set"""
+
+    async def receive():
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    return Request({"type": "http", "method": "GET", "path": "/api/trains/search", "headers": []}, receive)
+
+
+def _poll(started, finish, attempts=3):
+    """A poll that counts attempts, then waits for finish and returns offers"""
+
+    async def poll(deadline, progress):
+        started.append(deadline)
+        progress["attempts"] += attempts
+        await finish.wait()
+        return {"items": [{"id": "offer_1"}]}
+
+    return poll
+
+
+def test_waiters_share_one_poll_and_survive_a_disconnect():
+    """A second waiter joins the running poll; one client leaving doesn't cancel it for the other"""
+
+    async def scenario():
+        poller = OfferPoller()
+        started, finish = [], asyncio.Event()
+        poll = _poll(started, finish)
+        key = ("train_search_1", None)
+        gone = asyncio.Event()
+        disconnects = offer_poller.stats["disconnects"]
+
+        leaving = asyncio.create_task(until_disconnected(_request(gone), poller.wait(key, poll, Deadline(5), 30, 1.0)))
+        staying = asyncio.create_task(poller.wait(key, poll, Deadline(10), 30, 1.0))
+        await asyncio.sleep(0.01)
+        assert len(started) == 1
+        # The shared poll runs until the latest waiter's deadline
+        assert started[0].remaining() > 9
+
+        gone.set()
+        with pytest.raises(ClientDisconnected):
+            await leaving
+        assert poller.to_dict()["waiters"] == 1
+
+        finish.set()
+        assert (await staying)["items"] == [{"id": "offer_1"}]
+        stats = poller.to_dict()
+        assert stats["started"] == 1 and stats["joined"] == 1 and stats["completed"] == 1
+        assert stats["cancelled"] == 0 and stats["attempts"] == 3 and stats["active"] == 0
+        # Disconnects are counted process-wide
+        assert offer_poller.stats["disconnects"] == disconnects + 1
+
+    asyncio.run(scenario())
+
+
+def test_last_waiter_leaving_cancels_the_poll():
+    """Once every client has disconnected the poll stops, saving its remaining attempts"""
+
+    async def scenario():
+        poller = OfferPoller()
+        started, finish = [], asyncio.Event()
+        poll = _poll(started, finish)
+        key = ("train_search_2", "offer_9")
+        gone = [asyncio.Event(), asyncio.Event()]
+
+        waiters = [
+            asyncio.create_task(until_disconnected(_request(event), poller.wait(key, poll, Deadline(10), 30, 1.0)))
+            for event in gone
+        ]
+        await asyncio.sleep(0.01)
+        shared = poller.polls[key]
+
+        gone[0].set()
+        await asyncio.sleep(0.01)
+        assert not shared.task.done()
+
+        gone[1].set()
+        for waiter in waiters:
+            with pytest.raises(ClientDisconnected):
+                await waiter
+        await asyncio.sleep(0)
+        assert shared.task.cancelled()
+        stats = poller.to_dict()
+        assert stats["cancelled"] == 1 and stats["completed"] == 0 and stats["active"] == 0
+        # 27 attempts left, but only about 10 fit in the time that was left
+        assert 9 <= stats["attempts_saved"] <= 10
+
+    asyncio.run(scenario())
+
+
+def test_waiter_deadline_returns_none():
+    """A waiter whose deadline passes gets None; alone, it takes the poll down with it"""
+
+    async def scenario():
+        poller = OfferPoller()
+        started, finish = [], asyncio.Event()
+        key = ("train_search_3", None)
+        assert await poller.wait(key, _poll(started, finish), Deadline(0.05), 30, 1.0) is None
+        await asyncio.sleep(0.01)
+        assert poller.to_dict()["cancelled"] == 1 and key not in poller.polls
+
+    asyncio.run(scenario())
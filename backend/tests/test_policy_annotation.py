@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Test annotating train offers with policy engine results"""
+
+import asyncio
+import json
+
+import httpx
+
+from app.api.trains import router as trains_router
+from app.services import policy_engine
+from app.services.policy_engine import annotate_train_offers, train_offer_to_travel_data
+from conftest import junction_client
+
+
+def _offer(offer_id, amount, segment=None, metadata=None):
+    offer = {
+        "id": offer_id,
+        "price": {"amount": str(amount), "currency": "GBP"},
+        "trips": [{"segments": [dict({"departureAt": "2026-11-02T08:00:00Z"}, **(segment or {}))]}],
+    }
+    if metadata is not None:
+        offer["metadata"] = metadata
+    return offer
+
+
+def _policy_engine(monkeypatch, handler):
+    """Route policy engine calls to handler; returns the payloads it was sent"""
+    payloads = []
+
+    def record(request):
+        payloads.append(json.loads(request.content))
+        return handler(request)
+
+    monkeypatch.setattr(policy_engine, "transport", httpx.MockTransport(record))
+    return payloads
+
+
+def _results(*results):
+    return lambda request: httpx.Response(200, json={"policies_evaluated": 1, "results": [
+        {"id": offer_id, "result": result, "messages": [f"{offer_id} {result}"], "approvers": []}
+        for offer_id, result in results
+    ]})
+
+
+def test_travel_data_matches_the_compliance_badge():
+    """Same fields and fallbacks as the frontend's PolicyComplianceBadge payload"""
+    offer = _offer("offer_1", "42.50", {"fareClass": "first", "bookingClass": "b", "vehicle": {"name": "Eurostar"}})
+    assert train_offer_to_travel_data(offer, "London", "Paris") == {
+        "train": {
+            "price": 42.5,
+            "currency": "GBP",
+            "class": "FIRST",
+            "operator": "Eurostar",
+            "departure_date": "2026-11-02T08:00:00Z",
+        },
+        "origin": "London",
+        "destination": "Paris",
+    }
+
+    train = train_offer_to_travel_data(_offer("offer_2", 10, {"bookingClass": "standard", "operator": "SNCF"}))["train"]
+    assert train["class"] == "STANDARD" and train["operator"] == "SNCF"
+    train = train_offer_to_travel_data(_offer("offer_3", 10, metadata={"providerId": "trenitalia"}))["train"]
+    assert train["class"] == "STANDARD" and train["operator"] == "trenitalia"
+    train = train_offer_to_travel_data({"id": "offer_4"})["train"]
+    assert train == {
+        "price": 0.0, "currency": "EUR", "class": "STANDARD", "operator": "Unknown", "departure_date": None
+    }
+
+
+def test_annotation_drops_hidden_offers(monkeypatch):
+    """HIDDEN offers are removed and counted; the others carry their policy result"""
+    payloads = _policy_engine(monkeypatch, _results(("offer_1", "IN_POLICY"), ("offer_2", "HIDDEN")))
+    offers = {"items": [_offer("offer_1", 40), _offer("offer_2", 90), _offer("offer_3", 60)]}
+
+    annotated = asyncio.run(annotate_train_offers(offers, "org_1", "user_1", "London", "Paris", timeout=5))
+    assert annotated["policyAnnotated"] is True and annotated["hiddenCount"] == 1
+    assert [item["id"] for item in annotated["items"]] == ["offer_1", "offer_3"]
+    assert annotated["items"][0]["policy"] == {
+        "result": "IN_POLICY", "messages": ["offer_1 IN_POLICY"], "approvers": []
+    }
+    # Offers the engine did not answer for are shown unannotated
+    assert "policy" not in annotated["items"][1]
+
+    assert len(payloads) == 1
+    payload = payloads[0]
+    assert payload["org_id"] == "org_1" and payload["user_id"] == "user_1" and payload["full_detail"] is False
+    assert [offer["id"] for offer in payload["offers"]] == ["offer_1", "offer_2", "offer_3"]
+    assert payload["offers"][0]["travel_data"] == train_offer_to_travel_data(_offer("offer_1", 40), "London", "Paris")
+
+
+def test_unavailable_policy_engine_leaves_offers_unannotated(monkeypatch):
+    """Errors, timeouts and an exhausted budget all return the offers as they were"""
+
+    def timeout(request):
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    for handler in (lambda request: httpx.Response(503, text="down"), timeout):
+        _policy_engine(monkeypatch, handler)
+        offers = {"items": [_offer("offer_1", 40)]}
+        annotated = asyncio.run(annotate_train_offers(offers, "org_1", "user_1", timeout=5))
+        assert annotated["policyAnnotated"] is False and "hiddenCount" not in annotated
+        assert annotated["items"] == [_offer("offer_1", 40)]
+
+    # No budget left: the engine is not called at all
+    payloads = _policy_engine(monkeypatch, _results(("offer_1", "HIDDEN")))
+    for budget in (0, -1):
+        offers = {"items": [_offer("offer_1", 40)]}
+        annotated = asyncio.run(annotate_train_offers(offers, "org_1", "user_1", timeout=budget))
+        assert annotated["policyAnnotated"] is False and len(annotated["items"]) == 1
+    assert payloads == []
+
+
+def test_offers_endpoint_annotates_for_an_org_and_user(monkeypatch):
+    """Resumed searches are annotated only when orgId and userId are given"""
+    payloads = _policy_engine(monkeypatch, _results(("offer_1", "OUT_OF_POLICY"), ("offer_2", "HIDDEN")))
+
+    def junction(request):
+        return httpx.Response(200, json={"items": [_offer("offer_1", 40), _offer("offer_2", 90)]})
+
+    async def scenario():
+        from main import app
+
+        monkeypatch.setattr(trains_router, "junction", junction_client(junction, slots=2))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            annotated = await client.get("/api/trains/search/train_search_annotated/offers", params={
+                "orgId": "org_1", "userId": "user_1", "originName": "London", "destinationName": "Paris"
+            })
+            plain = await client.get("/api/trains/search/train_search_plain/offers")
+        return annotated.json(), plain.json()
+
+    annotated, plain = asyncio.run(scenario())
+    assert annotated["status"] == "complete" and annotated["policyAnnotated"] is True
+    assert annotated["hiddenCount"] == 1
+    assert [(item["id"], item["policy"]["result"]) for item in annotated["items"]] == [("offer_1", "OUT_OF_POLICY")]
+    assert len(payloads) == 1 and payloads[0]["offers"][0]["travel_data"]["origin"] == "London"
+
+    assert "policyAnnotated" not in plain and len(plain["items"]) == 2
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Test token buckets and the priority queue in front of Junction calls"""
+
+import asyncio
+
+import pytest
+
+from app.utils.rate_limiter import HIGH, LOW, NORMAL, RateLimiter, RateLimitExceeded, TokenBucket
+from conftest import FakeClock
+
+
+def test_token_bucket_refills_up_to_burst():
+    """A bucket starts full, refills at its rate and never holds more than its burst"""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock)
+    for _ in range(3):
+        assert bucket.available()
+        bucket.take()
+    assert not bucket.available()
+    assert bucket.wait_time() == 0.5
+
+    clock.now = 0.5
+    assert bucket.available()
+    clock.now = 100
+    bucket.available()
+    assert bucket.tokens == 3
+
+    # Without a burst the bucket holds a second's worth, at least one token
+    assert TokenBucket(rate=5, clock=clock).capacity == 5
+    assert TokenBucket(rate=0.5, clock=clock).capacity == 1
+
+
+def test_token_bucket_pause():
+    """A pause hands out nothing for its length, however full the bucket was"""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, burst=10, clock=clock)
+    bucket.pause(2)
+    assert not bucket.available()
+    assert bucket.wait_time() == pytest.approx(2.1)
+    clock.now = 2.1
+    assert bucket.available()
+
+
+def test_queued_calls_are_granted_by_priority():
+    """Waiters get tokens HIGH first, then by arrival; low-priority polls go last"""
+
+    async def scenario():
+        limiter = RateLimiter("test", TokenBucket(rate=50, burst=1))
+        await limiter.acquire("searches")
+        order = []
+
+        async def call(name, priority):
+            await limiter.acquire("searches", priority, timeout=5)
+            order.append(name)
+
+        tasks = []
+        for name, priority in [("poll", LOW), ("places", NORMAL), ("search", HIGH), ("second poll", LOW)]:
+            tasks.append(asyncio.create_task(call(name, priority)))
+            await asyncio.sleep(0)
+        assert limiter.to_dict()["waiting"] == 4
+        await asyncio.gather(*tasks)
+        assert order == ["search", "places", "poll", "second poll"]
+        assert limiter.stats["granted"] == 5 and limiter.stats["queued"] == 4
+
+    asyncio.run(scenario())
+
+
+def test_queueing_times_out_and_classes_are_independent():
+    """A caller gives up with a retry hint; an exhausted class doesn't hold up others"""
+
+    async def scenario():
+        limiter = RateLimiter("test", buckets={"places": TokenBucket(rate=1, burst=1)})
+        await limiter.acquire("places")
+        with pytest.raises(RateLimitExceeded) as raised:
+            await limiter.acquire("places", timeout=0.05)
+        assert 0 < raised.value.retry_after <= 1
+        assert limiter.stats["rejected"] == 1
+
+        # Searches have no bucket of their own and no global bucket limits them
+        await asyncio.wait_for(limiter.acquire("searches", timeout=0.05), 1)
+
+        # A 429 pause of one class leaves the others alone
+        limiter.pause(10, "places")
+        with pytest.raises(RateLimitExceeded):
+            await limiter.acquire("places", timeout=0.01)
+        await limiter.acquire("searches", timeout=0.01)
+
+    asyncio.run(scenario())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Test the bulkheads and circuit breakers guarding Junction calls"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.api.places import router as places_router
+from app.services.junction_client import PLACES, SEARCHES, JunctionUnavailableError
+from app.utils.bulkhead import Bulkhead, BulkheadFullError
+from app.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from conftest import FakeClock, junction_client
+
+
+def test_bulkhead_hands_slots_to_waiters_in_order():
+    """Waiters get freed slots oldest first; with max_wait 0 a full bulkhead rejects at once"""
+
+    async def scenario():
+        bulkhead = Bulkhead("test", 1)
+        order = []
+        release = asyncio.Event()
+
+        async def call(name, max_wait):
+            async with bulkhead.slot(max_wait):
+                order.append(name)
+                await release.wait()
+
+        first = asyncio.create_task(call("first", 0))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(call(name, 5)) for name in ("second", "third")]
+        await asyncio.sleep(0)
+        assert bulkhead.in_flight == 1 and bulkhead.waiting == 2
+
+        with pytest.raises(BulkheadFullError):
+            async with bulkhead.slot(0):
+                pass
+        with pytest.raises(BulkheadFullError):
+            async with bulkhead.slot(0.01):
+                pass
+
+        release.set()
+        await asyncio.gather(first, *waiters)
+        assert order == ["first", "second", "third"]
+        assert bulkhead.in_flight == 0 and bulkhead.waiting == 0
+        assert bulkhead.stats == {"accepted": 3, "rejected": 2}
+
+    asyncio.run(scenario())
+
+
+def test_bulkhead_cancelled_waiter_passes_its_slot_on():
+    """A waiter cancelled after being handed a slot releases it instead of leaking it"""
+
+    async def scenario():
+        bulkhead = Bulkhead("test", 1)
+        holder = Bulkhead.slot(bulkhead)
+        await holder.__aenter__()
+
+        async def call():
+            async with bulkhead.slot(5):
+                pass
+
+        cancelled = asyncio.create_task(call())
+        await asyncio.sleep(0)
+        # Free the slot, which resolves the waiter's future, then cancel the
+        # waiter before it gets to run. Depending on the Python version the
+        # waiter is cancelled or runs its block; either way the slot comes back
+        await holder.__aexit__(None, None, None)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        assert bulkhead.in_flight == 0 and not bulkhead.waiters
+
+        async with bulkhead.slot(0):
+            assert bulkhead.in_flight == 1
+
+    asyncio.run(scenario())
+
+
+def test_breaker_opens_probes_and_closes():
+    """Consecutive failures open the breaker; after the reset timeout one probe decides"""
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=10, clock=clock)
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+    clock.now = 4
+    assert breaker.retry_after() == 6
+
+    clock.now = 10
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() and not breaker.allow()
+    # A failed probe opens it for another reset timeout
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.retry_after() == 10
+
+    clock.now = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+    assert breaker.stats == {"opened": 1, "rejected": 2, "failures": 6}
+
+
+def test_open_breaker_answers_503_with_retry_after(monkeypatch):
+    """Once the places breaker opens, the endpoint fails fast with a 503 and Retry-After"""
+    from main import app
+
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(502, text="bad gateway")
+
+    async def scenario():
+        monkeypatch.setattr(places_router, "junction", junction_client(handler, failure_threshold=2, reset_timeout=30))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            statuses = []
+            for query in ("pa", "par", "pari"):
+                response = await client.get("/api/places/search", params={"query": query})
+                statuses.append(response.status_code)
+            return statuses, response
+
+    statuses, response = asyncio.run(scenario())
+    assert 503 not in statuses[:2] and statuses[-1] == 503
+    assert len(calls) == 2
+    assert 1 <= int(response.headers["Retry-After"]) <= 30
+
+
+def test_groups_are_isolated():
+    """A full or failing searches group doesn't stop places calls"""
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def handler(request):
+            if request.url.path == "/train-searches":
+                await release.wait()
+                return httpx.Response(503)
+            return httpx.Response(200, json={"items": []})
+
+        client = junction_client(handler, failure_threshold=1, bulkhead_wait=0)
+        slow_search = asyncio.create_task(client.request(SEARCHES, "POST", "/train-searches", timeout=5))
+        await asyncio.sleep(0.01)
+
+        # Searches are full, places are not
+        with pytest.raises(JunctionUnavailableError):
+            await client.request(SEARCHES, "POST", "/train-searches", timeout=5)
+        assert (await client.request(PLACES, "GET", "/places", timeout=5)).status_code == 200
+
+        # Searches fail and open their breaker, places stay closed
+        release.set()
+        assert (await slow_search).status_code == 503
+        stats = client.stats()["groups"]
+        assert stats[SEARCHES]["breaker"]["state"] == OPEN
+        assert stats[PLACES]["breaker"]["state"] == CLOSED
+        assert (await client.request(PLACES, "GET", "/places", timeout=5)).status_code == 200
+        await client.aclose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Test ranking, deduplication and caching of prefetched return offers"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.services.return_prefetch import ReturnOfferPrefetcher, rank_outbound_offers
+
+
+def _offer(offer_id, amount, result=None, expires_in=None):
+    offer = {"id": offer_id, "price": {"amount": str(amount), "currency": "EUR"}}
+    if result is not None:
+        offer["policy"] = {"result": result}
+    if expires_in is not None:
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
+        offer["expiresAt"] = expires_at.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    return offer
+
+
+def _prefetcher(count=2, cache_ttl=600):
+    return ReturnOfferPrefetcher(count, concurrency=4, timeout=5, cache_ttl=cache_ttl, cache_max_bytes=1024 * 1024)
+
+
+def test_rank_outbound_offers():
+    """In-policy offers first, cheapest first; blocked offers never"""
+    items = [
+        _offer("cheap_out", 20, "OUT_OF_POLICY"),
+        _offer("blocked", 10, "BOOKING_BLOCKED"),
+        _offer("dear_in", 90, "IN_POLICY"),
+        _offer("unannotated", 50),
+        {"price": {"amount": "5"}},
+    ]
+    assert rank_outbound_offers(items, 3) == ["unannotated", "dear_in", "cheap_out"]
+
+
+def test_disabled_prefetcher_bypasses_the_cache():
+    prefetcher = _prefetcher(count=0)
+    prefetcher.store(("train_search_1", "offer_1"), {"items": [_offer("return_1", 40)]})
+    assert len(prefetcher.cache) == 0
+    assert prefetcher.lookup(("train_search_1", "offer_1")) is None
+    assert prefetcher.cache.stats["misses"] == 0
+    assert prefetcher.schedule("train_search_1", [_offer("offer_1", 40)], None, 1, 0.0) == []
+
+
+def test_schedule_prefetches_each_offer_once():
+    """Several requests finishing the same search start one prefetch per offer"""
+
+    async def scenario():
+        prefetcher = _prefetcher()
+        polls, finish = [], asyncio.Event()
+
+        def poll_for(offer_id):
+            async def poll(deadline, progress):
+                polls.append(offer_id)
+                await finish.wait()
+                return {"items": [_offer(f"return_for_{offer_id}", 30, expires_in=900)]}
+            return poll
+
+        items = [_offer("offer_1", 40), _offer("offer_2", 60), _offer("offer_3", 80)]
+        assert prefetcher.schedule("train_search_1", items, poll_for, 5, 0.0) == ["offer_1", "offer_2"]
+        assert prefetcher.schedule("train_search_1", items, poll_for, 5, 0.0) == []
+        await asyncio.sleep(0.01)
+        assert sorted(polls) == ["offer_1", "offer_2"]
+
+        finish.set()
+        await asyncio.gather(*prefetcher.tasks)
+        assert not prefetcher.in_flight
+        assert prefetcher.lookup(("train_search_1", "offer_1"))["items"][0]["id"] == "return_for_offer_1"
+        # Cached now, so still nothing to do
+        assert prefetcher.schedule("train_search_1", items, poll_for, 5, 0.0) == []
+        assert prefetcher.stats["scheduled"] == 2 and prefetcher.stats["prefetched"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_cached_offers_expire_with_the_offers():
+    """Entries last the cache TTL or until the first offer expires, whichever is sooner"""
+    prefetcher = _prefetcher(cache_ttl=600)
+    clock = prefetcher.cache.clock
+
+    prefetcher.store(("s", "short"), {"items": [_offer("r1", 30, expires_in=900), _offer("r2", 40, expires_in=60)]})
+    assert 55 < prefetcher.cache.entries[("s", "short")].expires_at - clock() <= 60
+
+    prefetcher.store(("s", "long"), {"items": [_offer("r3", 30, expires_in=3600)]})
+    assert 599 < prefetcher.cache.entries[("s", "long")].expires_at - clock() <= 600
+
+    # Unknown validity keeps the cache TTL; offers already expired are not cached
+    prefetcher.store(("s", "unknown"), {"items": [_offer("r4", 30)]})
+    assert ("s", "unknown") in prefetcher.cache
+    prefetcher.store(("s", "expired"), {"items": [_offer("r5", 30, expires_in=-5)]})
+    assert ("s", "expired") not in prefetcher.cache and prefetcher.stats["expired"] == 1
+
+
+def test_expired_offers_are_prefetched_again():
+    """Once a cached entry lapses its outbound offer is scheduled again"""
+
+    async def scenario():
+        prefetcher = _prefetcher(count=1, cache_ttl=600)
+        now = [1000.0]
+        prefetcher.cache.clock = lambda: now[0]
+
+        async def poll(deadline, progress):
+            return {"items": [_offer("return_1", 30, expires_in=120)]}
+
+        items = [_offer("offer_1", 40)]
+        prefetcher.store(("train_search_1", "offer_1"), {"items": [_offer("return_1", 30, expires_in=60)]})
+        assert prefetcher.schedule("train_search_1", items, lambda offer_id: poll, 5, 0.0) == []
+
+        now[0] += 61
+        assert prefetcher.schedule("train_search_1", items, lambda offer_id: poll, 5, 0.0) == ["offer_1"]
+        await asyncio.gather(*prefetcher.tasks)
+        assert prefetcher.lookup(("train_search_1", "offer_1")) is not None
+
+    asyncio.run(scenario())
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Test async train search jobs, their store and the multi-worker guard"""
+
+import asyncio
+import importlib.util
+import os
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.api.trains import router as trains_router
+from app.services.search_jobs import FAILED, RUNNING, SUCCEEDED, JobStore, MemoryJobStore, SearchJobs
+from conftest import junction_client
+
+SEARCH = {"origin": "a", "destination": "b", "departureDate": "2026-11-02", "passengers": [{"type": "adult"}]}
+
+
+async def _api(method, url, **kwargs):
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.request(method, url, **kwargs)
+
+
+def _load_gunicorn_conf():
+    spec = importlib.util.spec_from_file_location("gunicorn_conf", "gunicorn.conf.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_job_store_is_abstract():
+    with pytest.raises(TypeError):
+        JobStore(60)
+
+
+def test_memory_store_waits_and_expires():
+    """wait() returns as soon as a job finishes; jobs disappear after the TTL"""
+
+    async def scenario():
+        store = MemoryJobStore(ttl=0.2)
+        await store.put({"job_id": "j1", "status": RUNNING})
+        assert (await store.wait("j1", 0.01))["status"] == RUNNING
+
+        async def finish():
+            await asyncio.sleep(0.02)
+            await store.put({"job_id": "j1", "status": SUCCEEDED})
+
+        asyncio.create_task(finish())
+        assert (await store.wait("j1", 5))["status"] == SUCCEEDED
+        assert await store.wait("unknown", 0.01) is None
+
+        await asyncio.sleep(0.25)
+        assert await store.get("j1") is None
+
+    asyncio.run(scenario())
+
+
+def test_job_results_and_errors():
+    """Results are stored on success; HTTP errors keep their status, others become 500s"""
+
+    async def scenario():
+        jobs = SearchJobs(MemoryJobStore(60))
+
+        async def found():
+            return {"items": [{"id": "offer_1"}]}
+
+        async def rejected():
+            raise HTTPException(status_code=503, detail="searches circuit open")
+
+        async def broken():
+            raise KeyError("Location")
+
+        started = [await jobs.start(work) for work in (found, rejected, broken)]
+        assert all(job["status"] == RUNNING for job in started)
+        done = [await jobs.get(job["job_id"], wait=5) for job in started]
+
+        assert done[0]["status"] == SUCCEEDED and done[0]["result"]["items"] == [{"id": "offer_1"}]
+        assert done[1]["status"] == FAILED and done[1]["error"] == {"status_code": 503, "detail": "searches circuit open"}
+        assert done[2]["status"] == FAILED and done[2]["error"]["status_code"] == 500
+        assert jobs.to_dict()["running"] == 0
+        assert jobs.stats == {"started": 3, SUCCEEDED: 1, FAILED: 2}
+
+    asyncio.run(scenario())
+
+
+def test_shutdown_drains_jobs():
+    """Jobs that finish within the drain time keep their results; the rest fail with a 503"""
+
+    async def scenario():
+        jobs = SearchJobs(MemoryJobStore(60))
+
+        async def quick():
+            await asyncio.sleep(0.02)
+            return {"items": []}
+
+        async def slow():
+            await asyncio.sleep(10)
+
+        quick_job, slow_job = await jobs.start(quick), await jobs.start(slow)
+        await jobs.aclose(0.2)
+        return await jobs.get(quick_job["job_id"]), await jobs.get(slow_job["job_id"])
+
+    quick_job, slow_job = asyncio.run(scenario())
+    assert quick_job["status"] == SUCCEEDED
+    assert slow_job["status"] == FAILED and slow_job["error"]["status_code"] == 503
+
+
+def test_async_search_endpoint(monkeypatch):
+    """POST ?async=true answers 202 at once; the status URL serves the result"""
+
+    def handler(request):
+        if request.method == "POST":
+            return httpx.Response(201, headers={"Location": "/train-searches/train_search_job/offers"})
+        return httpx.Response(200, json={"items": [{"id": "offer_1"}]})
+
+    async def scenario():
+        monkeypatch.setattr(trains_router, "junction", junction_client(handler, slots=2))
+
+        accepted = await _api("POST", "/api/trains/search", params={"async": "true"}, json=SEARCH)
+        job = await _api("GET", accepted.json()["statusUrl"], params={"wait": 5})
+        missing = await _api("GET", "/api/trains/search/search_job_unknown")
+        return accepted, job, missing
+
+    accepted, job, missing = asyncio.run(scenario())
+    assert accepted.status_code == 202 and accepted.json()["status"] == RUNNING
+    assert job.status_code == 200 and job.json()["status"] == SUCCEEDED
+    assert job.json()["result"]["train_search_id"] == "train_search_job"
+    assert missing.status_code == 404
+
+
+def test_jobs_get_their_own_budget(monkeypatch):
+    """A job may run longer than a synchronous search could wait"""
+    budgets = []
+
+    async def fake_search(request, search_request, deadline):
+        budgets.append(deadline.seconds)
+        return {"items": []}
+
+    monkeypatch.setattr(trains_router, "_run_search", fake_search)
+    monkeypatch.setattr(trains_router.settings, "SEARCH_JOB_TIMEOUT_SECONDS", 120)
+    monkeypatch.setattr(trains_router.settings, "TRAIN_SEARCH_MAX_TIMEOUT_SECONDS", 60)
+
+    async def scenario():
+        await _api("POST", "/api/trains/search", params={"timeout": 90}, json=SEARCH)
+        accepted = await _api("POST", "/api/trains/search", params={"timeout": 90, "async": "true"}, json=SEARCH)
+        await _api("GET", accepted.json()["statusUrl"], params={"wait": 5})
+        await _api("POST", "/api/trains/search", params={"async": "true"}, json=SEARCH)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert budgets == [60, 90, 120]
+
+
+def test_gunicorn_profile_refuses_memory_jobs_with_several_workers(monkeypatch):
+    # Set first so the profile's setdefault is undone after the test
+    monkeypatch.setenv("SEARCH_JOB_BACKEND", "")
+    monkeypatch.delenv("SEARCH_JOB_BACKEND")
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    conf = _load_gunicorn_conf()
+    assert os.environ["SEARCH_JOB_BACKEND"] == "redis"
+    conf.on_starting(SimpleNamespace(cfg=SimpleNamespace(workers=4)))
+
+    monkeypatch.setenv("SEARCH_JOB_BACKEND", "memory")
+    with pytest.raises(RuntimeError):
+        conf.on_starting(SimpleNamespace(cfg=SimpleNamespace(workers=4)))
+    conf.on_starting(SimpleNamespace(cfg=SimpleNamespace(workers=1)))
@@ -0,0 +1,254 @@
+"""
+Local stand-in for the Junction content API, for load and latency testing.
+
+Implements the endpoints the backend calls:
+    POST /train-searches                      201 with a Location header
+    GET  /train-searches/{id}/offers          empty until the search is ready
+    GET  /places, GET /places/{id}
+    POST /bookings, GET /bookings/{id}, POST /bookings/{id}/confirm
+
+Behaviour is configured with environment variables (or the matching CLI flags):
+    FAKE_JUNCTION_READY_AFTER   seconds before a search returns offers (default 2.0)
+    FAKE_JUNCTION_LATENCY_MS    base latency added to every response (default 50)
+    FAKE_JUNCTION_JITTER_MS     random extra latency, uniform 0..jitter (default 50)
+    FAKE_JUNCTION_ERROR_RATE    fraction of requests answered with 503 (default 0.0)
+    FAKE_JUNCTION_OFFERS        offers per search response (default 20)
+    FAKE_JUNCTION_PADDING       extra bytes of metadata per offer (default 0)
+
+Run it and point the backend at it:
+    python tools/fake_junction.py --port 9000
+    JUNCTION_API_BASE=http://localhost:9000 uvicorn main:app
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+OPERATORS = ["Eurostar", "SNCF", "Deutsche Bahn", "Trenitalia", "Renfe", "Ouigo"]
+FARE_CLASSES = ["standard", "standard", "standard", "first", "business"]
+PLACES = [
+    ("place_01_london", "London St Pancras International", "GB"),
+    ("place_02_paris", "Paris Gare du Nord", "FR"),
+    ("place_03_brussels", "Brussels Midi", "BE"),
+    ("place_04_amsterdam", "Amsterdam Centraal", "NL"),
+    ("place_05_berlin", "Berlin Hauptbahnhof", "DE"),
+    ("place_06_frankfurt", "Frankfurt (Main) Hauptbahnhof", "DE"),
+    ("place_07_milan", "Milano Centrale", "IT"),
+    ("place_08_madrid", "Madrid Puerta de Atocha", "ES"),
+]
+
+
+class FakeJunctionConfig:
+    def __init__(self):
+        self.ready_after = float(os.getenv("FAKE_JUNCTION_READY_AFTER", "2.0"))
+        self.latency_ms = float(os.getenv("FAKE_JUNCTION_LATENCY_MS", "50"))
+        self.jitter_ms = float(os.getenv("FAKE_JUNCTION_JITTER_MS", "50"))
+        self.error_rate = float(os.getenv("FAKE_JUNCTION_ERROR_RATE", "0.0"))
+        self.offers = int(os.getenv("FAKE_JUNCTION_OFFERS", "20"))
+        self.padding = int(os.getenv("FAKE_JUNCTION_PADDING", "0"))
+
+
+config = FakeJunctionConfig()
+app = FastAPI(title="Fake Junction API")
+
+# In-memory state; searches and bookings live for the life of the process
+searches: Dict[str, Dict[str, Any]] = {}
+bookings: Dict[str, Dict[str, Any]] = {}
+
+
+def _id(prefix: str) -> str:
+    return f"{prefix}_{uuid.uuid4().hex[:26]}"
+
+
+@app.middleware("http")
+async def inject_faults(request: Request, call_next):
+    """Add latency to every response and fail a fraction of requests"""
+    await asyncio.sleep((config.latency_ms + random.uniform(0, config.jitter_ms)) / 1000)
+    if random.random() < config.error_rate:
+        return JSONResponse(status_code=503, content={"errors": [{"title": "Injected failure"}]})
+    return await call_next(request)
+
+
+def _build_offer(search: Dict[str, Any], index: int, outbound_offer_id: Optional[str]) -> Dict[str, Any]:
+    departure = search["departure_after"] + timedelta(minutes=35 * index)
+    if outbound_offer_id and search.get("return_departure_after"):
+        departure = search["return_departure_after"] + timedelta(minutes=35 * index)
+    arrival = departure + timedelta(hours=2, minutes=random.randint(0, 90))
+    fare_class = FARE_CLASSES[index % len(FARE_CLASSES)]
+    operator = OPERATORS[index % len(OPERATORS)]
+    origin, destination = search["origin_id"], search["destination_id"]
+    if outbound_offer_id:
+        origin, destination = destination, origin
+
+    offer = {
+        "id": _id("train_offer"),
+        "price": {"amount": f"{random.uniform(39, 450):.2f}", "currency": "EUR"},
+        "expiresAt": (datetime.utcnow() + timedelta(minutes=30)).isoformat() + "Z",
+        "passengerAges": search["passenger_ages"],
+        "trips": [{
+            "id": _id("trip"),
+            "segments": [{
+                "sequence": 1,
+                "origin": {"id": origin},
+                "destination": {"id": destination},
+                "departureAt": departure.isoformat() + "Z",
+                "arrivalAt": arrival.isoformat() + "Z",
+                "fareClass": fare_class,
+                "vehicle": {"name": operator, "number": str(9000 + index)},
+            }],
+        }],
+        "metadata": {"providerId": operator.lower().replace(" ", "-")},
+    }
+    if outbound_offer_id:
+        offer["outboundOfferId"] = outbound_offer_id
+    if config.padding:
+        offer["metadata"]["padding"] = "x" * config.padding
+    return offer
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+
+
+@app.post("/train-searches")
+async def create_train_search(body: Dict[str, Any], request: Request):
+    train_search_id = _id("train_search")
+    searches[train_search_id] = {
+        "created": time.monotonic(),
+        "origin_id": body.get("originId"),
+        "destination_id": body.get("destinationId"),
+        "departure_after": _parse_datetime(body.get("departureAfter")) or datetime.utcnow(),
+        "return_departure_after": _parse_datetime(body.get("returnDepartureAfter")),
+        "passenger_ages": body.get("passengerAges") or [],
+        "offers": {},
+    }
+    location = f"{str(request.base_url).rstrip('/')}/train-searches/{train_search_id}/offers"
+    return Response(status_code=201, headers={"Location": location})
+
+
+@app.get("/train-searches/{train_search_id}/offers")
+async def get_train_offers(train_search_id: str, trainOfferId: Optional[str] = None):
+    search = searches.get(train_search_id)
+    if search is None:
+        return JSONResponse(status_code=404, content={"errors": [{"title": "Train search not found"}]})
+    if time.monotonic() - search["created"] < config.ready_after:
+        return {"items": []}
+
+    # Offers are generated once per (search, outbound offer) so polls are stable
+    key = trainOfferId or ""
+    if key not in search["offers"]:
+        search["offers"][key] = [_build_offer(search, index, trainOfferId) for index in range(config.offers)]
+    return {"items": search["offers"][key]}
+
+
+def _place(place_id: str, name: str, country: str) -> Dict[str, Any]:
+    return {
+        "id": place_id,
+        "name": name,
+        "placeTypes": ["railway-station"],
+        "countryCode": country,
+        "coordinates": {"latitude": 0.0, "longitude": 0.0},
+    }
+
+
+@app.get("/places")
+async def search_places(request: Request):
+    query = (request.query_params.get("filter[name][like]") or "").lower()
+    limit = int(request.query_params.get("limit", 50))
+    items = [_place(*place) for place in PLACES if query in place[1].lower()]
+    return {"items": items[:limit]}
+
+
+@app.get("/places/{place_id}")
+async def get_place(place_id: str):
+    for place in PLACES:
+        if place[0] == place_id:
+            return _place(*place)
+    return JSONResponse(status_code=404, content={"errors": [{"title": "Place not found"}]})
+
+
+@app.post("/bookings")
+async def create_booking(body: Dict[str, Any], request: Request):
+    booking_id = _id("booking")
+    now = datetime.utcnow()
+    booking = {
+        "booking": {
+            "id": booking_id,
+            "status": "pending-payment",
+            "createdAt": now.isoformat() + "Z",
+            "expiresAt": (now + timedelta(minutes=15)).isoformat() + "Z",
+            "confirmationNumber": None,
+        },
+        "offerId": body.get("offerId"),
+        "price": {"amount": f"{random.uniform(39, 450):.2f}", "currency": "EUR"},
+        "passengers": body.get("passengers", []),
+        "priceBreakdown": [],
+        "ticketInformation": [],
+        "fareRules": [],
+        "trips": [],
+        "fulfillmentInformation": [],
+    }
+    bookings[booking_id] = booking
+    location = f"{str(request.base_url).rstrip('/')}/bookings/{booking_id}"
+    return JSONResponse(status_code=201, content=booking, headers={"Location": location})
+
+
+@app.get("/bookings/{booking_id}")
+async def get_booking(booking_id: str):
+    booking = bookings.get(booking_id)
+    if booking is None:
+        return JSONResponse(status_code=404, content={"errors": [{"title": "Booking not found"}]})
+    return booking
+
+
+@app.post("/bookings/{booking_id}/confirm")
+async def confirm_booking(booking_id: str, body: Dict[str, Any]):
+    booking = bookings.get(booking_id)
+    if booking is None:
+        return JSONResponse(status_code=404, content={"errors": [{"title": "Booking not found"}]})
+    booking["booking"]["status"] = "confirmed"
+    booking["booking"]["confirmationNumber"] = uuid.uuid4().hex[:8].upper()
+    booking["status"] = "confirmed"
+    booking["fulfillmentInformation"] = [
+        {"segmentSequence": choice.get("segmentSequence", 1), "deliveryOption": choice.get("deliveryOption")}
+        for choice in body.get("fulfillmentChoices", [])
+    ]
+    return booking
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake Junction API for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--ready-after", type=float, default=config.ready_after)
+    parser.add_argument("--latency-ms", type=float, default=config.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=config.jitter_ms)
+    parser.add_argument("--error-rate", type=float, default=config.error_rate)
+    parser.add_argument("--offers", type=int, default=config.offers)
+    parser.add_argument("--padding", type=int, default=config.padding)
+    args = parser.parse_args()
+
+    config.ready_after = args.ready_after
+    config.latency_ms = args.latency_ms
+    config.jitter_ms = args.jitter_ms
+    config.error_rate = args.error_rate
+    config.offers = args.offers
+    config.padding = args.padding
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Load generator for the backend's Junction-facing endpoints.
+
+Runs a scenario with a fixed number of concurrent virtual users for a number
+of iterations or a duration, then reports throughput, latency percentiles per
+step and status codes. Pair it with tools/fake_junction.py for a repeatable
+throughput and tail-latency benchmark:
+
+    python tools/fake_junction.py --port 9000 --ready-after 1 &
+    JUNCTION_API_BASE=http://localhost:9000 uvicorn main:app --port 8000 &
+    python tools/load_test.py --scenario search --concurrency 50 --duration 60 --output results.json
+
+Scenarios:
+    places    GET  /api/places/search
+    search    POST /api/trains/search
+    return    search, then POST /api/trains/return-offers/{train_search_id}
+    booking   search, then POST /api/bookings/create and /api/bookings/{id}/confirm
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+SEARCH_BODY = {
+    "origin": "place_01_london",
+    "destination": "place_02_paris",
+    "departureDate": (date.today() + timedelta(days=14)).isoformat(),
+    "passengers": [{"type": "adult"}],
+}
+
+PASSENGER = {
+    "dateOfBirth": "1990-01-01",
+    "firstName": "Load",
+    "lastName": "Test",
+    "gender": "male",
+    "email": "load.test@example.com",
+    "phoneNumber": "+4407770000001",
+    "residentialAddress": {
+        "addressLines": ["1 Test Street"],
+        "countryCode": "GB",
+        "postalCode": "N1 9AL",
+        "city": "London",
+    },
+}
+
+
+class Recorder:
+    """Latencies and status codes per scenario step"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.iterations = 0
+        self.failed_iterations = 0
+
+    async def call(self, client: httpx.AsyncClient, step: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            response = None
+            status = type(e).__name__
+        self.latencies[step].append((time.perf_counter() - start) * 1000)
+        self.statuses[step][status] += 1
+        return response if response is not None and response.is_success else None
+
+    def report(self, seconds: float) -> Dict[str, Any]:
+        steps = {}
+        for step, samples in self.latencies.items():
+            ordered = sorted(samples)
+
+            def at(fraction):
+                return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 1)
+
+            steps[step] = {
+                "requests": len(ordered),
+                "requests_per_second": round(len(ordered) / seconds, 2),
+                "mean_ms": round(statistics.fmean(ordered), 1),
+                "p50_ms": at(0.50),
+                "p90_ms": at(0.90),
+                "p99_ms": at(0.99),
+                "max_ms": round(ordered[-1], 1),
+                "statuses": dict(self.statuses[step]),
+            }
+        return {
+            "seconds": round(seconds, 2),
+            "iterations": self.iterations,
+            "failed_iterations": self.failed_iterations,
+            "iterations_per_second": round(self.iterations / seconds, 2),
+            "steps": steps,
+        }
+
+
+async def run_places(client: httpx.AsyncClient, recorder: Recorder) -> bool:
+    return await recorder.call(client, "places", "GET", "/api/places/search", params={"query": "Par"}) is not None
+
+
+async def run_search(client: httpx.AsyncClient, recorder: Recorder) -> Optional[Dict[str, Any]]:
+    response = await recorder.call(client, "search", "POST", "/api/trains/search", json=SEARCH_BODY)
+    if response is None:
+        return None
+    offers = response.json()
+    return offers if offers.get("items") else None
+
+
+async def run_return(client: httpx.AsyncClient, recorder: Recorder) -> bool:
+    offers = await run_search(client, recorder)
+    if offers is None:
+        return False
+    response = await recorder.call(
+        client, "return", "POST", f"/api/trains/return-offers/{offers['train_search_id']}",
+        json={"trainOfferId": offers["items"][0]["id"]}
+    )
+    return response is not None
+
+
+async def run_booking(client: httpx.AsyncClient, recorder: Recorder) -> bool:
+    offers = await run_search(client, recorder)
+    if offers is None:
+        return False
+    booking = await recorder.call(
+        client, "booking_create", "POST", "/api/bookings/create",
+        json={"offerId": offers["items"][0]["id"], "tripId": "1", "passengers": [PASSENGER]}
+    )
+    if booking is None:
+        return False
+    confirm = await recorder.call(
+        client, "booking_confirm", "POST", f"/api/bookings/{booking.json()['id']}/confirm",
+        json={"fulfillmentChoices": [{"deliveryOption": "electronic-ticket", "segmentSequence": 1}]}
+    )
+    return confirm is not None
+
+
+SCENARIOS = {
+    "places": run_places,
+    "search": run_search,
+    "return": run_return,
+    "booking": run_booking,
+}
+
+
+async def virtual_user(client: httpx.AsyncClient, recorder: Recorder, scenario, deadline: float, iterations: Optional[List[int]]):
+    while time.perf_counter() < deadline:
+        if iterations is not None:
+            if iterations[0] <= 0:
+                return
+            iterations[0] -= 1
+        ok = await scenario(client, recorder)
+        recorder.iterations += 1
+        if not ok:
+            recorder.failed_iterations += 1
+
+
+async def run(args) -> Dict[str, Any]:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        start = time.perf_counter()
+        deadline = start + args.duration if args.duration else float("inf")
+        iterations = [args.iterations] if args.iterations else None
+        await asyncio.gather(*(
+            virtual_user(client, recorder, SCENARIOS[args.scenario], deadline, iterations)
+            for _ in range(args.concurrency)
+        ))
+        seconds = time.perf_counter() - start
+
+    report = recorder.report(seconds)
+    report["params"] = vars(args)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend load generator")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="search")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, help="Seconds to run (default: until --iterations are done)")
+    parser.add_argument("--iterations", type=int, help="Total scenario iterations (default 100 without --duration)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    args = parser.parse_args()
+    if not args.duration and not args.iterations:
+        args.iterations = 100
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,9 +17,13 @@ CREATE TABLE IF NOT EXISTS policies (
     refundable_fares_enabled BOOLEAN NOT NULL DEFAULT false,
     user_count BIGINT DEFAULT 0,
     guest_count BIGINT DEFAULT 0,
-    approver_count BIGINT DEFAULT 0
+    approver_count BIGINT DEFAULT 0,
+    rule_count BIGINT DEFAULT 0 -- active rules, maintained by the policy engine
 );
 
+-- Added after the initial release; safe to re-run on existing databases
+ALTER TABLE policies ADD COLUMN IF NOT EXISTS rule_count BIGINT DEFAULT 0;
+
 -- Policy rules table
 CREATE TABLE IF NOT EXISTS policy_rules (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -62,6 +66,29 @@ CREATE TABLE IF NOT EXISTS user_policy_assignments (
     UNIQUE(user_id, policy_id)
 );
 
+-- Per-organization policy set version, bumped by the policy engine in the same
+-- transaction as any change to the org's policies, rules, exceptions,
+-- approvers or assignments
+CREATE TABLE IF NOT EXISTS policy_set_versions (
+    org_id UUID PRIMARY KEY,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    version BIGINT NOT NULL DEFAULT 0,
+    pruned_version BIGINT NOT NULL DEFAULT 0 -- changes up to here were pruned from policy_changes
+);
+
+-- Rows changed in each policy set version; deletes are kept as tombstones
+CREATE TABLE IF NOT EXISTS policy_changes (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    org_id UUID NOT NULL,
+    version BIGINT NOT NULL,
+    entity VARCHAR(32) NOT NULL, -- policy, rule, exception, approver, assignment
+    entity_id UUID NOT NULL,
+    policy_id UUID,
+    operation VARCHAR(16) NOT NULL -- upsert, delete
+);
+
 -- Rail stations/cities for location-based policies
 CREATE TABLE IF NOT EXISTS policy_rail_stations (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -103,6 +130,7 @@ CREATE INDEX IF NOT EXISTS idx_user_policy_assignments_policy_id ON user_policy_
 CREATE INDEX IF NOT EXISTS idx_policy_rail_stations_code ON policy_rail_stations(station_code);
 CREATE INDEX IF NOT EXISTS idx_policy_rail_operators_code ON policy_rail_operators(operator_code);
 CREATE INDEX IF NOT EXISTS idx_org_rail_preferences_org_id ON org_rail_preferences(org_id);
+CREATE INDEX IF NOT EXISTS idx_policy_changes_org_version ON policy_changes(org_id, version);
 
 -- Create approval_requests table
 CREATE TABLE IF NOT EXISTS approval_requests (
@@ -8,14 +8,30 @@ from app.config import Config
 db = SQLAlchemy()
 migrate = Migrate()
 
+def _postgres_engine_options(app):
+    """Connect and statement timeouts, so a slow database fails requests instead of stalling them"""
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+        return
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    options.setdefault('pool_pre_ping', True)
+    connect_args = options.setdefault('connect_args', {})
+    connect_args.setdefault('connect_timeout', app.config['DATABASE_CONNECT_TIMEOUT'])
+    if app.config['DATABASE_STATEMENT_TIMEOUT_MS']:
+        connect_args.setdefault('options', f"-c statement_timeout={app.config['DATABASE_STATEMENT_TIMEOUT_MS']}")
+
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    _postgres_engine_options(app)
     
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
     
+    # Fail fast while the database is down instead of waiting out timeouts
+    from app.utils.circuit_breaker import init_database_breaker
+    init_database_breaker(app, db)
+    
     # Configure CORS to allow frontend requests
     CORS(app, resources={
         r"/api/*": {
@@ -33,12 +49,33 @@ def create_app(config_class=Config):
         description='Policy management and evaluation for travel bookings',
         doc='/docs/'
     )
+    # Kept so the server profile can build the Swagger schema before forking
+    app.extensions['api'] = api
+    
+    from sqlalchemy.exc import InterfaceError, OperationalError
+    from app.utils.exceptions import DatabaseUnavailableError
+    
+    @api.errorhandler(DatabaseUnavailableError)
+    @api.errorhandler(OperationalError)
+    @api.errorhandler(InterfaceError)
+    def database_unavailable(error):
+        retry_after = int(app.config.get('DB_BREAKER_RESET_SECONDS', 10))
+        return {'message': 'Database unavailable, try again shortly'}, 503, {'Retry-After': str(retry_after)}
     
     # Register blueprints/namespaces
-    from app.api.v1 import policies, policy_rules, policy_evaluation, approval_requests
+    from app.api.v1 import policies, policy_rules, policy_evaluation, approval_requests, admin
     api.add_namespace(policies.api, path='/api/v1/policies')
     api.add_namespace(policy_rules.api, path='/api/v1/policy-rules')
     api.add_namespace(policy_evaluation.api, path='/api/v1/policy-evaluation')
     api.add_namespace(approval_requests.approval_requests_ns, path='/api/v1/approval-requests')
+    api.add_namespace(admin.api, path='/api/v1/admin')
+    
+    # Opt-in recording of evaluation traffic for replay
+    from app.utils.evaluation_recorder import init_recorder
+    init_recorder(app)
+    
+    # Compiled policy sets shared by all requests (preloaded before fork when configured)
+    from app.services.policy_cache import init_policy_cache
+    init_policy_cache(app)
     
     return app
\ No newline at end of file
@@ -0,0 +1,22 @@
+import os
+
+from flask import current_app
+from flask_restx import Namespace, Resource
+from app.utils.cache import cache_stats
+
+api = Namespace('admin', description='Operational introspection')
+
+@api.route('/caches')
+class CacheStats(Resource):
+    @api.doc('get_cache_stats')
+    def get(self):
+        """Get entries, bytes and hit/miss/eviction counts of every cache in this worker process"""
+        policy_cache = current_app.extensions.get('policy_cache')
+        breaker = current_app.extensions.get('database_breaker')
+        return {
+            # Caches are per process; with several workers each reports its own
+            'pid': os.getpid(),
+            'caches': cache_stats(),
+            'policy_sets': dict(policy_cache.stats) if policy_cache is not None else None,
+            'database_breaker': breaker.to_dict() if breaker is not None else None
+        }
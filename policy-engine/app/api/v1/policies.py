@@ -2,6 +2,8 @@ from flask_restx import Namespace, Resource, fields
 from flask import request
 from app.models.policy import Policy
 from app.services.policy_service import PolicyService
+from app.services.policy_changes import PolicyChangeService
+from app.utils.exceptions import ValidationError
 
 api = Namespace('policies', description='Policy management operations')
 
@@ -17,9 +19,10 @@ policy_model = api.model('Policy', {
     'message_for_reservation': fields.Raw(description='Custom messages per reservation type'),
     'exclude_restricted_fares': fields.Boolean(default=False),
     'refundable_fares_enabled': fields.Boolean(default=False),
-    'user_count': fields.String(readonly=True),
-    'guest_count': fields.String(readonly=True),
-    'approver_count': fields.String(readonly=True),
+    'user_count': fields.Integer(readonly=True),
+    'guest_count': fields.Integer(readonly=True),
+    'approver_count': fields.Integer(readonly=True),
+    'rule_count': fields.Integer(readonly=True, description='Number of active rules'),
     'created_at': fields.DateTime(readonly=True),
     'updated_at': fields.DateTime(readonly=True),
 })
@@ -55,6 +58,43 @@ class PolicyList(Resource):
         """Create a new policy"""
         return PolicyService.create_policy(api.payload), 201
 
+policy_change_model = api.model('PolicyChange', {
+    'entity': fields.String(enum=['policy', 'rule', 'exception', 'approver', 'assignment'], description='Changed table'),
+    'id': fields.String(description='UUID of the changed row'),
+    'policy_id': fields.String(description='Policy the row belongs to'),
+    'operation': fields.String(enum=['upsert', 'delete'], description='delete marks a removed row (tombstone)'),
+    'version': fields.Integer(description='Policy set version of the latest change to the row'),
+    'data': fields.Raw(description='Current row, or null for a tombstone'),
+})
+
+policy_changes_model = api.model('PolicyChanges', {
+    'org_id': fields.String(description='Organization UUID'),
+    'since': fields.Integer(description='Version the changes were requested from'),
+    'version': fields.Integer(description='Current policy set version; pass as since next time'),
+    'full_reload': fields.Boolean(description='Changes since that version are not all available; '
+                                              'policies holds every active policy'),
+    'changes': fields.List(fields.Nested(policy_change_model), description='Latest change per row'),
+    'policies': fields.List(fields.Raw, description='Active policies touched by the changes, with rules, '
+                                                    'exceptions and approvers'),
+    'removed_policy_ids': fields.List(fields.String, description='Touched policies now deleted or inactive'),
+})
+
+@api.route('/changes')
+class PolicyChanges(Resource):
+    @api.marshal_with(policy_changes_model)
+    @api.doc('get_policy_changes')
+    @api.param('org_id', 'Organization UUID', required=True)
+    @api.param('since', 'Policy set version the caller has (0 for everything)', type=int, default=0)
+    def get(self):
+        """Rows changed in an organization's policies since a policy set version"""
+        org_id = request.args.get('org_id')
+        if not org_id:
+            api.abort(400, "org_id is required")
+        try:
+            return PolicyChangeService.get_changes(org_id, request.args.get('since', 0, type=int))
+        except ValidationError as e:
+            api.abort(400, str(e))
+
 @api.route('/<string:policy_id>')
 @api.param('policy_id', 'Policy UUID')
 class PolicyItem(Resource):
@@ -75,4 +115,46 @@ class PolicyItem(Resource):
     def delete(self, policy_id):
         """Delete policy"""
         PolicyService.delete_policy(policy_id)
-        return '', 204
\ No newline at end of file
+        return '', 204
+
+
+bulk_assignment_model = api.model('PolicyBulkAssignment', {
+    'user_ids': fields.List(fields.String, description='User UUIDs to assign or unassign'),
+    'org_id': fields.String(description='Apply to every member of this organization'),
+    'assigned_by': fields.String(description='UUID of the user making the assignment'),
+})
+
+bulk_assignment_result_model = api.model('PolicyBulkAssignmentResult', {
+    'policy_id': fields.String(description='Policy UUID'),
+    'requested': fields.Integer(description='Number of distinct users in the request'),
+    'changed': fields.Integer(description='Number of assignments created or removed'),
+    'user_count': fields.Integer(description='Users assigned to the policy afterwards'),
+})
+
+@api.route('/<string:policy_id>/assignments/bulk')
+@api.param('policy_id', 'Policy UUID')
+class PolicyBulkAssignment(Resource):
+    @api.expect(bulk_assignment_model)
+    @api.marshal_with(bulk_assignment_result_model)
+    @api.doc('bulk_assign_policy')
+    def post(self, policy_id):
+        """Assign policy to many users"""
+        payload = api.payload or {}
+        return PolicyService.bulk_assign_policy(
+            policy_id,
+            assigned_by=payload.get('assigned_by'),
+            user_ids=payload.get('user_ids'),
+            org_id=payload.get('org_id')
+        )
+    
+    @api.expect(bulk_assignment_model)
+    @api.marshal_with(bulk_assignment_result_model)
+    @api.doc('bulk_unassign_policy')
+    def delete(self, policy_id):
+        """Remove policy from many users"""
+        payload = api.payload or {}
+        return PolicyService.bulk_unassign_policy(
+            policy_id,
+            user_ids=payload.get('user_ids'),
+            org_id=payload.get('org_id')
+        )
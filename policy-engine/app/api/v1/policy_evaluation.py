@@ -1,5 +1,13 @@
+from datetime import datetime
+import time
+
+from flask import current_app, request
 from flask_restx import Namespace, Resource, fields
 from app.services.evaluation_service import PolicyEvaluationService
+from app.services.simulation_service import (
+    DEFAULT_BATCH_SIZE, DEFAULT_SAMPLE_SIZE, SimulationJob, validate_simulation_args
+)
+from app.utils.exceptions import ValidationError
 
 api = Namespace('policy-evaluation', description='Policy evaluation operations')
 
@@ -17,6 +25,7 @@ evaluation_request_model = api.model('PolicyEvaluationRequest', {
     'travel_data': fields.Nested(travel_data_model, required=True),
     'org_id': fields.String(required=True, description='Organization UUID'),
     'user_id': fields.String(required=True, description='User UUID'),
+    'full_detail': fields.Boolean(default=True, description='Evaluate every rule; set false to stop at the first decisive result'),
 })
 
 rule_result_model = api.model('RuleResult', {
@@ -38,11 +47,26 @@ evaluation_response_model = api.model('PolicyEvaluationResponse', {
         'HIDDEN', 'BOOKING_BLOCKED', 'APPROVAL_REQUIRED', 'OUT_OF_POLICY', 'IN_POLICY', 'NOT_SPECIFIED'
     ]),
     'policies_evaluated': fields.Integer(description='Number of policies evaluated'),
+    'full_detail': fields.Boolean(description='Whether every rule and policy was evaluated'),
     'details': fields.List(fields.Nested(policy_result_model)),
     'messages': fields.List(fields.String, description='Policy violation messages'),
     'approvers': fields.List(fields.String, description='Required approver user IDs'),
+    'policies_stale': fields.Boolean(description='Policies could not be checked against the database; '
+                                                 'served from the last-known-good copy'),
+    'policies_as_of': fields.String(description='When the policies were last known to be current (ISO timestamp)'),
 })
 
+def _record(endpoint, started, response):
+    """Hand the request and its outcome to the evaluation recorder, if enabled"""
+    recorder = current_app.extensions.get('evaluation_recorder')
+    if recorder is None:
+        return
+    if 'results' in response:
+        results = [item['result'] for item in response['results']]
+    else:
+        results = [response['result']]
+    recorder.record(endpoint, api.payload, results, (time.perf_counter() - started) * 1000)
+
 @api.route('/evaluate')
 class PolicyEvaluation(Resource):
     @api.expect(evaluation_request_model)
@@ -50,12 +74,60 @@ class PolicyEvaluation(Resource):
     @api.doc('evaluate_policies')
     def post(self):
         """Evaluate travel data against user's policies"""
+        started = time.perf_counter()
         service = PolicyEvaluationService()
-        return service.evaluate_policies(
+        response = service.evaluate_policies(
             travel_data=api.payload['travel_data'],
             org_id=api.payload['org_id'],
-            user_id=api.payload['user_id']
+            user_id=api.payload['user_id'],
+            full_detail=api.payload.get('full_detail', True)
+        )
+        _record('evaluate', started, response)
+        return response
+
+batch_offer_model = api.model('BatchOffer', {
+    'id': fields.String(required=True, description='Caller offer ID, echoed in the result'),
+    'travel_data': fields.Nested(travel_data_model, required=True),
+})
+
+batch_request_model = api.model('PolicyBatchEvaluationRequest', {
+    'offers': fields.List(fields.Nested(batch_offer_model), required=True),
+    'org_id': fields.String(required=True, description='Organization UUID'),
+    'user_id': fields.String(required=True, description='User UUID'),
+    'full_detail': fields.Boolean(default=True, description='Evaluate every rule; set false to stop at the first decisive result'),
+})
+
+batch_result_model = api.model('PolicyBatchResult', {
+    'id': fields.String(description='Caller offer ID'),
+    'result': fields.String(description='Final evaluation result'),
+    'messages': fields.List(fields.String, description='Policy violation messages'),
+    'approvers': fields.List(fields.String, description='Required approver user IDs'),
+})
+
+batch_response_model = api.model('PolicyBatchEvaluationResponse', {
+    'policies_evaluated': fields.Integer(description='Number of policies evaluated per offer'),
+    'results': fields.List(fields.Nested(batch_result_model)),
+    'policies_stale': fields.Boolean(description='Policies were served from the last-known-good copy'),
+    'policies_as_of': fields.String(description='When the policies were last known to be current (ISO timestamp)'),
+})
+
+@api.route('/evaluate-batch')
+class PolicyBatchEvaluation(Resource):
+    @api.expect(batch_request_model)
+    @api.marshal_with(batch_response_model)
+    @api.doc('evaluate_policies_batch')
+    def post(self):
+        """Evaluate many offers against user's policies in one request"""
+        started = time.perf_counter()
+        service = PolicyEvaluationService()
+        response = service.evaluate_batch(
+            offers=api.payload['offers'],
+            org_id=api.payload['org_id'],
+            user_id=api.payload['user_id'],
+            full_detail=api.payload.get('full_detail', True)
         )
+        _record('evaluate-batch', started, response)
+        return response
 
 @api.route('/info')
 class PolicyInfo(Resource):
@@ -68,4 +140,85 @@ class PolicyInfo(Resource):
         user_id = api.parser().parse_args()['user_id']
         
         service = PolicyEvaluationService()
-        return service.get_policy_info(org_id, user_id)
\ No newline at end of file
+        return service.get_policy_info(org_id, user_id)
+
+@api.route('/envelope')
+class PolicyEnvelope(Resource):
+    @api.doc('get_policy_envelope')
+    @api.param('org_id', 'Organization UUID', required=True)
+    @api.param('user_id', 'User UUID', required=True)
+    def get(self):
+        """Get a compact constraint summary of the user's policies for pre-filtering search results"""
+        org_id = request.args.get('org_id')
+        user_id = request.args.get('user_id')
+        if not org_id or not user_id:
+            api.abort(400, "org_id and user_id are required")
+        
+        service = PolicyEvaluationService()
+        return service.get_policy_envelope(org_id, user_id)
+
+simulation_request_model = api.model('PolicySimulationRequest', {
+    'org_id': fields.String(required=True, description='Organization UUID'),
+    'draft_policies': fields.List(fields.Raw, required=True, description='Draft policies as snapshot policy data'),
+    'baseline': fields.String(default='current', enum=['current', 'recorded'],
+                              description='Compare with current active policies or the recorded results'),
+    'since': fields.String(description='Only requests created at or after this ISO timestamp'),
+    'until': fields.String(description='Only requests created before this ISO timestamp'),
+    'batch_size': fields.Integer(default=DEFAULT_BATCH_SIZE, description='Rows streamed per batch'),
+    'sample_size': fields.Integer(default=DEFAULT_SAMPLE_SIZE, description='Sample rows kept per transition'),
+})
+
+simulation_job_model = api.model('PolicySimulationJob', {
+    'id': fields.String(description='Job ID'),
+    'org_id': fields.String(description='Organization UUID'),
+    'status': fields.String(description='Job status', enum=['PENDING', 'RUNNING', 'COMPLETED', 'FAILED']),
+    'processed': fields.Integer(description='Rows simulated so far'),
+    'total': fields.Integer(description='Rows to simulate'),
+    'progress': fields.Float(description='Fraction of rows simulated'),
+    'result': fields.Raw(description='Aggregate diff with sample rows, once completed'),
+    'error': fields.String(description='Failure reason'),
+    'created_at': fields.String(description='Job creation time'),
+})
+
+def _parse_timestamp(value, field):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        api.abort(400, f"Invalid {field}: {value}")
+
+@api.route('/simulations')
+class PolicySimulations(Resource):
+    @api.expect(simulation_request_model)
+    @api.marshal_with(simulation_job_model, code=202)
+    @api.doc('start_policy_simulation')
+    def post(self):
+        """Start a what-if simulation of draft policies against historical approval requests"""
+        payload = api.payload
+        try:
+            validate_simulation_args(payload['org_id'], payload.get('baseline', 'current'))
+        except ValidationError as e:
+            api.abort(400, str(e))
+        job = SimulationJob.start(
+            current_app._get_current_object(),
+            payload['org_id'],
+            draft_policies=payload['draft_policies'],
+            baseline=payload.get('baseline', 'current'),
+            since=_parse_timestamp(payload.get('since'), 'since'),
+            until=_parse_timestamp(payload.get('until'), 'until'),
+            batch_size=payload.get('batch_size', DEFAULT_BATCH_SIZE),
+            sample_size=payload.get('sample_size', DEFAULT_SAMPLE_SIZE)
+        )
+        return job, 202
+
+@api.route('/simulations/<string:job_id>')
+class PolicySimulation(Resource):
+    @api.marshal_with(simulation_job_model)
+    @api.doc('get_policy_simulation')
+    def get(self, job_id):
+        """Get simulation progress and, once completed, its results"""
+        job = SimulationJob.get(job_id)
+        if not job:
+            api.abort(404, f"Simulation {job_id} not found")
+        return job
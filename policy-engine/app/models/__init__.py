@@ -4,6 +4,9 @@ from .policy_rule_exception import PolicyRuleException
 from .policy_approver import PolicyApprover
 from .user_policy_assignment import UserPolicyAssignment
 from .approval_request import ApprovalRequest
+from .policy_change import PolicySetVersion, PolicyChange
+from .policy_simulation import PolicySimulation
+from .user_organization import user_organizations
 
 __all__ = [
     'Policy',
@@ -11,5 +14,9 @@ __all__ = [
     'PolicyRuleException',
     'PolicyApprover',
     'UserPolicyAssignment',
-    'ApprovalRequest'
+    'ApprovalRequest',
+    'PolicySetVersion',
+    'PolicyChange',
+    'PolicySimulation',
+    'user_organizations'
 ]
\ No newline at end of file
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, String, Boolean, JSON, text
+from sqlalchemy import Column, String, Boolean, JSON, BigInteger, func, update
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 from sqlalchemy.orm import relationship
+from app import db
 from app.models.mixins import TimestampMixin, BaseModel
 
 class Policy(BaseModel, TimestampMixin):
@@ -17,9 +18,11 @@ class Policy(BaseModel, TimestampMixin):
     message_for_reservation = Column(JSON)
     exclude_restricted_fares = Column(Boolean, nullable=False, default=False)
     refundable_fares_enabled = Column(Boolean, nullable=False, default=False)
-    user_count = Column(String, default='0')  # Using String to match BigInt
-    guest_count = Column(String, default='0')
-    approver_count = Column(String, default='0')
+    # Aggregate counters maintained in the same transaction as the child rows
+    user_count = Column(BigInteger, nullable=False, default=0, server_default='0')
+    guest_count = Column(BigInteger, nullable=False, default=0, server_default='0')
+    approver_count = Column(BigInteger, nullable=False, default=0, server_default='0')
+    rule_count = Column(BigInteger, nullable=False, default=0, server_default='0')  # Active rules only
     
     # Relationships
     rules = relationship("PolicyRule", back_populates="policy", cascade="all, delete-orphan")
@@ -37,4 +40,58 @@ class Policy(BaseModel, TimestampMixin):
     @classmethod
     def find_active_policies(cls):
         """Find all active policies"""
-        return cls.query.filter_by(active=True).all()
\ No newline at end of file
+        return cls.query.filter_by(active=True).all()
+    
+    @classmethod
+    def adjust_counters(cls, policy_id, **deltas):
+        """
+        Atomically add deltas to aggregate counters, e.g. adjust_counters(id, user_count=1).
+        
+        Runs as a single UPDATE in the current transaction; does not commit.
+        """
+        values = {name: getattr(cls, name) + delta for name, delta in deltas.items() if delta}
+        if values:
+            db.session.execute(cls.__table__.update().where(cls.id == policy_id).values(**values))
+    
+    @classmethod
+    def recompute_counters(cls, org_id=None):
+        """
+        Repair user, approver and rule counters from the child tables with GROUP BY.
+        
+        guest_count has no backing table yet and is left untouched.
+        
+        Returns:
+            Number of policies whose counters were rewritten
+        """
+        from app.models.policy_rule import PolicyRule
+        from app.models.policy_approver import PolicyApprover
+        from app.models.user_policy_assignment import UserPolicyAssignment
+        
+        policy_query = db.session.query(cls.id)
+        if org_id is not None:
+            policy_query = policy_query.filter(cls.org_id == org_id)
+        policy_ids = [row.id for row in policy_query]
+        if not policy_ids:
+            return 0
+        
+        def grouped_counts(model, *criteria):
+            rows = db.session.query(model.policy_id, func.count(model.id)).filter(
+                model.policy_id.in_(policy_ids), *criteria
+            ).group_by(model.policy_id)
+            return dict(rows.all())
+        
+        user_counts = grouped_counts(UserPolicyAssignment)
+        approver_counts = grouped_counts(PolicyApprover)
+        rule_counts = grouped_counts(PolicyRule, PolicyRule.active == True)
+        
+        # ORM bulk UPDATE by primary key
+        db.session.execute(update(cls), [
+            {
+                'id': policy_id,
+                'user_count': user_counts.get(policy_id, 0),
+                'approver_count': approver_counts.get(policy_id, 0),
+                'rule_count': rule_counts.get(policy_id, 0),
+            }
+            for policy_id in policy_ids
+        ])
+        return len(policy_ids)
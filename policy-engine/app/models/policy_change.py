@@ -0,0 +1,139 @@
+"""Per-organization policy set versions and the log of changes between them"""
+
+from datetime import datetime
+import uuid
+from sqlalchemy import Column, String, BigInteger, DateTime, Index, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import UUID
+from app import db
+from app.models.mixins import TimestampMixin, BaseModel
+
+UPSERT = 'upsert'
+DELETE = 'delete'
+
+
+def _upsert(connection, table):
+    """
+    Build a dialect-specific INSERT that supports ON CONFLICT DO UPDATE,
+    or None on dialects without one (bump then locks the row and updates it)
+    """
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(table)
+
+class PolicySetVersion(BaseModel, TimestampMixin):
+    __tablename__ = 'policy_set_versions'
+    
+    org_id = Column(UUID(as_uuid=True), primary_key=True)
+    # Bumped in the same transaction as any change to the org's policies,
+    # rules, exceptions, approvers or assignments
+    version = Column(BigInteger, nullable=False, default=0, server_default='0')
+    # Changes up to this version have been pruned from policy_changes
+    pruned_version = Column(BigInteger, nullable=False, default=0, server_default='0')
+    
+    def __repr__(self):
+        return f'<PolicySetVersion org_id={self.org_id} version={self.version}>'
+    
+    @classmethod
+    def bump(cls, connection, org_id):
+        """
+        Increment the org's version with a single upsert and return the new value.
+        
+        The row stays locked until the transaction ends, so concurrent writers to
+        the same org commit their versions in order. Does not commit.
+        """
+        table = cls.__table__
+        now = datetime.utcnow()
+        insert = _upsert(connection, table)
+        if insert is None:
+            return cls._bump_locked(connection, org_id, now)
+        stmt = insert.values(
+            org_id=org_id, version=1, pruned_version=0, created_at=now, updated_at=now
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['org_id'],
+            set_={'version': table.c.version + 1, 'updated_at': now}
+        ).returning(table.c.version)
+        return connection.execute(stmt).scalar_one()
+    
+    @classmethod
+    def _bump_locked(cls, connection, org_id, now):
+        """Increment the org's version with SELECT ... FOR UPDATE, then UPDATE or INSERT"""
+        table = cls.__table__
+        current = connection.execute(
+            select(table.c.version).where(table.c.org_id == org_id).with_for_update()
+        ).scalar_one_or_none()
+        if current is None:
+            try:
+                # In a savepoint, so losing the race to create the row only undoes this insert
+                with connection.begin_nested():
+                    connection.execute(table.insert().values(
+                        org_id=org_id, version=1, pruned_version=0, created_at=now, updated_at=now
+                    ))
+                return 1
+            except IntegrityError:
+                current = connection.execute(
+                    select(table.c.version).where(table.c.org_id == org_id).with_for_update()
+                ).scalar_one()
+        connection.execute(
+            table.update().where(table.c.org_id == org_id).values(version=current + 1, updated_at=now)
+        )
+        return current + 1
+    
+    @classmethod
+    def versions(cls, org_ids=None):
+        """Current version of every org (or the given ones) that has changed since versioning began"""
+        stmt = select(cls.org_id, cls.version)
+        if org_ids is not None:
+            stmt = stmt.where(cls.org_id.in_(list(org_ids)))
+        return {str(org_id): version for org_id, version in db.session.execute(stmt)}
+
+class PolicyChange(BaseModel):
+    __tablename__ = 'policy_changes'
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    org_id = Column(UUID(as_uuid=True), nullable=False)
+    version = Column(BigInteger, nullable=False)  # Org policy set version the change was made in
+    entity = Column(String(32), nullable=False)  # policy, rule, exception, approver, assignment
+    entity_id = Column(UUID(as_uuid=True), nullable=False)
+    policy_id = Column(UUID(as_uuid=True))  # Policy the changed row belongs to
+    operation = Column(String(16), nullable=False)  # upsert, or delete (a tombstone)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('idx_policy_changes_org_version', 'org_id', 'version'),
+    )
+    
+    def __repr__(self):
+        return f'<PolicyChange {self.operation} {self.entity} {self.entity_id} v{self.version}>'
+    
+    @classmethod
+    def find_since(cls, org_id, version):
+        """Changes to an org after the given version, oldest first"""
+        return cls.query.filter(cls.org_id == org_id, cls.version > version).order_by(cls.version).all()
+    
+    @classmethod
+    def prune(cls, before):
+        """
+        Delete changes logged before a time, recording per org the newest version removed.
+        
+        Consumers older than an org's pruned_version must reload it in full. Does not commit.
+        
+        Returns:
+            Number of changes deleted
+        """
+        pruned = db.session.execute(
+            select(cls.org_id, func.max(cls.version)).where(cls.created_at < before).group_by(cls.org_id)
+        ).all()
+        for org_id, version in pruned:
+            db.session.execute(
+                PolicySetVersion.__table__.update()
+                .where(PolicySetVersion.org_id == org_id, PolicySetVersion.pruned_version < version)
+                .values(pruned_version=version)
+            )
+        return db.session.execute(cls.__table__.delete().where(cls.created_at < before)).rowcount
@@ -0,0 +1,42 @@
+"""What-if simulation jobs, stored so any worker can report on them"""
+
+import uuid
+from sqlalchemy import Column, String, Integer, JSON, Text
+from sqlalchemy.dialects.postgresql import UUID
+from app.models.mixins import TimestampMixin, BaseModel
+
+PENDING = 'PENDING'
+RUNNING = 'RUNNING'
+COMPLETED = 'COMPLETED'
+FAILED = 'FAILED'
+
+class PolicySimulation(BaseModel, TimestampMixin):
+    __tablename__ = 'policy_simulations'
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    org_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    status = Column(String(16), nullable=False, default=PENDING)
+    processed = Column(Integer, nullable=False, default=0)
+    total = Column(Integer)
+    result = Column(JSON)  # Aggregate diff with sample rows, once completed
+    error = Column(Text)
+    
+    def __repr__(self):
+        return f'<PolicySimulation {self.id} {self.status}>'
+    
+    @property
+    def finished(self):
+        return self.status in (COMPLETED, FAILED)
+    
+    def to_dict(self):
+        return {
+            'id': str(self.id),
+            'org_id': str(self.org_id),
+            'status': self.status,
+            'processed': self.processed,
+            'total': self.total,
+            'progress': round(self.processed / self.total, 4) if self.total else None,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat()
+        }
@@ -0,0 +1,27 @@
+"""Organization membership table owned by the main application (Supabase)"""
+
+from sqlalchemy import MetaData, Table, Column, String
+from sqlalchemy.dialects.postgresql import UUID
+from app import db
+
+# Tables owned by the main application. They live outside db.metadata so
+# db.create_all() and migrations never create or drop them.
+external_metadata = MetaData()
+
+# Read-only from the policy engine's point of view; only used to resolve
+# "all users in org X" for bulk policy assignment.
+user_organizations = Table(
+    'user_organizations',
+    external_metadata,
+    Column('user_id', UUID(as_uuid=True), nullable=False, index=True),
+    Column('org_id', UUID(as_uuid=True), nullable=False, index=True),
+    Column('role', String(32)),
+)
+
+
+def find_org_user_ids(org_id):
+    """Return the user IDs of every member of an organization"""
+    rows = db.session.execute(
+        db.select(user_organizations.c.user_id).where(user_organizations.c.org_id == org_id)
+    )
+    return [row.user_id for row in rows]
@@ -1,8 +1,31 @@
-from sqlalchemy import Column, ForeignKey, text, UniqueConstraint
+from datetime import datetime
+import uuid
+from sqlalchemy import Column, ForeignKey, text, UniqueConstraint, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
+from app import db
 from app.models.mixins import TimestampMixin, BaseModel
 
+# Rows per INSERT/DELETE statement for bulk operations. Each assignment row
+# binds six parameters, which keeps a chunk well under driver limits.
+BULK_CHUNK_SIZE = 1000
+
+
+def _insert_on_conflict_do_nothing(table):
+    """
+    Build a dialect-specific INSERT that supports ON CONFLICT DO NOTHING,
+    or None on dialects without one (bulk_assign then selects before inserting)
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(table)
+
+
 class UserPolicyAssignment(BaseModel, TimestampMixin):
     __tablename__ = 'user_policy_assignments'
     
@@ -39,4 +62,81 @@ class UserPolicyAssignment(BaseModel, TimestampMixin):
         return cls.query.join(Policy).filter(
             cls.user_id == user_id,
             Policy.active == True
-        ).all()
\ No newline at end of file
+        ).all()
+    
+    @classmethod
+    def count_by_policy_id(cls, policy_id):
+        """Count user assignments for a policy without loading them"""
+        return db.session.query(func.count(cls.id)).filter(cls.policy_id == policy_id).scalar()
+    
+    @classmethod
+    def bulk_assign(cls, policy_id, user_ids, assigned_by=None, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Assign a policy to many users with chunked INSERT ... ON CONFLICT DO NOTHING.
+        On other dialects each chunk selects the existing assignments and inserts the rest.
+        
+        Does not commit; the caller owns the transaction.
+        
+        Returns:
+            IDs of the newly created assignments (existing ones are skipped)
+        """
+        inserted = []
+        now = datetime.utcnow()
+        for start in range(0, len(user_ids), chunk_size):
+            rows = [
+                {
+                    'id': uuid.uuid4(),
+                    'user_id': user_id,
+                    'policy_id': policy_id,
+                    'assigned_by': assigned_by,
+                    'created_at': now,
+                    'updated_at': now,
+                }
+                for user_id in user_ids[start:start + chunk_size]
+            ]
+            insert = _insert_on_conflict_do_nothing(cls.__table__)
+            if insert is None:
+                inserted.extend(cls._insert_missing(policy_id, rows))
+                continue
+            stmt = insert.values(rows).on_conflict_do_nothing(
+                index_elements=['user_id', 'policy_id']
+            ).returning(cls.id)
+            inserted.extend(db.session.execute(stmt).scalars())
+        return inserted
+    
+    @classmethod
+    def _insert_missing(cls, policy_id, rows):
+        """Insert the rows whose user isn't assigned yet; returns their IDs"""
+        existing = set(db.session.execute(
+            db.select(cls.user_id).where(
+                cls.policy_id == policy_id,
+                cls.user_id.in_([row['user_id'] for row in rows])
+            )
+        ).scalars())
+        missing = []
+        for row in rows:
+            if row['user_id'] not in existing:
+                existing.add(row['user_id'])
+                missing.append(row)
+        if missing:
+            db.session.execute(cls.__table__.insert(), missing)
+        return [row['id'] for row in missing]
+    
+    @classmethod
+    def bulk_unassign(cls, policy_id, user_ids, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Remove a policy from many users in chunked DELETE statements.
+        
+        Does not commit; the caller owns the transaction.
+        
+        Returns:
+            IDs of the assignments removed
+        """
+        removed = []
+        for start in range(0, len(user_ids), chunk_size):
+            stmt = cls.__table__.delete().where(
+                cls.policy_id == policy_id,
+                cls.user_id.in_(user_ids[start:start + chunk_size])
+            ).returning(cls.id)
+            removed.extend(db.session.execute(stmt).scalars())
+        return removed
\ No newline at end of file
@@ -0,0 +1,257 @@
+"""Replay of recorded evaluation traffic against one or two engine versions
+
+Recordings come from app.utils.evaluation_recorder. Each recorded request is
+sent to a target (a running engine over HTTP, the app in-process, or snapshot
+files through the embedded evaluator) at a fixed rate or as fast as the
+concurrency allows, and its results are diffed against either the recorded
+results or a second target. The report holds latency percentiles per target,
+result transitions and a sample of differing requests.
+"""
+
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import glob
+import json
+import os
+import statistics
+import threading
+import time
+
+DEFAULT_SAMPLE_SIZE = 20
+
+# A target evaluates one recording and returns the final result per offer
+Target = Callable[[Dict[str, Any]], List[str]]
+
+
+def recording_files(path: str) -> List[str]:
+    """Recording files under path, each file's rotated backups (oldest first) before it"""
+    if not os.path.isdir(path):
+        return [path]
+    
+    def order(name):
+        base, _, suffix = os.path.basename(name).partition('.ndjson')
+        backup = int(suffix[1:]) if suffix[1:].isdigit() else 0
+        return base, -backup
+    
+    return sorted(glob.glob(os.path.join(path, 'evaluations*.ndjson*')), key=order)
+
+
+def read_recordings(paths: Iterable[str], endpoint: Optional[str] = None,
+                    org_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    for path in paths:
+        for file_path in recording_files(path):
+            with open(file_path) as recording_file:
+                for line in recording_file:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if endpoint and record.get('endpoint') != endpoint:
+                        continue
+                    if org_id and record.get('org_id') != org_id:
+                        continue
+                    yield record
+
+
+def _request_body(record: Dict[str, Any]) -> Dict[str, Any]:
+    body = {
+        'org_id': record['org_id'],
+        'user_id': record.get('user_id') or 'replay',
+        'full_detail': record.get('full_detail', True),
+    }
+    if record.get('endpoint') == 'evaluate-batch':
+        body['offers'] = record['offers']
+    else:
+        body['travel_data'] = record['travel_data']
+    return body
+
+
+def recorded_target(record: Dict[str, Any]) -> List[str]:
+    """The results as recorded, for diffing a replay against production"""
+    return record['results']
+
+
+def http_target(base_url: str, timeout: float = 30.0) -> Target:
+    """Replay against a running engine, e.g. http://localhost:5000"""
+    import requests
+    
+    local = threading.local()
+    prefix = base_url.rstrip('/') + '/api/v1/policy-evaluation/'
+    
+    def evaluate(record):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        response = session.post(prefix + record.get('endpoint', 'evaluate'), json=_request_body(record), timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
+        if 'results' in data:
+            return [item['result'] for item in data['results']]
+        return [data['result']]
+    
+    return evaluate
+
+
+def in_process_target(app) -> Target:
+    """Replay through PolicyEvaluationService against the app's database"""
+    from app import db
+    from app.services.evaluation_service import PolicyEvaluationService
+    
+    def evaluate(record):
+        body = _request_body(record)
+        with app.app_context():
+            try:
+                service = PolicyEvaluationService()
+                if 'offers' in body:
+                    response = service.evaluate_batch(body['offers'], body['org_id'], body['user_id'], body['full_detail'])
+                    return [item['result'] for item in response['results']]
+                response = service.evaluate_policies(body['travel_data'], body['org_id'], body['user_id'], body['full_detail'])
+                return [response['result']]
+            finally:
+                db.session.remove()
+    
+    return evaluate
+
+
+def snapshot_target(compiled_sets) -> Target:
+    """Replay through the embedded evaluator against compiled snapshots, keyed by org"""
+    from app.services.evaluator import PolicyEvaluator
+    
+    evaluator = PolicyEvaluator()
+    by_org = {str(compiled.org_id): compiled for compiled in compiled_sets}
+    
+    def evaluate(record):
+        compiled = by_org.get(str(record['org_id']))
+        if compiled is None:
+            raise KeyError(f"No snapshot for org {record['org_id']}")
+        body = _request_body(record)
+        offers = body['offers'] if 'offers' in body else [{'travel_data': body['travel_data']}]
+        return [
+            evaluator.evaluate(offer['travel_data'], compiled, body['user_id'], body['full_detail'])['result']
+            for offer in offers
+        ]
+    
+    return evaluate
+
+
+def _percentiles(samples_ms: List[float]) -> Dict[str, Any]:
+    if not samples_ms:
+        return {'count': 0}
+    ordered = sorted(samples_ms)
+    
+    def at(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 2)
+    
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered), 2),
+        'p50_ms': at(0.50),
+        'p90_ms': at(0.90),
+        'p99_ms': at(0.99),
+        'max_ms': round(ordered[-1], 2)
+    }
+
+
+class ReplayReport:
+    """Thread-safe accumulator of latencies, errors and result diffs"""
+    
+    def __init__(self, sample_size: int = DEFAULT_SAMPLE_SIZE):
+        self.sample_size = sample_size
+        self.lock = threading.Lock()
+        self.latencies = {'target': [], 'compare': []}
+        self.errors = Counter()
+        self.requests = 0
+        self.offers = 0
+        self.differing_offers = 0
+        self.transitions = Counter()
+        self.samples = []
+    
+    def add(self, record, index, target_results, compare_results, latencies, errors):
+        with self.lock:
+            self.requests += 1
+            for name, latency in latencies.items():
+                self.latencies[name].append(latency)
+            for name, error in errors.items():
+                self.errors[f'{name}: {type(error).__name__}'] += 1
+            if errors:
+                return
+            self.offers += len(target_results)
+            changed = []
+            for position, (expected, actual) in enumerate(zip(compare_results, target_results)):
+                if expected != actual:
+                    self.differing_offers += 1
+                    self.transitions[f'{expected} -> {actual}'] += 1
+                    changed.append({'position': position, 'compare': expected, 'target': actual})
+            if changed and len(self.samples) < self.sample_size:
+                self.samples.append({
+                    'index': index,
+                    'endpoint': record.get('endpoint'),
+                    'org_id': record.get('org_id'),
+                    'recorded_at': record.get('recorded_at'),
+                    'changes': changed
+                })
+    
+    def to_dict(self, seconds: float) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'offers': self.offers,
+            'seconds': round(seconds, 2),
+            'requests_per_second': round(self.requests / seconds, 2) if seconds else None,
+            'errors': dict(self.errors),
+            'latency': {name: _percentiles(samples) for name, samples in self.latencies.items() if samples},
+            'differing_offers': self.differing_offers,
+            'transitions': dict(self.transitions.most_common()),
+            'samples': self.samples
+        }
+
+
+def replay(records: Iterable[Dict[str, Any]], target: Target, compare: Target = recorded_target,
+           rate: Optional[float] = None, concurrency: int = 1, limit: Optional[int] = None,
+           sample_size: int = DEFAULT_SAMPLE_SIZE) -> Dict[str, Any]:
+    """Replay records against target and diff with compare (the recorded results by default)
+    
+    With rate set, requests start on a fixed schedule of rate per second
+    (open loop, so a slow target queues up rather than slowing the replay);
+    otherwise they run back to back on concurrency threads.
+    """
+    report = ReplayReport(sample_size)
+    
+    def timed(name, function, record, latencies, errors):
+        start = time.perf_counter()
+        try:
+            return function(record)
+        except Exception as e:
+            errors[name] = e
+            return None
+        finally:
+            if function is not recorded_target:
+                latencies[name] = (time.perf_counter() - start) * 1000
+    
+    # Back-to-back replays keep at most two requests per thread queued, so a
+    # long recording is streamed rather than read into the executor up front
+    in_flight = None if rate else threading.BoundedSemaphore(max(1, concurrency) * 2)
+    
+    def run_one(index, record):
+        try:
+            latencies, errors = {}, {}
+            target_results = timed('target', target, record, latencies, errors)
+            compare_results = timed('compare', compare, record, latencies, errors)
+            report.add(record, index, target_results, compare_results, latencies, errors)
+        finally:
+            if in_flight is not None:
+                in_flight.release()
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for index, record in enumerate(records):
+            if limit is not None and index >= limit:
+                break
+            if rate:
+                delay = start + index / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                in_flight.acquire()
+            executor.submit(run_one, index, record)
+    
+    return report.to_dict(time.perf_counter() - start)
@@ -1,84 +1,125 @@
 """Policy evaluation service - core engine for evaluating travel against policies"""
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any
+from datetime import datetime, timezone
 from uuid import UUID
-from datetime import datetime, timedelta
 import logging
 
+from flask import current_app
+from sqlalchemy.orm import selectinload
+
 from app.models.policy import Policy
-from app.models.user_policy_assignment import UserPolicyAssignment
-from app.services.rule_engine import PolicyContext, RuleRegistry
-from app.utils.exceptions import PolicyEvaluationError
+from app.models.policy_rule import PolicyRule
+from app.services.evaluator import PolicyEvaluator
+from app.services.policy_compiler import CompiledPolicySet
+from app.services.policy_changes import PolicyChangeService
+from app.services.policy_envelope import build_policy_envelope
+from app.services.policy_snapshot import build_snapshot
+from app.utils.exceptions import DatabaseUnavailableError, PolicyEvaluationError
 from app.utils.currency import CurrencyConverter
 
 logger = logging.getLogger(__name__)
 
-class PolicyEvaluationService:
-    """Service for evaluating travel data against policies"""
+class PolicyEvaluationService(PolicyEvaluator):
+    """Service for evaluating travel data against policies stored in the database"""
     
-    def __init__(self):
-        self.rule_registry = RuleRegistry()
-        self.currency_converter = CurrencyConverter()
+    def __init__(self, dedupe_predicates: bool = True):
+        super().__init__(currency_converter=CurrencyConverter(), dedupe_predicates=dedupe_predicates)
     
-    def evaluate_policies(self, travel_data: Dict[str, Any], org_id: str, user_id: str) -> Dict[str, Any]:
+    def evaluate_policies(self, travel_data: Dict[str, Any], org_id: str, user_id: str,
+                          full_detail: bool = True) -> Dict[str, Any]:
         """
         Evaluate travel data against user's policies
         
+        With full_detail=False, rules run in cost order and evaluation stops as
+        soon as the final result can no longer become more restrictive. Details,
+        messages and approvers then only cover the policies actually evaluated.
+        
         Returns:
             {
                 'result': 'HIDDEN|BOOKING_BLOCKED|APPROVAL_REQUIRED|OUT_OF_POLICY|IN_POLICY|NOT_SPECIFIED',
                 'policies_evaluated': int,
+                'full_detail': bool,
                 'details': [...],
                 'messages': [...],
-                'approvers': [...]
+                'approvers': [...],
+                'policies_stale': bool, True when served from last-known-good policies,
+                'policies_as_of': ISO timestamp the policies were last known to be current
             }
         """
         try:
             logger.info(f"Evaluating policies for user {user_id} in org {org_id}")
             
-            # Create evaluation context
-            context = PolicyContext(travel_data, org_id, user_id, self.currency_converter)
-            
             # Get applicable policies for the user
-            policies = self._get_user_policies(user_id, org_id)
+            compiled = self._get_compiled_policies(user_id, org_id)
             
-            if not policies:
+            if not len(compiled):
                 logger.info(f"No policies found for user {user_id}")
-                return {
+                result = {
                     'result': 'NOT_SPECIFIED',
                     'policies_evaluated': 0,
+                    'full_detail': full_detail,
                     'details': [],
                     'messages': [],
                     'approvers': []
                 }
+            else:
+                result = self.evaluate(travel_data, compiled, user_id, full_detail)
+            result.update(self._policy_freshness(org_id))
+            return result
             
-            # Evaluate each policy
-            policy_results = []
-            for policy in policies:
-                result = self._evaluate_policy(context, policy)
-                policy_results.append(result)
-            
-            # Combine results (most restrictive wins)
-            final_result = self._combine_policy_results(policy_results)
-            
-            # Collect messages and approvers
-            messages = self._collect_messages(policy_results, travel_data)
-            approvers = self._collect_approvers(policy_results)
-            
-            logger.info(f"Policy evaluation complete. Result: {final_result}")
-            
-            return {
-                'result': final_result,
-                'policies_evaluated': len(policies),
-                'details': policy_results,
-                'messages': messages,
-                'approvers': approvers
-            }
-            
+        except (PolicyEvaluationError, DatabaseUnavailableError):
+            raise
         except Exception as e:
             logger.error(f"Policy evaluation failed: {e}")
             raise PolicyEvaluationError(f"Policy evaluation failed: {str(e)}")
     
+    def evaluate_batch(self, offers: List[Dict[str, Any]], org_id: str, user_id: str,
+                       full_detail: bool = True) -> Dict[str, Any]:
+        """
+        Evaluate many offers against the user's policies with a single policy load
+        
+        Each offer is {'id': ..., 'travel_data': {...}}. Per-policy details are
+        left out to keep the response small.
+        
+        Returns:
+            {
+                'policies_evaluated': int,
+                'results': [{'id', 'result', 'messages', 'approvers'}, ...],
+                'policies_stale': bool,
+                'policies_as_of': ISO timestamp
+            }
+        """
+        try:
+            logger.info(f"Evaluating {len(offers)} offers for user {user_id} in org {org_id}")
+            
+            compiled = self._get_compiled_policies(user_id, org_id)
+            
+            results = []
+            for offer in offers:
+                if len(compiled):
+                    evaluation = self.evaluate(offer['travel_data'], compiled, user_id, full_detail)
+                else:
+                    evaluation = {'result': 'NOT_SPECIFIED', 'messages': [], 'approvers': []}
+                results.append({
+                    'id': offer.get('id'),
+                    'result': evaluation['result'],
+                    'messages': evaluation['messages'],
+                    'approvers': evaluation['approvers']
+                })
+                
+            return {
+                'policies_evaluated': len(compiled),
+                'results': results,
+                **self._policy_freshness(org_id)
+            }
+            
+        except (PolicyEvaluationError, DatabaseUnavailableError):
+            raise
+        except Exception as e:
+            logger.error(f"Batch policy evaluation failed: {e}")
+            raise PolicyEvaluationError(f"Batch policy evaluation failed: {str(e)}")
+            
     def get_policy_info(self, org_id: str, user_id: str) -> Dict[str, Any]:
         """Get policy information for travel searches (without evaluation)"""
         try:
@@ -91,7 +132,7 @@ class PolicyEvaluationService:
                     'label': policy.label,
                     'type': policy.type,
                     'enforce_approval': policy.enforce_approval,
-                    'rules_count': len(policy.rules)
+                    'rules_count': policy.rule_count
                 }
                 policy_info.append(info)
             
@@ -106,6 +147,43 @@ class PolicyEvaluationService:
             logger.error(f"Failed to get policy info: {e}")
             raise PolicyEvaluationError(f"Failed to get policy info: {str(e)}")
     
+    def get_policy_envelope(self, org_id: str, user_id: str) -> Dict[str, Any]:
+        """Get a compact constraint summary of the user's policies for pre-filtering offers"""
+        try:
+            compiled = self._get_compiled_policies(user_id, org_id)
+            envelope = build_policy_envelope(compiled)
+            envelope['user_id'] = user_id
+            envelope.update(self._policy_freshness(org_id))
+            return envelope
+            
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to build policy envelope: {e}")
+            raise PolicyEvaluationError(f"Failed to build policy envelope: {str(e)}")
+    
+    def export_snapshot(self, org_id: str) -> Dict[str, Any]:
+        """Export the org's active policies as a snapshot for embedded evaluation"""
+        # Read before the policies, so changes racing the export are fetched again rather than missed
+        version = PolicyChangeService.get_version(org_id)
+        return build_snapshot(org_id, self._get_user_policies(None, org_id), version)
+    
+    def _get_compiled_policies(self, user_id: str, org_id: str) -> CompiledPolicySet:
+        """The user's compiled policies, from the app's policy cache when it has one"""
+        cache = current_app.extensions.get('policy_cache')
+        if cache is not None:
+            return cache.get(org_id)
+        return CompiledPolicySet.from_policies(org_id, self._get_user_policies(user_id, org_id), self.rule_registry)
+    
+    def _policy_freshness(self, org_id: str) -> Dict[str, Any]:
+        """Staleness of the policies just used for org_id"""
+        cache = current_app.extensions.get('policy_cache')
+        if cache is None:
+            # Loaded from the database for this request
+            return {'policies_stale': False, 'policies_as_of': datetime.now(timezone.utc).isoformat()}
+        freshness = cache.freshness(org_id)
+        return {'policies_stale': freshness['stale'], 'policies_as_of': freshness['as_of']}
+    
     def _get_user_policies(self, user_id: str, org_id: str) -> List[Policy]:
         """Get all active policies assigned to a user in an organization"""
         try:
@@ -113,8 +191,12 @@ class PolicyEvaluationService:
             # since user assignments may not be set up yet
             org_uuid = UUID(org_id)
             
-            # Get all active policies for the organization
-            policies = Policy.query.filter(
+            # Get all active policies for the organization, with rules,
+            # exceptions and approvers loaded up front for compilation
+            policies = Policy.query.options(
+                selectinload(Policy.rules).selectinload(PolicyRule.exceptions),
+                selectinload(Policy.approvers)
+            ).filter(
                 Policy.org_id == org_uuid,
                 Policy.active == True
             ).all()
@@ -122,183 +204,4 @@ class PolicyEvaluationService:
             return policies
             
         except ValueError as e:
-            raise PolicyEvaluationError(f"Invalid UUID: {e}")
-    
-    def _evaluate_policy(self, context: PolicyContext, policy: Policy) -> Dict[str, Any]:
-        """Evaluate a single policy against travel data"""
-        logger.debug(f"Evaluating policy: {policy.label}")
-        
-        rule_results = []
-        policy_violated = False
-        
-        for rule in policy.rules:
-            if not rule.active:
-                continue
-            
-            logger.debug(f"Evaluating rule: {rule.code}")
-            
-            # Get rule specification
-            rule_spec = self.rule_registry.get_rule_spec(rule.code)
-            if not rule_spec:
-                logger.warning(f"Unknown rule specification: {rule.code}")
-                continue
-            
-            # Apply the rule
-            try:
-                rule_result = rule_spec.apply(context, rule.vars or {})
-                logger.debug(f"Rule {rule.code} result: {rule_result}")
-                
-                # Check exceptions if rule failed
-                if rule_result is False:
-                    for exception in rule.exceptions:
-                        if not exception.active:
-                            continue
-                        
-                        exc_spec = self.rule_registry.get_rule_spec(exception.code)
-                        if exc_spec:
-                            exc_result = exc_spec.apply(context, exception.vars or {})
-                            if exc_result is True:
-                                logger.debug(f"Exception {exception.code} applied, overriding rule failure")
-                                rule_result = True
-                                break
-                
-                rule_results.append({
-                    'rule_id': str(rule.id),
-                    'rule_code': rule.code,
-                    'result': rule_result,
-                    'action': rule.action,
-                    'vars': rule.vars
-                })
-                
-                # If any rule fails, mark policy as violated
-                if rule_result is False:
-                    policy_violated = True
-                
-            except Exception as e:
-                logger.error(f"Error evaluating rule {rule.code}: {e}")
-                rule_results.append({
-                    'rule_id': str(rule.id),
-                    'rule_code': rule.code,
-                    'result': None,
-                    'action': rule.action,
-                    'error': str(e)
-                })
-        
-        # Determine policy result
-        if policy_violated:
-            policy_result = self._map_action_to_result(policy.action)
-        elif policy.enforce_approval:
-            policy_result = 'APPROVAL_REQUIRED'
-        else:
-            policy_result = 'IN_POLICY'
-        
-        return {
-            'policy_id': str(policy.id),
-            'policy_label': policy.label,
-            'policy_type': policy.type,
-            'result': policy_result,
-            'rule_results': rule_results,
-            'enforce_approval': policy.enforce_approval,
-            'message_for_reservation': policy.message_for_reservation
-        }
-    
-    def _combine_policy_results(self, policy_results: List[Dict[str, Any]]) -> str:
-        """
-        Combine multiple policy results into final result
-        Priority (most to least restrictive): HIDDEN > BOOKING_BLOCKED > APPROVAL_REQUIRED > OUT_OF_POLICY > IN_POLICY
-        """
-        if not policy_results:
-            return 'NOT_SPECIFIED'
-        
-        result_priority = {
-            'HIDDEN': 5,
-            'BOOKING_BLOCKED': 4,
-            'APPROVAL_REQUIRED': 3,
-            'OUT_OF_POLICY': 2,
-            'IN_POLICY': 1,
-            'NOT_SPECIFIED': 0
-        }
-        
-        max_priority = 0
-        final_result = 'IN_POLICY'
-        
-        for policy_result in policy_results:
-            result = policy_result.get('result', 'NOT_SPECIFIED')
-            priority = result_priority.get(result, 0)
-            
-            if priority > max_priority:
-                max_priority = priority
-                final_result = result
-        
-        return final_result
-    
-    def _map_action_to_result(self, action: str) -> str:
-        """Map policy action to evaluation result"""
-        mapping = {
-            'HIDE': 'HIDDEN',
-            'BLOCK': 'BOOKING_BLOCKED',
-            'APPROVE': 'APPROVAL_REQUIRED',
-            'OUT_OF_POLICY': 'OUT_OF_POLICY'
-        }
-        return mapping.get(action, 'OUT_OF_POLICY')
-    
-    def _collect_messages(self, policy_results: List[Dict[str, Any]], travel_data: Dict[str, Any]) -> List[str]:
-        """Collect policy violation messages"""
-        messages = []
-        
-        for policy_result in policy_results:
-            if policy_result['result'] in ['HIDDEN', 'BOOKING_BLOCKED', 'APPROVAL_REQUIRED', 'OUT_OF_POLICY']:
-                
-                # Check for custom messages
-                custom_messages = policy_result.get('message_for_reservation')
-                if custom_messages and isinstance(custom_messages, dict):
-                    # Try to get message for travel type
-                    travel_type = self._determine_travel_type(travel_data)
-                    message = custom_messages.get(travel_type) or custom_messages.get('default')
-                    if message:
-                        messages.append(message)
-                        continue
-                
-                # Default message
-                policy_label = policy_result['policy_label']
-                result = policy_result['result']
-                
-                if result == 'APPROVAL_REQUIRED':
-                    messages.append(f"Approval required due to policy: {policy_label}")
-                elif result == 'OUT_OF_POLICY':
-                    messages.append(f"This booking is out of policy: {policy_label}")
-                elif result == 'BOOKING_BLOCKED':
-                    messages.append(f"Booking blocked by policy: {policy_label}")
-        
-        return messages
-    
-    def _collect_approvers(self, policy_results: List[Dict[str, Any]]) -> List[str]:
-        """Collect required approvers for policies that need approval"""
-        approvers = []
-        
-        for policy_result in policy_results:
-            if policy_result['result'] == 'APPROVAL_REQUIRED':
-                policy_id = policy_result['policy_id']
-                
-                # Get approvers for this policy
-                from app.models.policy_approver import PolicyApprover
-                policy_approvers = PolicyApprover.find_by_policy_id(UUID(policy_id))
-                
-                for approver in policy_approvers:
-                    if str(approver.user_id) not in approvers:
-                        approvers.append(str(approver.user_id))
-        
-        return approvers
-    
-    def _determine_travel_type(self, travel_data: Dict[str, Any]) -> str:
-        """Determine travel type from travel data"""
-        if 'train' in travel_data:
-            return 'train'
-        elif 'flight' in travel_data:
-            return 'flight'
-        elif 'hotel' in travel_data:
-            return 'hotel'
-        elif 'car' in travel_data:
-            return 'car'
-        else:
-            return 'default'
\ No newline at end of file
+            raise PolicyEvaluationError(f"Invalid UUID: {e}")
\ No newline at end of file
@@ -0,0 +1,270 @@
+"""Policy evaluator - pure in-process evaluation of compiled policy sets
+
+Needs no Flask app context and no database: policy sets are compiled from
+plain data or a snapshot (see policy_snapshot) and evaluation is a function
+call. PolicyEvaluationService wraps the same core for the HTTP API.
+"""
+
+from typing import List, Dict, Any, Optional
+import logging
+
+from app.services.rule_engine import PolicyContext, RuleRegistry
+from app.services.policy_compiler import (
+    CompiledPolicy, CompiledPolicySet, RESULT_PRIORITY, map_action_to_result
+)
+from app.utils.exceptions import PolicyEvaluationError
+from app.utils.currency import StaticCurrencyConverter
+
+logger = logging.getLogger(__name__)
+
+class PolicyEvaluator:
+    """Evaluates travel data against compiled policy sets"""
+    
+    def __init__(self, rule_registry: Optional[RuleRegistry] = None, currency_converter=None,
+                 dedupe_predicates: bool = True):
+        self.rule_registry = rule_registry or RuleRegistry()
+        # Fixed rates by default so evaluation never waits on the network
+        self.currency_converter = currency_converter or StaticCurrencyConverter()
+        # Evaluate identical (code, vars) predicates once per offer
+        self.dedupe_predicates = dedupe_predicates
+    
+    def compile(self, org_id: str, policies_data: List[Dict[str, Any]]) -> CompiledPolicySet:
+        """Compile policies supplied as plain data (see policy_compiler.policy_to_data)"""
+        return CompiledPolicySet.from_data(org_id, policies_data, self.rule_registry)
+    
+    def apply_changes(self, compiled: CompiledPolicySet, changes: Dict[str, Any]) -> CompiledPolicySet:
+        """Bring a compiled set up to date with the result of PolicyChangeService.get_changes"""
+        if changes.get('full_reload'):
+            return self.compile(compiled.org_id, changes['policies'])
+        return compiled.with_changes(changes['policies'], changes['removed_policy_ids'], self.rule_registry)
+    
+    def evaluate(self, travel_data: Dict[str, Any], compiled: CompiledPolicySet, user_id: str,
+                 full_detail: bool = True) -> Dict[str, Any]:
+        """Evaluate travel data against an already compiled policy set"""
+        try:
+            # Create evaluation context
+            context = PolicyContext(travel_data, compiled.org_id, user_id, self.currency_converter)
+            
+            # Only rules for the travel types present in the offer are evaluated
+            travel_types = CompiledPolicySet.travel_types_of(travel_data)
+            
+            # Per-offer results of shared predicates, by predicate index
+            predicate_results = {}
+            
+            # Evaluate each policy
+            policy_results = []
+            if full_detail:
+                for policy in compiled.policies:
+                    policy_results.append(
+                        self._evaluate_policy(context, policy, travel_types, predicate_results)
+                    )
+            else:
+                # Most restrictive potential outcome first, so the loop can stop
+                # once no remaining policy could raise the final result
+                ranked = sorted(
+                    ((policy.ceiling(travel_types), policy) for policy in compiled.policies),
+                    key=lambda ranked_policy: ranked_policy[0],
+                    reverse=True
+                )
+                current_priority = 0
+                for ceiling, policy in ranked:
+                    if ceiling <= current_priority:
+                        break
+                    result = self._evaluate_policy(
+                        context, policy, travel_types, predicate_results, full_detail=False
+                    )
+                    policy_results.append(result)
+                    current_priority = max(current_priority, RESULT_PRIORITY.get(result['result'], 0))
+            
+            # Combine results (most restrictive wins)
+            final_result = self._combine_policy_results(policy_results)
+            
+            # Collect messages and approvers
+            messages = self._collect_messages(policy_results, travel_data)
+            approvers = self._collect_approvers(policy_results, compiled)
+            
+            logger.info(f"Policy evaluation complete. Result: {final_result}")
+            
+            return {
+                'result': final_result,
+                'policies_evaluated': len(policy_results),
+                'full_detail': full_detail,
+                'details': policy_results,
+                'messages': messages,
+                'approvers': approvers
+            }
+        
+        except Exception as e:
+            logger.error(f"Policy evaluation failed: {e}")
+            raise PolicyEvaluationError(f"Policy evaluation failed: {str(e)}")
+    
+    def _apply_predicate(self, context: PolicyContext, code: str, rule_vars: Dict[str, Any],
+                         predicate: int, predicate_results: Dict[int, Any]) -> Optional[bool]:
+        """Apply a rule specification, reusing the result of an identical predicate"""
+        if predicate in predicate_results:
+            outcome = predicate_results[predicate]
+        else:
+            try:
+                outcome = self.rule_registry.get_rule_spec(code).apply(context, rule_vars)
+            except Exception as e:
+                outcome = e
+            if self.dedupe_predicates:
+                predicate_results[predicate] = outcome
+        
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    
+    def _evaluate_policy(self, context: PolicyContext, policy: CompiledPolicy, travel_types,
+                         predicate_results: Dict[int, Any], full_detail: bool = True) -> Dict[str, Any]:
+        """Evaluate a single compiled policy against travel data"""
+        logger.debug(f"Evaluating policy: {policy.label}")
+        
+        rule_results = []
+        policy_violated = False
+        
+        for rule in policy.rules_for(travel_types, cost_ordered=not full_detail):
+            logger.debug(f"Evaluating rule: {rule.code}")
+            
+            # Apply the rule
+            try:
+                rule_result = self._apply_predicate(
+                    context, rule.code, rule.vars, rule.predicate, predicate_results
+                )
+                logger.debug(f"Rule {rule.code} result: {rule_result}")
+                
+                # Check exceptions if rule failed
+                if rule_result is False:
+                    for exception in rule.exceptions:
+                        exc_result = self._apply_predicate(
+                            context, exception.code, exception.vars, exception.predicate, predicate_results
+                        )
+                        if exc_result is True:
+                            logger.debug(f"Exception {exception.code} applied, overriding rule failure")
+                            rule_result = True
+                            break
+                
+                rule_results.append({
+                    'rule_id': rule.rule_id,
+                    'rule_code': rule.code,
+                    'result': rule_result,
+                    'action': rule.action,
+                    'vars': rule.vars
+                })
+                
+                # If any rule fails, mark policy as violated
+                if rule_result is False:
+                    policy_violated = True
+                    if not full_detail:
+                        # The policy result is fixed by its action from here on
+                        break
+            
+            except Exception as e:
+                logger.error(f"Error evaluating rule {rule.code}: {e}")
+                rule_results.append({
+                    'rule_id': rule.rule_id,
+                    'rule_code': rule.code,
+                    'result': None,
+                    'action': rule.action,
+                    'error': str(e)
+                })
+        
+        # Determine policy result
+        if policy_violated:
+            policy_result = policy.violation_result
+        elif policy.enforce_approval:
+            policy_result = 'APPROVAL_REQUIRED'
+        else:
+            policy_result = 'IN_POLICY'
+        
+        return {
+            'policy_id': policy.policy_id,
+            'policy_label': policy.label,
+            'policy_type': policy.type,
+            'result': policy_result,
+            'rule_results': rule_results,
+            'enforce_approval': policy.enforce_approval,
+            'message_for_reservation': policy.message_for_reservation
+        }
+    
+    def _combine_policy_results(self, policy_results: List[Dict[str, Any]]) -> str:
+        """
+        Combine multiple policy results into final result
+        Priority (most to least restrictive): HIDDEN > BOOKING_BLOCKED > APPROVAL_REQUIRED > OUT_OF_POLICY > IN_POLICY
+        """
+        if not policy_results:
+            return 'NOT_SPECIFIED'
+        
+        max_priority = 0
+        final_result = 'IN_POLICY'
+        
+        for policy_result in policy_results:
+            result = policy_result.get('result', 'NOT_SPECIFIED')
+            priority = RESULT_PRIORITY.get(result, 0)
+            
+            if priority > max_priority:
+                max_priority = priority
+                final_result = result
+        
+        return final_result
+    
+    def _map_action_to_result(self, action: str) -> str:
+        """Map policy action to evaluation result"""
+        return map_action_to_result(action)
+    
+    def _collect_messages(self, policy_results: List[Dict[str, Any]], travel_data: Dict[str, Any]) -> List[str]:
+        """Collect policy violation messages"""
+        messages = []
+        
+        for policy_result in policy_results:
+            if policy_result['result'] in ['HIDDEN', 'BOOKING_BLOCKED', 'APPROVAL_REQUIRED', 'OUT_OF_POLICY']:
+            
+                # Check for custom messages
+                custom_messages = policy_result.get('message_for_reservation')
+                if custom_messages and isinstance(custom_messages, dict):
+                    # Try to get message for travel type
+                    travel_type = self._determine_travel_type(travel_data)
+                    message = custom_messages.get(travel_type) or custom_messages.get('default')
+                    if message:
+                        messages.append(message)
+                        continue
+                
+                # Default message
+                policy_label = policy_result['policy_label']
+                result = policy_result['result']
+                
+                if result == 'APPROVAL_REQUIRED':
+                    messages.append(f"Approval required due to policy: {policy_label}")
+                elif result == 'OUT_OF_POLICY':
+                    messages.append(f"This booking is out of policy: {policy_label}")
+                elif result == 'BOOKING_BLOCKED':
+                    messages.append(f"Booking blocked by policy: {policy_label}")
+        
+        return messages
+    
+    def _collect_approvers(self, policy_results: List[Dict[str, Any]], compiled: CompiledPolicySet) -> List[str]:
+        """Collect required approvers for policies that need approval"""
+        approvers = []
+        policies_by_id = {policy.policy_id: policy for policy in compiled.policies}
+        
+        for policy_result in policy_results:
+            if policy_result['result'] == 'APPROVAL_REQUIRED':
+                # Approvers are part of the compiled policy data
+                for approver in policies_by_id[policy_result['policy_id']].approvers:
+                    if approver not in approvers:
+                        approvers.append(approver)
+        
+        return approvers
+    
+    def _determine_travel_type(self, travel_data: Dict[str, Any]) -> str:
+        """Determine travel type from travel data"""
+        if 'train' in travel_data:
+            return 'train'
+        elif 'flight' in travel_data:
+            return 'flight'
+        elif 'hotel' in travel_data:
+            return 'hotel'
+        elif 'car' in travel_data:
+            return 'car'
+        else:
+            return 'default'
\ No newline at end of file
@@ -0,0 +1,147 @@
+"""Offline evaluation of NDJSON offer streams across a process pool
+
+Each input line is either travel data or {'id'?, 'user_id'?, 'travel_data'}.
+Each output line is {'line', 'id', 'result', 'policies_evaluated', 'messages',
+'approvers'} (plus 'details' with full_detail), or {'line', 'id', 'error'}.
+
+Lines are read in chunks and at most max_in_flight chunks are queued at any
+time, so memory stays bounded however long the input is. Chunks are written
+back in submission order, so output lines follow input order. The compiled
+policy set is built once in the parent and inherited by forked workers.
+"""
+
+from typing import Any, Dict, IO, Iterator, List, Optional, Tuple
+from collections import deque
+import json
+import multiprocessing
+import time
+
+from app.services.evaluator import PolicyEvaluator
+from app.services.policy_compiler import CompiledPolicySet
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_USER_ID = 'offline'
+
+# Set in the parent before the pool forks; workers read it copy-on-write
+_worker_state = {}
+
+
+def _init_worker(compiled: Optional[CompiledPolicySet], full_detail: bool) -> None:
+    if compiled is not None:
+        # Platforms without fork receive the compiled set pickled, once per worker
+        _worker_state['compiled'] = compiled
+    _worker_state['full_detail'] = full_detail
+    _worker_state['evaluator'] = PolicyEvaluator()
+
+
+def _evaluate_line(evaluator: PolicyEvaluator, compiled: CompiledPolicySet, line_number: int,
+                   line: str, full_detail: bool) -> Dict[str, Any]:
+    offer_id = None
+    try:
+        record = json.loads(line)
+        if 'travel_data' in record:
+            offer_id = record.get('id')
+            travel_data = record['travel_data']
+            user_id = record.get('user_id') or DEFAULT_USER_ID
+        else:
+            travel_data = record
+            user_id = DEFAULT_USER_ID
+        
+        evaluation = evaluator.evaluate(travel_data, compiled, user_id, full_detail)
+        output = {
+            'line': line_number,
+            'id': offer_id,
+            'result': evaluation['result'],
+            'policies_evaluated': evaluation['policies_evaluated'],
+            'messages': evaluation['messages'],
+            'approvers': evaluation['approvers']
+        }
+        if full_detail:
+            output['details'] = evaluation['details']
+        return output
+    
+    except Exception as e:
+        return {'line': line_number, 'id': offer_id, 'error': str(e)}
+
+
+def _evaluate_chunk(first_line: int, lines: List[str]) -> Tuple[str, int]:
+    """Evaluate a chunk in a worker; returns its NDJSON output and error count"""
+    evaluator = _worker_state['evaluator']
+    compiled = _worker_state['compiled']
+    full_detail = _worker_state['full_detail']
+    outputs = [
+        _evaluate_line(evaluator, compiled, first_line + offset, line, full_detail)
+        for offset, line in enumerate(lines)
+    ]
+    errors = sum(1 for output in outputs if 'error' in output)
+    return ''.join(json.dumps(output, default=str) + '\n' for output in outputs), errors
+
+
+def _chunks(source: IO[str], chunk_size: int) -> Iterator[Tuple[int, List[str]]]:
+    """Yield (first line number, non-blank lines) chunks; line numbers are 1-based"""
+    chunk = []
+    first_line = 1
+    for line_number, line in enumerate(source, start=1):
+        if not line.strip():
+            continue
+        if not chunk:
+            first_line = line_number
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield first_line, chunk
+            chunk = []
+    if chunk:
+        yield first_line, chunk
+
+
+def evaluate_stream(compiled: CompiledPolicySet, source: IO[str], sink: IO[str], workers: int = 1,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE, max_in_flight: Optional[int] = None,
+                    full_detail: bool = False, progress=None) -> Dict[str, Any]:
+    """
+    Evaluate every offer in source and write results to sink in input order
+    
+    progress, if given, is called with the running stats after each chunk.
+    Returns {'offers', 'errors', 'seconds', 'offers_per_second', 'workers'}.
+    """
+    stats = {'offers': 0, 'errors': 0, 'seconds': 0.0, 'offers_per_second': 0.0, 'workers': workers}
+    start = time.perf_counter()
+    
+    def write(chunk_result: Tuple[str, int], count: int) -> None:
+        output, errors = chunk_result
+        sink.write(output)
+        stats['offers'] += count
+        stats['errors'] += errors
+        stats['seconds'] = time.perf_counter() - start
+        stats['offers_per_second'] = stats['offers'] / stats['seconds'] if stats['seconds'] else 0.0
+        if progress:
+            progress(stats)
+    
+    _worker_state['compiled'] = compiled
+    
+    if workers <= 1:
+        _init_worker(None, full_detail)
+        for first_line, lines in _chunks(source, chunk_size):
+            write(_evaluate_chunk(first_line, lines), len(lines))
+        return stats
+    
+    # Fork shares the compiled set with workers without pickling it
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+        initargs = (None, full_detail)
+    else:
+        context = multiprocessing.get_context()
+        initargs = (compiled, full_detail)
+    
+    max_in_flight = max_in_flight or workers * 2
+    pending = deque()
+    with context.Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+        for first_line, lines in _chunks(source, chunk_size):
+            if len(pending) >= max_in_flight:
+                count, result = pending.popleft()
+                write(result.get(), count)
+            pending.append((len(lines), pool.apply_async(_evaluate_chunk, (first_line, lines))))
+        while pending:
+            count, result = pending.popleft()
+            write(result.get(), count)
+    
+    return stats
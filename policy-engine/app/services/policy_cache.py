@@ -0,0 +1,398 @@
+"""Process-wide cache of compiled policy sets, preloadable before gunicorn forks
+
+With preload_app, create_app runs once in the gunicorn master. Preloading
+there compiles every organization's active policies into the tuple-based
+CompiledPolicySet structures, and forked workers inherit them copy-on-write
+(gunicorn.conf.py freezes them out of the garbage collector's reach so that
+collections do not touch, and thereby copy, their pages).
+
+Workers then only apply deltas: every refresh_interval seconds the first
+request reads each organization's policy_set_version (see policy_changes) and,
+for the cached organizations whose version moved, fetches the rows changed
+since and recompiles just the touched policies. Commits in the same process
+mark the changed organizations stale at once and, when an invalidation bus is
+configured (see policy_invalidation), are published to the other replicas; the
+periodic check then only runs every fallback_interval seconds as a safety net.
+
+The sets are held in a BoundedCache (see app.utils.cache) with a byte budget,
+max_bytes; past it, the least frequently evaluated orgs are evicted and
+compiled again on their next request.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+from collections import defaultdict
+from datetime import datetime, timezone
+from uuid import UUID
+import logging
+import os
+import threading
+import time
+import weakref
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, selectinload
+
+from app import db
+from app.models.policy import Policy
+from app.models.policy_change import PolicySetVersion
+from app.models.policy_rule import PolicyRule
+from app.services.policy_changes import PolicyChangeService
+from app.services.policy_compiler import CompiledPolicySet, policy_to_data
+from app.services.policy_invalidation import InvalidationBus, create_invalidation_bus
+from app.services.policy_snapshot import apply_changes as apply_snapshot_changes, read_snapshot, write_snapshot
+from app.services.rule_engine import RuleRegistry
+from app.utils.cache import LFU, BoundedCache
+from app.utils.circuit_breaker import DATABASE_ERRORS
+from app.utils.exceptions import DatabaseUnavailableError, PolicyEvaluationError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_INTERVAL = 5.0
+DEFAULT_FALLBACK_INTERVAL = 60.0
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Caches told about policy commits made in this process
+_caches = weakref.WeakSet()
+
+
+class PolicySetCache:
+    """Compiled policy sets by organization, shared by all requests in a process
+    
+    While the database is unavailable the cache keeps serving the sets it
+    has, and with a snapshot_dir it falls back to the last-known-good snapshot
+    written there for orgs it has not loaded; freshness reports whether an
+    org's set could be checked against the database and when it last was.
+    """
+    
+    def __init__(self, rule_registry: Optional[RuleRegistry] = None,
+                 refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+                 bus: Optional[InvalidationBus] = None,
+                 fallback_interval: float = DEFAULT_FALLBACK_INTERVAL,
+                 snapshot_dir: Optional[str] = None,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.rule_registry = rule_registry or RuleRegistry()
+        self.refresh_interval = refresh_interval
+        self.fallback_interval = fallback_interval
+        self.snapshot_dir = snapshot_dir
+        if snapshot_dir:
+            os.makedirs(snapshot_dir, exist_ok=True)
+        # Bounded so that many tenants can't exhaust worker memory; the least
+        # frequently evaluated orgs are dropped first and recompiled on next use
+        self.sets = BoundedCache('policy_sets', max_bytes=max_bytes, policy=LFU, on_evict=self._evicted)
+        # policy_set_version each cached set was compiled at
+        self.set_versions: Dict[str, int] = {}
+        # Orgs invalidated since they were compiled, brought up to date on next use
+        self.stale = set()
+        # Latest invalidation version applied per org
+        self.versions: Dict[str, int] = {}
+        # Wall-clock time each set was compiled or updated, and of the last
+        # successful check of every cached org against the database
+        self.compiled_at: Dict[str, float] = {}
+        self.synced_at = 0.0
+        # Set when the database could not be reached, until a check succeeds
+        self.degraded = False
+        self.checked_at = time.monotonic()
+        self.lock = threading.Lock()
+        # Held while an org's changes are applied, so concurrent gets apply them once
+        self.org_locks: Dict[str, threading.Lock] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'refreshes': 0, 'recompiled': 0, 'invalidations': 0,
+                      'stale_served': 0, 'snapshot_loads': 0, 'database_errors': 0}
+        
+        self.bus = bus
+        if bus is not None:
+            bus.subscribe(self.invalidate)
+            bus.on_reconnect.append(self.mark_stale)
+    
+    def preload(self) -> int:
+        """Compile every organization's active policies; returns the number of orgs loaded
+        
+        With the database unavailable, loads every last-known-good snapshot instead.
+        """
+        start = time.perf_counter()
+        try:
+            # Versions first: a commit racing the load is picked up by the next refresh
+            versions = PolicySetVersion.versions()
+            by_org = defaultdict(list)
+            for policy in self._load_policies():
+                by_org[str(policy.org_id)].append(policy_to_data(policy))
+        except DATABASE_ERRORS as e:
+            self._database_failed(e)
+            db.session.remove()
+            if not self.snapshot_dir:
+                raise
+            loaded = sum(1 for org_id in self._snapshot_org_ids() if self._load_snapshot(org_id) is not None)
+            logger.warning(f"Database unavailable; loaded last-known-good policies for {loaded} orgs")
+            return loaded
+        
+        for org_id, policies_data in by_org.items():
+            compiled = CompiledPolicySet.from_data(org_id, policies_data, self.rule_registry)
+            self._store(org_id, compiled, versions.get(org_id, 0))
+            self._persist(org_id, policies_data, versions.get(org_id, 0))
+        self.synced_at = time.time()
+        self.checked_at = time.monotonic()
+        db.session.remove()
+        
+        logger.info(f"Preloaded compiled policies for {len(by_org)} orgs in {time.perf_counter() - start:.2f}s")
+        return len(by_org)
+    
+    def get(self, org_id: str) -> CompiledPolicySet:
+        """The org's compiled active policies, loading them on first use"""
+        key = self._key(org_id)
+        
+        if self.bus is not None:
+            self.bus.start()
+        if self.bus is not None and self.bus.connected and not self.degraded:
+            interval = self.fallback_interval
+        else:
+            interval = self.refresh_interval
+        if time.monotonic() - self.checked_at >= interval:
+            self.refresh()
+        
+        compiled = self.sets.get(key)
+        if compiled is not None:
+            if key in self.stale:
+                with self._org_lock(key):
+                    if key in self.stale:
+                        try:
+                            return self._apply_changes(key)
+                        except DATABASE_ERRORS as e:
+                            self._database_failed(e)
+                    else:
+                        # Applied by another request while this one waited
+                        compiled = self.sets.peek(key) or compiled
+            if self.degraded or key in self.stale:
+                self.stats['stale_served'] += 1
+            else:
+                self.stats['hits'] += 1
+            return compiled
+        
+        self.stats['misses'] += 1
+        try:
+            version = PolicySetVersion.versions([UUID(key)]).get(key, 0)
+            policies_data = [policy_to_data(policy) for policy in self._load_policies(UUID(key))]
+        except DATABASE_ERRORS as e:
+            self._database_failed(e)
+            compiled = self._load_snapshot(key)
+            if compiled is None:
+                raise DatabaseUnavailableError(f"Policies for org {key} are unavailable: {e}")
+            self.stats['stale_served'] += 1
+            return compiled
+        
+        compiled = CompiledPolicySet.from_data(key, policies_data, self.rule_registry)
+        self._store(key, compiled, version)
+        self._persist(key, policies_data, version)
+        return compiled
+    
+    def freshness(self, org_id: str) -> Dict[str, Any]:
+        """Whether the org's set may be out of date, and when it was last known to be current"""
+        key = self._key(org_id)
+        stale = self.degraded or key in self.stale
+        as_of = self.compiled_at.get(key)
+        if as_of is not None and key not in self.stale:
+            as_of = max(as_of, self.synced_at)
+        return {
+            'stale': stale,
+            'as_of': datetime.fromtimestamp(as_of, timezone.utc).isoformat() if as_of is not None else None
+        }
+    
+    def refresh(self) -> int:
+        """Bring the cached orgs whose policies changed up to date; returns how many changed"""
+        # One thread checks; the others keep serving the sets they have
+        if not self.lock.acquire(blocking=False):
+            return 0
+        try:
+            self.checked_at = time.monotonic()
+            current = PolicySetVersion.versions()
+            changed = [
+                org_id for org_id in self.sets.keys()
+                if current.get(org_id, 0) != self.set_versions.get(org_id, 0)
+            ]
+            for org_id in changed:
+                with self._org_lock(org_id):
+                    self._apply_changes(org_id)
+            
+            self.stats['refreshes'] += 1
+            self.synced_at = time.time()
+            if self.degraded:
+                logger.info("Database reachable again; policy cache back in sync")
+            self.degraded = False
+            if changed:
+                logger.info(f"Updated policies for {len(changed)} changed orgs")
+            return len(changed)
+        except DATABASE_ERRORS as e:
+            self._database_failed(e)
+            return 0
+        finally:
+            self.lock.release()
+    
+    def invalidate(self, org_ids: Iterable[str], version: Optional[int] = None) -> None:
+        """Mark the orgs' compiled sets stale so the next get applies their changes"""
+        for org_id in org_ids:
+            if version is not None:
+                if version <= self.versions.get(org_id, 0):
+                    continue
+                self.versions[org_id] = version
+            if org_id in self.sets:
+                self.stale.add(org_id)
+            self.stats['invalidations'] += 1
+    
+    def mark_stale(self) -> None:
+        """Check for changes on the next get"""
+        self.checked_at = float('-inf')
+    
+    def _key(self, org_id: str) -> str:
+        try:
+            return str(UUID(str(org_id)))
+        except ValueError as e:
+            raise PolicyEvaluationError(f"Invalid UUID: {e}")
+    
+    def _org_lock(self, org_id: str) -> threading.Lock:
+        return self.org_locks.setdefault(org_id, threading.Lock())
+    
+    def _store(self, org_id: str, compiled: CompiledPolicySet, version: int,
+               compiled_at: Optional[float] = None) -> None:
+        self.sets.set(org_id, compiled)
+        self.set_versions[org_id] = version
+        self.compiled_at[org_id] = compiled_at if compiled_at is not None else time.time()
+        # An invalidation that arrived while the set was loading is for a
+        # later version than this one; keep the org stale to apply it next
+        if self.versions.get(org_id, 0) > version:
+            self.stale.add(org_id)
+        else:
+            self.stale.discard(org_id)
+    
+    def _evicted(self, org_id: str, compiled: CompiledPolicySet) -> None:
+        self.set_versions.pop(org_id, None)
+        self.compiled_at.pop(org_id, None)
+        self.stale.discard(org_id)
+    
+    def _apply_changes(self, org_id: str) -> CompiledPolicySet:
+        """Recompile only the policies that changed since the org's cached version"""
+        current = self.sets.peek(org_id)
+        # An org evicted meanwhile is loaded in full
+        since = self.set_versions.get(org_id, 0) if current is not None else 0
+        changes = PolicyChangeService.get_changes(org_id, since)
+        if changes['full_reload']:
+            compiled = CompiledPolicySet.from_data(org_id, changes['policies'], self.rule_registry)
+        else:
+            compiled = current.with_changes(
+                changes['policies'], changes['removed_policy_ids'], self.rule_registry
+            )
+        self._store(org_id, compiled, changes['version'])
+        self._persist_changes(org_id, since, changes)
+        self.stats['recompiled'] += 1
+        return compiled
+    
+    def _database_failed(self, error: Exception) -> None:
+        if not self.degraded:
+            logger.warning(f"Database unavailable, serving cached policies: {error}")
+        self.degraded = True
+        self.stats['database_errors'] += 1
+        try:
+            db.session.rollback()
+        except Exception:
+            pass
+    
+    def _snapshot_path(self, org_id: str) -> str:
+        return os.path.join(self.snapshot_dir, f'{org_id}.json')
+    
+    def _snapshot_org_ids(self) -> List[str]:
+        return sorted(name[:-len('.json')] for name in os.listdir(self.snapshot_dir) if name.endswith('.json'))
+    
+    def _persist(self, org_id: str, policies_data: List[Dict[str, Any]], version: int) -> None:
+        """Write the org's policies as its last-known-good snapshot; never raises"""
+        if not self.snapshot_dir:
+            return
+        try:
+            write_snapshot({
+                'org_id': org_id,
+                'generated_at': datetime.utcnow().isoformat() + 'Z',
+                'policy_set_version': version,
+                'policies': policies_data
+            }, self._snapshot_path(org_id))
+        except Exception as e:
+            logger.warning(f"Failed to write policy snapshot for org {org_id}: {e}")
+    
+    def _persist_changes(self, org_id: str, since: int, changes: Dict[str, Any]) -> None:
+        """Patch the org's snapshot with changes since a version; never raises"""
+        if not self.snapshot_dir:
+            return
+        path = self._snapshot_path(org_id)
+        try:
+            if changes['full_reload']:
+                snapshot = apply_snapshot_changes({'org_id': org_id, 'policies': []}, changes)
+            elif os.path.exists(path):
+                snapshot = read_snapshot(path)
+                # Another worker may have written a different version meanwhile;
+                # only a snapshot at the version the changes start from can be patched
+                if snapshot.get('policy_set_version', 0) != since:
+                    return
+                snapshot = apply_snapshot_changes(snapshot, changes)
+            else:
+                return
+            write_snapshot(snapshot, path)
+        except Exception as e:
+            logger.warning(f"Failed to update policy snapshot for org {org_id}: {e}")
+    
+    def _load_snapshot(self, org_id: str) -> Optional[CompiledPolicySet]:
+        """Compile the org's last-known-good snapshot, marked stale until the database is back"""
+        if not self.snapshot_dir or not os.path.exists(self._snapshot_path(org_id)):
+            return None
+        try:
+            snapshot = read_snapshot(self._snapshot_path(org_id))
+            compiled = CompiledPolicySet.from_data(org_id, snapshot['policies'], self.rule_registry)
+            generated_at = datetime.fromisoformat(snapshot['generated_at'].rstrip('Z'))
+        except Exception as e:
+            logger.warning(f"Unusable policy snapshot for org {org_id}: {e}")
+            return None
+        self._store(org_id, compiled, snapshot.get('policy_set_version', 0),
+                    compiled_at=generated_at.replace(tzinfo=timezone.utc).timestamp())
+        self.stale.add(org_id)
+        self.stats['snapshot_loads'] += 1
+        return compiled
+    
+    def _load_policies(self, org_id: Optional[UUID] = None):
+        query = Policy.query.options(
+            selectinload(Policy.rules).selectinload(PolicyRule.exceptions),
+            selectinload(Policy.approvers)
+        ).filter(Policy.active == True)
+        if org_id is not None:
+            query = query.filter(Policy.org_id == org_id)
+        return query.all()
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    versions = session.info.pop('policy_changes', None)
+    if not versions:
+        return
+    for cache in list(_caches):
+        for org_id, version in versions.items():
+            cache.invalidate([org_id], version)
+        if cache.bus is not None:
+            cache.bus.publish(versions)
+
+
+def init_policy_cache(app) -> PolicySetCache:
+    """Create the app's policy set cache, preloading it when POLICY_CACHE_PRELOAD is set"""
+    cache = PolicySetCache(
+        refresh_interval=app.config.get('POLICY_CACHE_REFRESH_SECONDS', DEFAULT_REFRESH_INTERVAL),
+        bus=create_invalidation_bus(app),
+        fallback_interval=app.config.get('POLICY_CACHE_FALLBACK_SECONDS', DEFAULT_FALLBACK_INTERVAL),
+        snapshot_dir=app.config.get('POLICY_SNAPSHOT_DIR'),
+        max_bytes=app.config.get('POLICY_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+    )
+    app.extensions['policy_cache'] = cache
+    _caches.add(cache)
+    
+    if app.config.get('POLICY_CACHE_PRELOAD'):
+        from app.utils.currency import CurrencyConverter
+        with app.app_context():
+            try:
+                cache.preload()
+            except Exception as e:
+                # Serve anyway; orgs are compiled on first use instead
+                logger.warning(f"Policy preload failed: {e}")
+                db.session.remove()
+        CurrencyConverter.preload()
+    return cache
@@ -0,0 +1,287 @@
+"""Policy set versions and incremental changes
+
+Every flush that inserts, updates or deletes a Policy, PolicyRule,
+PolicyRuleException, PolicyApprover or UserPolicyAssignment bumps the owning
+organization's policy_set_version and logs one policy_changes row per changed
+row, in the same transaction. Deletes are logged as tombstones, which is what
+updated_at timestamps cannot show.
+
+Consumers that hold an org's policies at version N (the process-wide cache,
+embedded evaluators working from a snapshot) ask for the changes since N and
+patch what they hold instead of reloading the org.
+
+Writes made with Core statements rather than the ORM (the bulk assignment
+paths) report their rows through record_changes themselves.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from uuid import UUID
+import logging
+import uuid
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, selectinload
+
+from app import db
+from app.models.policy import Policy
+from app.models.policy_approver import PolicyApprover
+from app.models.policy_change import PolicyChange, PolicySetVersion, UPSERT, DELETE
+from app.models.policy_rule import PolicyRule
+from app.models.policy_rule_exception import PolicyRuleException
+from app.models.user_policy_assignment import UserPolicyAssignment
+from app.services.policy_compiler import policy_to_data
+from app.utils.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+ENTITY_MODELS = {
+    'policy': Policy,
+    'rule': PolicyRule,
+    'exception': PolicyRuleException,
+    'approver': PolicyApprover,
+    'assignment': UserPolicyAssignment,
+}
+ENTITY_NAMES = {model: entity for entity, model in ENTITY_MODELS.items()}
+
+POLICY_MODELS = tuple(ENTITY_MODELS.values())
+
+# Assignments decide who a policy applies to, not how offers are evaluated,
+# so they never change an org's compiled policies
+COMPILED_ENTITIES = ('policy', 'rule', 'exception', 'approver')
+
+DEFAULT_RETENTION_DAYS = 30
+
+# (org_id, entity, entity_id, policy_id, operation)
+Change = Tuple[str, str, Any, Any, str]
+
+
+def _org_id_of(instance) -> Optional[str]:
+    """Organization a policy row belongs to"""
+    if isinstance(instance, Policy):
+        org_id = instance.org_id
+    elif isinstance(instance, PolicyRuleException):
+        rule = instance.rule or (db.session.get(PolicyRule, instance.policy_rule_id) if instance.policy_rule_id else None)
+        policy = rule.policy if rule is not None else None
+        org_id = policy.org_id if policy is not None else None
+    else:
+        policy = instance.policy or (db.session.get(Policy, instance.policy_id) if instance.policy_id else None)
+        org_id = policy.org_id if policy is not None else None
+    return str(org_id) if org_id is not None else None
+
+
+def _policy_id_of(instance):
+    """Policy a policy row belongs to"""
+    if isinstance(instance, Policy):
+        return instance.id
+    if isinstance(instance, PolicyRuleException):
+        rule = instance.rule or (db.session.get(PolicyRule, instance.policy_rule_id) if instance.policy_rule_id else None)
+        return rule.policy_id if rule is not None else None
+    return instance.policy_id
+
+
+def record_changes(session, changes: Iterable[Change]) -> Dict[str, int]:
+    """
+    Bump each affected org's version once and log the changes under it.
+    
+    Runs on the session's connection in the current transaction; does not
+    commit. Returns the new version of each org.
+    """
+    by_org = defaultdict(list)
+    for org_id, entity, entity_id, policy_id, operation in changes:
+        by_org[str(org_id)].append((entity, entity_id, policy_id, operation))
+    if not by_org:
+        return {}
+    
+    connection = session.connection()
+    versions = {}
+    # Always lock version rows in the same order so concurrent writers can't deadlock
+    for org_id in sorted(by_org):
+        org_uuid = UUID(org_id)
+        version = PolicySetVersion.bump(connection, org_uuid)
+        versions[org_id] = version
+        rows = [
+            {
+                'id': uuid.uuid4(),
+                'org_id': org_uuid,
+                'version': version,
+                'entity': entity,
+                'entity_id': entity_id,
+                'policy_id': policy_id,
+                'operation': operation,
+                'created_at': datetime.utcnow(),
+            }
+            for entity, entity_id, policy_id, operation in by_org[org_id]
+        ]
+        connection.execute(PolicyChange.__table__.insert(), rows)
+    
+    # Orgs for the caches to invalidate once the transaction commits, at
+    # their latest version (a session can flush several times per commit)
+    committed = session.info.setdefault('policy_changes', {})
+    for org_id, version in versions.items():
+        committed[org_id] = max(version, committed.get(org_id, 0))
+    return versions
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_policy_changes(session, flush_context, instances):
+    # Resolve orgs now, while every row and relationship can still be loaded;
+    # IDs of new rows are only known after the flush
+    pending = session.info.setdefault('pending_policy_changes', [])
+    for instance in session.deleted:
+        if isinstance(instance, POLICY_MODELS):
+            org_id = _org_id_of(instance)
+            if org_id is not None:
+                pending.append((org_id, instance, instance.id, _policy_id_of(instance), DELETE))
+    for instance in (*session.new, *session.dirty):
+        if isinstance(instance, POLICY_MODELS) and session.is_modified(instance, include_collections=False):
+            org_id = _org_id_of(instance)
+            if org_id is not None:
+                pending.append((org_id, instance, None, None, UPSERT))
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_flushed_changes(session, flush_context):
+    pending = session.info.pop('pending_policy_changes', None)
+    if not pending:
+        return
+    changes = []
+    for org_id, instance, entity_id, policy_id, operation in pending:
+        if operation == UPSERT:
+            entity_id, policy_id = instance.id, _policy_id_of(instance)
+        changes.append((org_id, ENTITY_NAMES[type(instance)], entity_id, policy_id, operation))
+    record_changes(session, changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_policy_changes(session):
+    session.info.pop('pending_policy_changes', None)
+    session.info.pop('policy_changes', None)
+
+
+def _json_value(value):
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class PolicyChangeService:
+    """Service class for policy set versions and changes"""
+    
+    @staticmethod
+    def get_version(org_id: str) -> int:
+        """The org's current policy set version (0 before its first change)"""
+        try:
+            return PolicySetVersion.versions([UUID(org_id)]).get(str(UUID(org_id)), 0)
+        except ValueError as e:
+            raise ValidationError(f"Invalid UUID: {e}")
+    
+    @staticmethod
+    def get_changes(org_id: str, since: int = 0) -> Dict[str, Any]:
+        """
+        Everything that changed in an org's policies after a version.
+        
+        Returns:
+            {
+                'org_id', 'since', 'version': the version the result brings a consumer to,
+                'full_reload': True when the changes since that version are no longer
+                    all logged (or since is 0); policies then holds every active policy
+                    and the consumer should replace what it has,
+                'changes': [{'entity', 'id', 'policy_id', 'operation', 'version', 'data'}],
+                    the latest change per row, data being the current row or None for
+                    a tombstone,
+                'policies': active policies touched by the changes, as policy_to_data,
+                'removed_policy_ids': touched policies that were deleted or deactivated
+            }
+        """
+        try:
+            org_uuid = UUID(org_id)
+        except ValueError as e:
+            raise ValidationError(f"Invalid UUID: {e}")
+        if since < 0:
+            raise ValidationError("since must not be negative")
+        
+        # Read the version first: rows changed after this read can only make
+        # the result newer than the version reported, never older
+        current = db.session.get(PolicySetVersion, org_uuid)
+        version = current.version if current is not None else 0
+        pruned_version = current.pruned_version if current is not None else 0
+        
+        result = {
+            'org_id': str(org_uuid),
+            'since': since,
+            'version': version,
+            'full_reload': since == 0 or since < pruned_version or since > version,
+            'changes': [],
+            'policies': [],
+            'removed_policy_ids': []
+        }
+        if result['full_reload']:
+            result['policies'] = [policy_to_data(policy) for policy in PolicyChangeService._load_policies(
+                Policy.org_id == org_uuid, Policy.active == True
+            )]
+            return result
+        
+        latest = {}
+        for change in PolicyChange.find_since(org_uuid, since):
+            latest[(change.entity, change.entity_id)] = change
+        
+        rows = PolicyChangeService._current_rows(latest.values())
+        touched_policy_ids = set()
+        for (entity, entity_id), change in latest.items():
+            row = rows.get((entity, entity_id)) if change.operation == UPSERT else None
+            result['changes'].append({
+                'entity': entity,
+                'id': str(entity_id),
+                'policy_id': str(change.policy_id) if change.policy_id else None,
+                'operation': UPSERT if row is not None else DELETE,
+                'version': change.version,
+                'data': {key: _json_value(value) for key, value in row.to_dict().items()} if row is not None else None
+            })
+            if entity in COMPILED_ENTITIES and change.policy_id is not None:
+                touched_policy_ids.add(change.policy_id)
+        
+        if touched_policy_ids:
+            active = PolicyChangeService._load_policies(
+                Policy.id.in_(touched_policy_ids), Policy.active == True
+            )
+            result['policies'] = [policy_to_data(policy) for policy in active]
+            result['removed_policy_ids'] = sorted(
+                str(policy_id) for policy_id in touched_policy_ids - {policy.id for policy in active}
+            )
+        return result
+    
+    @staticmethod
+    def prune_changes(retention_days: int = DEFAULT_RETENTION_DAYS) -> int:
+        """Delete changes older than the retention period; returns how many were deleted"""
+        try:
+            pruned = PolicyChange.prune(datetime.utcnow() - timedelta(days=retention_days))
+            db.session.commit()
+            logger.info(f"Pruned {pruned} policy changes older than {retention_days} days")
+            return pruned
+        except Exception:
+            db.session.rollback()
+            raise
+    
+    @staticmethod
+    def _current_rows(changes: Iterable[PolicyChange]) -> Dict[Tuple[str, UUID], Any]:
+        ids_by_entity = defaultdict(set)
+        for change in changes:
+            if change.operation == UPSERT:
+                ids_by_entity[change.entity].add(change.entity_id)
+        rows = {}
+        for entity, ids in ids_by_entity.items():
+            model = ENTITY_MODELS[entity]
+            for row in model.query.filter(model.id.in_(ids)):
+                rows[(entity, row.id)] = row
+        return rows
+    
+    @staticmethod
+    def _load_policies(*criteria) -> List[Policy]:
+        return Policy.query.options(
+            selectinload(Policy.rules).selectinload(PolicyRule.exceptions),
+            selectinload(Policy.approvers)
+        ).filter(*criteria).all()
@@ -0,0 +1,252 @@
+"""Compiled policy sets - immutable, evaluation-ready views of an org's policies"""
+
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Travel data keys that identify the kind of travel being evaluated
+TRAVEL_TYPES = ('train', 'flight', 'hotel', 'car')
+
+# Rules whose specification has no travel type apply to every offer
+ANY_TRAVEL_TYPE = None
+
+RESULT_PRIORITY = {
+    'HIDDEN': 5,
+    'BOOKING_BLOCKED': 4,
+    'APPROVAL_REQUIRED': 3,
+    'OUT_OF_POLICY': 2,
+    'IN_POLICY': 1,
+    'NOT_SPECIFIED': 0
+}
+
+ACTION_RESULTS = {
+    'HIDE': 'HIDDEN',
+    'BLOCK': 'BOOKING_BLOCKED',
+    'APPROVE': 'APPROVAL_REQUIRED',
+    'OUT_OF_POLICY': 'OUT_OF_POLICY'
+}
+
+
+def map_action_to_result(action: str) -> str:
+    """Map policy action to evaluation result"""
+    return ACTION_RESULTS.get(action, 'OUT_OF_POLICY')
+
+
+class Predicate(NamedTuple):
+    """A unique (code, vars) check shared by every rule/exception that uses it"""
+    code: str
+    vars: Dict[str, Any]
+
+
+class CompiledException(NamedTuple):
+    code: str
+    vars: Dict[str, Any]
+    predicate: int  # Index into CompiledPolicySet.predicates
+
+
+class CompiledRule(NamedTuple):
+    rule_id: str
+    code: str
+    action: str
+    vars: Dict[str, Any]
+    travel_type: Optional[str]
+    rank: float
+    exceptions: Tuple[CompiledException, ...]
+    predicate: int  # Index into CompiledPolicySet.predicates
+
+
+class CompiledPolicy(NamedTuple):
+    policy_id: str
+    label: str
+    type: str
+    action: str
+    enforce_approval: bool
+    message_for_reservation: Any
+    # User IDs that can approve bookings under this policy
+    approvers: Tuple[str, ...]
+    # Active, known rules in definition order
+    rules: Tuple[CompiledRule, ...]
+    # travel type -> (rules in definition order, rules in short-circuit order)
+    rules_by_travel_type: Dict[Optional[str], Tuple[Tuple[CompiledRule, ...], Tuple[CompiledRule, ...]]]
+    
+    @property
+    def violation_result(self) -> str:
+        return map_action_to_result(self.action)
+    
+    def rules_for(self, travel_types: Iterable[str], cost_ordered: bool = False) -> Tuple[CompiledRule, ...]:
+        """Rules that apply to an offer of the given travel types"""
+        index = 1 if cost_ordered else 0
+        groups = [self.rules_by_travel_type.get(ANY_TRAVEL_TYPE)]
+        groups.extend(self.rules_by_travel_type.get(travel_type) for travel_type in travel_types)
+        groups = [group[index] for group in groups if group]
+        if len(groups) == 1:
+            return groups[0]
+        merged = [rule for group in groups for rule in group]
+        if cost_ordered:
+            merged.sort(key=lambda rule: rule.rank)
+        else:
+            order = {rule.rule_id: position for position, rule in enumerate(self.rules)}
+            merged.sort(key=lambda rule: order[rule.rule_id])
+        return tuple(merged)
+    
+    def ceiling(self, travel_types: Iterable[str]) -> int:
+        """Priority of the most restrictive result this policy can produce for an offer"""
+        ceiling = RESULT_PRIORITY['APPROVAL_REQUIRED'] if self.enforce_approval else RESULT_PRIORITY['IN_POLICY']
+        if self.rules_for(travel_types):
+            ceiling = max(ceiling, RESULT_PRIORITY[self.violation_result])
+        return ceiling
+
+
+def policy_to_data(policy) -> Dict[str, Any]:
+    """Convert a Policy model (with rules and exceptions) into plain data"""
+    return {
+        'id': str(policy.id),
+        'label': policy.label,
+        'type': policy.type,
+        'action': policy.action,
+        'enforce_approval': policy.enforce_approval,
+        'message_for_reservation': policy.message_for_reservation,
+        'approvers': [str(approver.user_id) for approver in policy.approvers],
+        'rules': [
+            {
+                'id': str(rule.id),
+                'code': rule.code,
+                'action': rule.action,
+                'vars': rule.vars,
+                'active': rule.active,
+                'exceptions': [
+                    {'code': exception.code, 'vars': exception.vars, 'active': exception.active}
+                    for exception in rule.exceptions
+                ]
+            }
+            for rule in policy.rules
+        ]
+    }
+
+
+class CompiledPolicySet:
+    """An organization's active policies, compiled once and evaluated many times"""
+    
+    def __init__(self, org_id: str, policies: Tuple[CompiledPolicy, ...], predicates: Tuple[Predicate, ...]):
+        self.org_id = org_id
+        self.policies = policies
+        # Identical (code, vars) checks across policies and exceptions are
+        # stored once; evaluation memoizes results per offer by index
+        self.predicates = predicates
+    
+    def __len__(self):
+        return len(self.policies)
+    
+    @classmethod
+    def from_policies(cls, org_id: str, policies: Iterable, rule_registry) -> 'CompiledPolicySet':
+        """Compile Policy models"""
+        return cls.from_data(org_id, [policy_to_data(policy) for policy in policies], rule_registry)
+    
+    @classmethod
+    def from_data(cls, org_id: str, policies_data: List[Dict[str, Any]], rule_registry) -> 'CompiledPolicySet':
+        """Compile policies supplied as plain data (see policy_to_data)"""
+        predicate_index = {}
+        compiled = tuple(
+            _compile_policy(policy_data, rule_registry, predicate_index)
+            for policy_data in policies_data
+            if policy_data.get('active', True)
+        )
+        predicates = tuple(Predicate(code, entry[1]) for (code, _), entry in predicate_index.items())
+        return cls(org_id, compiled, predicates)
+    
+    def with_changes(self, policies_data: List[Dict[str, Any]], removed_policy_ids: Iterable[str],
+                     rule_registry) -> 'CompiledPolicySet':
+        """
+        A copy with the given policies compiled in and the removed ones dropped
+        
+        Policies that did not change are reused as they are, and predicates keep
+        their indexes; those only the dropped policies used stay in the table
+        until the next full compile.
+        """
+        predicate_index = {
+            (predicate.code, json.dumps(predicate.vars, sort_keys=True, default=str)): (index, predicate.vars)
+            for index, predicate in enumerate(self.predicates)
+        }
+        replaced = {str(policy_data['id']) for policy_data in policies_data}
+        replaced.update(str(policy_id) for policy_id in removed_policy_ids)
+        compiled = {
+            str(policy_data['id']): _compile_policy(policy_data, rule_registry, predicate_index)
+            for policy_data in policies_data
+            if policy_data.get('active', True)
+        }
+        
+        policies = []
+        for policy in self.policies:
+            if policy.policy_id in compiled:
+                policies.append(compiled.pop(policy.policy_id))
+            elif policy.policy_id not in replaced:
+                policies.append(policy)
+        policies.extend(compiled.values())
+        
+        predicates = tuple(Predicate(code, entry[1]) for (code, _), entry in predicate_index.items())
+        return CompiledPolicySet(self.org_id, tuple(policies), predicates)
+    
+    @staticmethod
+    def travel_types_of(travel_data: Dict[str, Any]) -> Tuple[str, ...]:
+        """Upper-case travel types present in travel data, e.g. ('TRAIN',)"""
+        return tuple(travel_type.upper() for travel_type in TRAVEL_TYPES if travel_type in travel_data)
+
+
+def _predicate_id(predicate_index: Dict, code: str, rule_vars: Dict[str, Any]) -> int:
+    """Intern a (code, vars) pair; vars are compared by canonical JSON"""
+    key = (code, json.dumps(rule_vars, sort_keys=True, default=str))
+    entry = predicate_index.get(key)
+    if entry is None:
+        entry = (len(predicate_index), rule_vars)
+        predicate_index[key] = entry
+    return entry[0]
+
+
+def _compile_policy(policy_data: Dict[str, Any], rule_registry, predicate_index: Dict) -> CompiledPolicy:
+    rules = []
+    for rule_data in policy_data.get('rules', []):
+        if not rule_data.get('active', True):
+            continue
+        code = rule_data['code']
+        if not rule_registry.get_rule_spec(code):
+            logger.warning(f"Unknown rule specification: {code}")
+            continue
+        exceptions = tuple(
+            CompiledException(
+                exception['code'],
+                exception.get('vars') or {},
+                _predicate_id(predicate_index, exception['code'], exception.get('vars') or {})
+            )
+            for exception in rule_data.get('exceptions', [])
+            if exception.get('active', True) and rule_registry.get_rule_spec(exception['code'])
+        )
+        rule_vars = rule_data.get('vars') or {}
+        rules.append(CompiledRule(
+            rule_id=str(rule_data.get('id')),
+            code=code,
+            action=rule_data.get('action'),
+            vars=rule_vars,
+            travel_type=rule_registry.get_travel_type(code),
+            rank=rule_registry.get_rule_rank(code),
+            exceptions=exceptions,
+            predicate=_predicate_id(predicate_index, code, rule_vars)
+        ))
+    
+    rules_by_travel_type = {}
+    for travel_type in {rule.travel_type for rule in rules}:
+        in_order = tuple(rule for rule in rules if rule.travel_type == travel_type)
+        rules_by_travel_type[travel_type] = (in_order, tuple(sorted(in_order, key=lambda rule: rule.rank)))
+    
+    return CompiledPolicy(
+        policy_id=str(policy_data['id']),
+        label=policy_data['label'],
+        type=policy_data.get('type', 'TRAVEL'),
+        action=policy_data.get('action', 'OUT_OF_POLICY'),
+        enforce_approval=bool(policy_data.get('enforce_approval', False)),
+        message_for_reservation=policy_data.get('message_for_reservation'),
+        approvers=tuple(str(approver) for approver in policy_data.get('approvers', [])),
+        rules=tuple(rules),
+        rules_by_travel_type=rules_by_travel_type
+    )
@@ -0,0 +1,119 @@
+"""Policy envelope - a compact constraint summary of a compiled policy set
+
+The envelope lets callers (e.g. the backend's train search) pre-filter offers
+without a per-offer evaluation round trip. Constraints are reduced so each
+entry is exactly equivalent to the union of the rules it came from:
+
+- max price: tightest limit per (currency, trip type)
+- max class: lowest allowed level; premium exclusion if any rule excludes it
+- operators: blocked operators are unioned, required operators intersected
+- routes: restricted routes are unioned, allowed routes intersected
+- advance purchase: largest minimum; same-day exclusion if any rule excludes it
+
+Entries are grouped by the result a violation triggers (the owning policy's
+action). Rules that have exceptions are kept in separate entries flagged with
+'has_exceptions' because an exception may excuse the violation; callers should
+fall back to full evaluation for offers that only violate those.
+"""
+
+from typing import Any, Dict
+from datetime import datetime
+
+from app.services.policy_compiler import CompiledPolicySet, RESULT_PRIORITY
+from app.services.rule_engine import TrainClassMaxRule
+
+CLASS_HIERARCHY = TrainClassMaxRule.CLASS_HIERARCHY
+
+
+def build_policy_envelope(compiled: CompiledPolicySet) -> Dict[str, Any]:
+    """Reduce a compiled policy set to per-result constraint summaries"""
+    groups = {}
+    
+    def group(kind, key, result, action, has_exceptions, policy_id, initial):
+        entry = groups.setdefault((kind, key, result, has_exceptions), dict(
+            initial,
+            result=result,
+            action=action,
+            has_exceptions=has_exceptions,
+            policy_ids=[]
+        ))
+        if policy_id not in entry['policy_ids']:
+            entry['policy_ids'].append(policy_id)
+        return entry
+    
+    baseline = 'NOT_SPECIFIED'
+    for policy in compiled.policies:
+        policy_baseline = 'APPROVAL_REQUIRED' if policy.enforce_approval else 'IN_POLICY'
+        if RESULT_PRIORITY[policy_baseline] > RESULT_PRIORITY[baseline]:
+            baseline = policy_baseline
+        
+        result = policy.violation_result
+        for rule in policy.rules:
+            rule_vars = rule.vars
+            has_exceptions = bool(rule.exceptions)
+            common = (result, policy.action, has_exceptions, policy.policy_id)
+            
+            if rule.code == 'train_max_od_price' and rule_vars.get('max_price'):
+                currency = rule_vars.get('currency', 'EUR')
+                trip_type = rule_vars.get('trip_type', 'one_way')
+                entry = group('max_price', (currency, trip_type), *common,
+                              {'currency': currency, 'trip_type': trip_type, 'max_price': rule_vars['max_price']})
+                entry['max_price'] = min(entry['max_price'], rule_vars['max_price'])
+            
+            elif rule.code == 'train_class_max' and rule_vars.get('max_class'):
+                level = CLASS_HIERARCHY.get(rule_vars['max_class'].upper(), 1)
+                entry = group('max_class', None, *common,
+                              {'max_class': rule_vars['max_class'].upper(), 'max_level': level, 'exclude_premium': False})
+                if level < entry['max_level']:
+                    entry['max_level'] = level
+                    entry['max_class'] = rule_vars['max_class'].upper()
+                entry['exclude_premium'] = entry['exclude_premium'] or bool(rule_vars.get('exclude_premium'))
+            
+            elif rule.code == 'train_operator_preference':
+                preferred = {op.upper() for op in rule_vars.get('preferred_operators', [])}
+                blocked = {op.upper() for op in rule_vars.get('restricted_operators', [])}
+                level = rule_vars.get('preference_level', 'PREFERRED')
+                if level == 'AVOID':
+                    blocked |= preferred
+                if blocked:
+                    entry = group('blocked_operators', None, *common, {'operators': set()})
+                    entry['operators'] |= blocked
+                if level == 'REQUIRED' and preferred:
+                    entry = group('required_operators', None, *common, {'operators': preferred})
+                    entry['operators'] &= preferred
+            
+            elif rule.code == 'train_route_restriction':
+                if rule_vars.get('restricted_routes'):
+                    entry = group('restricted_routes', None, *common, {'routes': []})
+                    for route in rule_vars['restricted_routes']:
+                        if route not in entry['routes']:
+                            entry['routes'].append(route)
+                if rule_vars.get('allowed_routes'):
+                    entry = group('allowed_routes', None, *common, {'routes': list(rule_vars['allowed_routes'])})
+                    entry['routes'] = [route for route in entry['routes'] if route in rule_vars['allowed_routes']]
+            
+            elif rule.code == 'train_advanced_purchase' and rule_vars.get('min_days') is not None:
+                entry = group('min_advance_days', None, *common, {'min_days': rule_vars['min_days'], 'exclude_same_day': False})
+                entry['min_days'] = max(entry['min_days'], rule_vars['min_days'])
+                entry['exclude_same_day'] = entry['exclude_same_day'] or bool(rule_vars.get('exclude_same_day'))
+    
+    constraints = {kind: [] for kind in (
+        'max_price', 'max_class', 'blocked_operators', 'required_operators',
+        'restricted_routes', 'allowed_routes', 'min_advance_days'
+    )}
+    for (kind, _, _, _), entry in groups.items():
+        if isinstance(entry.get('operators'), set):
+            entry['operators'] = sorted(entry['operators'])
+        constraints[kind].append(entry)
+    
+    # Most restrictive first so callers can stop at the first violated entry
+    for entries in constraints.values():
+        entries.sort(key=lambda entry: (-RESULT_PRIORITY[entry['result']], entry['has_exceptions']))
+    
+    return {
+        'org_id': compiled.org_id,
+        'policies': len(compiled),
+        'baseline_result': baseline,
+        'constraints': constraints,
+        'generated_at': datetime.utcnow().isoformat() + 'Z'
+    }
@@ -0,0 +1,165 @@
+"""Cross-replica invalidation of cached policy sets
+
+After a commit that touches an organization's policies, the committing
+process publishes {'versions', 'origin'} on a channel, versions mapping each
+org to the policy_set_version the commit brought it to; every other replica
+marks that org's compiled set stale and applies its changes on next use.
+The versions come from the database's per-org counter rather than any
+replica's clock, so replayed or duplicated messages for an org are ignored
+once a newer one has been applied.
+
+Messages can be lost (a replica restarting, a dropped Redis connection), so
+the cache's periodic policy set version check stays on as a fallback, at a longer
+interval while a channel is connected.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHANNEL = 'policy-invalidation'
+RECONNECT_DELAY = 1.0
+
+# Called with ([org_id], version) for each org in messages from other replicas
+Listener = Callable[[List[str], int], None]
+
+
+class InvalidationBus(ABC):
+    """Publishes and delivers policy invalidations between replicas"""
+    
+    def __init__(self):
+        # Identifies this process, so its own messages are not applied twice
+        self.origin = uuid.uuid4().hex
+        self.listeners: List[Listener] = []
+        # Called after (re)connecting, when messages may have been missed
+        self.on_reconnect: List[Callable[[], None]] = []
+        self.connected = False
+    
+    def subscribe(self, listener: Listener) -> None:
+        self.listeners.append(listener)
+    
+    @abstractmethod
+    def publish(self, versions: Dict[str, int]) -> None:
+        """Tell the other replicas these orgs' policies changed, as of the given policy_set_versions"""
+    
+    def start(self) -> None:
+        """Start receiving messages in this process; safe to call repeatedly"""
+    
+    def close(self) -> None:
+        self.connected = False
+    
+    def _deliver(self, message: Dict) -> None:
+        if message.get('origin') == self.origin:
+            return
+        for org_id, version in message['versions'].items():
+            for listener in list(self.listeners):
+                try:
+                    listener([org_id], version)
+                except Exception as e:
+                    logger.error(f"Policy invalidation listener failed: {e}")
+    
+    def _message(self, versions: Dict[str, int]) -> Dict:
+        return {
+            'versions': {str(org_id): version for org_id, version in versions.items()},
+            'origin': self.origin
+        }
+
+
+class InMemoryInvalidationBus(InvalidationBus):
+    """Delivers synchronously to every bus on the same channel in this process (for tests)"""
+    
+    channels: Dict[str, List['InMemoryInvalidationBus']] = {}
+    
+    def __init__(self, channel: str = DEFAULT_CHANNEL):
+        super().__init__()
+        self.channel = channel
+        self.channels.setdefault(channel, []).append(self)
+        self.connected = True
+    
+    def publish(self, versions: Dict[str, int]) -> None:
+        message = self._message(versions)
+        for bus in list(self.channels.get(self.channel, [])):
+            if bus.connected:
+                bus._deliver(message)
+    
+    def close(self) -> None:
+        super().close()
+        peers = self.channels.get(self.channel, [])
+        if self in peers:
+            peers.remove(self)
+
+
+class RedisInvalidationBus(InvalidationBus):
+    """Redis pub/sub channel, with a subscriber thread per process"""
+    
+    def __init__(self, redis_url: str, channel: str = DEFAULT_CHANNEL):
+        super().__init__()
+        import redis
+        
+        self.client = redis.Redis.from_url(redis_url)
+        self.channel = channel
+        self._thread_pid = None
+        self._lock = threading.Lock()
+    
+    def publish(self, versions: Dict[str, int]) -> None:
+        try:
+            self.client.publish(self.channel, json.dumps(self._message(versions)))
+        except Exception as e:
+            # Other replicas catch up through their periodic check
+            logger.warning(f"Failed to publish policy invalidation: {e}")
+    
+    def start(self) -> None:
+        # Threads don't survive fork, so each gunicorn worker starts its own
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            threading.Thread(target=self._listen, name='policy-invalidation', daemon=True).start()
+    
+    def _listen(self) -> None:
+        while self._thread_pid == os.getpid():
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                if not self.connected:
+                    self.connected = True
+                    # Anything published while disconnected was missed
+                    for callback in self.on_reconnect:
+                        callback()
+                for raw in pubsub.listen():
+                    if raw.get('type') == 'message':
+                        self._deliver(json.loads(raw['data']))
+            except Exception as e:
+                if self.connected:
+                    logger.warning(f"Policy invalidation channel disconnected: {e}")
+                self.connected = False
+                time.sleep(RECONNECT_DELAY)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+    
+    def close(self) -> None:
+        super().close()
+        self._thread_pid = None
+
+
+def create_invalidation_bus(app) -> Optional[InvalidationBus]:
+    """The bus selected by POLICY_INVALIDATION_BACKEND: 'redis', 'memory' or 'none'"""
+    backend = (app.config.get('POLICY_INVALIDATION_BACKEND') or 'none').lower()
+    channel = app.config.get('POLICY_INVALIDATION_CHANNEL', DEFAULT_CHANNEL)
+    if backend == 'redis':
+        return RedisInvalidationBus(app.config['REDIS_URL'], channel)
+    if backend == 'memory':
+        return InMemoryInvalidationBus(channel)
+    return None
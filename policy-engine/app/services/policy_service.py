@@ -1,13 +1,15 @@
 from typing import List, Dict, Any, Optional
 from uuid import UUID
-import uuid
 from app.models.policy import Policy
 from app.models.policy_rule import PolicyRule
 from app.models.policy_rule_exception import PolicyRuleException
 from app.models.policy_approver import PolicyApprover
 from app.models.user_policy_assignment import UserPolicyAssignment
+from app.models.user_organization import find_org_user_ids
+from app.models.policy_change import UPSERT, DELETE
+from app.services.policy_changes import record_changes
+from app import db
 from app.utils.exceptions import PolicyNotFoundError, ValidationError
-from sqlalchemy.exc import OperationalError
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,54 +17,10 @@ logger = logging.getLogger(__name__)
 class PolicyService:
     """Service class for policy management operations"""
     
-    @staticmethod
-    def _get_demo_policies(org_id: str) -> List[Dict[str, Any]]:
-        """Return demo policy data when database is unavailable"""
-        return [
-            {
-                'id': str(uuid.uuid4()),
-                'org_id': org_id,
-                'label': 'Corporate Travel Policy',
-                'type': 'TRAVEL',
-                'active': True,
-                'action': 'OUT_OF_POLICY',
-                'enforce_approval': True,
-                'message_for_reservation': {'message': 'Please ensure compliance with company travel policy'},
-                'exclude_restricted_fares': False,
-                'refundable_fares_enabled': True,
-                'user_count': '45',
-                'guest_count': '0',
-                'approver_count': '3',
-                'created_at': '2024-01-15T10:00:00Z',
-                'updated_at': '2024-01-15T10:00:00Z'
-            },
-            {
-                'id': str(uuid.uuid4()),
-                'org_id': org_id,
-                'label': 'Executive Travel Policy',
-                'type': 'TRAVEL',
-                'active': True,
-                'action': 'APPROVE',
-                'enforce_approval': False,
-                'message_for_reservation': {'message': 'Executive level travel approved'},
-                'exclude_restricted_fares': True,
-                'refundable_fares_enabled': True,
-                'user_count': '5',
-                'guest_count': '0',
-                'approver_count': '1',
-                'created_at': '2024-01-10T14:30:00Z',
-                'updated_at': '2024-01-10T14:30:00Z'
-            }
-        ]
-    
     @staticmethod
     def get_all_policies() -> List[Policy]:
         """Get all active policies"""
-        try:
-            return Policy.find_active_policies()
-        except OperationalError as e:
-            logger.warning(f"Database connection failed, returning demo data: {e}")
-            return []
+        return Policy.find_active_policies()
     
     @staticmethod
     def get_policies_by_org(org_id: str) -> List[Dict[str, Any]]:
@@ -71,9 +29,6 @@ class PolicyService:
             org_uuid = UUID(org_id)
             policies = Policy.find_by_org_id(org_uuid)
             return [policy.to_dict() for policy in policies]
-        except OperationalError as e:
-            logger.warning(f"Database connection failed, returning demo data: {e}")
-            return PolicyService._get_demo_policies(org_id)
         except ValueError:
             raise ValidationError(f"Invalid organization ID: {org_id}")
     
@@ -182,7 +137,11 @@ class PolicyService:
                 active=rule_data.get('active', True)
             )
             
-            return rule.save()
+            db.session.add(rule)
+            if rule.active:
+                Policy.adjust_counters(policy_uuid, rule_count=1)
+            db.session.commit()
+            return rule
             
         except ValueError as e:
             raise ValidationError(f"Invalid data: {e}")
@@ -197,12 +156,17 @@ class PolicyService:
         updatable_fields = ['code', 'action', 'vars', 'active']
         update_data = {k: v for k, v in rule_data.items() if k in updatable_fields}
         
+        if 'active' in update_data and bool(update_data['active']) != rule.active:
+            Policy.adjust_counters(rule.policy_id, rule_count=1 if update_data['active'] else -1)
+        
         return rule.update(**update_data)
     
     @staticmethod
     def delete_rule(rule_id: str) -> bool:
         """Delete a rule (soft delete by setting active=False)"""
         rule = PolicyService.get_rule(rule_id)
+        if rule.active:
+            Policy.adjust_counters(rule.policy_id, rule_count=-1)
         rule.update(active=False)
         return True
     
@@ -304,7 +268,10 @@ class PolicyService:
                 assigned_by=assigned_by_uuid
             )
             
-            return assignment.save()
+            db.session.add(assignment)
+            Policy.adjust_counters(policy_uuid, user_count=1)
+            db.session.commit()
+            return assignment
             
         except ValueError as e:
             raise ValidationError(f"Invalid UUID: {e}")
@@ -324,6 +291,7 @@ class PolicyService:
             ).first()
             
             if assignment:
+                Policy.adjust_counters(policy_uuid, user_count=-1)
                 assignment.delete()
                 return True
             
@@ -332,6 +300,92 @@ class PolicyService:
         except ValueError as e:
             raise ValidationError(f"Invalid UUID: {e}")
     
+    @staticmethod
+    def _resolve_bulk_user_ids(user_ids: Optional[List[str]], org_id: Optional[str]) -> List[UUID]:
+        """Resolve an explicit user list or "all users in org" to unique user UUIDs"""
+        if user_ids is None and org_id is None:
+            raise ValidationError("Either user_ids or org_id is required")
+        
+        resolved = []
+        if user_ids is not None:
+            resolved.extend(UUID(user_id) for user_id in user_ids)
+        if org_id is not None:
+            resolved.extend(find_org_user_ids(UUID(org_id)))
+        
+        # Preserve order while dropping duplicates
+        return list(dict.fromkeys(resolved))
+    
+    @staticmethod
+    def bulk_assign_policy(policy_id: str, assigned_by: Optional[str] = None,
+                           user_ids: Optional[List[str]] = None,
+                           org_id: Optional[str] = None) -> Dict[str, Any]:
+        """Assign a policy to a list of users or to every member of an organization"""
+        try:
+            policy = PolicyService.get_policy(policy_id)
+            assigned_by_uuid = UUID(assigned_by) if assigned_by else None
+            user_uuids = PolicyService._resolve_bulk_user_ids(user_ids, org_id)
+            
+            assigned_ids = UserPolicyAssignment.bulk_assign(policy.id, user_uuids, assigned_by_uuid)
+            assigned = len(assigned_ids)
+            Policy.adjust_counters(policy.id, user_count=assigned)
+            # Core inserts bypass the flush hooks that version ORM changes
+            record_changes(db.session, [
+                (policy.org_id, 'assignment', assignment_id, policy.id, UPSERT) for assignment_id in assigned_ids
+            ])
+            db.session.commit()
+            
+            logger.info(f"Bulk assigned policy {policy_id} to {assigned} of {len(user_uuids)} users")
+            return {
+                'policy_id': policy_id,
+                'requested': len(user_uuids),
+                'changed': assigned,
+                'user_count': policy.user_count
+            }
+            
+        except ValueError as e:
+            db.session.rollback()
+            raise ValidationError(f"Invalid UUID: {e}")
+        except (PolicyNotFoundError, ValidationError):
+            db.session.rollback()
+            raise
+        except Exception as e:
+            db.session.rollback()
+            raise ValidationError(f"Failed to bulk assign policy: {e}")
+    
+    @staticmethod
+    def bulk_unassign_policy(policy_id: str, user_ids: Optional[List[str]] = None,
+                             org_id: Optional[str] = None) -> Dict[str, Any]:
+        """Remove a policy from a list of users or from every member of an organization"""
+        try:
+            policy = PolicyService.get_policy(policy_id)
+            user_uuids = PolicyService._resolve_bulk_user_ids(user_ids, org_id)
+            
+            removed_ids = UserPolicyAssignment.bulk_unassign(policy.id, user_uuids)
+            removed = len(removed_ids)
+            Policy.adjust_counters(policy.id, user_count=-removed)
+            record_changes(db.session, [
+                (policy.org_id, 'assignment', assignment_id, policy.id, DELETE) for assignment_id in removed_ids
+            ])
+            db.session.commit()
+            
+            logger.info(f"Bulk removed policy {policy_id} from {removed} of {len(user_uuids)} users")
+            return {
+                'policy_id': policy_id,
+                'requested': len(user_uuids),
+                'changed': removed,
+                'user_count': policy.user_count
+            }
+            
+        except ValueError as e:
+            db.session.rollback()
+            raise ValidationError(f"Invalid UUID: {e}")
+        except (PolicyNotFoundError, ValidationError):
+            db.session.rollback()
+            raise
+        except Exception as e:
+            db.session.rollback()
+            raise ValidationError(f"Failed to bulk unassign policy: {e}")
+    
     @staticmethod
     def get_user_policies(user_id: str) -> List[Policy]:
         """Get all policies assigned to a user"""
@@ -369,7 +423,10 @@ class PolicyService:
                 user_id=user_uuid
             )
             
-            return approver.save()
+            db.session.add(approver)
+            Policy.adjust_counters(policy_uuid, approver_count=1)
+            db.session.commit()
+            return approver
             
         except ValueError as e:
             raise ValidationError(f"Invalid UUID: {e}")
@@ -389,6 +446,7 @@ class PolicyService:
             ).first()
             
             if approver:
+                Policy.adjust_counters(policy_uuid, approver_count=-1)
                 approver.delete()
                 return True
             
@@ -397,6 +455,18 @@ class PolicyService:
         except ValueError as e:
             raise ValidationError(f"Invalid UUID: {e}")
     
+    @staticmethod
+    def recompute_policy_counters(org_id: Optional[str] = None) -> int:
+        """Repair job: recompute aggregate counters from child tables"""
+        try:
+            org_uuid = UUID(org_id) if org_id else None
+            repaired = Policy.recompute_counters(org_uuid)
+            db.session.commit()
+            logger.info(f"Recomputed counters for {repaired} policies")
+            return repaired
+        except ValueError:
+            raise ValidationError(f"Invalid organization ID: {org_id}")
+    
     @staticmethod
     def get_policy_approvers(policy_id: str) -> List[PolicyApprover]:
         """Get all approvers for a policy"""
@@ -0,0 +1,107 @@
+"""Policy snapshots - an org's policies as a JSON or YAML file for embedded evaluation
+
+A snapshot is:
+    {
+        'org_id': str,
+        'generated_at': ISO timestamp,
+        'policy_set_version': int, the version to ask for changes since (optional),
+        'policies': [policy data, see policy_compiler.policy_to_data]
+    }
+"""
+
+from typing import Any, Dict, Iterable, Optional
+from datetime import datetime
+import json
+import os
+
+try:
+    import yaml
+except ImportError:  # YAML snapshots are optional
+    yaml = None
+
+from app.services.policy_compiler import CompiledPolicySet, policy_to_data
+from app.services.rule_engine import RuleRegistry
+from app.utils.exceptions import ValidationError
+
+YAML_EXTENSIONS = ('.yaml', '.yml')
+
+
+def build_snapshot(org_id: str, policies: Iterable, policy_set_version: Optional[int] = None) -> Dict[str, Any]:
+    """Build a snapshot from Policy models (with rules, exceptions and approvers)"""
+    snapshot = {
+        'org_id': str(org_id),
+        'generated_at': datetime.utcnow().isoformat() + 'Z'
+    }
+    if policy_set_version is not None:
+        snapshot['policy_set_version'] = policy_set_version
+    snapshot['policies'] = [policy_to_data(policy) for policy in policies]
+    return snapshot
+
+
+def _is_yaml(path: str) -> bool:
+    if os.path.splitext(path)[1].lower() not in YAML_EXTENSIONS:
+        return False
+    if yaml is None:
+        raise ValidationError(f"PyYAML is required for YAML snapshots: {path}")
+    return True
+
+
+def write_snapshot(snapshot: Dict[str, Any], path: str) -> None:
+    """Write a snapshot as JSON, or YAML for .yaml/.yml paths
+    
+    The file is written beside the target and renamed over it, so readers
+    never see a partial snapshot.
+    """
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(temporary_path, 'w') as snapshot_file:
+            if _is_yaml(path):
+                yaml.safe_dump(snapshot, snapshot_file, sort_keys=False)
+            else:
+                json.dump(snapshot, snapshot_file, indent=2, default=str)
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def apply_changes(snapshot: Dict[str, Any], changes: Dict[str, Any]) -> Dict[str, Any]:
+    """A copy of a snapshot updated with the result of PolicyChangeService.get_changes"""
+    if changes.get('full_reload'):
+        policies = list(changes['policies'])
+    else:
+        updated = {str(policy['id']): policy for policy in changes['policies']}
+        removed = {str(policy_id) for policy_id in changes['removed_policy_ids']}
+        policies = []
+        for policy in snapshot['policies']:
+            policy_id = str(policy['id'])
+            if policy_id in updated:
+                policies.append(updated.pop(policy_id))
+            elif policy_id not in removed:
+                policies.append(policy)
+        policies.extend(updated.values())
+    return {
+        **snapshot,
+        'generated_at': datetime.utcnow().isoformat() + 'Z',
+        'policy_set_version': changes['version'],
+        'policies': policies
+    }
+
+
+def read_snapshot(path: str) -> Dict[str, Any]:
+    """Read and validate a JSON or YAML snapshot"""
+    with open(path) as snapshot_file:
+        if _is_yaml(path):
+            snapshot = yaml.safe_load(snapshot_file)
+        else:
+            snapshot = json.load(snapshot_file)
+    
+    if not isinstance(snapshot, dict) or 'org_id' not in snapshot or not isinstance(snapshot.get('policies'), list):
+        raise ValidationError(f"Invalid policy snapshot: {path}")
+    return snapshot
+
+
+def load_snapshot(path: str, rule_registry: Optional[RuleRegistry] = None) -> CompiledPolicySet:
+    """Read a snapshot and compile it for evaluation"""
+    snapshot = read_snapshot(path)
+    return CompiledPolicySet.from_data(snapshot['org_id'], snapshot['policies'], rule_registry or RuleRegistry())
@@ -27,6 +27,16 @@ class PolicyContext:
 class RuleSpecification(ABC):
     """Abstract base class for rule specifications"""
     
+    # Travel data key the rule inspects (matches 'travel_type' in
+    # PolicyService.get_rule_specifications); None applies to every offer.
+    travel_type = None
+    
+    # Relative evaluation cost and estimated probability that the rule fails.
+    # Short-circuit evaluation runs rules in ascending cost / selectivity order
+    # so cheap, frequently failing checks come first.
+    cost = 1.0
+    selectivity = 0.1
+    
     @abstractmethod
     def apply(self, context: PolicyContext, rule_vars: Dict[str, Any]) -> Optional[bool]:
         """
@@ -46,6 +56,10 @@ class RuleSpecification(ABC):
 class TrainMaxPriceRule(RuleSpecification):
     """Rule to enforce maximum price for train journeys"""
     
+    travel_type = 'TRAIN'
+    cost = 1.0
+    selectivity = 0.3
+    
     def apply(self, context: PolicyContext, rule_vars: Dict[str, Any]) -> Optional[bool]:
         max_price = rule_vars.get('max_price')
         currency = rule_vars.get('currency', 'EUR')
@@ -102,6 +116,10 @@ class TrainMaxPriceRule(RuleSpecification):
 class TrainAdvancePurchaseRule(RuleSpecification):
     """Rule to enforce advance purchase requirements"""
     
+    travel_type = 'TRAIN'
+    cost = 3.0  # Parses ISO timestamps
+    selectivity = 0.2
+    
     def apply(self, context: PolicyContext, rule_vars: Dict[str, Any]) -> Optional[bool]:
         min_days = rule_vars.get('min_days')
         exclude_same_day = rule_vars.get('exclude_same_day', False)
@@ -144,6 +162,19 @@ class TrainAdvancePurchaseRule(RuleSpecification):
 class TrainClassMaxRule(RuleSpecification):
     """Rule to enforce maximum train class/fare type"""
     
+    travel_type = 'TRAIN'
+    cost = 1.0
+    selectivity = 0.2
+    
+    # Define class hierarchy (lower number = lower class)
+    CLASS_HIERARCHY = {
+        'STANDARD': 1,
+        'COMFORT': 2,
+        'FIRST': 3,
+        'BUSINESS': 4,
+        'PREMIUM': 5
+    }
+    
     def apply(self, context: PolicyContext, rule_vars: Dict[str, Any]) -> Optional[bool]:
         max_class = rule_vars.get('max_class')
         exclude_premium = rule_vars.get('exclude_premium', False)
@@ -154,15 +185,7 @@ class TrainClassMaxRule(RuleSpecification):
             return None
         
         try:
-            # Define class hierarchy (lower number = lower class)
-            class_hierarchy = {
-                'STANDARD': 1,
-                'COMFORT': 2,
-                'FIRST': 3,
-                'BUSINESS': 4,
-                'PREMIUM': 5
-            }
-            
+            class_hierarchy = self.CLASS_HIERARCHY
             max_class_level = class_hierarchy.get(max_class.upper(), 1)
             
             # Check class from train data
@@ -202,6 +225,10 @@ class TrainClassMaxRule(RuleSpecification):
 class TrainOperatorPreferenceRule(RuleSpecification):
     """Rule to enforce train operator preferences"""
     
+    travel_type = 'TRAIN'
+    cost = 2.0
+    selectivity = 0.1
+    
     def apply(self, context: PolicyContext, rule_vars: Dict[str, Any]) -> Optional[bool]:
         preferred_operators = rule_vars.get('preferred_operators', [])
         restricted_operators = rule_vars.get('restricted_operators', [])
@@ -260,6 +287,10 @@ class TrainOperatorPreferenceRule(RuleSpecification):
 class TrainRouteRestrictionRule(RuleSpecification):
     """Rule to enforce route restrictions"""
     
+    travel_type = 'TRAIN'
+    cost = 5.0  # Scans allowed/restricted route lists
+    selectivity = 0.05
+    
     def apply(self, context: PolicyContext, rule_vars: Dict[str, Any]) -> Optional[bool]:
         allowed_routes = rule_vars.get('allowed_routes', [])
         restricted_routes = rule_vars.get('restricted_routes', [])
@@ -352,6 +383,18 @@ class RuleRegistry:
         """Register a new rule specification"""
         self.rules[code] = rule_spec
     
+    def get_travel_type(self, rule_code: str) -> Optional[str]:
+        """Travel type a rule applies to (e.g. 'TRAIN'), or None for all travel"""
+        rule_spec = self.rules.get(rule_code)
+        return rule_spec.travel_type if rule_spec else None
+    
+    def get_rule_rank(self, rule_code: str) -> float:
+        """Ordering key for short-circuit evaluation (lower runs first)"""
+        rule_spec = self.rules.get(rule_code)
+        if not rule_spec:
+            return float('inf')
+        return rule_spec.cost / max(rule_spec.selectivity, 0.01)
+    
     def list_rules(self) -> list:
         """List all available rule codes"""
         return list(self.rules.keys())
\ No newline at end of file
@@ -0,0 +1,261 @@
+"""What-if simulation of draft policy sets against historical travel data"""
+
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from datetime import datetime, timedelta
+from uuid import UUID
+import json
+import logging
+import threading
+import time
+
+from sqlalchemy import func, select, update
+
+from app import db
+from app.models.approval_request import ApprovalRequest
+from app.models.policy_simulation import PolicySimulation, PENDING, RUNNING, COMPLETED, FAILED
+from app.services.evaluation_service import PolicyEvaluationService
+from app.services.policy_compiler import CompiledPolicySet, RESULT_PRIORITY
+from app.utils.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_SAMPLE_SIZE = 10
+
+# Compare against the org's current active policies, or the result stored
+# with each historical row
+BASELINES = ('current', 'recorded')
+
+
+def validate_simulation_args(org_id: str, baseline: str) -> UUID:
+    """Check a simulation's org ID and baseline, returning the org UUID; raises ValidationError"""
+    if baseline not in BASELINES:
+        raise ValidationError(f"Invalid baseline: {baseline}")
+    try:
+        return UUID(org_id)
+    except (TypeError, ValueError):
+        raise ValidationError(f"Invalid organization ID: {org_id}")
+
+
+def approval_request_batches(org_id: UUID, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                             batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Stream an org's approval requests in batches without loading them all
+    
+    Rows are {'id', 'created_at', 'user_id', 'travel_data', 'recorded_result'};
+    other historical sources can feed the simulation in the same shape.
+    """
+    query = select(
+        ApprovalRequest.id,
+        ApprovalRequest.created_at,
+        ApprovalRequest.user_id,
+        ApprovalRequest.travel_data,
+        ApprovalRequest.policy_evaluation
+    ).where(ApprovalRequest.org_id == org_id)
+    if since:
+        query = query.where(ApprovalRequest.created_at >= since)
+    if until:
+        query = query.where(ApprovalRequest.created_at < until)
+    query = query.order_by(ApprovalRequest.created_at).execution_options(yield_per=batch_size)
+    
+    for partition in db.session.execute(query).partitions():
+        yield [
+            {
+                'id': str(row.id),
+                'created_at': row.created_at.isoformat() if row.created_at else None,
+                'user_id': str(row.user_id),
+                'travel_data': row.travel_data,
+                'recorded_result': (row.policy_evaluation or {}).get('result')
+            }
+            for row in partition
+        ]
+
+
+def count_approval_requests(org_id: UUID, since: Optional[datetime] = None, until: Optional[datetime] = None) -> int:
+    query = select(func.count()).select_from(ApprovalRequest).where(ApprovalRequest.org_id == org_id)
+    if since:
+        query = query.where(ApprovalRequest.created_at >= since)
+    if until:
+        query = query.where(ApprovalRequest.created_at < until)
+    return db.session.execute(query).scalar_one()
+
+
+class PolicySimulationService:
+    """Re-evaluates historical travel data against a draft policy set"""
+    
+    def __init__(self):
+        self.evaluator = PolicyEvaluationService()
+    
+    def simulate(self, org_id: str, draft_policies: List[Dict[str, Any]], baseline: str = 'current',
+                 since: Optional[datetime] = None, until: Optional[datetime] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE, sample_size: int = DEFAULT_SAMPLE_SIZE,
+                 progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """
+        Simulate a draft policy set over the org's approval requests
+        
+        Returns:
+            {
+                'org_id': str,
+                'baseline': 'current|recorded',
+                'rows': int,
+                'changed': int,
+                'errors': int,
+                'baseline_results': {result: count},
+                'draft_results': {result: count},
+                'transitions': {'BASELINE->DRAFT': count},  # changed rows only
+                'more_restrictive': int,
+                'less_restrictive': int,
+                'samples': {'BASELINE->DRAFT': [row, ...]},
+                'seconds': float
+            }
+        """
+        org_uuid = validate_simulation_args(org_id, baseline)
+        
+        draft = self.evaluator.compile(org_id, draft_policies)
+        current = None
+        if baseline == 'current':
+            current = self.evaluator.compile(org_id, self.evaluator.export_snapshot(org_id)['policies'])
+        
+        total = count_approval_requests(org_uuid, since, until)
+        summary = {
+            'org_id': org_id,
+            'baseline': baseline,
+            'rows': 0,
+            'changed': 0,
+            'errors': 0,
+            'baseline_results': {},
+            'draft_results': {},
+            'transitions': {},
+            'more_restrictive': 0,
+            'less_restrictive': 0,
+            'samples': {},
+            'seconds': 0.0
+        }
+        start = time.perf_counter()
+        
+        for batch in approval_request_batches(org_uuid, since, until, batch_size):
+            self._simulate_batch(batch, draft, current, summary, sample_size)
+            summary['seconds'] = round(time.perf_counter() - start, 3)
+            if progress:
+                progress(summary['rows'], total)
+        
+        logger.info(f"Simulated {summary['rows']} rows for org {org_id}: {summary['changed']} changed")
+        return summary
+    
+    def _evaluate_batch(self, batch: List[Dict[str, Any]], compiled: CompiledPolicySet) -> List[Optional[str]]:
+        """Final result per row; identical (user, travel data) rows in a batch are evaluated once"""
+        results = []
+        seen = {}
+        for row in batch:
+            key = (row['user_id'], json.dumps(row['travel_data'], sort_keys=True, default=str))
+            if key not in seen:
+                try:
+                    if len(compiled):
+                        seen[key] = self.evaluator.evaluate(row['travel_data'], compiled, row['user_id'], False)['result']
+                    else:
+                        seen[key] = 'NOT_SPECIFIED'
+                except Exception as e:
+                    logger.debug(f"Simulation failed for row {row['id']}: {e}")
+                    seen[key] = None
+            results.append(seen[key])
+        return results
+    
+    def _simulate_batch(self, batch: List[Dict[str, Any]], draft: CompiledPolicySet,
+                        current: Optional[CompiledPolicySet], summary: Dict[str, Any], sample_size: int) -> None:
+        draft_results = self._evaluate_batch(batch, draft)
+        if current is not None:
+            baseline_results = self._evaluate_batch(batch, current)
+        else:
+            baseline_results = [row['recorded_result'] or 'NOT_SPECIFIED' for row in batch]
+        
+        for row, before, after in zip(batch, baseline_results, draft_results):
+            summary['rows'] += 1
+            if before is None or after is None:
+                summary['errors'] += 1
+                continue
+            
+            summary['baseline_results'][before] = summary['baseline_results'].get(before, 0) + 1
+            summary['draft_results'][after] = summary['draft_results'].get(after, 0) + 1
+            if before == after:
+                continue
+            
+            summary['changed'] += 1
+            if RESULT_PRIORITY.get(after, 0) > RESULT_PRIORITY.get(before, 0):
+                summary['more_restrictive'] += 1
+            else:
+                summary['less_restrictive'] += 1
+            
+            transition = f"{before}->{after}"
+            summary['transitions'][transition] = summary['transitions'].get(transition, 0) + 1
+            samples = summary['samples'].setdefault(transition, [])
+            if len(samples) < sample_size:
+                samples.append({
+                    'id': row['id'],
+                    'created_at': row['created_at'],
+                    'user_id': row['user_id'],
+                    'travel_data': row['travel_data']
+                })
+
+
+class SimulationJob:
+    """
+    Runs simulations in background threads of this process, keeping their
+    state in the policy_simulations table so every worker can report it.
+    """
+    
+    # A job that reported no progress for this long was lost with its worker
+    STALE_AFTER = 600
+    # Seconds between progress writes
+    PROGRESS_INTERVAL = 1.0
+    
+    @classmethod
+    def get(cls, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            job = db.session.get(PolicySimulation, UUID(job_id))
+        except ValueError:
+            return None
+        if job is None:
+            return None
+        if not job.finished and job.updated_at < datetime.utcnow() - timedelta(seconds=cls.STALE_AFTER):
+            job.status = FAILED
+            job.error = 'Simulation was interrupted when its worker stopped; start it again'
+            db.session.commit()
+        return job.to_dict()
+    
+    @classmethod
+    def start(cls, app, org_id: str, **simulate_args) -> Dict[str, Any]:
+        """Record a job and run PolicySimulationService.simulate for it in a background thread"""
+        job = PolicySimulation(org_id=UUID(org_id), status=PENDING).save()
+        job_id = job.id
+        last_write = [0.0]
+        
+        def write(**values):
+            # Own transaction: the simulation's session is streaming rows
+            with db.engine.begin() as connection:
+                connection.execute(
+                    update(PolicySimulation).where(PolicySimulation.id == job_id)
+                    .values(updated_at=datetime.utcnow(), **values)
+                )
+        
+        def progress(processed, total):
+            now = time.monotonic()
+            if now - last_write[0] >= cls.PROGRESS_INTERVAL or processed >= total:
+                last_write[0] = now
+                write(processed=processed, total=total)
+        
+        def run():
+            with app.app_context():
+                try:
+                    write(status=RUNNING)
+                    result = PolicySimulationService().simulate(org_id, progress=progress, **simulate_args)
+                    db.session.rollback()
+                    write(status=COMPLETED, result=result, processed=result['rows'])
+                except Exception as e:
+                    logger.error(f"Simulation job {job_id} failed: {e}")
+                    db.session.rollback()
+                    write(status=FAILED, error=str(e))
+                finally:
+                    db.session.remove()
+        
+        threading.Thread(target=run, name=f'simulation-{job_id}', daemon=True).start()
+        return job.to_dict()
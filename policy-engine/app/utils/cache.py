@@ -0,0 +1,320 @@
+"""Memory-bounded in-process caches with per-namespace stats
+
+BoundedCache holds entries up to a byte budget (and optionally an entry
+count), evicting the least recently used entry ('lru') or the least
+frequently used one, oldest first among equals ('lfu'). Entries can expire
+after a TTL; for stale_ttl seconds after that, get_or_load still returns them
+while a background thread reloads them (stale-while-revalidate), so callers
+never wait on a refresh of a value they already have.
+
+Entry sizes are estimated once, when the entry is set, by walking the value's
+containers and attributes with sys.getsizeof; callers that know better pass
+size= instead. Every cache registers under its namespace, and cache_stats()
+reports hits, misses, evictions and bytes for all of them.
+
+The backend has its own, event-loop-only LRU variant
+(backend/app/utils/cache.py).
+"""
+
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from collections import OrderedDict
+import logging
+import sys
+import threading
+import time
+import types
+import weakref
+
+logger = logging.getLogger(__name__)
+
+LRU = 'lru'
+LFU = 'lfu'
+
+FRESH = 'fresh'
+STALE = 'stale'
+MISS = 'miss'
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Walking into these would count code and shared state, not the cached value
+_UNSIZED = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+            types.MethodType, types.CodeType, weakref.ref)
+_SCALARS = (str, bytes, bytearray, int, float, complex, bool, type(None))
+
+# Live caches by namespace
+_registry: 'weakref.WeakValueDictionary[str, BoundedCache]' = weakref.WeakValueDictionary()
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate bytes held by a value and everything it references, counting shared objects once"""
+    seen = set()
+    stack = [value]
+    size = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _UNSIZED):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, _SCALARS):
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        else:
+            attributes = getattr(obj, '__dict__', None)
+            if attributes is not None:
+                stack.append(attributes)
+            for cls in type(obj).__mro__:
+                slots = cls.__dict__.get('__slots__', ())
+                for slot in (slots,) if isinstance(slots, str) else slots:
+                    if slot not in ('__dict__', '__weakref__'):
+                        stack.append(getattr(obj, slot, None))
+    return size
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats of every live cache in the process, by namespace"""
+    return {namespace: cache.to_dict() for namespace, cache in sorted(_registry.items())}
+
+
+class _Entry:
+    __slots__ = ('value', 'size', 'expires_at', 'stale_until', 'hits')
+    
+    def __init__(self, value: Any, size: int, expires_at: Optional[float], stale_until: Optional[float]):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+        self.hits = 0
+
+
+class BoundedCache:
+    """Size-aware LRU or LFU cache with per-entry TTL, safe to share between threads
+    
+    on_evict, if given, is called with the key and value of every entry
+    dropped to make room or because it expired.
+    """
+    
+    def __init__(self, namespace: str, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_entries: Optional[int] = None, ttl: Optional[float] = None,
+                 stale_ttl: float = 0.0, policy: str = LRU,
+                 sizer: Callable[[Any], int] = estimate_size,
+                 on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if policy not in (LRU, LFU):
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.policy = policy
+        self.sizer = sizer
+        self.on_evict = on_evict
+        self.clock = clock
+        # Least recently used first
+        self.entries: 'OrderedDict[Hashable, _Entry]' = OrderedDict()
+        # LFU only: keys by hit count, least recently used first within each count
+        self.by_hits: Dict[int, 'OrderedDict[Hashable, None]'] = {}
+        self.min_hits = 0
+        self.bytes = 0
+        self.refreshing = set()
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0,
+                      'expirations': 0, 'rejected': 0, 'refreshes': 0, 'refresh_errors': 0}
+        _registry[namespace] = self
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def __contains__(self, key):
+        return key in self.entries
+    
+    def keys(self) -> List[Hashable]:
+        with self.lock:
+            return list(self.entries)
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """The key's value while it is fresh, else default"""
+        state, value = self._lookup(key, allow_stale=False)
+        return value if state == FRESH else default
+    
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """The key's value, fresh or not, without counting a hit or touching its recency"""
+        entry = self.entries.get(key)
+        return entry.value if entry is not None else default
+    
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None,
+                    size: Optional[int] = None) -> Any:
+        """
+        The key's value, loading it on a miss.
+        
+        A value past its TTL but within stale_ttl is returned as is and
+        reloaded in a background thread. Loader errors on a miss propagate
+        and nothing is cached.
+        """
+        state, value = self._lookup(key, allow_stale=True)
+        if state == FRESH:
+            return value
+        if state == STALE:
+            self._refresh_in_background(key, loader, ttl, size)
+            return value
+        value = loader()
+        self.set(key, value, ttl=ttl, size=size)
+        return value
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, size: Optional[int] = None) -> bool:
+        """
+        Cache a value, evicting others to stay within budget.
+        
+        ttl defaults to the cache's; returns False (caching nothing) when the
+        value alone is larger than the budget.
+        """
+        size = self.sizer(value) if size is None else size
+        ttl = self.ttl if ttl is None else ttl
+        now = self.clock()
+        expires_at = now + ttl if ttl is not None else None
+        stale_until = expires_at + self.stale_ttl if expires_at is not None else None
+        
+        evicted = []
+        with self.lock:
+            if key in self.entries:
+                self._unlink(key)
+            if size > self.max_bytes:
+                self.stats['rejected'] += 1
+                return False
+            while self.entries and (self.bytes + size > self.max_bytes or
+                                    (self.max_entries is not None and len(self.entries) >= self.max_entries)):
+                victim = self._victim()
+                evicted.append((victim, self._unlink(victim).value))
+                self.stats['evictions'] += 1
+            
+            self.entries[key] = _Entry(value, size, expires_at, stale_until)
+            self.bytes += size
+            if self.policy == LFU:
+                self.by_hits.setdefault(0, OrderedDict())[key] = None
+                self.min_hits = 0
+            self.stats['sets'] += 1
+        
+        self._evicted(evicted)
+        return True
+    
+    def delete(self, key: Hashable) -> bool:
+        with self.lock:
+            if key not in self.entries:
+                return False
+            self._unlink(key)
+            return True
+    
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.by_hits.clear()
+            self.min_hits = 0
+            self.bytes = 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        lookups = self.stats['hits'] + self.stats['stale_hits'] + self.stats['misses']
+        return {
+            'namespace': self.namespace,
+            'policy': self.policy,
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'max_entries': self.max_entries,
+            'hit_ratio': round((self.stats['hits'] + self.stats['stale_hits']) / lookups, 4) if lookups else None,
+            **self.stats
+        }
+    
+    def _lookup(self, key: Hashable, allow_stale: bool) -> Tuple[str, Any]:
+        evicted = []
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return MISS, None
+            now = self.clock()
+            if entry.expires_at is None or now < entry.expires_at:
+                state = FRESH
+            elif now < entry.stale_until:
+                state = STALE
+            else:
+                self._unlink(key)
+                evicted.append((key, entry.value))
+                self.stats['expirations'] += 1
+                state = MISS
+            
+            if state == FRESH or (state == STALE and allow_stale):
+                self.stats['hits' if state == FRESH else 'stale_hits'] += 1
+                self._touch(key, entry)
+            else:
+                self.stats['misses'] += 1
+        
+        self._evicted(evicted)
+        return state, entry.value if state != MISS else None
+    
+    def _touch(self, key: Hashable, entry: _Entry) -> None:
+        self.entries.move_to_end(key)
+        if self.policy == LFU:
+            bucket = self.by_hits[entry.hits]
+            del bucket[key]
+            self.by_hits.setdefault(entry.hits + 1, OrderedDict())[key] = None
+            if not bucket:
+                del self.by_hits[entry.hits]
+                if self.min_hits == entry.hits:
+                    self.min_hits = entry.hits + 1
+        entry.hits += 1
+    
+    def _victim(self) -> Hashable:
+        if self.policy == LFU:
+            return next(iter(self.by_hits[self.min_hits]))
+        return next(iter(self.entries))
+    
+    def _unlink(self, key: Hashable) -> _Entry:
+        entry = self.entries.pop(key)
+        self.bytes -= entry.size
+        if self.policy == LFU:
+            self._unlink_hits(key, entry.hits)
+        return entry
+    
+    def _unlink_hits(self, key: Hashable, hits: int) -> None:
+        bucket = self.by_hits[hits]
+        del bucket[key]
+        if not bucket:
+            del self.by_hits[hits]
+            if hits == self.min_hits:
+                self.min_hits = min(self.by_hits) if self.by_hits else 0
+    
+    def _evicted(self, evicted: List[Tuple[Hashable, Any]]) -> None:
+        # Outside the lock, so the callback may use the cache
+        if self.on_evict is None:
+            return
+        for key, value in evicted:
+            try:
+                self.on_evict(key, value)
+            except Exception as e:
+                logger.warning(f"Cache {self.namespace} eviction callback failed for {key}: {e}")
+    
+    def _refresh_in_background(self, key: Hashable, loader: Callable[[], Any],
+                               ttl: Optional[float], size: Optional[int]) -> None:
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+        
+        def refresh():
+            try:
+                self.set(key, loader(), ttl=ttl, size=size)
+                self.stats['refreshes'] += 1
+            except Exception as e:
+                # Keep serving the stale value until it runs out
+                self.stats['refresh_errors'] += 1
+                logger.warning(f"Cache {self.namespace} failed to refresh {key}: {e}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+        
+        threading.Thread(target=refresh, name=f'cache-refresh-{self.namespace}', daemon=True).start()
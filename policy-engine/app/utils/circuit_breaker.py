@@ -0,0 +1,150 @@
+"""Circuit breaker for database access
+
+After failure_threshold consecutive connection-level failures the breaker
+opens and every database call fails at once with DatabaseUnavailableError,
+instead of each request waiting out its own connect or statement timeout.
+After reset_timeout seconds one call is let through as a probe: success
+closes the breaker, failure opens it for another reset_timeout.
+
+guard_engine attaches a breaker to a SQLAlchemy engine, so it covers every
+query made through the session without wrapping call sites.
+"""
+
+from typing import Any, Callable, Dict, Optional
+import logging
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from app.utils.exceptions import DatabaseUnavailableError
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Errors that mean the database could not be used, as opposed to a bad query
+DATABASE_ERRORS = (DatabaseUnavailableError, OperationalError, InterfaceError)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker, safe to share between threads"""
+    
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 10.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_started: Optional[float] = None
+        self.lock = threading.Lock()
+        self.stats = {'opened': 0, 'rejected': 0, 'failures': 0}
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+    
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; in half-open state only one probe at a time does"""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == OPEN:
+            return False
+        with self.lock:
+            now = self.clock()
+            # A probe that never reported back (e.g. a query error unrelated
+            # to availability) must not hold the breaker half-open forever
+            if self.probe_started is None or now - self.probe_started >= self.reset_timeout:
+                self.probe_started = now
+                return True
+            return False
+    
+    def before_call(self) -> None:
+        """Raise DatabaseUnavailableError unless a call may go ahead"""
+        if not self.allow():
+            self.stats['rejected'] += 1
+            raise DatabaseUnavailableError(f"{self.name} unavailable: circuit open")
+    
+    def record_success(self) -> None:
+        if self.opened_at is None and self.failures == 0:
+            return
+        with self.lock:
+            if self.opened_at is not None:
+                logger.info(f"{self.name} circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self.probe_started = None
+    
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            self.stats['failures'] += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"{self.name} circuit opened after {self.failures} consecutive failures")
+                    self.stats['opened'] += 1
+                # A failed probe restarts the wait
+                self.opened_at = self.clock()
+                self.probe_started = None
+    
+    def trip(self) -> None:
+        """Open the breaker now, e.g. ahead of planned database maintenance"""
+        with self.lock:
+            if self.opened_at is None:
+                self.stats['opened'] += 1
+            self.opened_at = self.clock()
+            self.probe_started = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            **self.stats
+        }
+
+
+def guard_engine(engine, breaker: CircuitBreaker) -> None:
+    """Route every connection attempt and statement on the engine through the breaker"""
+    
+    @event.listens_for(engine, 'do_connect')
+    def _before_connect(dialect, conn_rec, cargs, cparams):
+        breaker.before_call()
+    
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        breaker.before_call()
+    
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        breaker.record_success()
+    
+    @event.listens_for(engine, 'handle_error')
+    def _on_error(context):
+        if isinstance(context.original_exception, DatabaseUnavailableError):
+            return
+        if context.is_disconnect or isinstance(context.sqlalchemy_exception, (OperationalError, InterfaceError)):
+            breaker.record_failure()
+
+
+def init_database_breaker(app, db) -> CircuitBreaker:
+    """Create the app's database breaker and attach it to the app's engine"""
+    breaker = CircuitBreaker(
+        'database',
+        failure_threshold=app.config.get('DB_BREAKER_FAILURE_THRESHOLD', 5),
+        reset_timeout=app.config.get('DB_BREAKER_RESET_SECONDS', 10.0)
+    )
+    with app.app_context():
+        guard_engine(db.engine, breaker)
+    app.extensions['database_breaker'] = breaker
+    return breaker
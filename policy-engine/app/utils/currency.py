@@ -1,37 +1,44 @@
 """Currency conversion utilities for policy engine"""
 
 import requests
-from typing import Dict, Optional
-from datetime import datetime, timedelta
+import logging
+from typing import Dict, Iterable, Optional
+from app.utils.cache import BoundedCache
 from app.utils.exceptions import CurrencyConversionError
 
+logger = logging.getLogger(__name__)
+
+# Default exchange rates (fallback if API fails)
+DEFAULT_RATES = {
+    'EUR': {'USD': 1.10, 'GBP': 0.85, 'EUR': 1.0},
+    'USD': {'EUR': 0.91, 'GBP': 0.77, 'USD': 1.0},
+    'GBP': {'USD': 1.30, 'EUR': 1.18, 'GBP': 1.0}
+}
+
 class CurrencyConverter:
     """Handles currency conversion for policy evaluation"""
     
+    # Shared by every converter in the process, so rates fetched (or preloaded
+    # before gunicorn forks) once serve all requests. Rates older than an hour
+    # are still used for a day while they are refetched in the background.
+    cache = BoundedCache('exchange_rates', max_bytes=1024 * 1024, ttl=3600, stale_ttl=24 * 3600)
+    
     def __init__(self):
         self.base_url = "https://api.exchangerate-api.com/v4/latest"
-        self.cache = {}
-        self.cache_expiry = timedelta(hours=1)
         
-        # Default exchange rates (fallback if API fails)
-        self.default_rates = {
-            'EUR': {'USD': 1.10, 'GBP': 0.85, 'EUR': 1.0},
-            'USD': {'EUR': 0.91, 'GBP': 0.77, 'USD': 1.0},
-            'GBP': {'USD': 1.30, 'EUR': 1.18, 'GBP': 1.0}
-        }
+        self.default_rates = DEFAULT_RATES
     
     def get_exchange_rate(self, from_currency: str, to_currency: str) -> float:
         """Get exchange rate between two currencies"""
         if from_currency == to_currency:
             return 1.0
         
-        # Check cache first
-        cache_key = f"{from_currency}_{to_currency}"
-        if cache_key in self.cache:
-            cached_data = self.cache[cache_key]
-            if datetime.now() - cached_data['timestamp'] < self.cache_expiry:
-                return cached_data['rate']
-        
+        return self.cache.get_or_load(
+            f"{from_currency}_{to_currency}",
+            lambda: self._fetch_exchange_rate(from_currency, to_currency)
+        )
+    
+    def _fetch_exchange_rate(self, from_currency: str, to_currency: str) -> float:
         try:
             # Try to fetch from API
             response = requests.get(f"{self.base_url}/{from_currency}", timeout=5)
@@ -43,28 +50,16 @@ class CurrencyConverter:
             if to_currency not in rates:
                 raise CurrencyConversionError(f"Currency {to_currency} not supported")
             
-            rate = rates[to_currency]
-            
-            # Cache the result
-            self.cache[cache_key] = {
-                'rate': rate,
-                'timestamp': datetime.now()
-            }
+            # Cache every rate from this base; one response covers all targets
+            for currency, currency_rate in rates.items():
+                self.cache.set(f"{from_currency}_{currency}", currency_rate)
             
-            return rate
+            return rates[to_currency]
             
         except (requests.RequestException, KeyError) as e:
-            # Fallback to default rates
+            # Fallback to default rates (cached like fetched ones)
             if from_currency in self.default_rates and to_currency in self.default_rates[from_currency]:
-                rate = self.default_rates[from_currency][to_currency]
-                
-                # Cache the fallback rate
-                self.cache[cache_key] = {
-                    'rate': rate,
-                    'timestamp': datetime.now()
-                }
-                
-                return rate
+                return self.default_rates[from_currency][to_currency]
             
             raise CurrencyConversionError(f"Failed to get exchange rate for {from_currency} to {to_currency}: {e}")
     
@@ -82,4 +77,33 @@ class CurrencyConverter:
     
     def get_supported_currencies(self) -> list:
         """Get list of supported currencies"""
-        return ['EUR', 'USD', 'GBP', 'CHF', 'SEK', 'NOK', 'DKK', 'PLN', 'CZK', 'HUF']
\ No newline at end of file
+        return ['EUR', 'USD', 'GBP', 'CHF', 'SEK', 'NOK', 'DKK', 'PLN', 'CZK', 'HUF']
+    
+    @classmethod
+    def preload(cls, currencies: Iterable[str] = tuple(DEFAULT_RATES)) -> None:
+        """Fill the shared rate cache for every pair of currencies"""
+        converter = cls()
+        currencies = list(currencies)
+        for from_currency in currencies:
+            for to_currency in currencies:
+                try:
+                    converter.get_exchange_rate(from_currency, to_currency)
+                except CurrencyConversionError as e:
+                    logger.warning(f"Could not preload exchange rate: {e}")
+
+class StaticCurrencyConverter(CurrencyConverter):
+    """Currency conversion from a fixed rate table, without network calls"""
+    
+    def __init__(self, rates: Optional[Dict[str, Dict[str, float]]] = None):
+        super().__init__()
+        self.default_rates = rates or DEFAULT_RATES
+    
+    def get_exchange_rate(self, from_currency: str, to_currency: str) -> float:
+        """Get exchange rate between two currencies"""
+        if from_currency == to_currency:
+            return 1.0
+        
+        try:
+            return self.default_rates[from_currency][to_currency]
+        except KeyError:
+            raise CurrencyConversionError(f"No exchange rate for {from_currency} to {to_currency}")
\ No newline at end of file
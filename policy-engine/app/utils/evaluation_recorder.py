@@ -0,0 +1,125 @@
+"""Opt-in recording of evaluation requests to rotating NDJSON files for replay
+
+Each line is:
+    {
+        'recorded_at': ISO timestamp,
+        'endpoint': 'evaluate|evaluate-batch',
+        'org_id': str,                    # kept so replays resolve the org's policies
+        'user_id': str,                   # salted hash
+        'full_detail': bool,
+        'travel_data': {...} | 'offers': [{'id', 'travel_data'}, ...],
+        'results': [str, ...],            # final result per offer
+        'duration_ms': float
+    }
+
+Personal data in travel data (passenger names, contact details, dates of
+birth, addresses, documents) is replaced by a salted hash; prices,
+currencies, segments and other structure are kept as-is.
+"""
+
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+
+logger = logging.getLogger(__name__)
+
+PII_KEYS = {
+    'firstname', 'lastname', 'fullname', 'email', 'phonenumber', 'phone',
+    'dateofbirth', 'date_of_birth', 'birthdate', 'residentialaddress', 'address',
+    'addresslines', 'postalcode', 'passportinformation', 'passport', 'documentnumber',
+}
+
+RECORD_FILENAME = 'evaluations.ndjson'
+
+
+def record_filename(worker_id: Any = None) -> str:
+    """evaluations.ndjson, or evaluations-<worker>.ndjson for a multi-process server"""
+    if worker_id is None:
+        return RECORD_FILENAME
+    return f'evaluations-{worker_id}.ndjson'
+
+
+class EvaluationRecorder:
+    """Writes anonymised evaluation requests to size-rotated NDJSON files"""
+    
+    def __init__(self, directory: str, salt: str, sample_rate: float = 1.0,
+                 max_bytes: int = 50 * 1024 * 1024, backups: int = 10, filename: str = RECORD_FILENAME):
+        os.makedirs(directory, exist_ok=True)
+        self.salt = salt.encode()
+        self.sample_rate = sample_rate
+        # RotatingFileHandler serialises writes across threads and rotates
+        # evaluations.ndjson -> evaluations.ndjson.1 ... .N
+        self.handler = RotatingFileHandler(
+            os.path.join(directory, filename), maxBytes=max_bytes, backupCount=backups
+        )
+        self.handler.setFormatter(logging.Formatter('%(message)s'))
+    
+    def anonymise_id(self, value: Any) -> Optional[str]:
+        if value is None:
+            return None
+        return hmac.new(self.salt, str(value).encode(), hashlib.sha256).hexdigest()[:32]
+    
+    def anonymise(self, data: Any) -> Any:
+        """Copy of data with personal fields replaced by salted hashes"""
+        if isinstance(data, dict):
+            return {
+                key: self.anonymise_id(json.dumps(value, sort_keys=True, default=str))
+                if key.lower() in PII_KEYS and value is not None else self.anonymise(value)
+                for key, value in data.items()
+            }
+        if isinstance(data, list):
+            return [self.anonymise(item) for item in data]
+        return data
+    
+    def record(self, endpoint: str, payload: Dict[str, Any], results: List[str], duration_ms: float) -> None:
+        """Record one request; never raises into the request path"""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        try:
+            entry = {
+                'recorded_at': datetime.utcnow().isoformat() + 'Z',
+                'endpoint': endpoint,
+                'org_id': payload.get('org_id'),
+                'user_id': self.anonymise_id(payload.get('user_id')),
+                'full_detail': payload.get('full_detail', True),
+            }
+            if 'offers' in payload:
+                entry['offers'] = [
+                    {'id': offer.get('id'), 'travel_data': self.anonymise(offer.get('travel_data'))}
+                    for offer in payload['offers']
+                ]
+            else:
+                entry['travel_data'] = self.anonymise(payload.get('travel_data'))
+            entry['results'] = results
+            entry['duration_ms'] = round(duration_ms, 3)
+            
+            self.handler.emit(logging.makeLogRecord({'msg': json.dumps(entry, default=str)}))
+        except Exception as e:
+            logger.warning(f"Failed to record evaluation: {e}")
+    
+    def close(self) -> None:
+        self.handler.close()
+
+
+def init_recorder(app, worker_id: Any = None) -> Optional[EvaluationRecorder]:
+    """Create the app's recorder when EVALUATION_RECORD_DIR is configured"""
+    directory = app.config.get('EVALUATION_RECORD_DIR')
+    if not directory:
+        return None
+    recorder = EvaluationRecorder(
+        directory,
+        salt=app.config['EVALUATION_RECORD_SALT'],
+        sample_rate=app.config.get('EVALUATION_RECORD_SAMPLE_RATE', 1.0),
+        max_bytes=app.config.get('EVALUATION_RECORD_MAX_BYTES', 50 * 1024 * 1024),
+        backups=app.config.get('EVALUATION_RECORD_BACKUPS', 10),
+        filename=record_filename(worker_id)
+    )
+    app.extensions['evaluation_recorder'] = recorder
+    logger.info(f"Recording evaluation requests to {directory}")
+    return recorder
@@ -22,4 +22,8 @@ class RuleSpecificationError(PolicyEngineError):
 
 class CurrencyConversionError(PolicyEngineError):
     """Raised when currency conversion fails"""
-    pass
\ No newline at end of file
+    pass
+
+class DatabaseUnavailableError(PolicyEngineError):
+    """Raised when the database cannot be reached or its circuit breaker is open"""
+    pass
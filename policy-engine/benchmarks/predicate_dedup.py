@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Benchmark cross-policy predicate deduplication on overlapping policy sets
+
+Usage:
+    python benchmarks/predicate_dedup.py [--policies 8] [--offers 5000] [--seed 7]
+"""
+
+import argparse
+import random
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.evaluation_service import PolicyEvaluationService
+from app.services.policy_compiler import CompiledPolicySet
+
+# Rules most orgs copy between policies, with a few common parameter choices
+RULE_TEMPLATES = [
+    ('train_class_max', [{'max_class': 'FIRST'}, {'max_class': 'STANDARD'}]),
+    ('train_max_od_price', [{'max_price': 250, 'currency': 'EUR'}, {'max_price': 500, 'currency': 'EUR'}]),
+    ('train_advanced_purchase', [{'min_days': 3}, {'min_days': 7, 'exclude_same_day': True}]),
+    ('train_operator_preference', [{'restricted_operators': ['THA', 'OUIGO'], 'preference_level': 'PREFERRED'}]),
+    ('train_route_restriction', [{'restricted_routes': [f'ST{i}_ST{i + 1}' for i in range(0, 60, 2)]}]),
+]
+
+ACTIONS = ['OUT_OF_POLICY', 'BLOCK', 'HIDE']
+
+
+def build_policies(policy_count, rng):
+    """Synthetic org: every policy picks most rule families from the shared templates"""
+    policies = []
+    for policy_index in range(policy_count):
+        rules = []
+        for rule_index, (code, variants) in enumerate(RULE_TEMPLATES):
+            if rng.random() < 0.8:
+                rules.append({
+                    'id': f'rule-{policy_index}-{rule_index}',
+                    'code': code,
+                    'action': 'OUT_OF_POLICY',
+                    'vars': dict(rng.choice(variants)),
+                    'exceptions': [
+                        {'code': 'train_class_max', 'vars': {'max_class': 'STANDARD'}}
+                    ] if code == 'train_max_od_price' else []
+                })
+        policies.append({
+            'id': f'policy-{policy_index}',
+            'label': f'Policy {policy_index}',
+            'action': rng.choice(ACTIONS),
+            'rules': rules
+        })
+    return policies
+
+
+def build_offers(offer_count, rng):
+    now = datetime.utcnow()
+    return [
+        {
+            'train': {
+                'price': rng.randint(40, 700),
+                'currency': 'EUR',
+                'class': rng.choice(['STANDARD', 'COMFORT', 'FIRST', 'BUSINESS']),
+                'operator': rng.choice(['EUROSTAR', 'SNCF', 'DB', 'THA']),
+                'departure_date': (now + timedelta(days=rng.randint(0, 30), hours=2)).isoformat()
+            },
+            'origin': f'ST{rng.randint(0, 60)}',
+            'destination': f'ST{rng.randint(0, 60)}'
+        }
+        for _ in range(offer_count)
+    ]
+
+
+def run(service, compiled, offers):
+    start = time.perf_counter()
+    results = [service.evaluate(offer, compiled, 'bench-user')['result'] for offer in offers]
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--policies', type=int, default=8)
+    parser.add_argument('--offers', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    baseline = PolicyEvaluationService(dedupe_predicates=False)
+    deduped = PolicyEvaluationService(dedupe_predicates=True)
+    
+    compiled = CompiledPolicySet.from_data('bench-org', build_policies(args.policies, rng), deduped.rule_registry)
+    offers = build_offers(args.offers, rng)
+    
+    rule_refs = sum(len(policy.rules) + sum(len(rule.exceptions) for rule in policy.rules) for policy in compiled.policies)
+    print(f"Policies: {len(compiled)}  rule/exception references: {rule_refs}  unique predicates: {len(compiled.predicates)}")
+    
+    # Warm up both paths (currency table, imports)
+    run(baseline, compiled, offers[:50])
+    run(deduped, compiled, offers[:50])
+    
+    baseline_time, baseline_results = run(baseline, compiled, offers)
+    deduped_time, deduped_results = run(deduped, compiled, offers)
+    
+    assert baseline_results == deduped_results, "Deduplication changed evaluation results"
+    
+    print(f"Without dedup: {baseline_time * 1e6 / len(offers):8.1f} us/offer")
+    print(f"With dedup:    {deduped_time * 1e6 / len(offers):8.1f} us/offer")
+    print(f"Speedup:       {baseline_time / deduped_time:8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
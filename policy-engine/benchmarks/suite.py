@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""Policy engine benchmark suite, in-process against an embedded snapshot and SQLite
+
+Generates a synthetic org with N policies x M rules x K exceptions, evaluates a
+batch of synthetic offers and writes the results as JSON for diffing between
+releases:
+
+- per-rule cost (ns per apply, per rule specification)
+- per-evaluation latency percentiles (embedded and SQLite, full and short-circuit)
+- database queries per evaluation (SQLite path), both 'uncached' (every
+  evaluation loads and compiles the org's policies) and 'cached' (through the
+  app's PolicySetCache, as the HTTP service runs)
+- memory per compiled policy set (tracemalloc)
+
+Usage:
+    python benchmarks/suite.py [--policies 10] [--rules 5] [--exceptions 1] [--offers 2000]
+        [--seed 7] [--skip-db] [--output results.json] [--baseline previous.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.evaluator import PolicyEvaluator
+from app.services.rule_engine import PolicyContext
+
+ACTIONS = ['OUT_OF_POLICY', 'APPROVE', 'BLOCK', 'HIDE']
+CLASSES = ['STANDARD', 'COMFORT', 'FIRST', 'BUSINESS', 'PREMIUM']
+OPERATORS = ['EUROSTAR', 'SNCF', 'DB', 'THA', 'OUIGO', 'TRENITALIA']
+STATIONS = [f'ST{index}' for index in range(60)]
+
+
+def random_rule_vars(code, rng):
+    """Plausible vars for each registered rule specification"""
+    if code == 'train_max_od_price':
+        return {'max_price': rng.choice([150, 250, 400, 600]), 'currency': rng.choice(['EUR', 'GBP'])}
+    if code == 'train_advanced_purchase':
+        return {'min_days': rng.randint(1, 14), 'exclude_same_day': rng.random() < 0.3}
+    if code == 'train_class_max':
+        return {'max_class': rng.choice(CLASSES[:4]), 'exclude_premium': rng.random() < 0.5}
+    if code == 'train_operator_preference':
+        return {
+            'preferred_operators': rng.sample(OPERATORS, 2),
+            'restricted_operators': rng.sample(OPERATORS, 1),
+            'preference_level': rng.choice(['PREFERRED', 'REQUIRED', 'AVOID'])
+        }
+    if code == 'train_route_restriction':
+        return {'restricted_routes': [f'{rng.choice(STATIONS)}_{rng.choice(STATIONS)}' for _ in range(20)]}
+    return {}
+
+
+def build_policies(policy_count, rules_per_policy, exceptions_per_rule, codes, rng):
+    policies = []
+    for policy_index in range(policy_count):
+        action = rng.choice(ACTIONS)
+        rules = []
+        for rule_index in range(rules_per_policy):
+            code = codes[(policy_index + rule_index) % len(codes)]
+            rules.append({
+                'id': f'rule-{policy_index}-{rule_index}',
+                'code': code,
+                'action': action,
+                'vars': random_rule_vars(code, rng),
+                'exceptions': [
+                    {'code': exception_code, 'vars': random_rule_vars(exception_code, rng)}
+                    for exception_code in rng.sample(codes, min(exceptions_per_rule, len(codes)))
+                ]
+            })
+        policies.append({
+            'id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'label': f'Policy {policy_index}',
+            'action': action,
+            'enforce_approval': rng.random() < 0.2,
+            'approvers': [str(uuid.UUID(int=rng.getrandbits(128)))],
+            'rules': rules
+        })
+    return policies
+
+
+def build_offers(offer_count, rng):
+    now = datetime.utcnow()
+    return [
+        {
+            'train': {
+                'price': rng.randint(30, 800),
+                'currency': rng.choice(['EUR', 'EUR', 'GBP']),
+                'class': rng.choice(CLASSES),
+                'operator': rng.choice(OPERATORS),
+                'departure_date': (now + timedelta(days=rng.randint(0, 45), hours=2)).isoformat()
+            },
+            'origin': rng.choice(STATIONS),
+            'destination': rng.choice(STATIONS)
+        }
+        for _ in range(offer_count)
+    ]
+
+
+def percentiles(samples_us):
+    ordered = sorted(samples_us)
+    
+    def at(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 1)
+    
+    return {
+        'count': len(ordered),
+        'mean': round(statistics.fmean(ordered), 1),
+        'p50': at(0.50),
+        'p90': at(0.90),
+        'p99': at(0.99),
+        'max': round(ordered[-1], 1)
+    }
+
+
+def time_each(function, items):
+    samples = []
+    for item in items:
+        start = time.perf_counter()
+        function(item)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def bench_rule_costs(evaluator, policies, offers):
+    """Mean ns per apply for each rule specification, over the generated vars"""
+    costs = {}
+    for code in evaluator.rule_registry.list_rules():
+        spec = evaluator.rule_registry.get_rule_spec(code)
+        rule_vars = [rule['vars'] for policy in policies for rule in policy['rules'] if rule['code'] == code]
+        if not rule_vars:
+            continue
+        contexts = [PolicyContext(offer, 'bench-org', 'bench-user', evaluator.currency_converter) for offer in offers]
+        calls = 0
+        start = time.perf_counter()
+        for index, context in enumerate(contexts):
+            spec.apply(context, rule_vars[index % len(rule_vars)])
+            calls += 1
+        costs[code] = {
+            'ns_per_apply': round((time.perf_counter() - start) * 1e9 / calls),
+            'declared_cost': spec.cost,
+            'declared_selectivity': spec.selectivity
+        }
+    return costs
+
+
+def bench_compiled_memory(evaluator, policies):
+    """Bytes allocated by compiling the policy set, measured with tracemalloc"""
+    evaluator.compile('bench-org', policies)  # warm up imports and caches
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    compiled = evaluator.compile('bench-org', policies)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return {
+        'bytes': allocated,
+        'bytes_per_policy': round(allocated / max(len(policies), 1)),
+        'unique_predicates': len(compiled.predicates)
+    }, compiled
+
+
+def bench_embedded(evaluator, compiled, offers):
+    results = {}
+    for name, full_detail in (('full_detail', True), ('short_circuit', False)):
+        evaluator.evaluate(offers[0], compiled, 'bench-user', full_detail)
+        samples = time_each(lambda offer: evaluator.evaluate(offer, compiled, 'bench-user', full_detail), offers)
+        results[name] = percentiles(samples)
+    return results
+
+
+def bench_database(policies, offers):
+    """
+    Service path against SQLite, with query counts: 'uncached' without the
+    app's policy cache (load, compile, evaluate per call) and 'cached' with it
+    (a version check at most every refresh interval, then evaluate)
+    """
+    from sqlalchemy import event
+    from app import create_app, db
+    from app.config import TestingConfig
+    from app.models import Policy, PolicyApprover, PolicyRule, PolicyRuleException
+    from app.services.evaluation_service import PolicyEvaluationService
+    
+    app = create_app(TestingConfig)
+    with app.app_context():
+        @event.listens_for(db.engine, 'connect')
+        def _register_sqlite_functions(dbapi_connection, connection_record):
+            dbapi_connection.create_function('gen_random_uuid', 0, lambda: uuid.uuid4().hex)
+        
+        db.create_all()
+        org_id = uuid.uuid4()
+        for policy_data in policies:
+            policy = Policy(org_id=org_id, label=policy_data['label'], action=policy_data['action'],
+                            enforce_approval=policy_data['enforce_approval'], rule_count=len(policy_data['rules']))
+            db.session.add(policy)
+            for approver_id in policy_data['approvers']:
+                db.session.add(PolicyApprover(policy=policy, user_id=uuid.UUID(approver_id)))
+            for rule_data in policy_data['rules']:
+                rule = PolicyRule(policy=policy, code=rule_data['code'], action=rule_data['action'], vars=rule_data['vars'])
+                db.session.add(rule)
+                for exception_data in rule_data['exceptions']:
+                    db.session.add(PolicyRuleException(rule=rule, code=exception_data['code'], vars=exception_data['vars']))
+        db.session.commit()
+        
+        queries = [0]
+        
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def _count_query(conn, cursor, statement, parameters, context, executemany):
+            queries[0] += 1
+        
+        service = PolicyEvaluationService()
+        policy_cache = app.extensions.pop('policy_cache')
+        results = {}
+        for path in ('uncached', 'cached'):
+            if path == 'cached':
+                app.extensions['policy_cache'] = policy_cache
+            results[path] = {}
+            for name, full_detail in (('full_detail', True), ('short_circuit', False)):
+                service.evaluate_policies(offers[0], str(org_id), 'bench-user', full_detail)
+                db.session.expire_all()
+                queries[0] = 0
+                samples = []
+                for offer in offers:
+                    start = time.perf_counter()
+                    service.evaluate_policies(offer, str(org_id), 'bench-user', full_detail)
+                    samples.append((time.perf_counter() - start) * 1e6)
+                    # Each request runs in a fresh session in the HTTP service
+                    db.session.remove()
+                results[path][name] = dict(percentiles(samples), queries_per_evaluation=round(queries[0] / len(offers), 2))
+        
+        event.remove(db.engine, 'before_cursor_execute', _count_query)
+        db.session.remove()
+        db.drop_all()
+    return results
+
+
+def compare(results, baseline):
+    """Print relative changes of the headline metrics against a previous run"""
+    def metrics(run):
+        flat = {}
+        modes = {'embedded': run.get('embedded') or {}}
+        for path, stats_by_name in (run.get('database') or {}).items():
+            modes[f'database.{path}'] = stats_by_name
+        for mode, stats_by_name in modes.items():
+            for name, stats in stats_by_name.items():
+                for key in ('p50', 'p99', 'queries_per_evaluation'):
+                    if key in stats:
+                        flat[f'{mode}.{name}.{key}'] = stats[key]
+        for code, stats in run.get('rule_costs', {}).items():
+            flat[f'rule_costs.{code}.ns_per_apply'] = stats['ns_per_apply']
+        flat['compiled_memory.bytes'] = run.get('compiled_memory', {}).get('bytes')
+        return flat
+    
+    current, previous = metrics(results), metrics(baseline)
+    for key, value in current.items():
+        before = previous.get(key)
+        if before:
+            print(f"  {key:55s} {before:>12} -> {value:>12} ({(value - before) * 100 / before:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--policies', type=int, default=10)
+    parser.add_argument('--rules', type=int, default=5, help='Rules per policy')
+    parser.add_argument('--exceptions', type=int, default=1, help='Exceptions per rule')
+    parser.add_argument('--offers', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--skip-db', action='store_true', help='Only benchmark the embedded evaluator')
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    parser.add_argument('--baseline', help='Previous JSON results to compare against')
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    evaluator = PolicyEvaluator()
+    policies = build_policies(args.policies, args.rules, args.exceptions, evaluator.rule_registry.list_rules(), rng)
+    offers = build_offers(args.offers, rng)
+    
+    compiled_memory, compiled = bench_compiled_memory(evaluator, policies)
+    results = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'params': vars(args)
+        },
+        'rule_costs': bench_rule_costs(evaluator, policies, offers),
+        'compiled_memory': compiled_memory,
+        'embedded': bench_embedded(evaluator, compiled, offers),
+        'database': None if args.skip_db else bench_database(policies, offers[:max(1, args.offers // 4)])
+    }
+    
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            print(f"Compared with {args.baseline}:")
+            compare(results, json.load(baseline_file))
+
+
+if __name__ == '__main__':
+    main()
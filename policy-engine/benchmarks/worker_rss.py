@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Per-worker memory of the policy engine under gunicorn, with and without preloading
+
+Starts gunicorn with the production profile (gunicorn.conf.py) and N workers,
+evaluates an offer for every org repeatedly so each worker ends up holding
+every compiled policy set, then reads each worker's /proc/<pid>/smaps_rollup
+(Linux only):
+
+- rss: resident memory, shared or not
+- pss: proportional share, with shared pages split between the processes using them
+- private: pages only this worker has, copied on write or allocated after fork
+
+--seed first fills the database with synthetic orgs (use a scratch database).
+
+Usage:
+    DATABASE_URL=sqlite:////tmp/rss.db python benchmarks/worker_rss.py --seed --orgs 500 --workers 8
+        [--mode both|preload|lazy] [--output rss.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from suite import build_offers, build_policies
+
+
+def seed(org_count, policies_per_org, rules, exceptions, rng):
+    """Insert synthetic orgs into DATABASE_URL; returns their IDs"""
+    from sqlalchemy import event
+    from app import create_app, db
+    from app.models import Policy, PolicyApprover, PolicyRule, PolicyRuleException
+    from app.services.rule_engine import RuleRegistry
+    
+    app = create_app()
+    codes = RuleRegistry().list_rules()
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            @event.listens_for(db.engine, 'connect')
+            def _register_sqlite_functions(dbapi_connection, connection_record):
+                dbapi_connection.create_function('gen_random_uuid', 0, lambda: uuid.uuid4().hex)
+            db.engine.dispose()
+        db.create_all()
+        
+        org_ids = []
+        for _ in range(org_count):
+            org_id = uuid.UUID(int=rng.getrandbits(128))
+            org_ids.append(str(org_id))
+            for policy_data in build_policies(policies_per_org, rules, exceptions, codes, rng):
+                policy = Policy(org_id=org_id, label=policy_data['label'], action=policy_data['action'],
+                                enforce_approval=policy_data['enforce_approval'], rule_count=len(policy_data['rules']))
+                db.session.add(policy)
+                for approver_id in policy_data['approvers']:
+                    db.session.add(PolicyApprover(policy=policy, user_id=uuid.UUID(approver_id)))
+                for rule_data in policy_data['rules']:
+                    rule = PolicyRule(policy=policy, code=rule_data['code'], action=rule_data['action'], vars=rule_data['vars'])
+                    db.session.add(rule)
+                    for exception_data in rule_data['exceptions']:
+                        db.session.add(PolicyRuleException(rule=rule, code=exception_data['code'], vars=exception_data['vars']))
+            db.session.commit()
+    return org_ids
+
+
+def active_org_ids():
+    from app import create_app, db
+    from app.models import Policy
+    
+    app = create_app()
+    with app.app_context():
+        return [str(org_id) for (org_id,) in db.session.query(Policy.org_id).filter(Policy.active == True).distinct()]
+
+
+def smaps_rollup(pid):
+    """Memory totals of a process in kB"""
+    totals = {}
+    with open(f'/proc/{pid}/smaps_rollup') as smaps:
+        for line in smaps:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                totals[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss_kb': totals.get('Rss', 0),
+        'pss_kb': totals.get('Pss', 0),
+        'shared_kb': totals.get('Shared_Clean', 0) + totals.get('Shared_Dirty', 0),
+        'private_kb': totals.get('Private_Clean', 0) + totals.get('Private_Dirty', 0)
+    }
+
+
+def children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as children_file:
+        return [int(child) for child in children_file.read().split()]
+
+
+def wait_until_ready(base_url, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited during startup')
+        try:
+            if requests.get(f'{base_url}/swagger.json', timeout=2).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError('gunicorn did not become ready')
+
+
+def measure(mode, workers, port, org_ids, offer, rounds):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port), LOG_LEVEL='warning',
+               POLICY_CACHE_PRELOAD='true' if mode == 'preload' else 'false')
+    base_url = f'http://127.0.0.1:{port}'
+    process = subprocess.Popen(['gunicorn', 'run:app', '--access-logfile', '/dev/null'], cwd=ROOT, env=env)
+    try:
+        started = time.perf_counter()
+        wait_until_ready(base_url, process)
+        ready_seconds = time.perf_counter() - started
+        
+        # New connection per request so the requests spread across workers
+        def evaluate(org_id):
+            response = requests.post(f'{base_url}/api/v1/policy-evaluation/evaluate', timeout=60,
+                                     json={'travel_data': offer, 'org_id': org_id, 'user_id': 'rss'})
+            return response.ok
+        
+        with ThreadPoolExecutor(max_workers=workers * 2) as executor:
+            ok = sum(executor.map(evaluate, org_ids * rounds))
+        
+        worker_memory = [smaps_rollup(pid) for pid in children(process.pid)]
+        master_memory = smaps_rollup(process.pid)
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+    
+    def mean(key):
+        return round(statistics.fmean(memory[key] for memory in worker_memory))
+    
+    return {
+        'workers': len(worker_memory),
+        'ready_seconds': round(ready_seconds, 2),
+        'requests_ok': ok,
+        'requests': len(org_ids) * rounds,
+        'master': master_memory,
+        'per_worker_mean': {key: mean(key) for key in ('rss_kb', 'pss_kb', 'shared_kb', 'private_kb')},
+        'total_pss_kb': master_memory['pss_kb'] + sum(memory['pss_kb'] for memory in worker_memory),
+        'per_worker': worker_memory
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--mode', choices=['both', 'preload', 'lazy'], default='both')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--rounds', type=int, help='Evaluations per org (default: 3 x workers)')
+    parser.add_argument('--seed', action='store_true', help='Insert synthetic orgs into DATABASE_URL first')
+    parser.add_argument('--orgs', type=int, default=500, help='Orgs to seed')
+    parser.add_argument('--policies', type=int, default=5, help='Policies per seeded org')
+    parser.add_argument('--rules', type=int, default=5, help='Rules per seeded policy')
+    parser.add_argument('--exceptions', type=int, default=1, help='Exceptions per seeded rule')
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    args = parser.parse_args()
+    
+    rng = random.Random(7)
+    if args.seed:
+        seed(args.orgs, args.policies, args.rules, args.exceptions, rng)
+    org_ids = active_org_ids()
+    offer = build_offers(1, rng)[0]
+    # Same-currency offer, so evaluation never waits on the exchange rate API
+    offer['train']['currency'] = 'EUR'
+    
+    results = {'orgs': len(org_ids), 'workers': args.workers}
+    for mode in (('preload', 'lazy') if args.mode == 'both' else (args.mode,)):
+        results[mode] = measure(mode, args.workers, args.port, org_ids, offer, args.rounds or args.workers * 3)
+    
+    print(json.dumps({mode: {key: value for key, value in result.items() if key != 'per_worker'}
+                      if isinstance(result, dict) else result for mode, result in results.items()}, indent=2))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Production server profile: preloaded app on gthread workers
+
+    gunicorn run:app
+
+gunicorn reads this file from the working directory. The app is imported once
+in the master and forked, so workers share its code and start immediately;
+each worker serves requests on a pool of threads, so a slow database call
+only ties up one thread rather than the whole worker.
+
+Preloading also compiles every organization's policies and fetches exchange
+rates in the master (POLICY_CACHE_PRELOAD defaults to true here), and the
+collector is frozen before forking so those objects stay on shared pages.
+
+Environment:
+    PORT               bind port (default 5000)
+    WEB_CONCURRENCY    worker processes (default: one per core)
+    THREADS            threads per worker (default 8)
+    GRACEFUL_TIMEOUT   seconds a stopping worker has to finish in-flight requests (default 30)
+    TIMEOUT            seconds before a silent worker is killed and replaced (default 60)
+    POLICY_CACHE_PRELOAD             compile all orgs' policies before forking (default true)
+    POLICY_CACHE_REFRESH_SECONDS     how often workers check for changed policies (default 5)
+    POLICY_SNAPSHOT_DIR              keep compiled orgs' policies on disk to start during a database outage
+"""
+
+import gc
+import multiprocessing
+import os
+
+os.environ.setdefault('POLICY_CACHE_PRELOAD', 'true')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Evaluation is CPU work between database round trips: a process per core
+# for the CPU part, threads to overlap the waits
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('THREADS', '8'))
+preload_app = True
+
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT', '30'))
+timeout = int(os.environ.get('TIMEOUT', '60'))
+keepalive = 5
+
+max_requests = int(os.environ.get('MAX_REQUESTS', '10000'))
+max_requests_jitter = 1000
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    """Build the API schema, then exempt everything loaded so far from garbage collection
+
+    flask-restx builds the Swagger schema used for payload validation on
+    first use, and concurrent first requests on worker threads race to build
+    it; building it in the master gives every worker a finished copy.
+
+    A collection writes to the header of every object it visits, which would
+    copy the preloaded policy sets' pages into each worker.
+    """
+    from run import app
+    
+    with app.test_request_context():
+        app.extensions['api'].__schema__
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Give each worker its own database connections and recording file"""
+    from run import app
+    from app import db
+    from app.utils.evaluation_recorder import init_recorder
+    
+    with app.app_context():
+        # Connections opened in the master must not be shared across processes
+        db.engine.dispose(close=False)
+    
+    recorder = app.extensions.get('evaluation_recorder')
+    if recorder is not None:
+        # File rotation is not safe across processes, so each worker records to its own file
+        recorder.close()
+        init_recorder(app, worker_id=worker.pid)
@@ -0,0 +1,24 @@
+"""Export an organization's active policies to a JSON/YAML snapshot for embedded evaluation"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.services.evaluation_service import PolicyEvaluationService
+from app.services.policy_snapshot import write_snapshot
+
+def export_snapshot(org_id, path):
+    """Write the org's snapshot to path (.json, .yaml or .yml)"""
+    app = create_app()
+    
+    with app.app_context():
+        snapshot = PolicyEvaluationService().export_snapshot(org_id)
+        write_snapshot(snapshot, path)
+        print(f"Exported {len(snapshot['policies'])} policies to {path}")
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Usage: python migrations/export_policy_snapshot.py <org_id> <path>")
+        sys.exit(1)
+    export_snapshot(sys.argv[1], sys.argv[2])
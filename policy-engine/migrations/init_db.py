@@ -73,6 +73,10 @@ def create_sample_data():
             )
             rule.save()
         
+        # Rules were saved directly, so bring the aggregate counters up to date
+        from app.services.policy_service import PolicyService
+        PolicyService.recompute_policy_counters(str(sample_org_id))
+        
         print(f"Sample policy created: {policy.label}")
         print(f"Sample rules created: {len(rules_data)}")
         
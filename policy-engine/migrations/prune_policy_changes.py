@@ -0,0 +1,19 @@
+"""Maintenance job: delete policy change log entries past the retention period"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.services.policy_changes import PolicyChangeService, DEFAULT_RETENTION_DAYS
+
+def prune_changes(retention_days=DEFAULT_RETENTION_DAYS):
+    """Delete changes older than retention_days; consumers older than that reload in full"""
+    app = create_app()
+    
+    with app.app_context():
+        pruned = PolicyChangeService.prune_changes(retention_days)
+        print(f"Pruned {pruned} policy changes older than {retention_days} days")
+
+if __name__ == '__main__':
+    prune_changes(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RETENTION_DAYS)
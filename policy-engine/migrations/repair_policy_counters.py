@@ -0,0 +1,19 @@
+"""Repair job: recompute policy user/approver/rule counters from child tables"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.services.policy_service import PolicyService
+
+def repair_counters(org_id=None):
+    """Recompute counters for one organization, or every policy when org_id is omitted"""
+    app = create_app()
+    
+    with app.app_context():
+        repaired = PolicyService.recompute_policy_counters(org_id)
+        print(f"Recomputed counters for {repaired} policies")
+
+if __name__ == '__main__':
+    repair_counters(sys.argv[1] if len(sys.argv) > 1 else None)
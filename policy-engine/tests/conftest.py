@@ -0,0 +1,67 @@
+"""Shared fixtures for in-process policy engine tests (SQLite, no live server)"""
+
+import sys
+import os
+import uuid
+
+import pytest
+from sqlalchemy import event
+
+sys.path.append(os.getcwd())
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.models.user_organization import external_metadata
+
+
+@pytest.fixture
+def app():
+    """Flask app bound to an in-memory SQLite database with all tables created"""
+    app = create_app(TestingConfig)
+    
+    with app.app_context():
+        @event.listens_for(db.engine, 'connect')
+        def _register_sqlite_functions(dbapi_connection, connection_record):
+            # Postgres server defaults used by the models
+            dbapi_connection.create_function('gen_random_uuid', 0, lambda: uuid.uuid4().hex)
+        
+        db.create_all()
+        # Owned by the main application in production
+        external_metadata.create_all(db.engine)
+        yield app
+        db.session.remove()
+        db.drop_all()
+        external_metadata.drop_all(db.engine)
+
+
+@pytest.fixture
+def make_policy(app):
+    """
+    Factory for policies with rules and exceptions.
+    
+    Rules are dicts: {'code', 'vars', 'action'?, 'exceptions'?: [{'code', 'vars'}]}
+    """
+    from app.models import Policy, PolicyRule, PolicyRuleException
+    
+    def _make_policy(org_id, label='Test Policy', action='OUT_OF_POLICY', rules=(), **policy_fields):
+        policy = Policy(org_id=org_id, label=label, action=action, rule_count=len(rules), **policy_fields)
+        db.session.add(policy)
+        for rule_data in rules:
+            rule = PolicyRule(
+                policy=policy,
+                code=rule_data['code'],
+                action=rule_data.get('action', action),
+                vars=rule_data.get('vars'),
+                active=rule_data.get('active', True)
+            )
+            db.session.add(rule)
+            for exception_data in rule_data.get('exceptions', []):
+                db.session.add(PolicyRuleException(
+                    rule=rule,
+                    code=exception_data['code'],
+                    vars=exception_data.get('vars')
+                ))
+        db.session.commit()
+        return policy
+    
+    return _make_policy
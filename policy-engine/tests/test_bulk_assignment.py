@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Test bulk user-policy assignment"""
+
+import time
+import uuid
+
+from app import db
+from app.models import Policy, UserPolicyAssignment, user_organizations
+from app.services.policy_service import PolicyService
+
+
+def _create_policy(org_id):
+    return Policy(org_id=org_id, label='Department Policy').save()
+
+
+def test_bulk_assign_user_list_is_idempotent(app):
+    """Assigning the same users twice only creates each assignment once"""
+    policy = _create_policy(uuid.uuid4())
+    user_ids = [str(uuid.uuid4()) for _ in range(2500)]
+    
+    result = PolicyService.bulk_assign_policy(str(policy.id), user_ids=user_ids)
+    assert result['changed'] == 2500
+    assert result['user_count'] == 2500
+    
+    # Overlapping second batch: only the new users are inserted
+    extra = [str(uuid.uuid4()) for _ in range(10)]
+    result = PolicyService.bulk_assign_policy(str(policy.id), user_ids=user_ids[:100] + extra)
+    assert result['changed'] == 10
+    assert result['user_count'] == 2510
+    print(f"✅ Bulk assign skipped {result['requested'] - result['changed']} existing assignments")
+
+
+def test_bulk_assign_and_unassign_org(app):
+    """Org-wide assignment resolves members from user_organizations"""
+    org_id = uuid.uuid4()
+    other_org_id = uuid.uuid4()
+    policy = _create_policy(org_id)
+    
+    members = [{'user_id': uuid.uuid4(), 'org_id': org_id, 'role': 'member'} for _ in range(30)]
+    outsiders = [{'user_id': uuid.uuid4(), 'org_id': other_org_id, 'role': 'member'} for _ in range(5)]
+    db.session.execute(user_organizations.insert(), members + outsiders)
+    db.session.commit()
+    
+    result = PolicyService.bulk_assign_policy(str(policy.id), org_id=str(org_id))
+    assert result['changed'] == 30
+    assert UserPolicyAssignment.count_by_policy_id(policy.id) == 30
+    
+    removed = PolicyService.bulk_unassign_policy(
+        str(policy.id), user_ids=[str(m['user_id']) for m in members[:10]]
+    )
+    assert removed['changed'] == 10
+    assert removed['user_count'] == 20
+    
+    removed = PolicyService.bulk_unassign_policy(str(policy.id), org_id=str(org_id))
+    assert removed['changed'] == 20
+    assert Policy.find_by_id(policy.id).user_count == 0
+
+
+def test_bulk_assign_without_on_conflict(app, monkeypatch):
+    """Dialects without ON CONFLICT select the existing assignments and insert the rest"""
+    from app.models import user_policy_assignment
+    monkeypatch.setattr(user_policy_assignment, '_insert_on_conflict_do_nothing', lambda table: None)
+    policy = _create_policy(uuid.uuid4())
+    user_ids = [str(uuid.uuid4()) for _ in range(30)]
+    
+    result = PolicyService.bulk_assign_policy(str(policy.id), user_ids=user_ids[:20])
+    assert result['changed'] == 20
+    
+    result = PolicyService.bulk_assign_policy(str(policy.id), user_ids=user_ids)
+    assert result['changed'] == 10
+    assert UserPolicyAssignment.count_by_policy_id(policy.id) == 30
+
+
+def test_bulk_assign_tens_of_thousands(app):
+    """Tens of thousands of users are assigned in seconds"""
+    policy = _create_policy(uuid.uuid4())
+    user_ids = [str(uuid.uuid4()) for _ in range(20000)]
+    
+    start = time.perf_counter()
+    result = PolicyService.bulk_assign_policy(str(policy.id), user_ids=user_ids)
+    elapsed = time.perf_counter() - start
+    
+    assert result['changed'] == 20000
+    assert elapsed < 10
+    print(f"✅ Assigned {result['changed']} users in {elapsed:.2f}s")
+
+
+def test_bulk_assign_api(app, client):
+    """Bulk endpoint assigns and unassigns through the REST API"""
+    policy = _create_policy(uuid.uuid4())
+    user_ids = [str(uuid.uuid4()) for _ in range(3)]
+    url = f'/api/v1/policies/{policy.id}/assignments/bulk'
+    
+    response = client.post(url, json={'user_ids': user_ids})
+    assert response.status_code == 200
+    assert response.json['changed'] == 3
+    
+    response = client.delete(url, json={'user_ids': user_ids[:1]})
+    assert response.status_code == 200
+    assert response.json['user_count'] == 2
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Test the memory-bounded cache and its use for policy sets and exchange rates"""
+
+import time
+import uuid
+
+import pytest
+
+from app.services.policy_cache import PolicySetCache
+from app.utils.cache import LFU, BoundedCache, cache_stats, estimate_size
+
+PRICE_RULE = {'code': 'train_max_od_price', 'vars': {'max_price': 100, 'currency': 'EUR'}}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_lru_evicts_to_byte_budget():
+    """Least recently used entries go first; values over budget are not cached"""
+    evicted = []
+    cache = BoundedCache('test_lru', max_bytes=100, sizer=lambda value: value,
+                         on_evict=lambda key, value: evicted.append(key))
+    cache.set('a', 40)
+    cache.set('b', 40)
+    assert cache.get('a') == 40
+    cache.set('c', 40)
+    assert evicted == ['b'] and cache.keys() == ['a', 'c']
+    assert cache.bytes == 80
+    
+    assert not cache.set('huge', 101)
+    assert 'huge' not in cache and cache.stats['rejected'] == 1
+    
+    # Replacing an entry is not an eviction
+    cache.set('a', 10)
+    assert cache.bytes == 50 and evicted == ['b']
+    
+    limited = BoundedCache('test_lru_entries', max_entries=2)
+    for key in 'xyz':
+        limited.set(key, key)
+    assert limited.keys() == ['y', 'z']
+
+
+def test_lfu_keeps_frequently_used_entries():
+    """Under LFU a popular entry survives newer ones; ties go to the oldest"""
+    cache = BoundedCache('test_lfu', max_bytes=3, sizer=lambda value: 1, policy=LFU)
+    cache.set('popular', 1)
+    for _ in range(3):
+        cache.get('popular')
+    cache.set('once', 1)
+    cache.get('once')
+    cache.set('never', 1)
+    
+    cache.set('new', 1)
+    assert sorted(cache.keys()) == ['new', 'once', 'popular']
+    cache.set('newer', 1)
+    assert sorted(cache.keys()) == ['newer', 'once', 'popular']
+    assert cache.stats['evictions'] == 2
+    
+    cache.delete('popular')
+    cache.set('last', 1)
+    assert 'once' in cache and 'newer' in cache
+
+
+def test_ttl_and_stale_while_revalidate():
+    """Stale values are served at once and reloaded in the background; expired ones are reloaded inline"""
+    clock = FakeClock()
+    cache = BoundedCache('test_swr', ttl=10, stale_ttl=20, clock=clock)
+    loads = []
+    
+    def loader():
+        loads.append(clock.now)
+        return len(loads)
+    
+    assert cache.get_or_load('rate', loader) == 1
+    clock.now = 5
+    assert cache.get_or_load('rate', loader) == 1
+    
+    clock.now = 15
+    assert cache.get('rate') is None
+    assert cache.get_or_load('rate', loader) == 1
+    _wait_for(lambda: cache.stats['refreshes'] == 1)
+    assert cache.get_or_load('rate', loader) == 2
+    
+    # Past the stale window the caller waits for the load
+    clock.now = 100
+    assert cache.get_or_load('rate', loader) == 3
+    assert cache.stats['stale_hits'] == 1 and cache.stats['expirations'] == 1
+    
+    def failing():
+        raise RuntimeError('rates unavailable')
+    
+    clock.now = 115
+    assert cache.get_or_load('rate', failing) == 3
+    _wait_for(lambda: cache.stats['refresh_errors'] == 1)
+    assert cache.peek('rate') == 3
+    with pytest.raises(RuntimeError):
+        cache.get_or_load('other', failing)
+    assert 'other' not in cache
+
+
+def test_estimate_size_counts_shared_objects_once():
+    shared = {'max_price': 100, 'currency': 'EUR', 'notes': 'x' * 1000}
+    assert estimate_size([shared, shared]) < 2 * estimate_size(shared)
+    assert estimate_size({'key': 'x' * 1000}) > 1000
+
+
+def test_policy_sets_are_evicted_past_the_budget(app, make_policy):
+    """Evicted orgs are recompiled on next use"""
+    org_a, org_b = str(uuid.uuid4()), str(uuid.uuid4())
+    make_policy(uuid.UUID(org_a), rules=[PRICE_RULE])
+    make_policy(uuid.UUID(org_b), rules=[PRICE_RULE])
+    size = estimate_size(PolicySetCache(refresh_interval=3600).get(org_a))
+    
+    cache = PolicySetCache(refresh_interval=3600, max_bytes=int(size * 1.5))
+    cache.get(org_a)
+    cache.get(org_a)
+    cache.get(org_b)
+    # Only one set fits, so the new org evicts even a more frequently used one
+    assert cache.sets.keys() == [org_b]
+    assert org_a not in cache.set_versions and org_b in cache.set_versions
+    
+    assert len(cache.get(org_a)) == 1
+    assert cache.stats['misses'] == 3
+    assert cache.sets.stats['evictions'] == 2
+
+
+def test_admin_cache_stats(app, make_policy):
+    client = app.test_client()
+    org_id = uuid.uuid4()
+    make_policy(org_id, rules=[PRICE_RULE])
+    client.post('/api/v1/policy-evaluation/evaluate', json={
+        'travel_data': {'train': {'price': 150, 'currency': 'USD'}}, 'org_id': str(org_id), 'user_id': 'user'
+    })
+    
+    body = client.get('/api/v1/admin/caches').get_json()
+    policy_sets = body['caches']['policy_sets']
+    assert policy_sets['entries'] == 1 and policy_sets['bytes'] > 0
+    assert policy_sets['policy'] == 'lfu' and policy_sets['max_bytes'] == app.config['POLICY_CACHE_MAX_BYTES']
+    assert body['caches']['exchange_rates']['entries'] >= 1
+    assert body['policy_sets']['misses'] == 1
+    assert body['database_breaker']['state'] == 'closed'
+    assert set(cache_stats()) >= {'policy_sets', 'exchange_rates'}
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Test the database circuit breaker and last-known-good policy serving"""
+
+import os
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models import PolicyRule
+from app.services.policy_cache import PolicySetCache
+from app.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, guard_engine
+from app.utils.exceptions import DatabaseUnavailableError
+
+PRICE_RULE = {'code': 'train_max_od_price', 'vars': {'max_price': 100, 'currency': 'EUR'}}
+TRAVEL_DATA = {'train': {'price': 150, 'currency': 'EUR'}}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_probes_and_closes():
+    """Consecutive failures open the breaker; after the reset time one probe decides"""
+    clock = FakeClock()
+    breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=10, clock=clock)
+    
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(DatabaseUnavailableError):
+        breaker.before_call()
+    
+    clock.now = 10
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() and not breaker.allow()
+    # A failed probe waits out another reset period
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    
+    clock.now = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+    assert breaker.stats['opened'] == 1 and breaker.stats['rejected'] == 1
+
+
+def test_guarded_engine_fails_fast(tmp_path):
+    """Once open, connection attempts are not even made"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'missing' / 'policies.db'}")
+    breaker = CircuitBreaker('database', failure_threshold=2, reset_timeout=60)
+    guard_engine(engine, breaker)
+    attempts = []
+    event.listen(engine, 'do_connect', lambda *args: attempts.append(1))
+    
+    for _ in range(2):
+        with pytest.raises(OperationalError):
+            engine.connect()
+    assert breaker.state == OPEN
+    
+    with pytest.raises(DatabaseUnavailableError):
+        with engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+    assert len(attempts) == 2
+
+
+def test_cache_serves_last_known_good(app, make_policy, tmp_path):
+    """With the database down, cached and on-disk policies are served and marked stale"""
+    breaker = app.extensions['database_breaker']
+    org_id, other_org, unknown_org = str(uuid.uuid4()), str(uuid.uuid4()), str(uuid.uuid4())
+    policy = make_policy(uuid.UUID(org_id), rules=[PRICE_RULE])
+    make_policy(uuid.UUID(other_org), rules=[PRICE_RULE])
+    
+    cache = PolicySetCache(refresh_interval=0, snapshot_dir=str(tmp_path))
+    assert len(cache.get(org_id)) == 1
+    assert len(cache.get(other_org)) == 1
+    assert not cache.freshness(org_id)['stale']
+    assert os.path.exists(tmp_path / f'{org_id}.json')
+    
+    # Changes reach the snapshot on disk as well as the cache
+    PolicyRule.query.filter_by(policy_id=policy.id).one().vars = {'max_price': 90, 'currency': 'EUR'}
+    db.session.commit()
+    assert cache.get(org_id).policies[0].rules[0].vars['max_price'] == 90
+    
+    breaker.trip()
+    try:
+        assert cache.get(org_id).policies[0].rules[0].vars['max_price'] == 90
+        freshness = cache.freshness(org_id)
+        assert freshness['stale'] and freshness['as_of'] is not None
+        assert cache.stats['database_errors'] >= 1
+        
+        # A fresh process only has the disk
+        restarted = PolicySetCache(refresh_interval=0, snapshot_dir=str(tmp_path))
+        assert restarted.get(org_id).policies[0].rules[0].vars['max_price'] == 90
+        assert restarted.freshness(org_id)['stale']
+        assert restarted.stats['snapshot_loads'] == 1
+        
+        with pytest.raises(DatabaseUnavailableError):
+            restarted.get(unknown_org)
+    finally:
+        breaker.record_success()
+    
+    # Back to normal once the database answers again
+    assert len(restarted.get(org_id)) == 1
+    assert not restarted.freshness(org_id)['stale']
+
+
+def test_api_reports_staleness_and_unavailability(app, make_policy):
+    """Evaluation keeps answering with a staleness flag; database-only endpoints return 503"""
+    client = app.test_client()
+    breaker = app.extensions['database_breaker']
+    org_id = uuid.uuid4()
+    make_policy(org_id, rules=[PRICE_RULE])
+    payload = {'travel_data': TRAVEL_DATA, 'org_id': str(org_id), 'user_id': 'user'}
+    
+    body = client.post('/api/v1/policy-evaluation/evaluate', json=payload).get_json()
+    assert body['result'] == 'OUT_OF_POLICY' and body['policies_stale'] is False
+    
+    breaker.trip()
+    try:
+        # Past the refresh interval, the check against the database fails fast
+        app.extensions['policy_cache'].mark_stale()
+        response = client.post('/api/v1/policy-evaluation/evaluate', json=payload)
+        body = response.get_json()
+        assert response.status_code == 200
+        assert body['result'] == 'OUT_OF_POLICY' and body['policies_stale'] is True
+        assert body['policies_as_of'] is not None
+        
+        response = client.get(f'/api/v1/policies/?org_id={org_id}')
+        assert response.status_code == 503
+        assert response.headers['Retry-After']
+        
+        response = client.post('/api/v1/policy-evaluation/evaluate',
+                               json=dict(payload, org_id=str(uuid.uuid4())))
+        assert response.status_code == 503
+    finally:
+        breaker.record_success()
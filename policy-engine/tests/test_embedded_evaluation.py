@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Test embedded evaluation without a Flask app context or database"""
+
+import uuid
+from datetime import datetime, timedelta
+
+from flask import has_app_context
+
+from app.services.evaluator import PolicyEvaluator
+from app.services.evaluation_service import PolicyEvaluationService
+from app.services.policy_snapshot import load_snapshot, write_snapshot
+
+APPROVER_ID = str(uuid.uuid4())
+
+POLICIES = [
+    {
+        'id': 'policy-standard',
+        'label': 'Standard',
+        'action': 'OUT_OF_POLICY',
+        'approvers': [],
+        'rules': [
+            {'id': 'rule-price', 'code': 'train_max_od_price', 'action': 'OUT_OF_POLICY',
+             'vars': {'max_price': 200, 'currency': 'EUR'}},
+        ]
+    },
+    {
+        'id': 'policy-approval',
+        'label': 'Approval',
+        'action': 'APPROVE',
+        'enforce_approval': True,
+        'approvers': [APPROVER_ID],
+        'rules': [
+            {'id': 'rule-class', 'code': 'train_class_max', 'action': 'APPROVE',
+             'vars': {'max_class': 'FIRST'}},
+        ]
+    },
+]
+
+
+def _offer(price=150, currency='EUR'):
+    return {
+        'train': {
+            'price': price,
+            'currency': currency,
+            'class': 'STANDARD',
+            'operator': 'EUROSTAR',
+            'departure_date': (datetime.utcnow() + timedelta(days=10)).isoformat()
+        },
+        'origin': 'LDN',
+        'destination': 'PAR'
+    }
+
+
+def test_evaluates_plain_data_without_app_context():
+    """Policies as plain data evaluate with no app context, DB or network"""
+    assert not has_app_context()
+    evaluator = PolicyEvaluator()
+    compiled = evaluator.compile('org-1', POLICIES)
+    
+    in_policy = evaluator.evaluate(_offer(), compiled, 'user-1')
+    assert in_policy['result'] == 'APPROVAL_REQUIRED'
+    assert in_policy['approvers'] == [APPROVER_ID]
+    
+    # GBP converted with the static rate table: 300 GBP = 354 EUR
+    over_price = evaluator.evaluate(_offer(price=300, currency='GBP'), compiled, 'user-1')
+    assert over_price['details'][0]['result'] == 'OUT_OF_POLICY'
+    print(f"✅ Embedded: {in_policy['result']}, approvers {in_policy['approvers']}")
+
+
+def test_snapshot_round_trip(tmp_path):
+    """JSON and YAML snapshots compile to the same results as the plain data"""
+    evaluator = PolicyEvaluator()
+    expected = evaluator.evaluate(_offer(price=250), evaluator.compile('org-1', POLICIES), 'user-1')
+    
+    for name in ('policies.json', 'policies.yaml'):
+        path = str(tmp_path / name)
+        write_snapshot({'org_id': 'org-1', 'policies': POLICIES}, path)
+        compiled = load_snapshot(path)
+        assert compiled.org_id == 'org-1'
+        assert evaluator.evaluate(_offer(price=250), compiled, 'user-1')['result'] == expected['result']
+
+
+def test_exported_snapshot_matches_service(app, make_policy, tmp_path):
+    """A snapshot exported from the database evaluates like the HTTP service"""
+    org_id = uuid.uuid4()
+    make_policy(org_id, label='Standard', action='OUT_OF_POLICY', rules=[
+        {'code': 'train_max_od_price', 'vars': {'max_price': 200, 'currency': 'EUR'}},
+    ])
+    service = PolicyEvaluationService()
+    path = str(tmp_path / 'snapshot.json')
+    write_snapshot(service.export_snapshot(str(org_id)), path)
+    
+    compiled = load_snapshot(path)
+    for price in (150, 250):
+        embedded = PolicyEvaluator().evaluate(_offer(price=price), compiled, 'user-1')
+        assert embedded['result'] == service.evaluate_policies(_offer(price=price), str(org_id), 'user-1')['result']
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""Test in-process policy evaluation"""
+
+import uuid
+from datetime import datetime, timedelta
+
+from app.services.evaluation_service import PolicyEvaluationService
+
+
+def _offer(price=150, train_class='STANDARD', operator='EUROSTAR', days_ahead=10):
+    departure = (datetime.utcnow() + timedelta(days=days_ahead, hours=1)).isoformat()
+    return {
+        'train': {
+            'price': price,
+            'currency': 'EUR',
+            'class': train_class,
+            'operator': operator,
+            'departure_date': departure
+        },
+        'origin': 'LDN',
+        'destination': 'PAR'
+    }
+
+
+def _org_with_policies(make_policy):
+    org_id = uuid.uuid4()
+    make_policy(org_id, label='Standard', action='OUT_OF_POLICY', rules=[
+        {'code': 'train_route_restriction', 'vars': {'restricted_routes': ['LDN_BRU']}},
+        {'code': 'train_advanced_purchase', 'vars': {'min_days': 3}},
+        {'code': 'train_max_od_price', 'vars': {'max_price': 200, 'currency': 'EUR'}},
+    ])
+    make_policy(org_id, label='Hide Luxury', action='HIDE', rules=[
+        {'code': 'train_class_max', 'vars': {'max_class': 'FIRST'}},
+        {'code': 'train_max_od_price', 'vars': {'max_price': 500, 'currency': 'EUR'}},
+    ])
+    make_policy(org_id, label='Approval', action='APPROVE', enforce_approval=True, rules=[
+        {'code': 'train_operator_preference', 'vars': {'restricted_operators': ['THA'], 'preference_level': 'PREFERRED'}},
+    ])
+    return str(org_id)
+
+
+def test_short_circuit_matches_full_detail(app, make_policy):
+    """Both modes agree on the final result for a spread of offers"""
+    org_id = _org_with_policies(make_policy)
+    service = PolicyEvaluationService()
+    user_id = str(uuid.uuid4())
+    
+    offers = [
+        _offer(),
+        _offer(price=300),
+        _offer(price=800),
+        _offer(train_class='PREMIUM'),
+        _offer(operator='THA'),
+        _offer(days_ahead=1),
+    ]
+    for offer in offers:
+        full = service.evaluate_policies(offer, org_id, user_id)
+        fast = service.evaluate_policies(offer, org_id, user_id, full_detail=False)
+        assert fast['result'] == full['result']
+        assert full['policies_evaluated'] == 3
+        assert fast['policies_evaluated'] <= full['policies_evaluated']
+
+
+def test_short_circuit_stops_at_hidden(app, make_policy):
+    """Once HIDDEN is reached no further policies or rules are evaluated"""
+    org_id = _org_with_policies(make_policy)
+    service = PolicyEvaluationService()
+    
+    result = service.evaluate_policies(_offer(price=800), org_id, str(uuid.uuid4()), full_detail=False)
+    assert result['result'] == 'HIDDEN'
+    assert result['policies_evaluated'] == 1
+    
+    # Cheap price check runs before the class check and decides the policy
+    rule_codes = [rule['rule_code'] for rule in result['details'][0]['rule_results']]
+    assert rule_codes == ['train_max_od_price']
+    print(f"✅ Short-circuit evaluated {result['policies_evaluated']} policy, rules {rule_codes}")
+
+
+def test_full_detail_reports_every_rule(app, make_policy):
+    """Full detail keeps exhaustive per-rule results for explanations"""
+    org_id = _org_with_policies(make_policy)
+    service = PolicyEvaluationService()
+    
+    result = service.evaluate_policies(_offer(price=800), org_id, str(uuid.uuid4()))
+    rule_counts = sorted(len(detail['rule_results']) for detail in result['details'])
+    assert rule_counts == [1, 2, 3]
+
+
+def test_non_train_offer_skips_train_rules(app, make_policy):
+    """A hotel offer never reaches the train rule family"""
+    org_id = _org_with_policies(make_policy)
+    service = PolicyEvaluationService()
+    
+    result = service.evaluate_policies({'hotel': {'price': 900, 'currency': 'EUR'}}, org_id, str(uuid.uuid4()))
+    assert all(detail['rule_results'] == [] for detail in result['details'])
+    assert result['result'] == 'APPROVAL_REQUIRED'  # enforce_approval still applies
+    
+    # Train-only policies cannot be violated, so short-circuit skips them entirely
+    fast = service.evaluate_policies({'hotel': {'price': 900}}, org_id, str(uuid.uuid4()), full_detail=False)
+    assert fast['policies_evaluated'] == 1
+
+
+def test_registry_travel_types_match_specifications():
+    """RuleRegistry and the published rule specifications agree on travel types"""
+    from app.services.rule_engine import RuleRegistry
+    from app.services.policy_service import PolicyService
+    
+    registry = RuleRegistry()
+    for spec in PolicyService.get_rule_specifications():
+        if registry.get_rule_spec(spec['code']):
+            assert registry.get_travel_type(spec['code']) == spec['travel_type']
+
+
+def test_identical_predicates_evaluate_once(app, make_policy):
+    """The same (code, vars) predicate in several policies runs once per offer"""
+    from app.services.rule_engine import TrainClassMaxRule
+    
+    class CountingClassRule(TrainClassMaxRule):
+        calls = 0
+        
+        def apply(self, context, rule_vars):
+            CountingClassRule.calls += 1
+            return super().apply(context, rule_vars)
+    
+    org_id = uuid.uuid4()
+    shared_rule = {'code': 'train_class_max', 'vars': {'max_class': 'FIRST'}}
+    make_policy(org_id, label='Executive', action='BLOCK', rules=[shared_rule])
+    make_policy(org_id, label='Standard', action='OUT_OF_POLICY', rules=[
+        shared_rule,
+        {'code': 'train_max_od_price', 'vars': {'max_price': 100, 'currency': 'EUR'},
+         'exceptions': [{'code': 'train_class_max', 'vars': {'max_class': 'FIRST'}}]},
+    ])
+    
+    for dedupe, expected_calls in ((True, 1), (False, 3)):
+        service = PolicyEvaluationService(dedupe_predicates=dedupe)
+        service.rule_registry.register_rule('train_class_max', CountingClassRule())
+        CountingClassRule.calls = 0
+        result = service.evaluate_policies(_offer(price=300), str(org_id), str(uuid.uuid4()))
+        assert result['result'] == 'IN_POLICY'  # Price failure excused by the class exception
+        assert CountingClassRule.calls == expected_calls
+
+
+def test_batch_endpoint_matches_single_evaluation(app, make_policy, client):
+    """Batch results match per-offer evaluation and echo offer IDs"""
+    org_id = _org_with_policies(make_policy)
+    user_id = str(uuid.uuid4())
+    offers = [_offer(), _offer(price=800), _offer(operator='THA')]
+    
+    response = client.post('/api/v1/policy-evaluation/evaluate-batch', json={
+        'org_id': org_id,
+        'user_id': user_id,
+        'full_detail': False,
+        'offers': [{'id': f'offer_{index}', 'travel_data': offer} for index, offer in enumerate(offers)]
+    })
+    assert response.status_code == 200
+    batch = response.json
+    
+    service = PolicyEvaluationService()
+    assert batch['policies_evaluated'] == 3
+    assert [result['id'] for result in batch['results']] == ['offer_0', 'offer_1', 'offer_2']
+    for offer, result in zip(offers, batch['results']):
+        assert result['result'] == service.evaluate_policies(offer, org_id, user_id)['result']
+    assert batch['results'][1]['result'] == 'HIDDEN'
+    print(f"✅ Batch: {[result['result'] for result in batch['results']]}")
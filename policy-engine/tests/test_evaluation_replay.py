@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Test evaluation recording and replay"""
+
+import json
+import uuid
+from datetime import datetime, timedelta
+
+from app.services.evaluation_replay import in_process_target, read_recordings, replay, snapshot_target
+from app.services.evaluator import PolicyEvaluator
+from app.utils.evaluation_recorder import init_recorder
+
+
+def _travel_data(price):
+    return {
+        'train': {
+            'price': price,
+            'currency': 'EUR',
+            'departure_date': (datetime.utcnow() + timedelta(days=10)).isoformat()
+        },
+        'passengers': {'count': 1, 'lead': {'firstName': 'Ada', 'lastName': 'Lovelace', 'email': 'ada@example.com'}}
+    }
+
+
+def test_recorded_traffic_is_anonymised_and_replays(app, make_policy, tmp_path):
+    """Requests are recorded without personal data and replay to the same results"""
+    app.config['EVALUATION_RECORD_DIR'] = str(tmp_path)
+    recorder = init_recorder(app)
+    org_id = uuid.uuid4()
+    make_policy(org_id, label='Price cap', action='OUT_OF_POLICY', rules=[
+        {'code': 'train_max_od_price', 'vars': {'max_price': 200, 'currency': 'EUR'}}
+    ])
+    
+    client = app.test_client()
+    user_id = str(uuid.uuid4())
+    response = client.post('/api/v1/policy-evaluation/evaluate', json={
+        'travel_data': _travel_data(150), 'org_id': str(org_id), 'user_id': user_id
+    })
+    assert response.status_code == 200
+    response = client.post('/api/v1/policy-evaluation/evaluate-batch', json={
+        'offers': [{'id': 'cheap', 'travel_data': _travel_data(100)}, {'id': 'dear', 'travel_data': _travel_data(300)}],
+        'org_id': str(org_id), 'user_id': user_id, 'full_detail': False
+    })
+    assert response.status_code == 200
+    recorder.close()
+    
+    raw = (tmp_path / 'evaluations.ndjson').read_text()
+    assert user_id not in raw and 'Lovelace' not in raw and 'ada@example.com' not in raw
+    records = list(read_recordings([str(tmp_path)]))
+    assert [record['endpoint'] for record in records] == ['evaluate', 'evaluate-batch']
+    assert records[0]['results'] == ['IN_POLICY']
+    assert records[1]['results'] == ['IN_POLICY', 'OUT_OF_POLICY']
+    assert records[1]['offers'][1]['travel_data']['train']['price'] == 300
+    
+    report = replay(records, in_process_target(app), concurrency=1)
+    assert report['requests'] == 2 and report['offers'] == 3
+    assert report['errors'] == {} and report['differing_offers'] == 0
+    assert report['latency']['target']['count'] == 2
+    
+    # A stricter draft version flips the 150 EUR offer
+    stricter = PolicyEvaluator().compile(str(org_id), [{
+        'id': 'draft', 'label': 'Price cap', 'action': 'OUT_OF_POLICY',
+        'rules': [{'id': 'rule', 'code': 'train_max_od_price', 'action': 'OUT_OF_POLICY',
+                   'vars': {'max_price': 120, 'currency': 'EUR'}}]
+    }])
+    report = replay(records, snapshot_target([stricter]), concurrency=2)
+    assert report['differing_offers'] == 1
+    assert report['transitions'] == {'IN_POLICY -> OUT_OF_POLICY': 1}
+    assert report['samples'][0]['endpoint'] == 'evaluate'
+    print(f"✅ Replay: {json.dumps(report['transitions'])}")
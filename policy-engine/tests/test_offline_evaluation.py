@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Test offline NDJSON evaluation"""
+
+import io
+import json
+from datetime import datetime, timedelta
+
+from app.services.evaluator import PolicyEvaluator
+from app.services.offline_evaluation import evaluate_stream
+
+POLICIES = [
+    {
+        'id': 'policy-standard',
+        'label': 'Standard',
+        'action': 'HIDE',
+        'rules': [
+            {'id': 'rule-price', 'code': 'train_max_od_price', 'action': 'HIDE',
+             'vars': {'max_price': 200, 'currency': 'EUR'}},
+        ]
+    },
+]
+
+
+def _input(prices):
+    departure = (datetime.utcnow() + timedelta(days=10)).isoformat()
+    lines = [
+        json.dumps({'id': f'offer-{index}', 'travel_data': {
+            'train': {'price': price, 'currency': 'EUR', 'departure_date': departure}
+        }})
+        for index, price in enumerate(prices)
+    ]
+    lines.insert(3, 'not json')
+    return io.StringIO('\n'.join(lines) + '\n')
+
+
+def test_pool_output_is_ordered_and_matches_serial():
+    """Workers and small chunks keep input order and agree with one process"""
+    compiled = PolicyEvaluator().compile('org-1', POLICIES)
+    prices = [100 + (index * 37) % 250 for index in range(60)]
+    
+    serial, pooled = io.StringIO(), io.StringIO()
+    evaluate_stream(compiled, _input(prices), serial, workers=1, chunk_size=7)
+    stats = evaluate_stream(compiled, _input(prices), pooled, workers=2, chunk_size=7, max_in_flight=2)
+    
+    assert pooled.getvalue() == serial.getvalue()
+    assert stats['offers'] == 61 and stats['errors'] == 1
+    
+    results = [json.loads(line) for line in pooled.getvalue().splitlines()]
+    assert [result['line'] for result in results] == list(range(1, 62))
+    assert 'error' in results[3]
+    
+    offers = [result for result in results if 'error' not in result]
+    assert [result['id'] for result in offers] == [f'offer-{index}' for index in range(60)]
+    assert [result['result'] == 'HIDDEN' for result in offers] == [price > 200 for price in prices]
+    print(f"✅ Offline: {stats['offers']} offers, {stats['offers_per_second']:.0f} offers/s")
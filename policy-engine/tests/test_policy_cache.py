@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Test the compiled policy set cache"""
+
+import uuid
+
+import pytest
+
+from app import db
+from app.models import PolicyRule, PolicySetVersion
+from app.services.policy_cache import PolicySetCache, _caches
+from app.services.policy_invalidation import InMemoryInvalidationBus
+from app.utils.exceptions import PolicyEvaluationError
+
+PRICE_RULE = {'code': 'train_max_od_price', 'vars': {'max_price': 200, 'currency': 'EUR'}}
+
+
+def test_preload_and_delta_refresh(app, make_policy):
+    """Preload compiles every org; a refresh recompiles only the orgs that changed"""
+    org_a, org_b = uuid.uuid4(), uuid.uuid4()
+    policy_a = make_policy(org_a, label='A', rules=[PRICE_RULE])
+    make_policy(org_b, label='B', rules=[PRICE_RULE, PRICE_RULE])
+    
+    cache = PolicySetCache(refresh_interval=3600)
+    assert cache.preload() == 2
+    assert len(cache.get(str(org_a))) == 1
+    compiled_b = cache.get(str(org_b))
+    assert cache.stats['hits'] == 2 and cache.stats['misses'] == 0
+    
+    # Nothing changed: nothing recompiled
+    assert cache.refresh() == 0
+    
+    rule = PolicyRule.query.filter_by(policy_id=policy_a.id).one()
+    rule.vars = {'max_price': 100, 'currency': 'EUR'}
+    db.session.commit()
+    assert PolicySetVersion.versions()[str(org_a)] != cache.set_versions[str(org_a)]
+    
+    assert cache.refresh() == 1
+    assert cache.get(str(org_a)).policies[0].rules[0].vars['max_price'] == 100
+    assert cache.get(str(org_b)) is compiled_b
+    
+    # Deletes bump the version too
+    db.session.delete(PolicyRule.query.filter_by(policy_id=policy_a.id).one())
+    db.session.commit()
+    assert cache.refresh() == 1
+    assert cache.get(str(org_a)).policies[0].rules == ()
+
+
+def test_service_uses_app_cache(app, make_policy):
+    """Evaluations read the app's cache, and commits in the process drop the changed org"""
+    from app.services.evaluation_service import PolicyEvaluationService
+    
+    cache = app.extensions['policy_cache']
+    org_id = uuid.uuid4()
+    travel_data = {'train': {'price': 150, 'currency': 'EUR'}}
+    service = PolicyEvaluationService()
+    
+    assert service.evaluate_policies(travel_data, str(org_id), 'user')['result'] == 'NOT_SPECIFIED'
+    make_policy(org_id, rules=[{'code': 'train_max_od_price', 'vars': {'max_price': 100, 'currency': 'EUR'}}])
+    assert service.evaluate_policies(travel_data, str(org_id), 'user')['result'] == 'OUT_OF_POLICY'
+    # The commit marked the org stale; its changes were applied rather than reloaded
+    assert cache.stats['misses'] == 1 and cache.stats['invalidations'] == 1
+    assert cache.stats['recompiled'] == 1
+    
+    with pytest.raises(PolicyEvaluationError):
+        cache.get('not-a-uuid')
+
+
+def test_invalidation_during_apply_is_kept(app, make_policy, monkeypatch):
+    """A commit landing while an org's changes are fetched leaves it stale rather than lost"""
+    from app.services.policy_changes import PolicyChangeService
+    
+    cache = PolicySetCache(refresh_interval=3600)
+    org_id = uuid.uuid4()
+    policy = make_policy(org_id, rules=[PRICE_RULE])
+    assert cache.get(str(org_id)).policies[0].rules[0].vars['max_price'] == 200
+    
+    rule = PolicyRule.query.filter_by(policy_id=policy.id).one()
+    rule.vars = {'max_price': 100, 'currency': 'EUR'}
+    db.session.commit()
+    cache.invalidate([str(org_id)], PolicySetVersion.versions()[str(org_id)])
+    
+    get_changes = PolicyChangeService.get_changes
+    
+    def racing_get_changes(org, since=0):
+        changes = get_changes(org, since)
+        if rule.vars['max_price'] == 100:
+            # Another request commits, and its invalidation arrives, mid-apply
+            rule.vars = {'max_price': 50, 'currency': 'EUR'}
+            db.session.commit()
+            cache.invalidate([org], PolicySetVersion.versions()[org])
+        return changes
+    
+    monkeypatch.setattr(PolicyChangeService, 'get_changes', staticmethod(racing_get_changes))
+    assert cache.get(str(org_id)).policies[0].rules[0].vars['max_price'] == 100
+    assert cache.set_versions[str(org_id)] < cache.versions[str(org_id)]
+    assert cache.freshness(str(org_id))['stale'] is True
+    
+    assert cache.get(str(org_id)).policies[0].rules[0].vars['max_price'] == 50
+    assert cache.set_versions[str(org_id)] == cache.versions[str(org_id)]
+    assert cache.freshness(str(org_id))['stale'] is False
+
+
+def test_invalidation_reaches_other_replicas(app, make_policy):
+    """A commit on one replica drops the org on the others without waiting for the periodic check"""
+    local = PolicySetCache(refresh_interval=3600, bus=InMemoryInvalidationBus('test-replicas'))
+    remote = PolicySetCache(refresh_interval=3600, bus=InMemoryInvalidationBus('test-replicas'))
+    # Only the local cache sees this process's commits; the remote one relies on the bus
+    _caches.add(local)
+    try:
+        org_id = uuid.uuid4()
+        policy = make_policy(org_id, rules=[PRICE_RULE])
+        assert len(remote.get(str(org_id)).policies[0].rules) == 1
+        invalidations = remote.stats['invalidations']
+        
+        rule = PolicyRule.query.filter_by(policy_id=policy.id).one()
+        rule.vars = {'max_price': 90, 'currency': 'EUR'}
+        db.session.commit()
+        
+        assert remote.stats['invalidations'] == invalidations + 1
+        assert remote.get(str(org_id)).policies[0].rules[0].vars['max_price'] == 90
+        assert remote.stats['refreshes'] == 0
+        
+        # Invalidations carry the org's policy_set_version, not a replica's clock
+        version = remote.versions[str(org_id)]
+        assert version == PolicySetVersion.versions()[str(org_id)]
+        
+        # Stale or duplicate versions are ignored
+        remote.invalidate([str(org_id)], version)
+        remote.invalidate([str(org_id)], version - 1)
+        assert remote.stats['invalidations'] == invalidations + 1
+        
+        # and the next commit's version is always newer
+        rule.vars = {'max_price': 80, 'currency': 'EUR'}
+        db.session.commit()
+        assert remote.versions[str(org_id)] == version + 1
+        assert remote.get(str(org_id)).policies[0].rules[0].vars['max_price'] == 80
+    finally:
+        _caches.discard(local)
+        local.bus.close()
+        remote.bus.close()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""Test policy set versions and incremental change loading"""
+
+import uuid
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import PolicyApprover, PolicyChange, PolicyRule, PolicySetVersion
+from app.models import policy_change
+from app.services.evaluator import PolicyEvaluator
+from app.services.policy_changes import PolicyChangeService
+from app.services.policy_compiler import CompiledPolicySet
+from app.services.policy_service import PolicyService
+
+PRICE_RULE = {'code': 'train_max_od_price', 'vars': {'max_price': 200, 'currency': 'EUR'}}
+CLASS_RULE = {'code': 'train_class_max', 'vars': {'max_class': 'STANDARD'}}
+
+
+def test_every_commit_bumps_the_org_version(app, make_policy):
+    """Inserts, updates and deletes each bump the org's version once per flush"""
+    org_id, other_org = uuid.uuid4(), uuid.uuid4()
+    assert PolicyChangeService.get_version(str(org_id)) == 0
+    
+    policy = make_policy(org_id, rules=[PRICE_RULE])
+    make_policy(other_org, rules=[PRICE_RULE])
+    assert PolicyChangeService.get_version(str(org_id)) == 1
+    
+    rule = PolicyRule.query.filter_by(policy_id=policy.id).one()
+    rule.vars = {'max_price': 100, 'currency': 'EUR'}
+    db.session.commit()
+    db.session.add(PolicyApprover(policy_id=policy.id, user_id=uuid.uuid4()))
+    db.session.commit()
+    assert PolicyChangeService.get_version(str(org_id)) == 3
+    
+    # Unmodified rows don't count
+    policy.label = policy.label
+    db.session.commit()
+    assert PolicyChangeService.get_version(str(org_id)) == 3
+    assert PolicyChangeService.get_version(str(other_org)) == 1
+    
+    # Rolled back changes leave no trace
+    rule.active = False
+    db.session.flush()
+    db.session.rollback()
+    assert PolicyChangeService.get_version(str(org_id)) == 3
+    assert PolicyChange.query.filter_by(org_id=org_id).count() == 4
+
+
+def test_version_bump_without_upsert_support(app, make_policy, monkeypatch):
+    """Dialects without ON CONFLICT lock the version row and update it, or insert the first one"""
+    monkeypatch.setattr(policy_change, '_upsert', lambda connection, table: None)
+    org_id = uuid.uuid4()
+    
+    policy = make_policy(org_id, rules=[PRICE_RULE])
+    assert PolicyChangeService.get_version(str(org_id)) == 1
+    
+    rule = PolicyRule.query.filter_by(policy_id=policy.id).one()
+    rule.vars = {'max_price': 100, 'currency': 'EUR'}
+    db.session.commit()
+    assert PolicyChangeService.get_version(str(org_id)) == 2
+    assert PolicyChange.query.filter_by(org_id=org_id, version=2).count() == 1
+    
+    # Losing the race to create the row falls back to updating it
+    other_org = uuid.uuid4()
+    connection = db.session.connection()
+    assert PolicySetVersion._bump_locked(connection, other_org, datetime.utcnow()) == 1
+    monkeypatch.setattr(policy_change, 'select', _first_select_finds_nothing(policy_change.select))
+    assert PolicySetVersion._bump_locked(connection, other_org, datetime.utcnow()) == 2
+    db.session.commit()
+    assert PolicyChangeService.get_version(str(other_org)) == 2
+
+
+def _first_select_finds_nothing(select):
+    """select() whose first statement matches no rows, as if another writer hadn't committed yet"""
+    calls = []
+    
+    def patched(*columns):
+        stmt = select(*columns)
+        calls.append(stmt)
+        return stmt.where(False) if len(calls) == 1 else stmt
+    
+    return patched
+
+
+def test_changes_since_include_tombstones(app, make_policy):
+    """Only rows changed after the version are returned, with deletes as tombstones"""
+    org_id = uuid.uuid4()
+    kept = make_policy(org_id, label='Kept', rules=[PRICE_RULE])
+    dropped = make_policy(org_id, label='Dropped', rules=[CLASS_RULE])
+    since = PolicyChangeService.get_version(str(org_id))
+    
+    rule = PolicyRule.query.filter_by(policy_id=kept.id).one()
+    rule.vars = {'max_price': 120, 'currency': 'EUR'}
+    dropped_rule_id = str(dropped.rules[0].id)
+    db.session.delete(dropped)
+    db.session.commit()
+    
+    changes = PolicyChangeService.get_changes(str(org_id), since)
+    assert not changes['full_reload']
+    # Loading the cascade autoflushed the rule update first, so that's two versions
+    assert changes['version'] == since + 2
+    by_id = {change['id']: change for change in changes['changes']}
+    assert by_id[str(rule.id)]['operation'] == 'upsert'
+    assert by_id[str(rule.id)]['data']['vars']['max_price'] == 120
+    # The cascade deleted the rule along with its policy; both leave tombstones
+    assert by_id[str(dropped.id)]['operation'] == 'delete' and by_id[str(dropped.id)]['data'] is None
+    assert by_id[dropped_rule_id]['operation'] == 'delete'
+    assert [policy['label'] for policy in changes['policies']] == ['Kept']
+    assert changes['removed_policy_ids'] == [str(dropped.id)]
+    
+    # Nothing since the latest version
+    latest = PolicyChangeService.get_changes(str(org_id), changes['version'])
+    assert latest['changes'] == [] and latest['policies'] == []
+
+
+def test_bulk_assignments_are_versioned(app, make_policy):
+    """Core bulk statements bypass the flush hooks but are still logged"""
+    org_id = uuid.uuid4()
+    policy = make_policy(org_id)
+    since = PolicyChangeService.get_version(str(org_id))
+    user_ids = [str(uuid.uuid4()) for _ in range(3)]
+    
+    PolicyService.bulk_assign_policy(str(policy.id), user_ids=user_ids)
+    changes = PolicyChangeService.get_changes(str(org_id), since)
+    assert changes['version'] == since + 1
+    assert [change['operation'] for change in changes['changes']] == ['upsert'] * 3
+    # Assignments don't change how offers are evaluated
+    assert changes['policies'] == []
+    
+    PolicyService.bulk_unassign_policy(str(policy.id), user_ids=user_ids[:1])
+    changes = PolicyChangeService.get_changes(str(org_id), since + 1)
+    assert [(change['entity'], change['operation']) for change in changes['changes']] == [('assignment', 'delete')]
+
+
+def test_delta_matches_full_compile(app, make_policy):
+    """Applying changes to a compiled set gives the same set as compiling from scratch"""
+    org_id = uuid.uuid4()
+    first = make_policy(org_id, label='First', rules=[PRICE_RULE])
+    second = make_policy(org_id, label='Second', rules=[CLASS_RULE])
+    evaluator = PolicyEvaluator()
+    snapshot = PolicyChangeService.get_changes(str(org_id))
+    assert snapshot['full_reload']
+    compiled = evaluator.compile(str(org_id), snapshot['policies'])
+    
+    PolicyRule.query.filter_by(policy_id=first.id).one().vars = {'max_price': 80, 'currency': 'EUR'}
+    second.active = False
+    db.session.commit()
+    make_policy(org_id, label='Third', rules=[CLASS_RULE])
+    
+    updated = evaluator.apply_changes(compiled, PolicyChangeService.get_changes(str(org_id), snapshot['version']))
+    full = evaluator.compile(str(org_id), PolicyChangeService.get_changes(str(org_id))['policies'])
+    assert sorted(policy.label for policy in updated.policies) == ['First', 'Third']
+    
+    travel_data = {'train': {'price': 100, 'currency': 'EUR', 'class': 'FIRST'}}
+    for result in (evaluator.evaluate(travel_data, updated, 'user'), evaluator.evaluate(travel_data, full, 'user')):
+        assert result['result'] == 'OUT_OF_POLICY'
+        assert sorted(detail['policy_label'] for detail in result['details']) == ['First', 'Third']
+    assert isinstance(updated, CompiledPolicySet)
+
+
+def test_pruned_changes_require_full_reload(app, make_policy):
+    """Consumers older than the pruned log are told to reload the org"""
+    org_id = uuid.uuid4()
+    make_policy(org_id, rules=[PRICE_RULE])
+    make_policy(org_id, label='Later', rules=[PRICE_RULE])
+    
+    PolicyChange.query.filter_by(org_id=org_id, version=1).update({'created_at': datetime.utcnow() - timedelta(days=90)})
+    db.session.commit()
+    assert PolicyChangeService.prune_changes(retention_days=30) == 2
+    assert db.session.get(PolicySetVersion, org_id).pruned_version == 1
+    
+    assert not PolicyChangeService.get_changes(str(org_id), 1)['full_reload']
+    assert PolicyChangeService.get_changes(str(org_id), 0)['full_reload']
+    assert len(PolicyChangeService.get_changes(str(org_id), 0)['policies']) == 2
+
+
+def test_changes_api(app, make_policy):
+    """GET /policies/changes returns the delta for an org"""
+    client = app.test_client()
+    org_id = uuid.uuid4()
+    make_policy(org_id, rules=[PRICE_RULE])
+    
+    response = client.get(f'/api/v1/policies/changes?org_id={org_id}&since=0')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['version'] == 1 and body['full_reload'] and len(body['policies']) == 1
+    
+    response = client.get(f'/api/v1/policies/changes?org_id={org_id}&since=1')
+    assert response.get_json()['changes'] == []
+    
+    assert client.get('/api/v1/policies/changes').status_code == 400
+    assert client.get('/api/v1/policies/changes?org_id=not-a-uuid').status_code == 400
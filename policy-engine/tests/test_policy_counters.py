@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Test maintained policy aggregate counters"""
+
+import uuid
+
+from app import db
+from app.models import Policy, PolicyRule
+from app.services.policy_service import PolicyService
+from app.services.evaluation_service import PolicyEvaluationService
+
+
+def test_counters_follow_assignments_approvers_and_rules(app):
+    """Counters change in the same transaction as the child rows"""
+    org_id = uuid.uuid4()
+    policy = PolicyService.create_policy({'org_id': str(org_id), 'label': 'Standard'})
+    policy_id = str(policy.id)
+    
+    user_id = str(uuid.uuid4())
+    PolicyService.assign_policy_to_user(user_id, policy_id, str(uuid.uuid4()))
+    PolicyService.add_policy_approver(policy_id, str(uuid.uuid4()))
+    rule = PolicyService.create_rule({
+        'policy_id': policy_id, 'code': 'train_class_max', 'action': 'BLOCK',
+        'vars': {'max_class': 'FIRST'}
+    })
+    PolicyService.create_rule({
+        'policy_id': policy_id, 'code': 'train_max_od_price', 'action': 'BLOCK',
+        'vars': {'max_price': 100, 'currency': 'EUR'}
+    })
+    
+    policy = PolicyService.get_policy(policy_id)
+    assert (policy.user_count, policy.approver_count, policy.rule_count) == (1, 1, 2)
+    
+    PolicyService.delete_rule(str(rule.id))
+    PolicyService.delete_rule(str(rule.id))  # Deleting twice must not double count
+    PolicyService.remove_policy_from_user(user_id, policy_id)
+    policy = PolicyService.get_policy(policy_id)
+    assert (policy.user_count, policy.rule_count) == (0, 1)
+    
+    PolicyService.update_rule(str(rule.id), {'active': True})
+    assert PolicyService.get_policy(policy_id).rule_count == 2
+    
+    info = PolicyEvaluationService().get_policy_info(str(org_id), user_id)
+    assert info['policies'][0]['rules_count'] == 2
+
+
+def test_recompute_counters_repairs_drift(app):
+    """Repair job recomputes counters with GROUP BY"""
+    org_id = uuid.uuid4()
+    policy = PolicyService.create_policy({'org_id': str(org_id), 'label': 'Drifted'})
+    PolicyService.bulk_assign_policy(str(policy.id), user_ids=[str(uuid.uuid4()) for _ in range(7)])
+    PolicyService.create_rule({'policy_id': str(policy.id), 'code': 'train_class_max', 'action': 'BLOCK'})
+    
+    # Simulate drift from writes that bypassed the service layer
+    db.session.add(PolicyRule(id=uuid.uuid4(), policy_id=policy.id, code='train_class_max', action='HIDE'))
+    db.session.execute(Policy.__table__.update().values(user_count=999, approver_count=5))
+    db.session.commit()
+    
+    assert PolicyService.recompute_policy_counters(str(org_id)) == 1
+    policy = PolicyService.get_policy(str(policy.id))
+    assert (policy.user_count, policy.approver_count, policy.rule_count) == (7, 0, 2)
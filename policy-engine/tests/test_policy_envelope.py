@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Test policy envelope export"""
+
+import uuid
+
+
+def test_envelope_reduces_constraints_per_result(app, make_policy, client):
+    """Envelope keeps the tightest constraint per result and flags exceptions"""
+    org_id = uuid.uuid4()
+    make_policy(org_id, label='Hide Expensive', action='HIDE', rules=[
+        {'code': 'train_max_od_price', 'vars': {'max_price': 800, 'currency': 'EUR'}},
+        {'code': 'train_operator_preference', 'vars': {'restricted_operators': ['tha'], 'preference_level': 'PREFERRED'}},
+    ])
+    make_policy(org_id, label='Hide Very Expensive', action='HIDE', rules=[
+        {'code': 'train_max_od_price', 'vars': {'max_price': 600, 'currency': 'EUR'}},
+        {'code': 'train_operator_preference', 'vars': {'preferred_operators': ['OUIGO'], 'preference_level': 'AVOID'}},
+    ])
+    make_policy(org_id, label='Standard', action='OUT_OF_POLICY', enforce_approval=True, rules=[
+        {'code': 'train_max_od_price', 'vars': {'max_price': 200, 'currency': 'EUR'}},
+        {'code': 'train_class_max', 'vars': {'max_class': 'first'},
+         'exceptions': [{'code': 'train_max_od_price', 'vars': {'max_price': 100, 'currency': 'EUR'}}]},
+        {'code': 'train_advanced_purchase', 'vars': {'min_days': 3}},
+        {'code': 'train_route_restriction', 'vars': {'restricted_routes': ['LDN_BRU']}},
+    ])
+    
+    response = client.get(f'/api/v1/policy-evaluation/envelope?org_id={org_id}&user_id={uuid.uuid4()}')
+    assert response.status_code == 200
+    envelope = response.json
+    constraints = envelope['constraints']
+    
+    assert envelope['policies'] == 3
+    assert envelope['baseline_result'] == 'APPROVAL_REQUIRED'
+    
+    prices = [(c['result'], c['max_price']) for c in constraints['max_price']]
+    assert prices == [('HIDDEN', 600), ('OUT_OF_POLICY', 200)]
+    assert constraints['max_price'][0]['action'] == 'HIDE'
+    assert len(constraints['max_price'][0]['policy_ids']) == 2
+    
+    assert constraints['blocked_operators'][0]['operators'] == ['OUIGO', 'THA']
+    assert constraints['max_class'][0]['max_level'] == 3
+    assert constraints['max_class'][0]['has_exceptions'] is True
+    assert constraints['min_advance_days'][0]['min_days'] == 3
+    assert constraints['restricted_routes'][0]['routes'] == ['LDN_BRU']
+    assert constraints['required_operators'] == []
+    print(f"✅ Envelope: {sum(len(v) for v in constraints.values())} constraints from 3 policies")
+
+
+def test_envelope_requires_org_and_user(app, client):
+    response = client.get(f'/api/v1/policy-evaluation/envelope?org_id={uuid.uuid4()}')
+    assert response.status_code == 400
+    assert client.get('/api/v1/policy-evaluation/envelope').status_code == 400
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Test what-if simulation of draft policies"""
+
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import ApprovalRequest, PolicySimulation
+from app.services.simulation_service import PolicySimulationService, SimulationJob
+
+
+def _travel_data(price):
+    return {
+        'train': {
+            'price': price,
+            'currency': 'EUR',
+            'departure_date': (datetime.utcnow() + timedelta(days=10)).isoformat()
+        },
+        'origin': 'LDN',
+        'destination': 'PAR'
+    }
+
+
+def _draft(max_price, action='BLOCK'):
+    return [{
+        'id': 'draft-1',
+        'label': 'Draft',
+        'action': action,
+        'rules': [{'id': 'draft-rule', 'code': 'train_max_od_price', 'action': action,
+                   'vars': {'max_price': max_price, 'currency': 'EUR'}}]
+    }]
+
+
+def _org_with_history(make_policy, prices):
+    org_id = uuid.uuid4()
+    make_policy(org_id, label='Current', action='OUT_OF_POLICY', rules=[
+        {'code': 'train_max_od_price', 'vars': {'max_price': 300, 'currency': 'EUR'}},
+    ])
+    for price in prices:
+        db.session.add(ApprovalRequest(
+            org_id=org_id,
+            user_id=uuid.uuid4(),
+            travel_data=_travel_data(price),
+            policy_evaluation={'result': 'APPROVAL_REQUIRED'}
+        ))
+    db.session.commit()
+    return str(org_id)
+
+
+def test_simulation_diffs_draft_against_current(app, make_policy):
+    """Rows flip only where the draft limit is tighter; batches cover every row"""
+    prices = [100, 150, 250, 280, 350, 400]
+    org_id = _org_with_history(make_policy, prices)
+    progress = []
+    
+    summary = PolicySimulationService().simulate(
+        org_id, _draft(200), batch_size=4, sample_size=1,
+        progress=lambda processed, total: progress.append((processed, total))
+    )
+    
+    assert summary['rows'] == 6 and summary['errors'] == 0
+    assert summary['baseline_results'] == {'IN_POLICY': 4, 'OUT_OF_POLICY': 2}
+    assert summary['transitions'] == {'IN_POLICY->BOOKING_BLOCKED': 2, 'OUT_OF_POLICY->BOOKING_BLOCKED': 2}
+    assert summary['changed'] == 4 and summary['more_restrictive'] == 4
+    assert len(summary['samples']['IN_POLICY->BOOKING_BLOCKED']) == 1
+    assert progress == [(4, 6), (6, 6)]
+    
+    recorded = PolicySimulationService().simulate(org_id, _draft(200), baseline='recorded')
+    assert recorded['transitions'] == {'APPROVAL_REQUIRED->IN_POLICY': 2, 'APPROVAL_REQUIRED->BOOKING_BLOCKED': 4}
+    print(f"✅ Simulation: {summary['transitions']}")
+
+
+def test_simulation_job_endpoint(app, make_policy, client):
+    """Jobs run in the background and report progress and results"""
+    org_id = _org_with_history(make_policy, [100, 500])
+    
+    response = client.post('/api/v1/policy-evaluation/simulations', json={
+        'org_id': org_id,
+        'draft_policies': _draft(1000)
+    })
+    assert response.status_code == 202
+    job_id = response.json['id']
+    
+    for _ in range(50):
+        job = client.get(f'/api/v1/policy-evaluation/simulations/{job_id}').json
+        if job['status'] in ('COMPLETED', 'FAILED'):
+            break
+        time.sleep(0.1)
+    
+    assert job['status'] == 'COMPLETED', job['error']
+    assert job['processed'] == job['total'] == 2
+    assert job['result']['transitions'] == {'OUT_OF_POLICY->IN_POLICY': 1}
+    assert client.get('/api/v1/policy-evaluation/simulations/missing').status_code == 404
+    
+    # State lives in the database, so any worker can answer
+    assert db.session.get(PolicySimulation, uuid.UUID(job_id)).status == 'COMPLETED'
+
+
+def test_simulation_request_validation(app, client):
+    """Invalid org IDs and baselines are rejected before a job is started"""
+    url = '/api/v1/policy-evaluation/simulations'
+    assert client.post(url, json={'org_id': 'not-a-uuid', 'draft_policies': []}).status_code == 400
+    response = client.post(url, json={'org_id': str(uuid.uuid4()), 'draft_policies': [], 'baseline': 'yesterday'})
+    assert response.status_code == 400
+    assert PolicySimulation.query.count() == 0
+
+
+def test_lost_simulation_jobs_are_reported_failed(app):
+    """A job whose worker stopped stops reporting progress and is then marked failed"""
+    job = PolicySimulation(org_id=uuid.uuid4(), status='RUNNING').save()
+    assert SimulationJob.get(str(job.id))['status'] == 'RUNNING'
+    
+    job.updated_at = datetime.utcnow() - timedelta(seconds=SimulationJob.STALE_AFTER + 1)
+    db.session.commit()
+    reported = SimulationJob.get(str(job.id))
+    assert reported['status'] == 'FAILED' and 'interrupted' in reported['error']
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Evaluate NDJSON offers against a policy snapshot, writing NDJSON results in input order
+
+Usage:
+    python tools/evaluate_ndjson.py policies.json [offers.ndjson] [-o results.ndjson]
+        [--workers N] [--chunk-size 500] [--max-in-flight N] [--full-detail]
+
+Reads offers from stdin when no input file is given. Export snapshots with
+migrations/export_policy_snapshot.py. Throughput is reported on stderr.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.offline_evaluation import DEFAULT_CHUNK_SIZE, evaluate_stream
+from app.services.policy_snapshot import load_snapshot
+
+PROGRESS_INTERVAL = 5.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('snapshot', help='Policy snapshot (.json, .yaml or .yml)')
+    parser.add_argument('input', nargs='?', help='NDJSON offers (default: stdin)')
+    parser.add_argument('-o', '--output', help='NDJSON results (default: stdout)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--max-in-flight', type=int, help='Chunks queued at once (default: 2 x workers)')
+    parser.add_argument('--full-detail', action='store_true', help='Evaluate every rule and include per-policy details')
+    args = parser.parse_args()
+    
+    compiled = load_snapshot(args.snapshot)
+    print(f"Loaded {len(compiled)} policies for org {compiled.org_id}, {args.workers} workers", file=sys.stderr)
+    
+    last_report = [time.perf_counter()]
+    
+    def progress(stats):
+        now = time.perf_counter()
+        if now - last_report[0] >= PROGRESS_INTERVAL:
+            last_report[0] = now
+            print(f"{stats['offers']} offers, {stats['offers_per_second']:.0f} offers/s", file=sys.stderr)
+    
+    source = open(args.input) if args.input else sys.stdin
+    sink = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        stats = evaluate_stream(
+            compiled, source, sink,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            max_in_flight=args.max_in_flight,
+            full_detail=args.full_detail,
+            progress=progress
+        )
+    finally:
+        if args.input:
+            source.close()
+        if args.output:
+            sink.close()
+    
+    print(
+        f"Evaluated {stats['offers']} offers ({stats['errors']} errors) in {stats['seconds']:.2f}s: "
+        f"{stats['offers_per_second']:.0f} offers/s with {stats['workers']} workers",
+        file=sys.stderr
+    )
+
+
+if __name__ == '__main__':
+    main()
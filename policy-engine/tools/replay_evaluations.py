@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Replay recorded evaluation traffic and diff the results between engine versions
+
+Usage:
+    python tools/replay_evaluations.py RECORDINGS... (--target URL | --in-process | --snapshot FILE...)
+        [--compare-target URL] [--rate 50] [--concurrency 8] [--limit N]
+        [--endpoint evaluate|evaluate-batch] [--org-id UUID] [--output report.json]
+
+RECORDINGS are NDJSON files or the EVALUATION_RECORD_DIR of a recording engine.
+Results are compared with the recorded results unless --compare-target is set.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.evaluation_replay import (
+    DEFAULT_SAMPLE_SIZE, http_target, in_process_target, read_recordings, recorded_target, replay, snapshot_target
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('recordings', nargs='+', help='Recording files or directories')
+    targets = parser.add_mutually_exclusive_group(required=True)
+    targets.add_argument('--target', help='Base URL of the engine under test, e.g. http://localhost:5000')
+    targets.add_argument('--in-process', action='store_true', help='Evaluate in-process against DATABASE_URL')
+    targets.add_argument('--snapshot', nargs='+', help='Policy snapshots to evaluate with the embedded evaluator')
+    parser.add_argument('--compare-target', help='Base URL of a second engine to diff against (default: recorded results)')
+    parser.add_argument('--rate', type=float, help='Requests per second (default: as fast as --concurrency allows)')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--limit', type=int, help='Replay at most this many requests')
+    parser.add_argument('--endpoint', choices=['evaluate', 'evaluate-batch'], help='Only replay this endpoint')
+    parser.add_argument('--org-id', help='Only replay requests for this organization')
+    parser.add_argument('--sample-size', type=int, default=DEFAULT_SAMPLE_SIZE, help='Differing requests to include')
+    parser.add_argument('--timeout', type=float, default=30.0, help='HTTP timeout in seconds')
+    parser.add_argument('--output', help='Write the JSON report to this path')
+    args = parser.parse_args()
+    
+    if args.target:
+        target = http_target(args.target, args.timeout)
+    elif args.snapshot:
+        from app.services.policy_snapshot import load_snapshot
+        target = snapshot_target([load_snapshot(path) for path in args.snapshot])
+    else:
+        from app import create_app
+        target = in_process_target(create_app())
+    compare = http_target(args.compare_target, args.timeout) if args.compare_target else recorded_target
+    
+    records = read_recordings(args.recordings, endpoint=args.endpoint, org_id=args.org_id)
+    report = replay(
+        records, target, compare,
+        rate=args.rate,
+        concurrency=args.concurrency,
+        limit=args.limit,
+        sample_size=args.sample_size
+    )
+    
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+    sys.exit(1 if report['differing_offers'] or report['errors'] else 0)
+
+
+if __name__ == '__main__':
+    main()